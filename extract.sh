@@ -7,24 +7,9 @@
   echo "=================================================================="
   echo "SECTION B — Latest definition of each search RPC (full SQL body)"
   echo "=================================================================="
-  for fn in search_buildings find_nearby_buildings get_discovery_filters get_discovery_feed get_map_clusters get_map_clusters_v2 get_buildings_list building_matches_credit_filters resolve_locality_for_explore; do
-    echo
-    echo "------------------------------------------------------------------"
-    echo "FUNCTION: $fn"
-    echo "------------------------------------------------------------------"
-    latest=$(grep -rl "CREATE OR REPLACE FUNCTION.*\b$fn\b\|CREATE FUNCTION.*\b$fn\b" supabase/migrations 2>/dev/null | sort | tail -1)
-    if [ -z "$latest" ]; then
-      echo "(no migration found defining $fn)"
-    else
-      echo "FILE: $latest"
-      echo
-      awk -v fn="$fn" '
-        $0 ~ "CREATE (OR REPLACE )?FUNCTION.*\\y" fn "\\y" {flag=1}
-        flag {print}
-        flag && /\$\$ LANGUAGE|\$function\$ LANGUAGE|LANGUAGE (sql|plpgsql|SQL|PLPGSQL)/ {flag=0; print "---END---"; exit}
-      ' "$latest"
-    fi
-  done
+  # One pass over the migrations (cached in .audit-cache), every live overload.
+  python3 scripts/sql_functions.py search_buildings find_nearby_buildings get_discovery_filters get_discovery_feed \
+    get_map_clusters get_map_clusters_v2 get_buildings_list building_matches_credit_filters resolve_locality_for_explore
   echo
   echo "=================================================================="
   echo "SECTION C — Indexes, extensions, tsvector, trigram"
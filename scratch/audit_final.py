@@ -1,10 +1,10 @@
 
 import os
-import re
-import subprocess
+import sys
 
-migrations_dir = 'supabase/migrations'
-migration_files = sorted([f for f in os.listdir(migrations_dir) if f.endswith('.sql')])
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from schema_catalog import build_catalog, table_security
+from table_refs import count_occurrences, scan_table_references
 
 # Tables to audit (extracted from types.ts previously, cleaning up)
 target_tables = [
@@ -23,65 +23,15 @@ target_tables = [
     'suggested_profile_hides', 'user_buildings', 'user_folder_items', 'user_folders', 'waitlist_signups'
 ]
 
-results = {}
-for table in target_tables:
-    results[table] = {
-        'name': table,
-        'created_in': 'Unknown',
-        'rls_enabled': False,
-        'policies_count': 0,
-        'grants': [],
-        'code_references': 0
-    }
+# RLS, policies and grants as they stand after every migration, read from
+# the cached catalog instead of re-scanning supabase/migrations.
+results = table_security(build_catalog(), target_tables)
 
-# Regex patterns
-create_table_re = re.compile(r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(?:public\.)?(\w+)', re.IGNORECASE)
-enable_rls_re = re.compile(r'ALTER\s+TABLE\s+(?:public\.)?(\w+)\s+ENABLE\s+ROW\s+LEVEL\s+SECURITY', re.IGNORECASE)
-grant_re = re.compile(r'GRANT\s+(.*?)\s+ON\s+(?:TABLE\s+)?(?:public\.)?(\w+)\s+TO\s+([\w, ]+)', re.IGNORECASE)
-policy_re = re.compile(r'CREATE\s+POLICY\s+.*?\s+ON\s+(?:public\.)?(\w+)', re.IGNORECASE)
-
-for filename in migration_files:
-    filepath = os.path.join(migrations_dir, filename)
-    try:
-        with open(filepath, 'r') as f:
-            content = f.read()
-            
-            # Find table creations
-            matches = create_table_re.findall(content)
-            for table in matches:
-                if table in results and results[table]['created_in'] == 'Unknown':
-                    results[table]['created_in'] = filename
-            
-            # Check for RLS
-            rls_matches = enable_rls_re.findall(content)
-            for table in rls_matches:
-                if table in results:
-                    results[table]['rls_enabled'] = True
-            
-            # Check for policies
-            policy_matches = policy_re.findall(content)
-            for table in policy_matches:
-                if table in results:
-                    results[table]['policies_count'] += 1
-                    
-            # Check for grants
-            grant_matches = grant_re.findall(content)
-            for privileges, table, roles in grant_matches:
-                if table in results:
-                    roles_list = [r.strip() for r in roles.split(',')]
-                    results[table]['grants'].extend(roles_list)
-    except Exception as e:
-        print(f"Error reading {filename}: {e}")
-
-# Grep code for Data API usage
+# Scan code for Data API usage: .from('table_name') or .from("table_name"),
+# every table in a single walk of the tree
+refs = scan_table_references(results.keys())
 for table in results:
-    # Search for .from('table_name') or .from("table_name")
-    cmd = f"grep -rE \"\\.from\\(['\\\"]{table}['\\\"]\\)\" src app apps packages --exclude-dir=node_modules | wc -l"
-    try:
-        count = subprocess.check_output(cmd, shell=True).decode().strip()
-        results[table]['code_references'] = int(count)
-    except:
-        pass
+    results[table]['code_references'] = refs[table]['count']
 
 # Print Report
 print("# Supabase Data API Compliance Audit Report")
@@ -89,19 +39,18 @@ print("\n## Step 1 Audit Results\n")
 print("| Table Name | Created In | RLS | Policies | Explicit Grants | Code Refs (Data API) |")
 print("|------------|------------|-----|----------|-----------------|----------------------|")
 for name, data in sorted(results.items()):
-    grants = ", ".join(sorted(set(data['grants'])))
+    grants = ", ".join(data['grants'])
     rls = "✅" if data['rls_enabled'] else "❌"
-    print(f"| {name} | {data['created_in']} | {rls} | {data['policies_count']} | {grants} | {data['code_references']} |")
+    print(f"| {name} | {data['created_in'] or 'Unknown'} | {rls} | {len(data['policies'])} | {grants} | {data['code_references']} |")
 
 print("\n## Data API Confirmation")
 # Check for createClient usage
-create_client_cmd = "grep -r \"createClient\" src app apps --exclude-dir=node_modules | wc -l"
-create_client_count = subprocess.check_output(create_client_cmd, shell=True).decode().strip()
+create_client_count = count_occurrences("createClient", roots=('src', 'app', 'apps'))
 print(f"Usage of 'createClient': {create_client_count} occurrences")
 
 # Check for supabase-js usage
-supabase_js_cmd = "grep -r \"@supabase/supabase-js\" package.json | wc -l"
-supabase_js_count = subprocess.check_output(supabase_js_cmd, shell=True).decode().strip()
+with open('package.json', 'r') as f:
+    supabase_js_count = sum(1 for line in f if "@supabase/supabase-js" in line)
 print(f"Usage of '@supabase/supabase-js' in package.json: {supabase_js_count}")
 
 data_api_tables = [t for t, d in results.items() if d['code_references'] > 0]
@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+
+from schema_catalog import CACHE_DIR
+
+# Bump whenever the analysers change what they report, so cached findings
+# from an older version of the audit are never served.
+FINDINGS_VERSION = 5
+
+FINDINGS_CACHE = os.path.join(CACHE_DIR, 'findings.json')
+
+
+def content_hash(content):
+    return hashlib.sha256(content.encode('utf-8', errors='replace')).hexdigest()
+
+
+class FindingsCache:
+    """Per-file findings keyed by file content hash.
+
+    The whole cache is bound to one schema key (the catalog chain key or the
+    hash of schema.sql): when the schema changes every entry is stale, since
+    any file's findings may depend on it.
+    """
+
+    def __init__(self, path=FINDINGS_CACHE, schema_key=None):
+        self.path = path
+        self.schema_key = schema_key
+        self.files = {}
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return self
+        if data.get("version") == FINDINGS_VERSION and data.get("schema") == self.schema_key:
+            self.files = data.get("files", {})
+        return self
+
+    def get(self, filepath, digest):
+        entry = self.files.get(filepath)
+        if entry is not None and entry["hash"] == digest:
+            self.hits += 1
+            return entry["findings"]
+        self.misses += 1
+        return None
+
+    def put(self, filepath, digest, findings):
+        self.files[filepath] = {"hash": digest, "findings": findings}
+        self.dirty = True
+
+    def prune(self, live_paths):
+        # Forget deleted files, but only after a full run has seen every file.
+        live = set(live_paths)
+        for filepath in [p for p in self.files if p not in live]:
+            del self.files[filepath]
+            self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({"version": FINDINGS_VERSION, "schema": self.schema_key, "files": self.files}, f,
+                      separators=(',', ':'))
+        os.replace(tmp, self.path)
+        self.dirty = False
@@ -1,7 +1,21 @@
 import os
-import re
-import json
+import sys
+import time
+import argparse
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
 from parse_schema_test import parse_schema
+from audit_cache import FindingsCache, content_hash
+from audit_profile import Profiler, add_arguments as add_profile_arguments
+from gen_types import TYPES_PATH, committed_relations
+from line_index import LineIndex
+from query_chains import iter_query_chains, iter_rpc_calls, parse_select
+from relations import RelationGraph
+from report_writers import WRITERS
+from schema_catalog import (MIGRATIONS_DIR, build_catalog, catalog_to_functions, catalog_to_schema, new_catalog,
+                            partial_tables, referenced_tables, replay_migration)
+from ts_lexer import tokenize
+from suggestions import SchemaSuggestions
 
 def find_files(root_dir):
     file_paths = []
@@ -17,225 +31,443 @@ def find_files(root_dir):
                 file_paths.append(os.path.join(root, file))
     return file_paths
 
-def extract_table_references(content):
-    # Match supabase.from('table') or .from("table")
-    # Also handle newlines between supabase and .from
-    matches = []
-    # Simplified regex, assuming typical usage
-    # We look for .from('...')
-    for match in re.finditer(r"\.from\(['\"](\w+)['\"]\)", content):
-        matches.append((match.group(1), match.start()))
-    return matches
-
-def analyze_chain(content, start_index, table_name, schema):
+def tokenize_file(filepath, content):
+    return list(tokenize(content, jsx=filepath.endswith('.tsx')))
+
+def extract_query_chains(filepath, content, tokens=None):
+    # Files without a .from() call cannot hold a query chain; skipping the
+    # tokenizer for them keeps a cold run close to the old regex speed.
+    if '.from(' not in content:
+        return []
+    return list(iter_query_chains(content, tokens=tokens or tokenize_file(filepath, content)))
+
+def extract_rpc_calls(filepath, content, tokens=None):
+    if '.rpc(' not in content:
+        return []
+    return list(iter_rpc_calls(content, tokens=tokens or tokenize_file(filepath, content)))
+
+def column_discrepancy(table, col_name, offset, suggestions):
+    suggestion = suggestions.column(table, col_name)
+    return {
+        "type": "column",
+        "table": table,
+        "invalid": col_name,
+        "suggestion": suggestion,
+        "offset": offset
+    }
+
+def check_select(items, table_name, schema, relations, suggestions, discrepancies, embeds, path=()):
+    # Columns are checked against `table_name`; embedded relations
+    # ("profiles(username)", "owner:profiles!owner_id(username)") are
+    # resolved through the FK graph and their items checked against the
+    # target, level by level. `embeds` collects {alias path: target table}
+    # for the chain's "alias.col" filters.
+    columns = schema.get(table_name)
+    for item in items:
+        if item["kind"] == "column":
+            if path and item["name"] == 'count':
+                continue  # "collection_items(count)" counts the embedded rows
+            if columns is not None and item["name"] not in columns:
+                discrepancies.append(column_discrepancy(table_name, item["name"], item["offset"], suggestions))
+            continue
+        if item["kind"] != "embed" or relations is None:
+            continue
+
+        resolved = relations.resolve(table_name, item["name"], item["hints"])
+        status = resolved["status"]
+        if status == 'unknown':
+            discrepancies.append({
+                "type": "relation",
+                "table": table_name,
+                "invalid": item["name"],
+                "suggestion": relations.suggest(table_name, item["name"]),
+                "offset": item["offset"]
+            })
+        elif status in ('ambiguous', 'hint'):
+            discrepancies.append({
+                "type": status,
+                "table": table_name,
+                "relation": item["name"],
+                "invalid": resolved["hint"] if status == 'hint' else item["name"],
+                "suggestion": resolved["candidates"],
+                "offset": item["offset"]
+            })
+        target = resolved["target"]
+        if target is not None:
+            embed_path = path + (item["alias"] or item["name"],)
+            embeds[embed_path] = target
+            check_select(item["inner"], target, schema, relations, suggestions, discrepancies, embeds, embed_path)
+
+def analyze_chain(chain, schema, suggestions=None, relations=None):
+    suggestions = suggestions or SchemaSuggestions(schema)
     discrepancies = []
-
-    # Find the end of the chain. This is hard without a proper parser.
-    # We will look for chained methods until we hit a semicolon or something that looks like end of statement.
-    # Actually, we can just look for specific method calls following the .from()
-
-    # We will limit the search window to say 500 characters or until next .from or ;
-    search_window = content[start_index:]
-    end_stmt = search_window.find(';')
-    if end_stmt != -1:
-        search_window = search_window[:end_stmt]
-
-    next_from = search_window.find('.from(')
-    if next_from != -1 and next_from > 10: # ensure it's not the current one
-         search_window = search_window[:next_from]
-
-    # Check for .select()
-    select_matches = re.finditer(r"\.select\(['\"](.*?)['\"]\)", search_window, re.DOTALL)
-    for match in select_matches:
-        columns_str = match.group(1)
-        # remove newlines
-        columns_str = columns_str.replace('\n', '')
-
-        # Split by comma, but be careful about nested parens like related(col,col)
-        # This is a naive split, might fail on complex nested relations
-        # But should work for top level columns
-
-        # A better approach for static analysis of string content:
-        # 1. Top level columns: "id, name, created_at"
-        # 2. Relations: "profiles(username)"
-        # 3. Aliased relations: "owner:profiles(username)"
-        # 4. JSON arrows: "data->value" (should treat as "data")
-
-        # We can try to parse the string with a simple state machine or regex
-        # For now, let's just extract words that look like columns and check if they exist in schema[table_name]
-        # If it looks like a relation (followed by '('), we check if the relation exists (as a table)
-
-        # Let's clean the string of modifiers like !inner, count=...
-        columns_str = re.sub(r'!inner', '', columns_str)
-
-        # Tokenize by comma, but handle parens
-        tokens = []
-        depth = 0
-        current_token = ""
-        for char in columns_str:
-            if char == '(':
-                depth += 1
-                current_token += char
-            elif char == ')':
-                depth -= 1
-                current_token += char
-            elif char == ',' and depth == 0:
-                tokens.append(current_token.strip())
-                current_token = ""
-            else:
-                current_token += char
-        if current_token:
-            tokens.append(current_token.strip())
-
-        for token in tokens:
-            # Handle aliases: "alias:column" or "alias:table(cols)"
-            if ':' in token:
-                parts = token.split(':', 1)
-                # The right side is the actual column or table
-                token = parts[1]
-
-            # Check if it is a relation: "table(cols)"
-            if '(' in token:
-                # It's a join. The part before '(' is the table name.
-                rel_table_match = re.match(r'(\w+)', token)
-                if rel_table_match:
-                    rel_table = rel_table_match.group(1)
-                    if rel_table not in schema:
-                         # It might be a foreign key name instead of table name, but Supabase usually expects table name or relation name.
-                         # But let's report it if it's not a table.
-                         # Actually, wait. Supabase allows embedding by FK name.
-                         # For strict check, let's flag it if it's not a known table.
-                         # But be gentle.
-                         pass
-                    else:
-                        # Recursively check columns inside parens?
-                        # That requires knowing which table the alias maps to if aliased, or just assuming table name.
-                        # For "profiles(username)", we check 'username' in 'profiles'.
-                        inner_cols = token[token.find('(')+1 : token.rfind(')')]
-                        # We can verify inner_cols against rel_table
-                        # But let's stick to top level for now or simple recursion if easy.
-                        pass
-                continue
-
-            # It's a simple column (or with modifiers like count)
-            # "id"
-            # "id.count()" -> no, supabase doesn't do that inside select string usually
-            # "data->field"
-
-            col_name = token.split('->')[0].strip() # Handle json operators
-            col_name = col_name.split('.')[0].strip() # Handle accidental dots?
-            col_name = col_name.split(' ')[0].strip() # Handle ' column as alias' (SQL style? no supabase uses :)
-
-            if col_name == '*':
-                continue
-
-            if col_name and col_name not in schema.get(table_name, {}):
-                 # Check closest neighbor
-                 suggestion = find_closest_neighbor(col_name, schema.get(table_name, {}).keys())
-                 discrepancies.append({
-                     "type": "column",
-                     "table": table_name,
-                     "invalid": col_name,
-                     "suggestion": suggestion
-                 })
-
-    # Check for .eq('col', val), .order('col'), .gt('col'), etc.
-    # list of methods that take column as first arg
-    col_arg_methods = ['eq', 'neq', 'gt', 'gte', 'lt', 'lte', 'like', 'ilike', 'is', 'in', 'contains', 'containedBy', 'rangeGt', 'rangeGte', 'rangeLt', 'rangeLte', 'rangeAdjacent', 'overlaps', 'textSearch', 'match', 'order']
-
-    for method in col_arg_methods:
-        method_matches = re.finditer(r"\." + method + r"\(['\"](.*?)['\"]", search_window)
-        for match in method_matches:
-            col_name = match.group(1)
-            # handle json arrows
-            col_name = col_name.split('->')[0].strip()
-
-            # handle table qualifiers if any: "table.col" (not common in supabase js, but possible in join filters?)
-            # usually it is just "col" or "foreign_table.col" for join filtering?
-            # Actually Supabase JS uses logic filters on joined tables differently usually.
-            # But if it is "col", it refers to `table_name`.
-
-            if '.' in col_name:
-                # "relation.col"
-                rel, col = col_name.split('.', 1)
-                # we need to check if rel is a valid table (or alias) and col is valid on it.
-                # Simplification: check if 'rel' is in schema. If so, check 'col' on 'rel'.
-                if rel in schema:
-                    if col not in schema[rel]:
-                        suggestion = find_closest_neighbor(col, schema[rel].keys())
-                        discrepancies.append({
-                             "type": "column",
-                             "table": rel,
-                             "invalid": col,
-                             "suggestion": suggestion
-                        })
-                continue
-
-            if col_name and col_name not in schema.get(table_name, {}):
-                 suggestion = find_closest_neighbor(col_name, schema.get(table_name, {}).keys())
-                 discrepancies.append({
-                     "type": "column",
-                     "table": table_name,
-                     "invalid": col_name,
-                     "suggestion": suggestion
-                 })
-
-    # Check for .insert([...]) or .insert({...}) or .update or .upsert
-    # This is harder because the keys are in an object literal.
-    # regex to find .insert/update/upsert
-    write_methods = ['insert', 'update', 'upsert']
-    for method in write_methods:
-        # We need to capture the object content.
-        # This is very hard with regex because of nested braces.
-        # But we can try to find simple keys.
-        # Look for .method({ ... }) or .method([{...}])
-        pass
-        # For now, skipping write methods object parsing via regex as it is error prone.
-        # But we can look for "key:" patterns inside the method call?
+    table_name = chain["table"]
+    columns = schema.get(table_name, {})
+
+    # Check the select string; without `relations` embeds are skipped.
+    select = chain["select"]
+    embeds = {}
+    if select and not select["dynamic"] and select["offset"] is not None:
+        check_select(parse_select(select["value"], select["offset"]), table_name, schema, relations, suggestions,
+                     discrepancies, embeds)
+
+    # Check .eq('col', val), .order('col'), .gt('col'), etc.
+    checked = [f for f in chain["filters"] if not f["referenced"]]
+    checked += [o for o in chain["order"] if not o["referenced"]]
+    for ref in checked:
+        # handle json arrows
+        col_name = ref["column"].split('->')[0].strip()
+
+        if '.' in col_name:
+            # "embed.col" / "alias.nested.col": check 'col' on the table the
+            # select string embeds under that path, or on 'rel' itself when
+            # it names a table.
+            *rel_path, col = col_name.split('.')
+            rel = embeds.get(tuple(rel_path))
+            if rel is None and len(rel_path) == 1:
+                rel = rel_path[0]
+            if rel in schema and col not in schema[rel]:
+                offset = ref["offset"] + len(col_name) - len(col)
+                discrepancies.append(column_discrepancy(rel, col, offset, suggestions))
+            continue
+
+        if col_name and col_name not in columns:
+            discrepancies.append(column_discrepancy(table_name, col_name, ref["offset"], suggestions))
+
+    # Check the keys of .insert({...}) / .update({...}) / .upsert([...])
+    # payloads written as object literals.
+    write = chain["write"]
+    if write:
+        for key in write["keys"]:
+            if key["name"] not in columns:
+                discrepancies.append(column_discrepancy(table_name, key["name"], key["offset"], suggestions))
 
     return discrepancies
 
-import difflib
+def analyze_rpc(call, functions, suggestions):
+    """Discrepancies for one .rpc() call: unknown function, unknown or missing arguments."""
+    name = call["function"]
+    overloads = functions.get(name)
+    if overloads is None:
+        return [{
+            "type": "function",
+            "invalid": name,
+            "suggestion": suggestions.function(name),
+            "offset": call["offset"]
+        }]
+    # Positional (unnamed) parameters are matched by PostgREST in ways the
+    # argument names cannot describe; leave those functions alone.
+    if any(arg["name"] is None for overload in overloads for arg in overload):
+        return []
 
-def find_closest_neighbor(word, possibilities):
-    matches = difflib.get_close_matches(word, possibilities, n=1, cutoff=0.6)
-    return matches[0] if matches else None
+    discrepancies = []
+    known = {arg["name"] for overload in overloads for arg in overload}
+    given = set()
+    for arg in call["args"]:
+        given.add(arg["name"])
+        if arg["name"] not in known:
+            discrepancies.append({
+                "type": "argument",
+                "function": name,
+                "invalid": arg["name"],
+                "suggestion": suggestions.argument(name, arg["name"]),
+                "offset": arg["offset"]
+            })
+
+    # PostgREST picks the overload whose parameters match the given keys; an
+    # object with hidden keys may supply anything, so only literal ones count.
+    if discrepancies or call["dynamic"]:
+        return discrepancies
+    missing = None
+    for overload in overloads:
+        names = {arg["name"] for arg in overload}
+        if not given <= names:
+            continue
+        required = [arg["name"] for arg in overload if arg["required"] and arg["name"] not in given]
+        if missing is None or len(required) < len(missing):
+            missing = required
+    for arg_name in missing or []:
+        discrepancies.append({
+            "type": "missing_argument",
+            "function": name,
+            "invalid": arg_name,
+            "suggestion": None,
+            "offset": call["offset"]
+        })
+    return discrepancies
 
-def main():
-    schema = parse_schema('schema.sql')
-    files = find_files('src')
-
-    report = []
-
-    for filepath in files:
-        with open(filepath, 'r') as f:
-            content = f.read()
-
-        # check for invalid table usage
-        table_refs = extract_table_references(content)
-        for table_name, index in table_refs:
-            if table_name not in schema:
-                # Table does not exist
-                suggestion = find_closest_neighbor(table_name, schema.keys())
-                report.append({
+def load_schema(schema_path=None, migrations_dir=MIGRATIONS_DIR, stats=None, types_path=TYPES_PATH):
+    # A hand-exported schema.sql wins when given; otherwise replay the
+    # migrations. Tables that predate the migration history are returned
+    # separately: they exist, but their column list is incomplete. So are
+    # tables the migrations never create but whose SQL reads them, or that
+    # the committed types.ts (`types_path`) lists. Functions
+    # (as `catalog_to_functions` shapes them) and the FK graph come from the
+    # same source. The key identifies the schema version for the findings
+    # cache; `stats` is passed on to build_catalog.
+    if schema_path:
+        with open(schema_path, 'r') as f:
+            sql = f.read()
+        catalog = replay_migration(new_catalog(), sql, os.path.basename(schema_path))
+        return (parse_schema(schema_path), set(), catalog_to_functions(catalog), RelationGraph.from_catalog(catalog),
+                content_hash(sql))
+    catalog = build_catalog(migrations_dir, stats=stats)
+    known = partial_tables(catalog) | referenced_tables(catalog)
+    key = catalog["key"]
+    if types_path and os.path.exists(types_path):
+        with open(types_path, 'r') as f:
+            types = f.read()
+        known |= committed_relations(types) - set(catalog["tables"])
+        key = content_hash(key + content_hash(types))
+    return (catalog_to_schema(catalog), known, catalog_to_functions(catalog), RelationGraph.from_catalog(catalog, known),
+            key)
+
+def describe_discrepancy(d):
+    """(error, fix) report text for one discrepancy."""
+    suggestion = d['suggestion']
+    if d['type'] == 'column':
+        return (f"Invalid column '{d['invalid']}' on table '{d['table']}'",
+                f"Change to '{suggestion}'" if suggestion else "Unknown column")
+    if d['type'] == 'relation':
+        return (f"Invalid embedded resource '{d['invalid']}' on table '{d['table']}'",
+                f"Change to '{suggestion}'" if suggestion else "No relationship found")
+    if d['type'] == 'ambiguous':
+        return (f"Ambiguous embedded resource '{d['invalid']}' on table '{d['table']}'",
+                "Disambiguate with " + " or ".join(f"'{d['invalid']}!{hint}'" for hint in suggestion))
+    if d['type'] == 'hint':
+        return (f"Invalid hint '!{d['invalid']}' for embedded resource '{d['relation']}' on table '{d['table']}'",
+                "Change to " + " or ".join(f"'!{hint}'" for hint in suggestion) if suggestion
+                else "No relationship found")
+    if d['type'] == 'function':
+        return (f"Invalid function reference: '{d['invalid']}'",
+                f"Change to '{suggestion}'" if suggestion else "Unknown function")
+    if d['type'] == 'argument':
+        return (f"Invalid argument '{d['invalid']}' for function '{d['function']}'",
+                f"Change to '{suggestion}'" if suggestion else "Unknown argument")
+    return f"Missing argument '{d['invalid']}' for function '{d['function']}'", f"Pass '{d['invalid']}'"
+
+def analyze_file(filepath, content, schema, partial, suggestions=None, functions=None, relations=None):
+    # `suggestions` should be built once per schema and shared across files;
+    # its lookups are memoised, as are `relations`' resolutions. Without
+    # `functions`, .rpc() calls are not checked; without `relations`,
+    # embedded resources are not.
+    suggestions = suggestions or SchemaSuggestions(schema, functions)
+    findings = []
+    lines = None
+    tokens = tokenize_file(filepath, content) if '.from(' in content or '.rpc(' in content else None
+
+    # check for invalid table usage
+    for chain in extract_query_chains(filepath, content, tokens):
+        table_name = chain["table"]
+        if table_name in partial:
+            continue
+        if table_name not in schema:
+            # Table does not exist
+            suggestion = suggestions.table(table_name)
+            lines = lines or LineIndex(content)
+            line, column = lines.position(chain["table_offset"])
+            findings.append({
+                "file": filepath,
+                "error": f"Invalid table reference: '{table_name}'",
+                "fix": f"Change to '{suggestion}'" if suggestion else "Unknown table",
+                "line": line,
+                "column": column
+            })
+        else:
+            # Analyze columns and embedded resources
+            discs = analyze_chain(chain, schema, suggestions, relations)
+            for d in discs:
+                lines = lines or LineIndex(content)
+                line, column = lines.position(d['offset'])
+                error, fix = describe_discrepancy(d)
+                findings.append({
                     "file": filepath,
-                    "error": f"Invalid table reference: '{table_name}'",
-                    "fix": f"Change to '{suggestion}'" if suggestion else "Unknown table",
-                    "line": content[:index].count('\n') + 1
+                    "error": error,
+                    "fix": fix,
+                    "line": line,
+                    "column": column
                 })
+
+    # check .rpc('function', {args}) against the functions' parameters
+    if functions is not None:
+        for call in extract_rpc_calls(filepath, content, tokens):
+            for d in analyze_rpc(call, functions, suggestions):
+                lines = lines or LineIndex(content)
+                line, column = lines.position(d['offset'])
+                error, fix = describe_discrepancy(d)
+                findings.append({
+                    "file": filepath,
+                    "error": error,
+                    "fix": fix,
+                    "line": line,
+                    "column": column
+                })
+
+    return findings
+
+def changed_files(ref, root_dir='src', migrations_dir=MIGRATIONS_DIR):
+    """Source files changed since `ref`, or None when everything must be re-checked.
+
+    Covers committed, staged and unstaged changes plus untracked files. A
+    changed migration can invalidate findings in any file, so it forces a
+    full run. Exits with an error when git does not know `ref`.
+    """
+    try:
+        diff = subprocess.run(['git', 'diff', '--name-only', ref, '--'], capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError:
+        sys.exit(f"--since: unknown ref {ref}")
+    untracked = subprocess.run(['git', 'ls-files', '--others', '--exclude-standard'],
+                               capture_output=True, text=True, check=True)
+    paths = set(diff.stdout.splitlines()) | set(untracked.stdout.splitlines())
+
+    prefix = os.path.normpath(migrations_dir) + os.sep
+    if any(os.path.normpath(p).startswith(prefix) for p in paths):
+        return None
+
+    root = os.path.normpath(root_dir) + os.sep
+    return sorted(
+        p for p in paths
+        if os.path.normpath(p).startswith(root) and p.endswith(('.ts', '.tsx')) and os.path.exists(p)
+    )
+
+# Set once per worker process by the pool initializer, so the schema is
+# pickled once per worker rather than once per file.
+_worker_schema = None
+
+def _init_worker(schema, partial, functions, relations):
+    global _worker_schema
+    # Each worker builds its own suggestion index rather than unpickling one.
+    _worker_schema = (schema, partial, functions, relations, SchemaSuggestions(schema, functions))
+
+def _analyze_in_worker(filepath, content):
+    schema, partial, functions, relations, suggestions = _worker_schema
+    start = time.perf_counter()
+    findings = analyze_file(filepath, content, schema, partial, suggestions, functions, relations)
+    return findings, time.perf_counter() - start
+
+def analyze_files(pending, schema, partial, jobs=1, functions=None, relations=None, timings=None, suggestions=None):
+    """Analyse [(filepath, content), ...], yielding each file's findings in input order.
+
+    `timings`, when given, is called with (filepath, seconds) for every file,
+    timed where it was analysed.
+    """
+    if jobs <= 1 or len(pending) < 2:
+        suggestions = suggestions or SchemaSuggestions(schema, functions)
+        for filepath, content in pending:
+            start = time.perf_counter()
+            findings = analyze_file(filepath, content, schema, partial, suggestions, functions, relations)
+            if timings is not None:
+                timings(filepath, time.perf_counter() - start)
+            yield findings
+        return
+
+    jobs = min(jobs, len(pending))
+    # A few chunks per worker balances uneven files without paying IPC per file.
+    chunksize = max(1, len(pending) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(schema, partial, functions, relations)) as executor:
+        # map() yields in submission order, so the report matches a serial run.
+        results = executor.map(_analyze_in_worker,
+                               [filepath for filepath, _ in pending],
+                               [content for _, content in pending],
+                               chunksize=chunksize)
+        for (filepath, _), (findings, seconds) in zip(pending, results):
+            if timings is not None:
+                timings(filepath, seconds)
+            yield findings
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check Supabase table, column and RPC references in src against the schema.")
+    parser.add_argument('--schema', help="Use a pg_dump schema.sql instead of replaying supabase/migrations")
+    parser.add_argument('--migrations', default=MIGRATIONS_DIR)
+    parser.add_argument('--since', metavar='REF', help="Only analyse files changed since this git ref")
+    parser.add_argument('--no-cache', action='store_true', help="Ignore and do not update the findings cache")
+    parser.add_argument('--jobs', type=int, default=1, metavar='N',
+                        help="Analyse files in N worker processes (0 = one per CPU)")
+    parser.add_argument('--format', choices=sorted(WRITERS), default='json',
+                        help="json: one array (default); ndjson: a line per finding as it is found; "
+                             "sarif: SARIF 2.1.0 for code scanning; summary: counts by rule, table and file")
+    parser.add_argument('--watch', action='store_true',
+                        help="Keep running and stream changed findings as NDJSON when src or the schema changes")
+    parser.add_argument('--poll', action='store_true', help="With --watch, poll for changes instead of inotify")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    if args.watch:
+        # Imported here: audit_watch builds on this module.
+        from audit_watch import watch
+        watch('src', args.migrations, args.schema, jobs, not args.no_cache, args.poll)
+        return
+
+    profiler = Profiler.from_args('audit_codebase', args)
+    catalog_stats = {}
+    with profiler.phase('schema'):
+        schema, partial, functions, relations, schema_key = load_schema(args.schema, args.migrations,
+                                                                         catalog_stats)
+        suggestions = SchemaSuggestions(schema, functions)
+
+    with profiler.phase('walk'):
+        files = changed_files(args.since, migrations_dir=args.migrations) if args.since else None
+        full_run = files is None
+        if full_run:
+            files = find_files('src')
+
+    with profiler.phase('read'):
+        cache = FindingsCache(schema_key=schema_key)
+        if not args.no_cache:
+            cache.load()
+
+        cached = {}
+        pending = []
+        digests = {}
+
+        for filepath in files:
+            with open(filepath, 'r') as f:
+                content = f.read()
+
+            digest = content_hash(content)
+            findings = cache.get(filepath, digest)
+            if findings is None:
+                pending.append((filepath, content))
+                digests[filepath] = digest
             else:
-                # Analyze columns
-                discs = analyze_chain(content, index, table_name, schema)
-                for d in discs:
-                    report.append({
-                        "file": filepath,
-                        "error": f"Invalid column '{d['invalid']}' on table '{d['table']}'",
-                        "fix": f"Change to '{d['suggestion']}'" if d['suggestion'] else "Unknown column",
-                        "line": content[:index].count('\n') + 1 # Approximate line
-                    })
-
-    # Print report
-    print(json.dumps(report, indent=2))
+                cached[filepath] = findings
+
+    # Findings go out file by file as the analysis reaches them, in the
+    # order of `files`, rather than after the whole tree is done.
+    writer = WRITERS[args.format](sys.stdout)
+    analysed = analyze_files(pending, schema, partial, jobs, functions, relations, profiler.file, suggestions)
+    try:
+        for filepath in files:
+            findings = cached.pop(filepath, None)
+            if findings is None:
+                with profiler.phase('analyze'):
+                    findings = next(analysed)
+                cache.put(filepath, digests[filepath], findings)
+            with profiler.phase('report'):
+                for finding in findings:
+                    writer.write(finding)
+        with profiler.phase('report'):
+            writer.close()
+    except BrokenPipeError:
+        # The reader went away (`--format ndjson | head`): stop quietly. Point
+        # stdout at devnull so the flush at exit doesn't raise again.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+
+    if not args.no_cache:
+        with profiler.phase('save-cache'):
+            if full_run:
+                cache.prune(files)
+            cache.save()
+
+    profiler.catalog(catalog_stats)
+    profiler.cache('findings', cache.hits, cache.hits + cache.misses)
+    profiler.cache('suggestions', *suggestions.memo_stats())
+    profiler.cache('relations', *relations.memo_stats())
+    profiler.finish()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,156 @@
+import cProfile
+import heapq
+import json
+import os
+import signal
+import sys
+import time
+from contextlib import contextmanager
+
+# Sampling interval for --profile-stacks, in seconds of process CPU time.
+SAMPLE_INTERVAL = 0.001
+
+
+def add_arguments(parser):
+    parser.add_argument('--profile', metavar='PATH',
+                        help="Write a JSON profile (wall/CPU time per phase, slowest files, cache hit rates) "
+                             "to PATH, or - for stderr")
+    parser.add_argument('--profile-top', type=int, default=10, metavar='N',
+                        help="Slowest files to list in the profile (default: 10)")
+    parser.add_argument('--profile-stacks', metavar='PATH',
+                        help="Also write stacks: cProfile stats for a .prof PATH, otherwise sampled stacks in "
+                             "the collapsed format flamegraph.pl and speedscope read")
+
+
+class StackSampler:
+    """Collapsed call stacks of the main thread, sampled on SIGPROF."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.counts = {}
+        self._previous = None
+
+    def _sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        key = ';'.join(reversed(stack))
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def start(self):
+        self._previous = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._previous or signal.SIG_DFL)
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+
+class Profiler:
+    """Wall and CPU time per phase, the slowest files and cache hit rates for one audit run.
+
+    Phases accumulate, so a phase entered once per file reports its total.
+    CPU time is this process's: with worker processes, their time shows up
+    as wall time in the phase that waits for them.
+    """
+
+    def __init__(self, script, path=None, top=10, stacks=None):
+        self.script = script
+        self.path = path
+        self.top = top
+        self.stacks = stacks
+        self.phases = {}
+        self.files = []  # min-heap of (seconds, path), at most `top` entries
+        self.files_timed = 0
+        self.caches = {}
+        self._stack_profiler = None
+        self._started = (time.perf_counter(), time.process_time())
+
+    @classmethod
+    def from_args(cls, script, args):
+        profiler = cls(script, args.profile, args.profile_top, args.profile_stacks)
+        profiler.start()
+        return profiler
+
+    def start(self):
+        if self.stacks is None:
+            return
+        if self.stacks.endswith('.prof'):
+            self._stack_profiler = cProfile.Profile()
+            self._stack_profiler.enable()
+        else:
+            self._stack_profiler = StackSampler()
+            self._stack_profiler.start()
+
+    @contextmanager
+    def phase(self, name):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            totals = self.phases.setdefault(name, [0.0, 0.0])
+            totals[0] += time.perf_counter() - wall
+            totals[1] += time.process_time() - cpu
+
+    def file(self, path, seconds):
+        self.files_timed += 1
+        if len(self.files) < self.top:
+            heapq.heappush(self.files, (seconds, path))
+        elif self.top and (seconds, path) > self.files[0]:
+            heapq.heapreplace(self.files, (seconds, path))
+
+    def each_file(self, files):
+        """Yield `files`, timing the caller's loop body for each."""
+        for path in files:
+            start = time.perf_counter()
+            yield path
+            self.file(path, time.perf_counter() - start)
+
+    def cache(self, name, hits, lookups):
+        self.caches[name] = {"hits": hits, "lookups": lookups,
+                             "hit_rate": round(hits / lookups, 4) if lookups else None}
+
+    def catalog(self, stats):
+        """Record build_catalog's `stats`: migrations served from a checkpoint rather than replayed."""
+        if stats:
+            self.cache('catalog-checkpoints', stats["migrations"] - stats["replayed"], stats["migrations"])
+
+    def report(self):
+        wall, cpu = self._started
+        return {
+            "script": self.script,
+            "wall_seconds": round(time.perf_counter() - wall, 6),
+            "cpu_seconds": round(time.process_time() - cpu, 6),
+            "phases": [{"phase": name, "wall_seconds": round(w, 6), "cpu_seconds": round(c, 6)}
+                       for name, (w, c) in self.phases.items()],
+            "files_timed": self.files_timed,
+            "slowest_files": [{"file": path, "seconds": round(seconds, 6)}
+                              for seconds, path in sorted(self.files, reverse=True)],
+            "caches": self.caches,
+            "stacks": self.stacks,
+        }
+
+    def finish(self):
+        """Stop stack collection and write whatever was asked for."""
+        if isinstance(self._stack_profiler, cProfile.Profile):
+            self._stack_profiler.disable()
+            self._stack_profiler.dump_stats(self.stacks)
+        elif self._stack_profiler is not None:
+            self._stack_profiler.stop()
+            self._stack_profiler.dump(self.stacks)
+        if self.path is None:
+            return
+        if self.path == '-':
+            json.dump(self.report(), sys.stderr, indent=2)
+            sys.stderr.write('\n')
+            return
+        with open(self.path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+            f.write('\n')
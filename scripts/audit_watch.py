@@ -0,0 +1,224 @@
+import json
+import os
+import re
+import sys
+import time
+
+from audit_cache import FindingsCache, content_hash
+from audit_codebase import analyze_file, analyze_files, find_files, load_schema
+from file_watcher import InotifyWatcher, open_watcher
+from gen_types import TYPES_PATH
+from schema_catalog import MIGRATIONS_DIR
+from suggestions import SchemaSuggestions
+
+SOURCE_EXTENSIONS = ('.ts', '.tsx')
+
+_WORD_RE = re.compile(r'[A-Za-z_]\w*')
+
+
+def schema_changes(old, new):
+    """Names a file must mention for its findings to depend on what differs between two `load_schema` results.
+
+    A table whose columns or partial flag changed affects files naming it,
+    or embedding it through a foreign-key column (`owner_id(...)`). One
+    whose foreign keys changed also affects selects on the tables at the
+    other end, since embeds resolve from either side.
+    """
+    old_schema, old_partial, old_functions, old_relations = old[:4]
+    new_schema, new_partial, new_functions, new_relations = new[:4]
+    changed = set()
+    rewired = set()
+    for name in old_relations.tables.keys() | new_relations.tables.keys() | old_schema.keys() | new_schema.keys():
+        if old_relations.tables.get(name) != new_relations.tables.get(name):
+            rewired.add(name)
+        elif old_schema.get(name) != new_schema.get(name) or (name in old_partial) != (name in new_partial):
+            changed.add(name)
+    for relations in (old_relations, new_relations):
+        for name in changed | rewired:
+            changed.update(fk["columns"][0] for _, fk in relations.incoming.get(name, ()) if len(fk["columns"]) == 1)
+        for name in rewired:
+            changed.update(fk["ref_table"] for fk in relations.outgoing.get(name, ()))
+            changed.update(table for table, _ in relations.incoming.get(name, ()))
+    changed |= rewired | (old_relations.views ^ new_relations.views)
+    for name in (old_functions or {}).keys() | (new_functions or {}).keys():
+        if (old_functions or {}).get(name) != (new_functions or {}).get(name):
+            changed.add(name)
+    return changed
+
+
+class AuditDaemon:
+    """Keeps the schema and every file's findings in memory and re-checks what a change touches.
+
+    An edited source file is re-analysed on its own. A changed migration (or
+    schema.sql) reloads the schema, resuming the catalog from its newest
+    checkpoint, and re-analyses only the files that mention a table, view
+    or function whose definition changed, plus the files that already had
+    findings, whose suggestions may now differ. Every update is one NDJSON
+    line on `out`.
+    """
+
+    def __init__(self, root='src', migrations_dir=MIGRATIONS_DIR, schema_path=None, jobs=1, use_cache=True,
+                 out=sys.stdout):
+        self.root = root
+        self.migrations_dir = migrations_dir
+        self.schema_path = schema_path
+        self.jobs = jobs
+        self.use_cache = use_cache
+        self.out = out
+        self.files = {}  # path -> {"hash", "words", "findings"}
+        self.started = time.monotonic()
+
+    def emit(self, event, **fields):
+        fields = {"event": event, **fields, "ms": round((time.monotonic() - self.started) * 1000, 1)}
+        self.out.write(json.dumps(fields) + '\n')
+        self.out.flush()
+
+    def _load_schema(self):
+        loaded = load_schema(self.schema_path, self.migrations_dir)
+        self.loaded = loaded
+        self.schema, self.partial, self.functions, self.relations, self.schema_key = loaded
+        self.suggestions = SchemaSuggestions(self.schema, self.functions)
+
+    def _analyze(self, pending):
+        """Analyse [(path, content)] and record the results, emitting files whose findings changed."""
+        if len(pending) > 1 and self.jobs > 1:
+            results = analyze_files(pending, self.schema, self.partial, self.jobs, self.functions, self.relations)
+        else:
+            results = [analyze_file(path, content, self.schema, self.partial, self.suggestions, self.functions,
+                                    self.relations) for path, content in pending]
+        for (path, _), findings in zip(pending, results):
+            self._record(path, findings)
+
+    def _record(self, path, findings):
+        entry = self.files[path]
+        previous = entry["findings"]
+        entry["findings"] = findings
+        if findings != previous and (previous is not None or findings):
+            self.emit("findings", file=path, findings=findings)
+
+    def _read(self, path):
+        """(content, changed) for a source file, registering it on first sight; None once it is gone."""
+        try:
+            with open(path, 'r') as f:
+                content = f.read()
+        except (OSError, UnicodeDecodeError):
+            return None
+        digest = content_hash(content)
+        entry = self.files.get(path)
+        if entry is not None and entry["hash"] == digest:
+            return content, False
+        self.files[path] = {"hash": digest, "words": frozenset(_WORD_RE.findall(content)),
+                            "findings": entry["findings"] if entry else None}
+        return content, True
+
+    def start(self):
+        self._load_schema()
+        cache = FindingsCache(schema_key=self.schema_key)
+        if self.use_cache:
+            cache.load()
+        pending = []
+        for path in find_files(self.root):
+            read = self._read(path)
+            if read is None:
+                continue
+            findings = cache.get(path, self.files[path]["hash"])
+            if findings is None:
+                pending.append((path, read[0]))
+            else:
+                self._record(path, findings)
+        self._analyze(pending)
+        self.save()
+        self.emit("ready", files=len(self.files), analysed=len(pending),
+                  findings=sum(len(e["findings"]) for e in self.files.values()))
+
+    def save(self):
+        if not self.use_cache:
+            return
+        cache = FindingsCache(schema_key=self.schema_key)
+        for path, entry in self.files.items():
+            cache.put(path, entry["hash"], entry["findings"])
+        cache.save()
+
+    def _is_source(self, path):
+        root = os.path.normpath(self.root) + os.sep
+        return os.path.normpath(path).startswith(root) and path.endswith(SOURCE_EXTENSIONS)
+
+    def _is_schema(self, path):
+        if self.schema_path:
+            return os.path.abspath(path) == os.path.abspath(self.schema_path)
+        return ((os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.migrations_dir) and path.endswith('.sql'))
+                or os.path.abspath(path) == os.path.abspath(TYPES_PATH))
+
+    def update(self, paths):
+        """Re-check after `paths` changed; None means anything may have."""
+        self.started = time.monotonic()
+        if paths is None:
+            paths = set(self.files) | set(find_files(self.root))
+            schema_changed = True
+        else:
+            schema_changed = any(self._is_schema(p) for p in paths)
+
+        sources = {p for p in paths if self._is_source(p)}
+        for path in paths:
+            # A deleted or moved-away directory is reported by its own path
+            # only: every file recorded under it is gone too.
+            if path not in sources and not os.path.exists(path):
+                prefix = os.path.normpath(path) + os.sep
+                sources.update(p for p in self.files if os.path.normpath(p).startswith(prefix))
+
+        pending = []
+        for path in sorted(sources):
+            read = self._read(path)
+            if read is None:
+                entry = self.files.pop(path, None)
+                if entry is not None and entry["findings"]:
+                    self.emit("findings", file=path, findings=[])
+            elif read[1]:
+                pending.append((path, read[0]))
+
+        if schema_changed:
+            old, old_key = self.loaded, self.schema_key
+            try:
+                self._load_schema()
+            except Exception as e:  # a migration saved mid-edit must not kill the daemon
+                self.emit("error", error=f"{type(e).__name__}: {e}")
+            else:
+                if self.schema_key != old_key:
+                    changed = schema_changes(old, self.loaded)
+                    queued = {path for path, _ in pending}
+                    for path, entry in self.files.items():
+                        if path not in queued and (entry["findings"] or entry["words"] & changed):
+                            read = self._read(path)
+                            if read is not None:
+                                pending.append((path, read[0]))
+                    self.emit("schema", key=self.schema_key, changed=sorted(changed), reanalysing=len(pending))
+        try:
+            self._analyze(pending)
+        except Exception as e:
+            self.emit("error", error=f"{type(e).__name__}: {e}")
+        if pending or schema_changed or sources:
+            self.emit("idle", analysed=len(pending),
+                      findings=sum(len(e["findings"] or ()) for e in self.files.values()))
+
+    def run(self, polling=False):
+        schema_dir = (os.path.dirname(self.schema_path) or '.') if self.schema_path else self.migrations_dir
+        roots = [self.root, schema_dir]
+        watcher = open_watcher(roots, polling)
+        self.started = time.monotonic()
+        self.emit("watching", roots=roots, watcher='inotify' if isinstance(watcher, InotifyWatcher) else 'polling')
+        try:
+            while True:
+                changed = watcher.changes()
+                if changed is None or changed:
+                    self.update(changed)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.close()
+            self.save()
+
+
+def watch(root='src', migrations_dir=MIGRATIONS_DIR, schema_path=None, jobs=1, use_cache=True, polling=False):
+    daemon = AuditDaemon(root, migrations_dir, schema_path, jobs, use_cache)
+    daemon.start()
+    daemon.run(polling)
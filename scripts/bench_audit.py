@@ -0,0 +1,327 @@
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from audit_codebase import (analyze_chain, analyze_rpc, describe_discrepancy, extract_query_chains,
+                            extract_rpc_calls, find_files, tokenize_file)
+from line_index import LineIndex
+from parse_schema_test import parse_schema
+from relations import RelationGraph
+from report_writers import JsonWriter
+from schema_catalog import (CACHE_DIR, MIGRATIONS_DIR, build_catalog, catalog_to_functions, catalog_to_schema,
+                            partial_tables)
+from suggestions import SchemaSuggestions
+
+BASELINE = os.path.join(CACHE_DIR, 'bench-baseline.json')
+PHASES = ('schema-sql', 'schema-load', 'walk', 'extract', 'analyze', 'report')
+
+# Differences below these are timer and allocator noise, whatever the ratio.
+MIN_SECONDS = 0.005
+MIN_PEAK_KIB = 256
+
+COLUMN_TYPES = ('text', 'integer', 'boolean', 'timestamp with time zone', 'jsonb', 'numeric', 'uuid', 'text[]')
+
+
+class Corpus:
+    """A synthetic repo: `files` TS modules with `chains` queries each, over `migrations` migrations.
+
+    Tables get a handful of typed columns and a foreign key to an earlier
+    table, RLS and policies; later migrations add columns, indexes,
+    functions and re-created policies, the way a real history churns.
+    About `error_rate` of the column references are misspelt so the
+    suggestion path is exercised too.
+    """
+
+    def __init__(self, files=500, chains=8, migrations=200, tables=60, error_rate=0.02, seed=1):
+        self.params = {"files": files, "chains": chains, "migrations": migrations, "tables": tables,
+                       "error_rate": error_rate, "seed": seed}
+        self.random = random.Random(seed)
+        self.tables = {}  # name -> {"columns": {name: type}, "parent": name or None}
+        self.functions = {}  # name -> [param names]
+
+    def write(self, root):
+        migrations_dir = os.path.join(root, MIGRATIONS_DIR)
+        os.makedirs(migrations_dir)
+        for i, sql in enumerate(self._migrations()):
+            with open(os.path.join(migrations_dir, f"{20240101000000 + i * 100}_m{i}.sql"), 'w') as f:
+                f.write(sql)
+        with open(os.path.join(root, 'schema.sql'), 'w') as f:
+            f.write(self._schema_sql())
+        per_dir = 25
+        for i in range(self.params["files"]):
+            directory = os.path.join(root, 'src', 'features', f"f{i // per_dir}")
+            os.makedirs(directory, exist_ok=True)
+            extension = '.tsx' if i % 3 == 0 else '.ts'
+            with open(os.path.join(directory, f"module{i}{extension}"), 'w') as f:
+                f.write(self._module(i))
+        with open(os.path.join(root, 'corpus.json'), 'w') as f:
+            json.dump(self.params, f)
+
+    def _migrations(self):
+        count, table_count = self.params["migrations"], self.params["tables"]
+        # Tables are created across the first half of the history; the rest alters them.
+        creates = max(1, count // 2)
+        for i in range(count):
+            statements = []
+            while len(self.tables) < table_count and len(self.tables) * creates < table_count * (i + 1):
+                statements.extend(self._create_table())
+            if self.tables and (i >= creates or not statements):
+                statements.extend(self._churn())
+            yield '\n\n'.join(statements) + '\n'
+
+    def _create_table(self):
+        name = f"table_{len(self.tables)}"
+        parent = self.random.choice(list(self.tables)) if self.tables else None
+        columns = {'id': 'uuid', 'name': 'text', 'created_at': 'timestamp with time zone'}
+        for k in range(self.random.randint(3, 8)):
+            columns[f"col_{k}"] = self.random.choice(COLUMN_TYPES)
+        if parent:
+            columns[f"{parent}_id"] = 'uuid'
+        self.tables[name] = {"columns": columns, "parent": parent}
+        lines = [f"    {column} {'uuid PRIMARY KEY DEFAULT gen_random_uuid()' if column == 'id' else type_}"
+                 + (f" REFERENCES public.{parent}(id) ON DELETE CASCADE" if column == f"{parent}_id" else '')
+                 for column, type_ in columns.items()]
+        return [
+            f"CREATE TABLE IF NOT EXISTS public.{name} (\n" + ',\n'.join(lines) + "\n);",
+            f"ALTER TABLE public.{name} ENABLE ROW LEVEL SECURITY;",
+            f"CREATE POLICY \"{name} readable\" ON public.{name} FOR SELECT USING (true);",
+            f"GRANT SELECT ON public.{name} TO anon, authenticated;",
+        ]
+
+    def _churn(self):
+        name = self.random.choice(list(self.tables))
+        table = self.tables[name]
+        kind = self.random.randrange(4)
+        if kind == 0:
+            column = f"extra_{len(table['columns'])}"
+            table["columns"][column] = self.random.choice(COLUMN_TYPES)
+            return [f"ALTER TABLE public.{name} ADD COLUMN IF NOT EXISTS {column} {table['columns'][column]};"]
+        if kind == 1:
+            column = self.random.choice(list(table["columns"]))
+            return [f"CREATE INDEX IF NOT EXISTS idx_{name}_{column} ON public.{name} ({column});"]
+        if kind == 2:
+            return [f"DROP POLICY IF EXISTS \"{name} readable\" ON public.{name};",
+                    f"CREATE POLICY \"{name} readable\" ON public.{name} FOR SELECT USING (auth.uid() IS NOT NULL);"]
+        function = f"get_{name}_page_{self.random.randrange(3)}"
+        self.functions[function] = ['p_limit', 'p_offset']
+        return [f"CREATE OR REPLACE FUNCTION public.{function}(p_limit integer DEFAULT 20, p_offset integer DEFAULT 0)\n"
+                f"RETURNS SETOF public.{name}\nLANGUAGE sql STABLE SECURITY INVOKER\nAS $$\n"
+                f"  SELECT * FROM public.{name} ORDER BY created_at DESC LIMIT p_limit OFFSET p_offset;\n$$;",
+                f"GRANT EXECUTE ON FUNCTION public.{function}(integer, integer) TO authenticated;"]
+
+    def _schema_sql(self):
+        # The pg_dump layout parse_schema reads.
+        parts = []
+        for name, table in self.tables.items():
+            columns = ',\n'.join(f"    {column} {type_}" for column, type_ in table["columns"].items())
+            parts.append(f"CREATE TABLE public.{name} (\n{columns}\n);\n")
+        return '\n'.join(parts)
+
+    def _column(self, table):
+        column = self.random.choice(list(self.tables[table]["columns"]))
+        if self.random.random() < self.params["error_rate"]:
+            column = column[:-1] + 'x'
+        return column
+
+    def _module(self, index):
+        lines = ["import { supabase } from '@/integrations/supabase/client';", ""]
+        for k in range(self.params["chains"]):
+            if self.functions and k % 5 == 4:
+                function = self.random.choice(sorted(self.functions))
+                lines += [f"export async function call{index}_{k}(limit: number) {{",
+                          f"  const {{ data }} = await supabase.rpc('{function}', {{ p_limit: limit, p_offset: 0 }});",
+                          "  return data;", "}", ""]
+                continue
+            table = self.random.choice(list(self.tables))
+            parent = self.tables[table]["parent"]
+            select = ', '.join(sorted({self._column(table) for _ in range(4)}))
+            if parent and self.random.random() < 0.5:
+                select += f", {parent}(id, {self._column(parent)})"
+            lines += [f"export async function load{index}_{k}(id: string) {{",
+                      "  const { data, error } = await supabase",
+                      f"    .from('{table}')",
+                      f"    .select('{select}')",
+                      f"    .eq('{self._column(table)}', id)",
+                      "    .order('created_at', { ascending: false })",
+                      "    .limit(20);",
+                      "  if (error) throw error;",
+                      "  return data;", "}", ""]
+        return '\n'.join(lines)
+
+
+def run_phases(root, migrations_dir, schema_sql=None):
+    """Run the audit one phase at a time, yielding (phase, seconds) as each finishes."""
+    if schema_sql:
+        start = time.perf_counter()
+        parse_schema(schema_sql)
+        yield 'schema-sql', time.perf_counter() - start
+
+    start = time.perf_counter()
+    catalog = build_catalog(migrations_dir, use_cache=False)
+    schema, partial, functions = catalog_to_schema(catalog), partial_tables(catalog), catalog_to_functions(catalog)
+    relations = RelationGraph.from_catalog(catalog)
+    suggestions = SchemaSuggestions(schema, functions)
+    yield 'schema-load', time.perf_counter() - start
+
+    start = time.perf_counter()
+    files = find_files(root)
+    yield 'walk', time.perf_counter() - start
+
+    start = time.perf_counter()
+    extracted = []
+    for filepath in files:
+        with open(filepath, 'r') as f:
+            content = f.read()
+        tokens = tokenize_file(filepath, content) if '.from(' in content or '.rpc(' in content else None
+        extracted.append((filepath, content, extract_query_chains(filepath, content, tokens),
+                          extract_rpc_calls(filepath, content, tokens)))
+    yield 'extract', time.perf_counter() - start
+
+    start = time.perf_counter()
+    analysed = []
+    for filepath, content, chains, calls in extracted:
+        discrepancies = []
+        for chain in chains:
+            if chain["table"] not in partial and chain["table"] in schema:
+                discrepancies.extend(analyze_chain(chain, schema, suggestions, relations))
+        for call in calls:
+            discrepancies.extend(analyze_rpc(call, functions, suggestions))
+        analysed.append((filepath, content, discrepancies))
+    yield 'analyze', time.perf_counter() - start
+
+    start = time.perf_counter()
+    writer = JsonWriter(io.StringIO())
+    for filepath, content, discrepancies in analysed:
+        lines = LineIndex(content) if discrepancies else None
+        for d in discrepancies:
+            line, column = lines.position(d['offset'])
+            error, fix = describe_discrepancy(d)
+            writer.write({"file": filepath, "error": error, "fix": fix, "line": line, "column": column})
+    writer.close()
+    yield 'report', time.perf_counter() - start
+
+
+def measure(root, migrations_dir, schema_sql=None, repeat=3):
+    """{phase: {"seconds": best of `repeat`, "peak_kib": peak traced allocation}}.
+
+    Timings come from untraced runs; tracemalloc slows allocation-heavy
+    phases several times over, so peak memory is taken in one extra run.
+    """
+    results = {}
+    for _ in range(repeat):
+        for phase, seconds in run_phases(root, migrations_dir, schema_sql):
+            best = results.setdefault(phase, {"seconds": seconds})
+            best["seconds"] = min(best["seconds"], seconds)
+    tracemalloc.start()
+    try:
+        phases = run_phases(root, migrations_dir, schema_sql)
+        while True:
+            # Peak over what earlier phases still hold, so each phase is charged for its own allocations.
+            tracemalloc.reset_peak()
+            held = tracemalloc.get_traced_memory()[0]
+            try:
+                phase, _ = next(phases)
+            except StopIteration:
+                break
+            results[phase]["peak_kib"] = (tracemalloc.get_traced_memory()[1] - held) // 1024
+    finally:
+        tracemalloc.stop()
+    return results
+
+
+def compare(current, baseline, threshold):
+    """Per-phase comparison rows, with `regressed` set past `threshold` (a fraction)."""
+    rows = []
+    for phase in PHASES:
+        now, before = current.get(phase), baseline.get(phase)
+        if now is None:
+            continue
+        row = {"phase": phase, **now}
+        if before is not None:
+            row["baseline_seconds"] = before["seconds"]
+            row["baseline_peak_kib"] = before.get("peak_kib")
+            slower = (now["seconds"] > before["seconds"] * (1 + threshold)
+                      and now["seconds"] - before["seconds"] > MIN_SECONDS)
+            larger = (before.get("peak_kib") is not None
+                      and now["peak_kib"] > before["peak_kib"] * (1 + threshold)
+                      and now["peak_kib"] - before["peak_kib"] > MIN_PEAK_KIB)
+            row["regressed"] = [what for what, hit in (("time", slower), ("memory", larger)) if hit]
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time each phase of the schema audit on a synthetic repo (or this one) and compare against a "
+                    "stored baseline.")
+    parser.add_argument('--files', type=int, default=500, metavar='N', help="TS files to generate (default: 500)")
+    parser.add_argument('--chains', type=int, default=8, metavar='M', help="Query chains per file (default: 8)")
+    parser.add_argument('--migrations', type=int, default=200, metavar='K', help="Migrations to generate (default: 200)")
+    parser.add_argument('--tables', type=int, default=60, help="Tables the migrations create (default: 60)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--corpus', metavar='DIR', help="Generate the corpus here and keep it (default: a temp dir)")
+    parser.add_argument('--repo', action='store_true', help="Benchmark src and supabase/migrations of this repo")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per phase; the best counts (default: 3)")
+    parser.add_argument('--baseline', default=BASELINE, metavar='PATH')
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the baseline")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Fail when a phase is this fraction slower or larger than the baseline (default: 0.2)")
+    args = parser.parse_args()
+
+    temp = None
+    if args.repo:
+        params = {"repo": os.getcwd()}
+        root, migrations_dir, schema_sql = 'src', MIGRATIONS_DIR, None
+    else:
+        corpus = Corpus(args.files, args.chains, args.migrations, args.tables, seed=args.seed)
+        params = corpus.params
+        base = args.corpus or tempfile.mkdtemp(prefix='audit-bench-')
+        if args.corpus is None:
+            temp = base
+        if os.path.isdir(base) and os.listdir(base):
+            sys.exit(f"{base} is not empty")
+        corpus.write(base)
+        root, migrations_dir = os.path.join(base, 'src'), os.path.join(base, MIGRATIONS_DIR)
+        schema_sql = os.path.join(base, 'schema.sql')
+
+    try:
+        current = measure(root, migrations_dir, schema_sql, args.repeat)
+    finally:
+        if temp:
+            shutil.rmtree(temp)
+
+    baseline = {}
+    try:
+        with open(args.baseline, 'r') as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        stored = None
+    if stored is not None and stored.get("corpus") == params:
+        baseline = stored["phases"]
+    elif stored is not None and not args.save_baseline:
+        print(f"{args.baseline} was recorded on a different corpus; not comparing", file=sys.stderr)
+
+    rows = compare(current, baseline, args.threshold)
+    json.dump({"corpus": params, "python": platform.python_version(), "phases": rows}, sys.stdout, indent=2)
+    print()
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump({"corpus": params, "python": platform.python_version(), "phases": current}, f, indent=2)
+        return
+    regressed = [f"{row['phase']} ({', '.join(row['regressed'])})" for row in rows if row.get("regressed")]
+    if regressed:
+        sys.exit("Regressed past the baseline: " + '; '.join(regressed))
+
+
+if __name__ == "__main__":
+    main()
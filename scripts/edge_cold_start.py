@@ -0,0 +1,552 @@
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from urllib.parse import urljoin, urlsplit
+
+from audit_profile import Profiler, add_arguments as add_profile_arguments
+from ts_lexer import tokenize
+
+FUNCTIONS_DIR = 'supabase/functions'
+SHARED_DIR = '_shared'
+LOCKFILE = 'deno.lock'
+BASELINE = '.cold-start-baseline.json'
+
+# A direct import whose exclusive cost is at least this many bytes, and whose
+# bindings are only used inside functions, is reported as a lazy-load candidate.
+HEAVY_BYTES = 50_000
+
+# Growth below these is noise whatever the ratio.
+MIN_BYTES = 2048
+
+_SOURCE_EXTENSIONS = ('.ts', '.tsx', '.js', '.jsx', '.mjs')
+_MAX_REDIRECTS = 10
+
+# A '(' after one of these is syntax, not a call.
+_NOT_CALLS = frozenset(('if', 'for', 'while', 'switch', 'catch', 'with', 'function', 'return', 'typeof', 'void',
+                        'async', 'await', 'import', 'super', 'in', 'of', 'new', 'delete', 'yield', 'case'))
+# Braces opened after these hold declarations that run nothing when the module loads.
+_DECLARATION_KEYWORDS = frozenset(('function', 'class', 'interface', 'enum', 'declare', 'namespace', 'module'))
+
+Import = namedtuple('Import', ['specifier', 'dynamic', 'names'])
+Module = namedtuple('Module', ['id', 'kind', 'bytes', 'side_effects', 'imports', 'top_level_names', 'locked'])
+
+
+def parse_module(content, jsx=False):
+    """(imports, side_effects, top_level_names) for one module.
+
+    `imports` skips type-only imports, which TypeScript erases. A side effect
+    is a call or `new` that runs when the module is evaluated: outside any
+    function or class body, and not nested in another such call's arguments.
+    `top_level_names` are the identifiers read at load time.
+    """
+    tokens = list(tokenize(content, jsx=jsx))
+    closer = {}
+    opener = {}
+    opened = []
+    for i, token in enumerate(tokens):
+        if token.kind != 'punct':
+            continue
+        if token.value in ('(', '[', '{'):
+            opened.append(i)
+        elif token.value in (')', ']', '}') and opened:
+            start = opened.pop()
+            closer[start] = i
+            opener[i] = start
+
+    imports = []
+    side_effects = 0
+    top_level_names = set()
+    # 'fn' | 'block' | '(' | '[' for each open delimiter, plus 'arrow' while
+    # inside an arrow function's expression body.
+    stack = []
+    # Stack depth at which a declaration keyword was seen: the next '{' at
+    # that depth opens its body.
+    declaration = None
+    parameter_lists = set()  # indexes of the ')' closing a parameter list
+    clause_end = -1
+    # (stack depth, closing values) of an open type annotation, whose names
+    # are types rather than values read at load time.
+    annotation = None
+    for i, token in enumerate(tokens):
+        if i <= clause_end:
+            continue
+        prev = tokens[i - 1] if i else None
+        if (stack and stack[-1] == 'arrow' and token.kind == 'ident' and '\n' in content[prev.end:token.start]
+                and (prev.kind != 'punct' or prev.value in (')', ']', '}'))):
+            # Without semicolons an arrow's expression body ends at the line
+            # that starts the next statement.
+            while stack and stack[-1] == 'arrow':
+                stack.pop()
+        loading = 'fn' not in stack and 'arrow' not in stack
+
+        if token.kind == 'ident':
+            if token.value == 'import' and (prev is None or prev.value != '.'):
+                following = tokens[i + 1] if i + 1 < len(tokens) else None
+                if following is not None and following.value == '(':
+                    if i + 2 < len(tokens) and tokens[i + 2].kind == 'string':
+                        imports.append(Import(tokens[i + 2].value, True, ()))
+                elif not stack:
+                    parsed, clause_end = _static_import(tokens, i + 1)
+                    if parsed is not None:
+                        imports.append(parsed)
+                continue
+            if token.value == 'export' and not stack and i + 1 < len(tokens) and tokens[i + 1].value in ('{', '*'):
+                parsed, end = _static_import(tokens, i + 1)
+                if parsed is not None:
+                    imports.append(parsed)
+                    clause_end = end
+                    continue
+            if token.value in _DECLARATION_KEYWORDS and loading and (prev is None or prev.value != '.'):
+                declaration = len(stack)
+            elif token.value == 'type' and i + 2 < len(tokens) and tokens[i + 1].kind == 'ident' \
+                    and tokens[i + 2].value in ('=', '<'):
+                declaration = len(stack)
+            if loading and annotation is None and (prev is None or prev.value not in ('.', '?.')):
+                top_level_names.add(token.value)
+            continue
+
+        if token.kind != 'punct':
+            continue
+        value = token.value
+        if annotation is not None and len(stack) == annotation[0] and value in annotation[1]:
+            annotation = None
+        if value == ':' and prev is not None and annotation is None:
+            if prev.value == ')' and i - 1 in parameter_lists:
+                annotation = (len(stack), ('{', '=>', ';'))
+            elif prev.kind == 'ident' and i > 1 and tokens[i - 2].value in ('const', 'let', 'var'):
+                annotation = (len(stack), ('=', ';'))
+        if value in (';', ',', ')', ']', '}'):
+            while stack and stack[-1] == 'arrow':
+                stack.pop()
+        if value == '=>' and i + 1 < len(tokens) and tokens[i + 1].value != '{':
+            stack.append('arrow')
+        elif value == '{':
+            kind = 'block'
+            if declaration == len(stack) or (prev is not None and prev.value == '=>'):
+                kind = 'fn'
+                declaration = None
+            elif prev is not None and prev.value == ')':
+                # `) {` is a function body unless the parenthesis belonged to
+                # if/for/while/switch, whose blocks run at load time.
+                start = opener.get(i - 1)
+                before = tokens[start - 1] if start else None
+                if before is None or before.value not in ('if', 'for', 'while', 'switch', 'with'):
+                    kind = 'fn'
+            stack.append(kind)
+        elif value == '[':
+            stack.append(value)
+        elif value == '(':
+            after = tokens[closer[i] + 1] if closer.get(i, len(tokens)) + 1 < len(tokens) else None
+            # A parameter list: its defaults run per call, and names in it
+            # are parameters or types.
+            parameters = (after is not None and after.value in ('{', '=>')
+                          or (after is not None and after.value == ':' and (prev is None or prev.kind != 'ident'))
+                          or (prev is not None and prev.value == 'function')
+                          or (i > 1 and tokens[i - 2].value == 'function'))
+            if (not parameters and loading and '(' not in stack and '[' not in stack and prev is not None
+                    and (prev.value in (')', ']') or (prev.kind == 'ident' and prev.value not in _NOT_CALLS))):
+                side_effects += 1
+            if parameters and i in closer:
+                parameter_lists.add(closer[i])
+            stack.append('fn' if parameters else value)
+        elif value in (')', ']', '}') and stack:
+            stack.pop()
+    return imports, side_effects, top_level_names
+
+
+def _static_import(tokens, i):
+    """(Import, index of its last token) for the clause starting at tokens[i], after
+    `import` or a re-exporting `export`; the Import is None when only types are imported."""
+    if tokens[i].value == 'type' and i + 1 < len(tokens) and tokens[i + 1].value not in ('from', ','):
+        return None, i
+    names = []
+    types = 0
+    star = False
+    while i < len(tokens):
+        token = tokens[i]
+        if token.kind == 'string':
+            # `import { type A, type B } from` is erased like `import type`.
+            if types and not names and not star:
+                return None, i
+            return Import(token.value, False, tuple(names)), i
+        if token.value == ';':
+            return None, i
+        if token.kind == 'ident' and token.value != 'from':
+            if token.value == 'as':
+                # `* as ns` and `{ a as b }` bind the name after `as`.
+                if names:
+                    names.pop()
+            elif token.value == 'type' and i + 1 < len(tokens) and tokens[i + 1].kind == 'ident':
+                types += 1
+                i += 2
+                if i < len(tokens) and tokens[i].value == 'as':
+                    i += 2
+                continue
+            else:
+                names.append(token.value)
+        elif token.value == '*':
+            star = True
+        i += 1
+    return None, i
+
+
+class DenoLock:
+    """The parts of deno.lock that say what a remote specifier resolves to."""
+
+    def __init__(self, path=LOCKFILE):
+        self.path = path
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.version = data.get("version")
+        self.redirects = data.get("redirects", {})
+        self.remote = data.get("remote", {})
+
+    def resolve(self, url):
+        for _ in range(_MAX_REDIRECTS):
+            target = self.redirects.get(url)
+            if target is None:
+                break
+            url = target
+        return url
+
+    def locked(self, url):
+        return url in self.remote
+
+
+class RemoteSources:
+    """Remote module sources from the Deno cache, checked against deno.lock.
+
+    Without a populated cache every remote module is still counted, but its
+    size and its own imports are unknown.
+    """
+
+    def __init__(self, lock, deno_dir=None):
+        self.lock = lock
+        self.deno_dir = deno_dir or default_deno_dir()
+
+    def source(self, url):
+        if not self.deno_dir:
+            return None
+        parts = urlsplit(url)
+        host = parts.hostname or ''
+        if parts.port:
+            host += f"_PORT{parts.port}"
+        rest = parts.path + (f"?{parts.query}" if parts.query else '')
+        name = hashlib.sha256(rest.encode()).hexdigest()
+        for folder in ('remote', 'deps'):
+            path = os.path.join(self.deno_dir, folder, parts.scheme, host, name)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                continue
+            # Newer Deno versions append the HTTP metadata to the cached source.
+            marker = data.rfind(b'\n// denoCacheMetadata=')
+            if marker != -1:
+                data = data[:marker]
+            expected = self.lock.remote.get(url)
+            if expected is not None and hashlib.sha256(data).hexdigest() != expected:
+                return None
+            return data
+        return None
+
+
+def default_deno_dir():
+    if os.environ.get('DENO_DIR'):
+        return os.environ['DENO_DIR']
+    if sys.platform == 'darwin':
+        return os.path.expanduser('~/Library/Caches/deno')
+    return os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'deno')
+
+
+def list_functions(functions_dir=FUNCTIONS_DIR):
+    """(name, entry path) for every deployed function: a directory with an index.ts."""
+    entries = []
+    for name in sorted(os.listdir(functions_dir)):
+        if name.startswith(('_', '.')):
+            continue
+        for ext in _SOURCE_EXTENSIONS:
+            entry = os.path.join(functions_dir, name, 'index' + ext)
+            if os.path.isfile(entry):
+                entries.append((name, entry))
+                break
+    return entries
+
+
+class ImportGraph:
+    """Modules reachable from edge-function entry points, parsed once each.
+
+    Local modules are keyed by path relative to the repo root, remote ones
+    by their redirect-resolved URL.
+    """
+
+    def __init__(self, lock, remote, functions_dir=FUNCTIONS_DIR):
+        self.lock = lock
+        self.remote = remote
+        self.shared_prefix = os.path.join(functions_dir, SHARED_DIR) + os.sep
+        self.modules = {}
+
+    def resolve(self, specifier, referrer):
+        if specifier.startswith(('http://', 'https://')):
+            return self.lock.resolve(specifier)
+        if referrer.startswith(('http://', 'https://')):
+            return self.lock.resolve(urljoin(referrer, specifier))
+        if specifier.startswith(('./', '../', '/')):
+            return os.path.normpath(os.path.join(os.path.dirname(referrer), specifier))
+        # npm:, jsr: and bare specifiers: counted, never followed.
+        return specifier
+
+    def module(self, module_id):
+        module = self.modules.get(module_id)
+        if module is not None:
+            return module
+        remote = module_id.startswith(('http://', 'https://'))
+        if remote:
+            data = self.remote.source(module_id)
+            kind = 'remote'
+        elif os.path.isfile(module_id):
+            with open(module_id, 'rb') as f:
+                data = f.read()
+            kind = 'shared' if module_id.startswith(self.shared_prefix) else 'local'
+        else:
+            data = None
+            kind = 'package' if ':' in module_id or not module_id.startswith('.') and os.sep not in module_id \
+                else 'missing'
+        if data is None:
+            module = Module(module_id, kind, None, None, (), frozenset(), self.lock.locked(module_id) if remote else None)
+        else:
+            jsx = module_id.endswith(('.tsx', '.jsx'))
+            imports, side_effects, names = parse_module(data.decode('utf-8', errors='replace'), jsx=jsx)
+            imports = tuple(imp._replace(specifier=self.resolve(imp.specifier, module_id)) for imp in imports)
+            module = Module(module_id, kind, len(data), side_effects, imports, frozenset(names),
+                            self.lock.locked(module_id) if remote else None)
+        self.modules[module_id] = module
+        return module
+
+    def closure(self, roots):
+        """Every module loaded eagerly from `roots`; dynamic imports are not followed."""
+        seen = set()
+        todo = list(roots)
+        while todo:
+            module_id = todo.pop()
+            if module_id in seen:
+                continue
+            seen.add(module_id)
+            todo.extend(imp.specifier for imp in self.module(module_id).imports if not imp.dynamic)
+        return seen
+
+
+def _cost(graph, module_ids):
+    """Bytes, side effects and module counts for a set of modules."""
+    totals = {"local_bytes": 0, "shared_bytes": 0, "remote_bytes": 0, "modules": len(module_ids),
+              "remote_modules": 0, "remote_unsized": 0, "side_effects": 0, "remote_side_effects": 0}
+    for module_id in module_ids:
+        module = graph.module(module_id)
+        if module.kind in ('remote', 'package'):
+            totals["remote_modules"] += 1
+            if module.bytes is None:
+                totals["remote_unsized"] += 1
+            else:
+                totals["remote_bytes"] += module.bytes
+                totals["remote_side_effects"] += module.side_effects
+        elif module.bytes is not None:
+            totals[f"{module.kind}_bytes"] += module.bytes
+            totals["side_effects"] += module.side_effects
+    totals["bytes"] = totals["local_bytes"] + totals["shared_bytes"] + totals["remote_bytes"]
+    return totals
+
+
+def analyse_function(graph, name, entry, heavy_bytes=HEAVY_BYTES):
+    loaded = graph.closure([entry])
+    report = {"function": name, "entry": entry, **_cost(graph, loaded)}
+
+    # What each thing the function's own code imports costs, and what
+    # making every static import of it lazy would save: the modules nothing
+    # else loads.
+    edges = {}
+    for importer in sorted(loaded):
+        module = graph.module(importer)
+        if module.kind not in ('local', 'shared'):
+            continue
+        for imp in module.imports:
+            edges.setdefault(imp.specifier, []).append((importer, imp))
+    imports = []
+    for specifier, uses in edges.items():
+        reached = graph.closure([specifier])
+        dynamic = all(imp.dynamic for _, imp in uses)
+        cost = _cost(graph, reached)
+        exclusive = _cost(graph, reached - _closure_without(graph, entry, specifier)) if not dynamic else None
+        used_at_load = any(set(imp.names) & graph.module(importer).top_level_names for importer, imp in uses)
+        imports.append({
+            "specifier": specifier, "importers": sorted({importer for importer, _ in uses}), "dynamic": dynamic,
+            "bytes": cost["bytes"], "modules": cost["modules"], "remote_unsized": cost["remote_unsized"],
+            "side_effects": cost["side_effects"] + cost["remote_side_effects"],
+            "exclusive_bytes": exclusive and exclusive["bytes"], "used_at_load": used_at_load,
+            # A bare `import 'x'` is there for its side effects and cannot wait.
+            "lazy_candidate": (exclusive is not None and not used_at_load
+                               and all(imp.names for _, imp in uses if not imp.dynamic)
+                               and exclusive["bytes"] >= heavy_bytes),
+        })
+    report["imports"] = sorted(imports, key=lambda row: -row["bytes"])
+    # Unlike remote_modules, the same with or without a Deno cache.
+    report["remote_imports"] = sum(graph.module(specifier).kind in ('remote', 'package') for specifier in edges)
+    report["unlocked"] = sorted(m for m in loaded if graph.module(m).kind == 'remote' and not graph.module(m).locked)
+    report["missing"] = sorted(m for m in loaded if graph.module(m).kind == 'missing')
+    report["shared"] = sorted(m for m in loaded if graph.module(m).kind == 'shared')
+    return report
+
+
+def _closure_without(graph, entry, specifier):
+    """Modules `entry` would still load eagerly if the function's own code imported `specifier` lazily."""
+    seen = set()
+    todo = [entry]
+    while todo:
+        module_id = todo.pop()
+        if module_id in seen:
+            continue
+        seen.add(module_id)
+        own = graph.module(module_id).kind in ('local', 'shared')
+        for imp in graph.module(module_id).imports:
+            if imp.dynamic or (own and imp.specifier == specifier):
+                continue
+            todo.append(imp.specifier)
+    return seen
+
+
+def shared_report(graph, reports):
+    """Per _shared module: its own cost, what it pulls in, and which functions load it."""
+    users = {}
+    for report in reports:
+        for module_id in report["shared"]:
+            users.setdefault(module_id, []).append(report["function"])
+    rows = []
+    for module_id in sorted(users):
+        module = graph.module(module_id)
+        cost = _cost(graph, graph.closure([module_id]))
+        rows.append({"module": module_id, "bytes": module.bytes, "side_effects": module.side_effects,
+                     "transitive_bytes": cost["bytes"], "transitive_modules": cost["modules"],
+                     "remote_unsized": cost["remote_unsized"], "functions": users[module_id]})
+    return rows
+
+
+def budget(report):
+    """The numbers a cold-start baseline tracks for one function."""
+    entry = {"bytes": report["local_bytes"] + report["shared_bytes"], "side_effects": report["side_effects"],
+             "remote_imports": report["remote_imports"]}
+    if report["remote_unsized"] == 0:
+        entry["remote_bytes"] = report["remote_bytes"]
+    return entry
+
+
+def compare(reports, baseline, threshold):
+    """Regression messages for functions that grew past their baseline."""
+    regressions = []
+    for report in reports:
+        before = baseline.get(report["function"])
+        if before is None:
+            continue
+        now = budget(report)
+        for field in ('bytes', 'remote_bytes'):
+            if field in now and field in before and now[field] > before[field] * (1 + threshold) \
+                    and now[field] - before[field] > MIN_BYTES:
+                regressions.append(f"{report['function']}: {field} {before[field]} -> {now[field]}")
+        for field in ('side_effects', 'remote_imports'):
+            if field in before and now[field] > before[field]:
+                regressions.append(f"{report['function']}: {field} {before[field]} -> {now[field]}")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Offline cold-start cost of each Supabase edge function: bytes and top-level side effects "
+                    "of its eager import graph, lazy-load candidates, and growth against a committed baseline.")
+    parser.add_argument('functions', nargs='*', help="Only these functions (default: all)")
+    parser.add_argument('--functions-dir', default=FUNCTIONS_DIR)
+    parser.add_argument('--lock', default=LOCKFILE, help="deno.lock to resolve remote imports with")
+    parser.add_argument('--deno-dir', help="Deno cache with the remote sources (default: $DENO_DIR or the "
+                                           "platform cache); without one, remote sizes are unknown")
+    parser.add_argument('--heavy-bytes', type=int, default=HEAVY_BYTES, metavar='N',
+                        help="Exclusive size from which an import is a lazy-load candidate (default: %(default)s)")
+    parser.add_argument('--baseline', default=BASELINE, metavar='PATH')
+    parser.add_argument('--update', action='store_true', help="Rewrite the baseline from this run")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="Fail when a function's bytes grow by more than this fraction (default: 0.1); any "
+                             "new top-level side effect or remote import fails too")
+    parser.add_argument('--history', metavar='PATH', help="Append this run's totals to PATH as one NDJSON line")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    profiler = Profiler.from_args('edge_cold_start', args)
+    with profiler.phase('walk'):
+        lock = DenoLock(args.lock)
+        graph = ImportGraph(lock, RemoteSources(lock, args.deno_dir), args.functions_dir)
+        functions = list_functions(args.functions_dir)
+    if args.functions:
+        functions = [(name, entry) for name, entry in functions if name in args.functions]
+    if not functions:
+        sys.exit("No edge functions found")
+    reports = []
+    with profiler.phase('analyze'):
+        # Timed per entry point; modules shared with an earlier function are
+        # already parsed, so later functions come out cheaper.
+        for name, entry in functions:
+            start = time.perf_counter()
+            reports.append(analyse_function(graph, name, entry, args.heavy_bytes))
+            profiler.file(entry, time.perf_counter() - start)
+
+    try:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f).get("functions", {})
+    except (OSError, ValueError):
+        baseline = {}
+    regressions = [] if args.update else compare(reports, baseline, args.threshold)
+    totals = {field: sum(r[field] for r in reports)
+              for field in ('bytes', 'local_bytes', 'shared_bytes', 'remote_bytes', 'remote_imports',
+                            'remote_modules', 'remote_unsized', 'side_effects')}
+    with profiler.phase('report'):
+        json.dump({"deno_dir": graph.remote.deno_dir, "totals": totals, "functions": reports,
+                   "shared": shared_report(graph, reports), "regressions": regressions}, sys.stdout, indent=2)
+        print()
+    profiler.finish()
+
+    if args.history:
+        with open(args.history, 'a') as f:
+            f.write(json.dumps({"date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+                                "commit": _git_commit(), "totals": totals,
+                                "functions": {r["function"]: budget(r) for r in reports}}) + '\n')
+    if args.update:
+        if args.functions:
+            baseline.update({r["function"]: budget(r) for r in reports})
+        else:
+            baseline = {r["function"]: budget(r) for r in reports}
+        with open(args.baseline, 'w') as f:
+            json.dump({"comment": "Cold-start budget per edge function: eagerly loaded local+_shared bytes, "
+                                  "top-level side effects and distinct remote imports (remote bytes when the "
+                                  "Deno cache was available). CI fails when a function grows past it; only rewrite it with "
+                                  "--update after a deliberate change, and say why in the PR.",
+                       "functions": dict(sorted(baseline.items()))}, f, indent=2)
+            f.write('\n')
+        return
+    if regressions:
+        sys.exit("Cold-start cost grew past the baseline: " + '; '.join(regressions))
+
+
+if __name__ == "__main__":
+    main()
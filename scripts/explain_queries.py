@@ -0,0 +1,815 @@
+import argparse
+import contextlib
+import glob
+import itertools
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from audit_codebase import extract_query_chains, find_files
+from audit_profile import Profiler, add_arguments as add_profile_arguments
+from line_index import LineIndex
+from payload_size import DEFAULT_PAGE_ROWS, MAX_ROWS, load_row_counts
+from query_chains import parse_select
+from relations import RelationGraph
+from schema_catalog import MIGRATIONS_DIR, build_catalog, list_migrations
+
+# What Supabase provides before the first migration runs: its roles, the
+# auth/storage/extensions schemas and the auth helpers policies call, and
+# the default grants PostgREST's roles get on public objects.
+BOOTSTRAP_SQL = r"""
+DO $$
+DECLARE r text;
+BEGIN
+  FOREACH r IN ARRAY ARRAY['anon', 'authenticated', 'service_role', 'authenticator', 'supabase_admin',
+                           'supabase_auth_admin', 'supabase_storage_admin', 'dashboard_user'] LOOP
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = r) THEN
+      EXECUTE format('CREATE ROLE %I NOLOGIN', r);
+    END IF;
+  END LOOP;
+END $$;
+ALTER ROLE service_role BYPASSRLS;
+CREATE SCHEMA IF NOT EXISTS extensions;
+CREATE SCHEMA IF NOT EXISTS auth;
+CREATE SCHEMA IF NOT EXISTS storage;
+CREATE EXTENSION IF NOT EXISTS pgcrypto WITH SCHEMA extensions;
+CREATE EXTENSION IF NOT EXISTS "uuid-ossp" WITH SCHEMA extensions;
+ALTER DATABASE postgres SET search_path = public, extensions;
+SET search_path = public, extensions;
+
+CREATE TABLE IF NOT EXISTS auth.users (
+  id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  email text UNIQUE,
+  role text DEFAULT 'authenticated',
+  raw_user_meta_data jsonb DEFAULT '{}'::jsonb,
+  raw_app_meta_data jsonb DEFAULT '{}'::jsonb,
+  email_confirmed_at timestamptz,
+  last_sign_in_at timestamptz,
+  banned_until timestamptz,
+  is_anonymous boolean NOT NULL DEFAULT false,
+  created_at timestamptz DEFAULT now(),
+  updated_at timestamptz DEFAULT now(),
+  deleted_at timestamptz
+);
+CREATE OR REPLACE FUNCTION auth.jwt() RETURNS jsonb LANGUAGE sql STABLE AS $$
+  SELECT coalesce(nullif(current_setting('request.jwt.claims', true), ''), '{}')::jsonb
+$$;
+CREATE OR REPLACE FUNCTION auth.uid() RETURNS uuid LANGUAGE sql STABLE AS $$
+  SELECT nullif(coalesce(current_setting('request.jwt.claim.sub', true), auth.jwt() ->> 'sub'), '')::uuid
+$$;
+CREATE OR REPLACE FUNCTION auth.role() RETURNS text LANGUAGE sql STABLE AS $$
+  SELECT nullif(coalesce(current_setting('request.jwt.claim.role', true), auth.jwt() ->> 'role'), '')::text
+$$;
+
+CREATE TABLE IF NOT EXISTS storage.buckets (
+  id text PRIMARY KEY,
+  name text NOT NULL,
+  owner uuid,
+  public boolean DEFAULT false,
+  file_size_limit bigint,
+  allowed_mime_types text[],
+  created_at timestamptz DEFAULT now(),
+  updated_at timestamptz DEFAULT now()
+);
+CREATE TABLE IF NOT EXISTS storage.objects (
+  id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  bucket_id text REFERENCES storage.buckets (id),
+  name text,
+  owner uuid,
+  metadata jsonb,
+  created_at timestamptz DEFAULT now(),
+  updated_at timestamptz DEFAULT now()
+);
+CREATE OR REPLACE FUNCTION storage.foldername(name text) RETURNS text[] LANGUAGE sql IMMUTABLE AS $$
+  SELECT (string_to_array(name, '/'))[1:array_length(string_to_array(name, '/'), 1) - 1]
+$$;
+CREATE OR REPLACE FUNCTION storage.filename(name text) RETURNS text LANGUAGE sql IMMUTABLE AS $$
+  SELECT (string_to_array(name, '/'))[array_length(string_to_array(name, '/'), 1)]
+$$;
+
+GRANT USAGE ON SCHEMA public, auth, storage, extensions TO anon, authenticated, service_role;
+GRANT SELECT ON auth.users TO authenticated, service_role;
+ALTER DEFAULT PRIVILEGES IN SCHEMA public GRANT ALL ON TABLES TO anon, authenticated, service_role;
+ALTER DEFAULT PRIVILEGES IN SCHEMA public GRANT ALL ON SEQUENCES TO anon, authenticated, service_role;
+ALTER DEFAULT PRIVILEGES IN SCHEMA public GRANT ALL ON FUNCTIONS TO anon, authenticated, service_role;
+"""
+
+# Tables and columns of the loaded database, as the data generator needs
+# them: types, nullability, defaults, unique keys and foreign keys.
+INTROSPECT_SQL = r"""
+SELECT json_agg(t ORDER BY t.schema, t.name) FROM (
+  SELECT n.nspname AS schema, c.relname AS name,
+    (SELECT json_agg(json_build_object(
+        'name', a.attname, 'type', format_type(a.atttypid, a.atttypmod), 'not_null', a.attnotnull,
+        'default', a.atthasdef, 'generated', a.attgenerated <> '' OR a.attidentity <> '',
+        'enum', ty.typtype = 'e' OR (ty.typcategory = 'A' AND el.typtype = 'e'),
+        'array', ty.typcategory = 'A') ORDER BY a.attnum)
+     FROM pg_attribute a JOIN pg_type ty ON ty.oid = a.atttypid LEFT JOIN pg_type el ON el.oid = ty.typelem
+     WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped) AS columns,
+    (SELECT coalesce(json_agg((SELECT json_agg(a.attname ORDER BY k.i) FROM unnest(con.conkey) WITH ORDINALITY k(n, i)
+                                 JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum = k.n)), '[]')
+     FROM pg_constraint con WHERE con.conrelid = c.oid AND con.contype IN ('p', 'u')) AS unique,
+    (SELECT coalesce(json_agg(json_build_object(
+        'columns', (SELECT json_agg(a.attname ORDER BY k.i) FROM unnest(con.conkey) WITH ORDINALITY k(n, i)
+                    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum = k.n),
+        'ref_schema', rn.nspname, 'ref_table', rc.relname,
+        'ref_columns', (SELECT json_agg(a.attname ORDER BY k.i) FROM unnest(con.confkey) WITH ORDINALITY k(n, i)
+                        JOIN pg_attribute a ON a.attrelid = con.confrelid AND a.attnum = k.n))), '[]')
+     FROM pg_constraint con JOIN pg_class rc ON rc.oid = con.confrelid JOIN pg_namespace rn ON rn.oid = rc.relnamespace
+     WHERE con.conrelid = c.oid AND con.contype = 'f') AS foreign_keys
+  FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+  WHERE c.relkind IN ('r', 'p') AND (n.nspname = 'public' OR (n.nspname, c.relname) = ('auth', 'users'))
+) t
+"""
+
+DEFAULT_ROWS = 10000
+# Multipliers that scatter generated foreign keys over their parents.
+_SCATTER = (7919, 104729, 1299709)
+
+# PostgREST filter operators as SQL.
+COMPARISONS = {'eq': '=', 'neq': '<>', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<=', 'like': 'LIKE',
+               'ilike': 'ILIKE', 'contains': '@>', 'containedBy': '<@', 'overlaps': '&&',
+               'cs': '@>', 'cd': '<@', 'ov': '&&'}
+# How many sampled values stand in for the list passed to .in().
+IN_LIST_SIZE = 10
+
+FLAGS = ('seq-scan', 'sort-spill', 'high-cost')
+
+_SIMPLE_IDENT_RE = re.compile(r'^[a-z_][a-z0-9_]*$')
+_RESERVED = frozenset((
+    'all', 'analyse', 'analyze', 'and', 'any', 'array', 'as', 'asc', 'both', 'case', 'cast', 'check', 'collate',
+    'column', 'constraint', 'create', 'default', 'desc', 'distinct', 'do', 'else', 'end', 'except', 'false', 'for',
+    'foreign', 'from', 'grant', 'group', 'having', 'in', 'into', 'is', 'join', 'leading', 'left', 'limit', 'not',
+    'null', 'offset', 'on', 'only', 'or', 'order', 'primary', 'references', 'right', 'select', 'table', 'then', 'to',
+    'trailing', 'true', 'union', 'unique', 'user', 'using', 'when', 'where', 'window', 'with',
+))
+_PARAM_RE = re.compile(r'\$(\d+)\b')
+
+
+def quote_ident(name):
+    if _SIMPLE_IDENT_RE.match(name) and name not in _RESERVED:
+        return name
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _qualified(schema, table):
+    return f"{quote_ident(schema)}.{quote_ident(table)}"
+
+
+# ---------------------------------------------------------------------------
+# PostgREST chain -> SQL
+# ---------------------------------------------------------------------------
+
+class _Query:
+    # SQL under construction: aliases and the values to sample for $n.
+    def __init__(self):
+        self.aliases = itertools.count(1)
+        self.params = []
+        self.skipped = []
+
+    def alias(self):
+        return f"_{next(self.aliases)}"
+
+    def param(self, table, column, kind='value'):
+        self.params.append({"table": table, "column": column, "kind": kind})
+        return f"${len(self.params)}"
+
+
+def _columns_sql(items, table, alias, relations, query):
+    # (select list, lateral joins) for parsed select items on `table`.
+    select = []
+    joins = []
+    aggregated = False
+    for item in items:
+        name = item.get("alias") or item.get("name")
+        if item["kind"] == "star":
+            select.append(f"{alias}.*")
+        elif item["kind"] == "aggregate":
+            select.append(f"count(*) AS {quote_ident(name)}")
+            aggregated = True
+        elif item["kind"] == "column":
+            column = f"{alias}.{quote_ident(item['name'])}"
+            if item.get("aggregate"):
+                column = f"{item['aggregate']}({column})"
+                aggregated = True
+            if item["cast"]:
+                column = f"{column}::{item['cast']}"
+            select.append(f"{column} AS {quote_ident(name)}")
+        elif item["kind"] == "embed":
+            join = _embed_sql(item, table, alias, relations, query)
+            if join is None:
+                query.skipped.append(f"embed {item['name']}")
+                continue
+            joins.append(join[0])
+            select.append(f"{join[1]}.body AS {quote_ident(name)}")
+    if aggregated:
+        grouped = [s.rsplit(' AS ', 1)[0] for s in select if '(' not in s.split(' AS ')[0] and not s.endswith('.*')]
+        return select, joins, grouped
+    return select, joins, None
+
+
+def _join_condition(candidate, origin_alias, target_alias):
+    fk = candidate["fk"]
+    if candidate["kind"] == 'many-to-one':
+        pairs = zip(fk["ref_columns"], fk["columns"])
+        return ' AND '.join(f"{target_alias}.{quote_ident(t)} = {origin_alias}.{quote_ident(o)}" for t, o in pairs)
+    if candidate["kind"] == 'one-to-many':
+        pairs = zip(fk["columns"], fk["ref_columns"])
+        return ' AND '.join(f"{target_alias}.{quote_ident(t)} = {origin_alias}.{quote_ident(o)}" for t, o in pairs)
+    return None
+
+
+def _embed_sql(item, origin, origin_alias, relations, query):
+    # (LEFT JOIN LATERAL ..., lateral alias) the way PostgREST embeds a
+    # resource: a json_agg of the related rows, or row_to_json for a to-one.
+    resolved = relations.resolve(origin, item["name"], item["hints"])
+    if resolved["status"] != 'ok':
+        return None
+    target = resolved["target"]
+    hints = [h for h in item["hints"] if h not in ('inner', 'left')]
+    candidates = [c for c in relations.relationships(origin, target)
+                  if all(h in (c["fk"]["name"], c["junction"]) or c["fk"]["columns"] == [h] for h in hints)]
+    if not candidates and target != item["name"]:
+        # `owner_id(...)`: embedded through the FK on that column.
+        candidates = [{"kind": "many-to-one", "fk": fk, "table": origin, "junction": None}
+                      for fk in relations.outgoing.get(origin, ()) if fk["columns"] == [item["name"]]]
+    if not candidates:
+        return None
+    candidate = candidates[0]
+    target_alias = query.alias()
+    inner = [i for i in item["inner"] if not (i["kind"] == "column" and i["name"] == 'count')]
+    select, joins, grouped = _columns_sql(inner or [{"kind": "star"}], target, target_alias, relations, query)
+    source = f"{_qualified('public', target)} AS {target_alias}"
+
+    if candidate["kind"] == 'many-to-many':
+        junction = candidate["junction"]
+        to_origin = next((fk for fk in relations.outgoing.get(junction, ()) if fk["ref_table"] == origin), None)
+        if to_origin is None:
+            return None
+        junction_alias = query.alias()
+        to_target = candidate["fk"]
+        condition = ' AND '.join(
+            [f"{junction_alias}.{quote_ident(c)} = {origin_alias}.{quote_ident(r)}"
+             for c, r in zip(to_origin["columns"], to_origin["ref_columns"])]
+            + [f"{target_alias}.{quote_ident(r)} = {junction_alias}.{quote_ident(c)}"
+               for c, r in zip(to_target["columns"], to_target["ref_columns"])])
+        source = f"{source} JOIN {_qualified('public', junction)} AS {junction_alias} ON {condition}"
+        where = "TRUE"
+    else:
+        where = _join_condition(candidate, origin_alias, target_alias)
+
+    inner_sql = f"SELECT {', '.join(select)} FROM {source}"
+    if joins:
+        inner_sql += ' ' + ' '.join(joins)
+    inner_sql += f" WHERE {where}"
+    if grouped:
+        inner_sql += f" GROUP BY {', '.join(grouped)}"
+
+    lateral = query.alias()
+    rows = query.alias()
+    if resolved["to_many"]:
+        body = f"SELECT json_agg({rows}) AS body FROM ({inner_sql}) AS {rows}"
+        if 'inner' in item["hints"]:
+            body += " HAVING count(*) > 0"
+    else:
+        body = f"SELECT row_to_json({rows}) AS body FROM ({inner_sql} LIMIT 1) AS {rows}"
+    join = 'JOIN LATERAL' if 'inner' in item["hints"] else 'LEFT JOIN LATERAL'
+    return f"{join} ({body}) AS {lateral} ON TRUE", lateral
+
+
+def _filter_sql(chain_filter, table, alias, query):
+    method = chain_filter["method"]
+    column = chain_filter["column"]
+    value = chain_filter["value"]
+    negate = False
+    if method in ('not', 'filter'):
+        negate = method == 'not'
+        method = chain_filter["operator"]
+    if not _SIMPLE_IDENT_RE.match(column) or method is None:
+        return None
+    target = f"{alias}.{quote_ident(column)}"
+
+    if method == 'is':
+        condition = f"{target} IS {(value or 'null').upper()}"
+    elif method == 'in':
+        condition = f"{target} = ANY({query.param(table, column, 'list')})"
+    elif method in ('like', 'ilike'):
+        pattern = value if value is not None else f"'%' || {query.param(table, column)}::text || '%'"
+        condition = f"{target}::text {COMPARISONS[method]} {pattern}"
+    elif method in ('textSearch', 'fts', 'plfts', 'wfts'):
+        condition = f"{target} @@ websearch_to_tsquery('simple', 'word1')"
+    elif method in COMPARISONS:
+        operand = value if value is not None and value != 'null' else query.param(table, column)
+        condition = f"{target} {COMPARISONS[method]} {operand}"
+    else:
+        return None
+    return f"NOT ({condition})" if negate else condition
+
+
+def chain_sql(chain, relations):
+    """(EXPLAINable SQL with $n placeholders, [{table, column, kind}] per $n, [skipped parts]).
+
+    Mirrors what PostgREST runs for a select chain: embeds become lateral
+    joins, an unbounded request gets the server's max_rows limit, and filters
+    without a literal value get a sampled one. Filters on embedded resources
+    and .or() strings are left out and listed as skipped.
+    """
+    query = _Query()
+    table = chain["table"]
+    alias = query.alias()
+    select = chain["select"]
+    if select is None or select["dynamic"] or select["value"] is None:
+        items = [{"kind": "star"}]
+    else:
+        items = parse_select(select["value"], select["offset"] or 0)
+
+    if chain["head"]:
+        columns, joins, grouped = ["count(*)"], [], None
+    else:
+        columns, joins, grouped = _columns_sql(items, table, alias, relations, query)
+    sql = f"SELECT {', '.join(columns)} FROM {_qualified('public', table)} AS {alias}"
+    if joins:
+        sql += ' ' + ' '.join(joins)
+
+    conditions = []
+    for chain_filter in chain["filters"]:
+        condition = None if chain_filter["referenced"] else _filter_sql(chain_filter, table, alias, query)
+        if condition is None:
+            query.skipped.append(f"{chain_filter['method']} {chain_filter['column']}")
+        else:
+            conditions.append(condition)
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if grouped:
+        sql += f" GROUP BY {', '.join(grouped)}"
+    if chain["head"]:
+        return sql, query.params, query.skipped
+
+    order = [f"{alias}.{quote_ident(o['column'])} {'ASC' if o['ascending'] else 'DESC'}"
+             for o in chain["order"] if not o["referenced"] and _SIMPLE_IDENT_RE.match(o["column"])]
+    if order:
+        sql += " ORDER BY " + ", ".join(order)
+
+    limit, offset = MAX_ROWS, 0
+    if chain["range"] is not None:
+        bounds = [int(b) if b is not None and b.isdigit() else None for b in chain["range"]]
+        if len(bounds) == 2 and None not in bounds:
+            limit, offset = max(bounds[1] - bounds[0] + 1, 0), bounds[0]
+        else:
+            limit = DEFAULT_PAGE_ROWS
+    elif chain["limit"] is not None:
+        limit = int(chain["limit"]) if chain["limit"].isdigit() else DEFAULT_PAGE_ROWS
+    sql += f" LIMIT {min(limit, MAX_ROWS)}"
+    if offset:
+        sql += f" OFFSET {offset}"
+    return sql, query.params, query.skipped
+
+
+# ---------------------------------------------------------------------------
+# A disposable Postgres
+# ---------------------------------------------------------------------------
+
+def find_pg_bin(explicit=None):
+    """Directory holding initdb, pg_ctl and psql, or None."""
+    if explicit:
+        return explicit
+    initdb = shutil.which('initdb')
+    if initdb:
+        return os.path.dirname(initdb)
+    pg_config = shutil.which('pg_config')
+    if pg_config:
+        result = subprocess.run([pg_config, '--bindir'], capture_output=True, text=True)
+        if result.returncode == 0 and os.path.exists(os.path.join(result.stdout.strip(), 'initdb')):
+            return result.stdout.strip()
+    # Debian/Ubuntu keep the server binaries off PATH.
+    candidates = sorted(glob.glob('/usr/lib/postgresql/*/bin/initdb'), reverse=True)
+    return os.path.dirname(candidates[0]) if candidates else None
+
+
+def _run_server_tool(args):
+    result = subprocess.run(args, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{os.path.basename(args[0])} failed: {(result.stderr or result.stdout).strip()}")
+
+
+@contextlib.contextmanager
+def disposable_cluster(bin_dir, port=54329, keep=False):
+    """Start a throwaway cluster listening on a private socket; yield its URI.
+
+    initdb refuses to run as root, so run this as an ordinary user.
+    """
+    root = tempfile.mkdtemp(prefix='explain-pg-')
+    data = os.path.join(root, 'data')
+    try:
+        _run_server_tool([os.path.join(bin_dir, 'initdb'), '-D', data, '-U', 'postgres', '--auth=trust', '-E', 'UTF8',
+                          '--locale=C'])
+        _run_server_tool([os.path.join(bin_dir, 'pg_ctl'), '-D', data, '-l', os.path.join(root, 'server.log'), '-w',
+                          '-o', f"-p {port} -k {root} -c listen_addresses='' -c fsync=off "
+                                f"-c synchronous_commit=off -c full_page_writes=off",
+                          'start'])
+    except RuntimeError:
+        shutil.rmtree(root, ignore_errors=True)
+        raise
+    try:
+        yield f"postgresql://postgres@/postgres?host={root}&port={port}"
+    finally:
+        if keep:
+            print(f"Cluster kept in {data} (socket {root}, port {port})", file=sys.stderr)
+        else:
+            subprocess.run([os.path.join(bin_dir, 'pg_ctl'), '-D', data, '-m', 'immediate', 'stop'],
+                           capture_output=True)
+            shutil.rmtree(root, ignore_errors=True)
+
+
+def psql(bin_dir, uri, sql=None, path=None, stop_on_error=True):
+    args = [os.path.join(bin_dir, 'psql') if bin_dir else 'psql', uri, '-X', '-q', '-A', '-t',
+            '-v', f"ON_ERROR_STOP={1 if stop_on_error else 0}", '-f', path or '-']
+    return subprocess.run(args, input=sql, capture_output=True, text=True)
+
+
+def _errors(stderr):
+    return [line for line in stderr.splitlines() if 'ERROR:' in line]
+
+
+def apply_migrations(bin_dir, uri, migrations_dir):
+    """Bootstrap Supabase's roles and schemas, then run every migration the
+    Supabase CLI would (`list_migrations`), in its order.
+
+    Statements that fail (extensions the local server lacks, tables that
+    predate the migrations) are reported and skipped, as psql does with
+    ON_ERROR_STOP off. Returns {file: [error, ...]}.
+    """
+    failures = {}
+    result = psql(bin_dir, uri, BOOTSTRAP_SQL, stop_on_error=False)
+    if _errors(result.stderr):
+        failures['(bootstrap)'] = _errors(result.stderr)
+    for filename in list_migrations(migrations_dir):
+        result = psql(bin_dir, uri, path=os.path.join(migrations_dir, filename), stop_on_error=False)
+        if _errors(result.stderr):
+            failures[filename] = _errors(result.stderr)
+    return failures
+
+
+# ---------------------------------------------------------------------------
+# Synthetic rows
+# ---------------------------------------------------------------------------
+
+def _value_sql(column, unique, table_name):
+    # A per-row expression over `g` (1..N) for one generated column.
+    name = column["name"]
+    type_name = column["type"]
+    base = re.sub(r'\(.*\)', '', type_name).strip()
+    if column["array"]:
+        return f"'{{}}'::{type_name}"
+    if column["enum"]:
+        return f"(enum_range(NULL::{type_name}))[1 + g % cardinality(enum_range(NULL::{type_name}))]"
+    if base == 'uuid':
+        return 'gen_random_uuid()'
+    if base in ('text', 'character varying', 'citext', 'character'):
+        if 'email' in name:
+            return f"'{table_name}' || g || '@example.com'"
+        return f"'{name}-' || g" if unique else f"'{name}-' || (g % 997)"
+    if base in ('integer', 'bigint', 'smallint', 'numeric', 'real', 'double precision'):
+        return 'g' if unique else ('(g % 100)' if base == 'smallint' else '(g % 1000)')
+    if base == 'boolean':
+        return '(g % 2 = 0)'
+    if base.startswith('timestamp'):
+        return "now() - g * interval '1 minute'"
+    if base == 'date':
+        return '(current_date - (g % 3650))'
+    if base.startswith('time'):
+        return "time '00:00' + (g % 86400) * interval '1 second'"
+    if base == 'interval':
+        return "g * interval '1 second'"
+    if base in ('jsonb', 'json'):
+        return "'{}'"
+    if base == 'tsvector':
+        return "to_tsvector('simple', 'word' || (g % 100) || ' word' || (g % 7))"
+    if base.startswith(('geography', 'geometry')):
+        return "ST_SetSRID(ST_MakePoint(-180 + (g * 0.0137) % 360, -60 + (g * 0.0071) % 120), 4326)"
+    if base == 'inet':
+        return "'10.0.0.1'"
+    return None
+
+
+def load_order(tables):
+    """Tables with their foreign-key parents first; cycles keep input order."""
+    by_name = {(t["schema"], t["name"]): t for t in tables}
+    ordered, seen = [], set()
+
+    def visit(key, stack):
+        if key in seen or key in stack or key not in by_name:
+            return
+        stack.add(key)
+        for fk in by_name[key]["foreign_keys"]:
+            visit((fk["ref_schema"], fk["ref_table"]), stack)
+        seen.add(key)
+        ordered.append(by_name[key])
+
+    for key in by_name:
+        visit(key, set())
+    return ordered
+
+
+def insert_sql(table, rows, required_only=False):
+    """INSERT ... SELECT ... FROM generate_series() filling `table` with `rows` rows."""
+    unique = {column for key in table["unique"] for column in key}
+    fk_columns = {}
+    ctes = []
+    stride = None
+    for k, fk in enumerate(table["foreign_keys"]):
+        if (fk["ref_schema"], fk["ref_table"]) == (table["schema"], table["name"]):
+            continue  # self-references stay NULL
+        cte = f"p{k}"
+        arrays = ', '.join(f"array_agg({quote_ident(c)}) AS v{i}" for i, c in enumerate(fk["ref_columns"]))
+        ctes.append(f"{cte} AS (SELECT {arrays} FROM {_qualified(fk['ref_schema'], fk['ref_table'])})")
+        size = f"nullif(cardinality({cte}.v0), 0)"
+        # The first two keys walk their parents in mixed radix so composite
+        # unique keys over them stay unique; the rest are scattered.
+        if k == 0:
+            index = f"((g - 1) % {size})"
+            stride = size
+        elif k == 1 and stride:
+            index = f"(((g::bigint - 1) / {stride}) % {size})"
+        else:
+            index = f"((g::bigint * {_SCATTER[k % len(_SCATTER)]}) % {size})"
+        for i, column in enumerate(fk["columns"]):
+            fk_columns.setdefault(column, f"{cte}.v{i}[1 + {index}]")
+
+    names, values = [], []
+    for column in table["columns"]:
+        if column["generated"]:
+            continue
+        if required_only and not (column["not_null"] and not column["default"]) and column["name"] not in fk_columns:
+            continue
+        value = fk_columns.get(column["name"]) or _value_sql(column, column["name"] in unique, table["name"])
+        if value is None:
+            continue
+        names.append(quote_ident(column["name"]))
+        values.append(f"({value})::{column['type']}")
+    if not names:
+        return None
+    sources = ''.join(f", {cte.split(' AS ')[0]}" for cte in ctes)
+    sql = (f"INSERT INTO {_qualified(table['schema'], table['name'])} ({', '.join(names)})\n"
+           f"SELECT {', '.join(values)}\nFROM generate_series(1, {rows}) AS g{sources}")
+    if ctes:
+        sql = f"WITH {', '.join(ctes)}\n{sql}"
+    return sql + ';'
+
+
+def load_rows(bin_dir, uri, default_rows=DEFAULT_ROWS, row_counts=None):
+    """Fill every public table (and auth.users) with synthetic rows.
+
+    Triggers and foreign-key checks are off while loading. A table whose
+    full row fails a CHECK constraint is retried with only its required
+    columns. Returns {table: error} for tables left empty.
+    """
+    result = psql(bin_dir, uri, INTROSPECT_SQL)
+    tables = json.loads(result.stdout.strip() or 'null') or []
+    failures = {}
+    for table in load_order(tables):
+        rows = (row_counts or {}).get(table["name"], default_rows)
+        error = None
+        for required_only in (False, True):
+            sql = insert_sql(table, rows, required_only)
+            if sql is None:
+                break
+            result = psql(bin_dir, uri, "SET session_replication_role = replica;\n" + sql)
+            error = _errors(result.stderr)
+            if not error:
+                break
+        if error:
+            failures[f"{table['schema']}.{table['name']}"] = error[0]
+    psql(bin_dir, uri, "VACUUM ANALYZE;")
+    return failures
+
+
+# ---------------------------------------------------------------------------
+# EXPLAIN
+# ---------------------------------------------------------------------------
+
+class Sampler:
+    """Literal values drawn from the loaded rows, per (table, column)."""
+
+    def __init__(self, bin_dir, uri):
+        self.bin_dir = bin_dir
+        self.uri = uri
+        self._values = {}
+
+    def values(self, table, column):
+        key = (table, column)
+        if key not in self._values:
+            target = quote_ident(column)
+            sql = (f"SELECT quote_literal(c::text) || '::' || pg_typeof(c)::text FROM "
+                   f"(SELECT {target} AS c FROM {_qualified('public', table)} WHERE {target} IS NOT NULL "
+                   f"ORDER BY random() LIMIT {IN_LIST_SIZE}) s;")
+            result = psql(self.bin_dir, self.uri, sql)
+            self._values[key] = result.stdout.splitlines() if result.returncode == 0 else []
+        return self._values[key]
+
+    def bind(self, sql, params):
+        """`sql` with every $n replaced by a sampled literal."""
+        literals = []
+        for param in params:
+            values = self.values(param["table"], param["column"])
+            if param["kind"] == 'list':
+                literals.append(f"ARRAY[{', '.join(values)}]" if values else "'{}'")
+            else:
+                literals.append(values[len(values) // 2] if values else 'NULL')
+        return _PARAM_RE.sub(lambda m: literals[int(m.group(1)) - 1], sql)
+
+
+def _walk(plan, depth=0):
+    yield plan, depth
+    for child in plan.get("Plans", ()):
+        yield from _walk(child, depth + 1)
+
+
+def plan_flags(plan, seq_scan_rows, max_cost):
+    """[{flag, node, relation, detail}] for the nodes worth a look."""
+    flags = []
+    for node, _ in _walk(plan):
+        kind = node["Node Type"]
+        if kind == 'Seq Scan':
+            examined = (node.get("Actual Rows", 0) + node.get("Rows Removed by Filter", 0)) * node.get(
+                "Actual Loops", 1)
+            if examined >= seq_scan_rows:
+                flags.append({"flag": 'seq-scan', "node": kind, "relation": node.get("Relation Name"),
+                              "detail": f"{examined} rows read, {node.get('Actual Rows', 0)} kept"
+                                        + (f", filter {node['Filter']}" if node.get("Filter") else '')})
+        elif kind in ('Sort', 'Incremental Sort') and node.get("Sort Space Type") == 'Disk':
+            flags.append({"flag": 'sort-spill', "node": kind, "relation": None,
+                          "detail": f"{node.get('Sort Method')}, {node.get('Sort Space Used')} kB on disk, "
+                                    f"key {', '.join(node.get('Sort Key', ()))}"})
+    costliest = max((node for node, _ in _walk(plan)), key=lambda n: n.get("Total Cost", 0))
+    if plan.get("Total Cost", 0) >= max_cost:
+        flags.append({"flag": 'high-cost', "node": costliest["Node Type"],
+                      "relation": costliest.get("Relation Name"),
+                      "detail": f"plan cost {plan['Total Cost']:.0f}, "
+                                f"costliest node {costliest['Node Type']} at {costliest['Total Cost']:.0f}"})
+    return flags
+
+
+def explain(bin_dir, uri, sql, role=None, user_id=None, work_mem='4MB'):
+    """EXPLAIN (ANALYZE, BUFFERS) output for `sql` as {plan, planning_ms, execution_ms} or {error}."""
+    setup = [f"SET work_mem = '{work_mem}';"]
+    if role:
+        claims = json.dumps({"sub": user_id, "role": role}) if user_id else json.dumps({"role": role})
+        setup.append(f"SET request.jwt.claims = '{claims}';")
+        if user_id:
+            setup.append(f"SET request.jwt.claim.sub = '{user_id}';")
+        setup.append(f"SET ROLE {quote_ident(role)};")
+    # ANALYZE really runs the query; roll it back in case a function writes.
+    script = "BEGIN;\n" + "\n".join(setup) + f"\nEXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql};\nROLLBACK;\n"
+    result = psql(bin_dir, uri, script)
+    if result.returncode != 0:
+        errors = _errors(result.stderr)
+        return {"error": errors[0].split('ERROR:', 1)[1].strip() if errors else result.stderr.strip()}
+    output = json.loads(result.stdout.strip())[0]
+    return {"plan": output["Plan"], "planning_ms": output.get("Planning Time"),
+            "execution_ms": output.get("Execution Time")}
+
+
+def run(bin_dir, uri, chains, relations, args):
+    sampler = Sampler(bin_dir, uri)
+    user_id = args.user_id
+    if args.role == 'authenticated' and not user_id:
+        user_id = psql(bin_dir, uri, "SELECT id FROM auth.users ORDER BY id LIMIT 1;").stdout.strip() or None
+    report = []
+    for chain in chains:
+        sql, params, skipped = chain_sql(chain["chain"], relations)
+        bound = sampler.bind(sql, params)
+        result = explain(bin_dir, uri, bound, None if args.role == 'postgres' else args.role, user_id,
+                         args.work_mem)
+        entry = {"file": chain["file"], "line": chain["line"], "table": chain["chain"]["table"], "sql": bound,
+                 "skipped": skipped}
+        if "error" in result:
+            entry.update(error=result["error"], flags=[])
+        else:
+            plan = result["plan"]
+            entry.update(
+                execution_ms=result["execution_ms"],
+                planning_ms=result["planning_ms"],
+                total_cost=plan.get("Total Cost"),
+                shared_hit_blocks=plan.get("Shared Hit Blocks"),
+                shared_read_blocks=plan.get("Shared Read Blocks"),
+                flags=plan_flags(plan, args.seq_scan_rows, args.max_cost),
+            )
+            if args.plans:
+                entry["plan"] = plan
+        report.append(entry)
+    report.sort(key=lambda e: (-(e.get("execution_ms") or 0), e["file"], e["line"]))
+    return report
+
+
+def collect_chains(files, tables=None):
+    """Select chains in `files` (optionally only on `tables`) with their file and line."""
+    chains = []
+    for filepath in files:
+        with open(filepath, 'r') as f:
+            content = f.read()
+        lines = None
+        for chain in extract_query_chains(filepath, content):
+            if chain["kind"] != 'select' or (tables and chain["table"] not in tables):
+                continue
+            lines = lines or LineIndex(content)
+            line, _ = lines.position(chain["table_offset"])
+            chains.append({"file": filepath, "line": line, "chain": chain})
+    return chains
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run EXPLAIN (ANALYZE, BUFFERS) for every select chain in src against a disposable Postgres "
+                    "built from supabase/migrations and filled with synthetic rows.")
+    parser.add_argument('--migrations', default=MIGRATIONS_DIR)
+    parser.add_argument('--root', default='src', help="Source tree to scan (default: src)")
+    parser.add_argument('--table', action='append', help="Only explain chains on this table (repeatable)")
+    parser.add_argument('--sql-only', action='store_true',
+                        help="Print the translated SQL (with $n placeholders) without a database")
+    parser.add_argument('--pg-bin', metavar='DIR', help="Directory with initdb, pg_ctl and psql (default: search)")
+    parser.add_argument('--dsn', help="Use this already-migrated, disposable database instead of starting one")
+    parser.add_argument('--port', type=int, default=54329, help="Port for the disposable cluster's socket")
+    parser.add_argument('--keep', action='store_true', help="Leave the disposable cluster running")
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS, metavar='N',
+                        help=f"Synthetic rows per table (default: {DEFAULT_ROWS})")
+    parser.add_argument('--row-counts', metavar='PATH',
+                        help="Per-table row counts (JSON, or CSV with relation,approx_rows) overriding --rows")
+    parser.add_argument('--role', choices=('authenticated', 'anon', 'service_role', 'postgres'),
+                        default='authenticated', help="Role to explain as; RLS policies apply to all but postgres")
+    parser.add_argument('--user-id', help="auth.uid() for --role authenticated (default: a generated user)")
+    parser.add_argument('--work-mem', default='4MB', help="work_mem for each query (default: 4MB)")
+    parser.add_argument('--seq-scan-rows', type=int, default=1000, metavar='N',
+                        help="Flag sequential scans reading at least N rows")
+    parser.add_argument('--max-cost', type=float, default=10000, metavar='COST',
+                        help="Flag plans whose total cost reaches COST")
+    parser.add_argument('--flag', choices=FLAGS, action='append', help="Only report queries with this flag")
+    parser.add_argument('--plans', action='store_true', help="Include the full JSON plan of each query")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    profiler = Profiler.from_args('explain_queries', args)
+    catalog_stats = {}
+    with profiler.phase('schema'):
+        catalog = build_catalog(args.migrations, stats=catalog_stats)
+        relations = RelationGraph.from_catalog(catalog)
+    with profiler.phase('walk'):
+        files = find_files(args.root)
+    with profiler.phase('read'):
+        chains = collect_chains(profiler.each_file(files), set(args.table or ()))
+    profiler.catalog(catalog_stats)
+
+    if args.sql_only:
+        report = []
+        with profiler.phase('translate'):
+            for chain in chains:
+                sql, params, skipped = chain_sql(chain["chain"], relations)
+                report.append({"file": chain["file"], "line": chain["line"], "table": chain["chain"]["table"],
+                               "sql": sql, "params": [f"{p['table']}.{p['column']}" for p in params],
+                               "skipped": skipped})
+        with profiler.phase('report'):
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        profiler.finish()
+        return
+
+    bin_dir = find_pg_bin(args.pg_bin)
+    if bin_dir is None and not args.dsn:
+        sys.exit("No PostgreSQL server binaries found: install PostgreSQL (initdb, pg_ctl, psql) "
+                 "or pass --pg-bin DIR, or --dsn for an existing disposable database.")
+
+    row_counts = load_row_counts(args.row_counts) if args.row_counts else None
+    with contextlib.ExitStack() as stack:
+        if args.dsn:
+            uri = args.dsn
+        else:
+            try:
+                with profiler.phase('cluster'):
+                    uri = stack.enter_context(disposable_cluster(bin_dir, args.port, args.keep))
+            except RuntimeError as e:
+                sys.exit(str(e))
+            with profiler.phase('migrate'):
+                failures = apply_migrations(bin_dir, uri, args.migrations)
+            for filename, errors in failures.items():
+                print(f"{filename}: {len(errors)} failed statement(s), first: {errors[0]}", file=sys.stderr)
+            with profiler.phase('rows'):
+                empty = load_rows(bin_dir, uri, args.rows, row_counts)
+            for table, error in empty.items():
+                print(f"{table}: no synthetic rows ({error})", file=sys.stderr)
+        with profiler.phase('explain'):
+            report = run(bin_dir, uri, chains, relations, args)
+
+    if args.flag:
+        report = [e for e in report if {f["flag"] for f in e["flags"]} & set(args.flag)]
+    with profiler.phase('report'):
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    profiler.finish()
+
+
+if __name__ == "__main__":
+    main()
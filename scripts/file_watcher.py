@@ -0,0 +1,172 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+EXCLUDED_DIRS = ('node_modules', '.git')
+
+# inotify(7) event bits.
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+              | IN_MOVE_SELF)
+_EVENT = struct.Struct('iIII')
+
+# Editors save in bursts (write, rename, chmod); events this close together
+# are reported as one batch.
+SETTLE_SECONDS = 0.03
+POLL_SECONDS = 0.5
+
+
+def _walk_dirs(root):
+    for path, dirs, _ in os.walk(root):
+        dirs[:] = [d for d in dirs if d not in EXCLUDED_DIRS]
+        yield path
+
+
+def _walk_files(root):
+    for path, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if d not in EXCLUDED_DIRS]
+        for file in files:
+            yield os.path.join(path, file)
+
+
+class InotifyWatcher:
+    """Changed paths under `roots`, from Linux inotify.
+
+    `changes(timeout)` blocks until something changes (or `timeout` seconds
+    pass) and returns the set of paths created, written, moved or deleted;
+    None means the kernel queue overflowed and the caller must rescan.
+    Directories created later are watched as they appear.
+    """
+
+    def __init__(self, roots):
+        libc_name = ctypes.util.find_library('c')
+        if libc_name is None:
+            raise OSError("libc not found")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError("inotify is not available")
+        self._libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._dirs = {}
+        for root in roots:
+            for path in _walk_dirs(root):
+                self._add(path)
+
+    def _add(self, path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            if errno == 28:  # ENOSPC: fs.inotify.max_user_watches exhausted
+                raise OSError(errno, "inotify watch limit reached")
+            return  # vanished between walk and watch
+        self._dirs[wd] = path
+
+    def _read(self):
+        changed = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0')
+            offset += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None:
+                continue
+            path = os.path.join(directory, os.fsdecode(name)) if name else directory
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and os.path.basename(path) not in EXCLUDED_DIRS:
+                    # Files can land in a new directory before it is watched.
+                    for sub in _walk_dirs(path):
+                        self._add(sub)
+                    changed.update(_walk_files(path))
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    changed.add(path)
+                continue
+            changed.add(path)
+        return changed
+
+    def changes(self, timeout=None):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed = set()
+        while ready:
+            batch = self._read()
+            if batch is None:
+                return None
+            changed |= batch
+            ready, _, _ = select.select([self.fd], [], [], SETTLE_SECONDS)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """The same interface as InotifyWatcher, by comparing stat() snapshots."""
+
+    def __init__(self, roots, interval=POLL_SECONDS):
+        self.roots = roots
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for root in self.roots:
+            for path in _walk_files(root):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def changes(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            time.sleep(self.interval if deadline is None else max(0, min(self.interval, deadline - time.monotonic())))
+            snapshot = self._scan()
+            changed = {p for p in snapshot.keys() | self._snapshot.keys()
+                       if snapshot.get(p) != self._snapshot.get(p)}
+            self._snapshot = snapshot
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+
+def open_watcher(roots, polling=False):
+    """An InotifyWatcher for `roots`, or a PollingWatcher where inotify is unavailable."""
+    roots = [r for r in roots if os.path.isdir(r)]
+    if not polling:
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(roots)
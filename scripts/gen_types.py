@@ -0,0 +1,980 @@
+import argparse
+import json
+import re
+import sys
+import time
+
+from audit_profile import Profiler, add_arguments as add_profile_arguments
+from schema_catalog import (CACHE_DIR, IDENT, MIGRATIONS_DIR, build_catalog, canonical_type, matching_paren,
+                            normalize_ident, parse_qname, referenced_functions, referenced_tables,
+                            split_top_level)
+from ts_lexer import tokenize
+
+TYPES_PATH = 'src/integrations/supabase/types.ts'
+SCHEMA = 'public'
+SECTIONS = ('Tables', 'Views', 'Functions', 'Enums', 'CompositeTypes')
+
+# Prettier's print width, which the Supabase CLI formats its output with.
+WIDTH = 80
+
+# Objects the extensions install (PostGIS, pg_trgm, unaccent) rather than the
+# migrations. Generating keeps them from the committed types.ts; --diff
+# ignores them.
+EXTENSION_OBJECTS = {
+    "Tables": re.compile(r'spatial_ref_sys$'),
+    "Views": re.compile(r'(?:geography|geometry)_columns$'),
+    "Functions": re.compile(
+        r'(?:_?st_|_?postgis|pgis_|geometry|geography|geog|box[23]d|gidx|gserialized|spheroid|geomfromewk[bt]$|'
+        r'(?:add|drop|update)geometry|populate_geometry_columns$|find_srid$|(?:lock|unlock)rows?$|'
+        r'(?:add|check)auth$|(?:enable|disable)longtransactions$|longtransactionsenabled$|gettransactionid$|equals$|'
+        r'(?:json|jsonb|text|bytea|path|point|polygon)$|'
+        r'(?:show|set)_limit$|show_trgm$|(?:strict_)?(?:word_)?similarity|gtrgm_|gin_(?:extract|trgm)|unaccent)'),
+    "Enums": None,
+    "CompositeTypes": re.compile(r'(?:geometry_dump|valid_detail)$'),
+}
+
+_NUMBER_TYPES = frozenset(('smallint', 'integer', 'bigint', 'real', 'double precision', 'numeric', 'smallserial',
+                           'serial', 'bigserial', 'oid'))
+_STRING_TYPES = frozenset(('bytea', 'character', 'character varying', 'bpchar', 'date', 'text', 'citext', 'time',
+                           'time without time zone', 'time with time zone', 'timestamp without time zone',
+                           'timestamp with time zone', 'uuid', 'vector'))
+_SERIAL_TYPES = frozenset(('smallserial', 'serial', 'bigserial'))
+_KEY_RE = re.compile(r'[A-Za-z_$][\w$]*$')
+_EMPTY_SECTION = '[_ in never]'
+
+# A type is one of these nodes, for both what the migrations generate and what
+# the committed file parses to:
+#   ('type', text)               a keyword, literal or reference, as written
+#   ('array', node)
+#   ('union', [node, ...])
+#   ('tuple', [node, ...])
+#   ('obj', [(key, optional, node), ...], multiline)
+# `multiline` objects always print one member per line, as Prettier keeps an
+# object literal that was written that way; others break only past WIDTH.
+
+
+def _obj(members, multiline=True):
+    return ('obj', members, multiline)
+
+
+def _nullable(node):
+    # `unknown` already admits null, so the CLI leaves it bare.
+    return node if node == ('type', 'unknown') else ('union', [node, ('type', 'null')])
+
+
+def _literal(value):
+    return ('type', json.dumps(value, ensure_ascii=False))
+
+
+def _ref(*path):
+    return ('type', 'Database' + ''.join(f'["{p}"]' for p in path))
+
+
+# ---------------------------------------------------------------------------
+# Migrations -> types
+# ---------------------------------------------------------------------------
+
+def ts_type(catalog, pg_type):
+    """The TypeScript type supabase-js uses for a Postgres type name."""
+    name = canonical_type(pg_type)
+    depth = 0
+    while name.endswith('[]'):
+        name, depth = name[:-2], depth + 1
+    if name == 'boolean':
+        node = ('type', 'boolean')
+    elif name in _NUMBER_TYPES:
+        node = ('type', 'number')
+    elif name in _STRING_TYPES:
+        node = ('type', 'string')
+    elif name in ('json', 'jsonb'):
+        node = ('type', 'Json')
+    elif name == 'void':
+        node = ('type', 'undefined')
+    elif name == 'record':
+        node = ('type', 'Record<string, unknown>')
+    elif name in catalog["enums"]:
+        node = _ref(SCHEMA, 'Enums', name)
+    elif name in catalog["tables"]:
+        node = _ref(SCHEMA, 'Tables', name, 'Row')
+    elif name in catalog["views"]:
+        node = _ref(SCHEMA, 'Views', name, 'Row')
+    else:
+        node = ('type', 'unknown')
+    for _ in range(depth):
+        node = ('array', node)
+    return node
+
+
+def _one_to_one(table, indexes, table_name, columns):
+    if set(columns) == set(table["primary_key"]):
+        return True
+    return any(index["table"] == table_name and index["unique"] and index["where"] is None
+               and set(index["columns"]) == set(columns) for index in indexes.values())
+
+
+def _relationship(name, columns, one_to_one, relation, ref_columns):
+    return _obj([
+        ('foreignKeyName', False, _literal(name)),
+        ('columns', False, ('tuple', [_literal(c) for c in columns])),
+        ('isOneToOne', False, ('type', 'true' if one_to_one else 'false')),
+        ('referencedRelation', False, _literal(relation)),
+        ('referencedColumns', False, ('tuple', [_literal(c) for c in ref_columns])),
+    ])
+
+
+def _relationships(catalog, table_name, rename=None):
+    # `rename` maps a base table's columns to a view's, for the foreign keys
+    # a view exposes.
+    table = catalog["tables"][table_name]
+    entries = []
+    for fk in sorted(table["foreign_keys"], key=lambda fk: (fk["name"] or '', fk["ref_table"])):
+        if fk["ref_schema"] not in (None, SCHEMA) or not fk["name"]:
+            continue
+        columns = fk["columns"]
+        if rename is not None:
+            if not all(c in rename for c in columns):
+                continue
+            columns = [rename[c] for c in columns]
+        entries.append(_relationship(fk["name"], columns, _one_to_one(table, catalog["indexes"], table_name,
+                                                                      fk["columns"]),
+                                     fk["ref_table"], fk["ref_columns"]))
+    return ('tuple', entries)
+
+
+def _row(catalog, name):
+    # A table's or view's Row members.
+    if name in catalog["tables"]:
+        return table_type(catalog, name)[1][0][2][1]
+    return view_type(catalog, name)[1][0][2][1]
+
+
+def table_type(catalog, name):
+    table = catalog["tables"][name]
+    row, insert, update = [], [], []
+    for column, definition in sorted(table["columns"].items()):
+        serial = canonical_type(definition["type"]) in _SERIAL_TYPES
+        nullable = definition["nullable"] and not serial and column not in table["primary_key"]
+        node = ts_type(catalog, definition["type"])
+        if nullable:
+            node = _nullable(node)
+        row.append((column, False, node))
+        insert.append((column, nullable or serial or definition["default"] is not None or definition["generated"],
+                       node))
+        update.append((column, True, node))
+    return _obj([('Row', False, _obj(row)), ('Insert', False, _obj(insert)), ('Update', False, _obj(update)),
+                 ('Relationships', False, _relationships(catalog, name))])
+
+
+def function_type(catalog, overloads):
+    """One overload's {Args, Returns}, or a union of them; None for trigger functions.
+
+    Postgres lists overloads in creation order; the migration that last
+    defined each one stands in for it.
+    """
+    alternatives = []
+    for overload in sorted(overloads.values(), key=lambda o: (o["file"] or '', o["line"] or 0)):
+        if overload["returns"] in ('trigger', 'event_trigger'):
+            continue
+        inputs = sorted((a for a in overload["args"] if a["mode"] != 'OUT'), key=lambda a: a["name"] or '')
+        args = _obj([(a["name"] or '', a["default"] is not None, ts_type(catalog, a["type"])) for a in inputs],
+                    False) if inputs else ('type', 'never')
+        outputs = overload["returns_table"] or [a for a in overload["args"] if a["mode"] in ('OUT', 'INOUT')]
+        returned = canonical_type(overload["returns"] or 'void')
+        returns_set = bool(overload["returns_set"] or overload["returns_table"])
+        setof = None
+        if outputs and returned == 'record':
+            returns = _obj([(a["name"] or '', False, ts_type(catalog, a["type"]))
+                            for a in sorted(outputs, key=lambda a: a["name"] or '')])
+        elif returned in catalog["tables"] or returned in catalog["views"]:
+            # A row type comes back spelled out, with the relation it embeds
+            # from for PostgREST.
+            returns = _obj(_row(catalog, returned))
+            setof = _obj([('from', False, _literal('*')), ('to', False, _literal(returned)),
+                          ('isOneToOne', False, ('type', 'false' if returns_set else 'true')),
+                          ('isSetofReturn', False, ('type', 'true' if returns_set else 'false'))])
+        else:
+            returns = ts_type(catalog, overload["returns"] or 'void')
+        if returns_set:
+            returns = ('array', returns)
+        members = [('Args', False, args), ('Returns', False, returns)]
+        if setof is not None:
+            members.append(('SetofOptions', False, setof))
+        alternatives.append(_obj(members, False))
+    if not alternatives:
+        return None
+    if len(alternatives) == 1:
+        return alternatives[0]
+    return ('union', alternatives)
+
+
+# ---------------------------------------------------------------------------
+# Views. The catalog keeps a view's definition, not its columns, so they are
+# read off the SELECT list: names from aliases and column references, types
+# from casts, the columns referenced and a few well-known functions. Anything
+# else is `unknown`. Like PostgREST, every view column is nullable.
+# ---------------------------------------------------------------------------
+
+_FROM_END_RE = re.compile(r'\b(?:WHERE|GROUP|HAVING|WINDOW|ORDER|LIMIT|OFFSET|FETCH|FOR|UNION|INTERSECT|EXCEPT)\b',
+                          re.IGNORECASE)
+_SET_OPERATION_RE = re.compile(r'\b(?:UNION|INTERSECT|EXCEPT)\b', re.IGNORECASE)
+_NOT_UPDATABLE_RE = re.compile(r'\b(?:DISTINCT|GROUP|HAVING|LIMIT|OFFSET|FETCH|UNION|INTERSECT|EXCEPT|JOIN)\b|,',
+                               re.IGNORECASE)
+_JOIN_RE = re.compile(r',|\b(?:NATURAL\s+)?(?:(?:LEFT|RIGHT|FULL)(?:\s+OUTER)?\s+|INNER\s+|CROSS\s+)?JOIN\b',
+                      re.IGNORECASE)
+_SOURCE_RE = re.compile(r'(?:LATERAL\s+)?(?:ONLY\s+)?(?P<name>' + IDENT + r'(?:\s*\.\s*' + IDENT + r')?|\(.*?\))'
+                        r'(?:\s+(?:AS\s+)?(?!(?:ON|USING|WHERE)\b)(?P<alias>' + IDENT + r'))?',
+                        re.IGNORECASE | re.DOTALL)
+_COLUMN_REF_RE = re.compile(r'(?:(' + IDENT + r')\s*\.\s*)?(' + IDENT + r')$')
+_ALIAS_RE = re.compile(r'(?P<expr>.*?)\s+(?:AS\s+)?(?P<alias>' + IDENT + r')$', re.IGNORECASE | re.DOTALL)
+_CAST_RE = re.compile(r'(?P<expr>.*)::\s*(?P<type>[\w ."]+(?:\(\s*\d+(?:\s*,\s*\d+)?\s*\))?(?:\s*\[\s*\])*)$',
+                      re.DOTALL)
+_AGGREGATE_RE = re.compile(r'\b(?:count|sum|avg|min|max|array_agg|json_agg|jsonb_agg|string_agg|bool_or|bool_and)\s*\(',
+                           re.IGNORECASE)
+_CALL_RE = re.compile(r'(\w+)\s*\((.*)\)$', re.DOTALL)
+_NOT_ALIASES = frozenset(('end', 'null', 'true', 'false', 'distinct', 'all', 'and', 'or', 'not', 'is', 'as'))
+_FIXED_RESULT = {
+    'count': 'bigint', 'row_number': 'bigint', 'rank': 'bigint', 'dense_rank': 'bigint', 'sum': 'numeric',
+    'avg': 'numeric', 'now': 'timestamp with time zone', 'lower': 'text', 'upper': 'text', 'concat': 'text',
+    'concat_ws': 'text', 'trim': 'text', 'initcap': 'text', 'format': 'text', 'string_agg': 'text',
+    'to_json': 'json', 'json_agg': 'json', 'json_build_object': 'json', 'row_to_json': 'json', 'to_jsonb': 'jsonb',
+    'jsonb_agg': 'jsonb', 'jsonb_build_object': 'jsonb', 'bool_or': 'boolean', 'bool_and': 'boolean',
+    'exists': 'boolean', 'date_trunc': 'timestamp with time zone',
+}
+# Functions whose result has the type of their first argument.
+_FIRST_ARGUMENT_TYPE = frozenset(('coalesce', 'nullif', 'greatest', 'least', 'min', 'max', 'array_remove',
+                                  'array_append', 'abs'))
+
+
+def _mask(sql):
+    # `sql` with quoted text and everything inside parentheses blanked, so
+    # top-level keywords can be found with a regex at the same offsets.
+    out = []
+    depth = 0
+    quote = None
+    for char in sql:
+        if quote:
+            quote = None if char == quote else quote
+            out.append(' ')
+        elif char in '\'"':
+            quote = char
+            out.append(' ')
+        elif char == '(':
+            out.append(char if depth == 0 else ' ')
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            out.append(char if depth == 0 else ' ')
+        else:
+            out.append(char if depth == 0 else ' ')
+    return ''.join(out)
+
+
+def _select_parts(definition):
+    # (select list, FROM clause, masked statement from SELECT on) of the
+    # first branch of a view's top-level query.
+    masked = _mask(definition)
+    select = re.search(r'\bSELECT\b', masked, re.IGNORECASE)
+    if not select:
+        return None
+    start = select.end()
+    modifier = re.match(r'\s+(?:ALL\b|DISTINCT\b(?:\s+ON\s*\(\s*\))?)', masked[start:], re.IGNORECASE)
+    if modifier:
+        start += modifier.end()
+    end = _SET_OPERATION_RE.search(masked, start)
+    end = end.start() if end else len(masked)
+    from_match = re.search(r'\bFROM\b', masked[start:end], re.IGNORECASE)
+    if not from_match:
+        return definition[start:end], '', masked[select.start():]
+    from_start = start + from_match.end()
+    from_end = _FROM_END_RE.search(masked, from_start)
+    from_end = min(from_end.start(), end) if from_end else end
+    return (definition[start:start + from_match.start()], definition[from_start:from_end],
+            masked[select.start():])
+
+
+def _sources(catalog, from_clause, resolving):
+    # [(alias, {column: pg type} or None)] in FROM order; None for subqueries,
+    # functions and names the catalog doesn't know.
+    sources = []
+    pieces = []
+    start = 0
+    for join in _JOIN_RE.finditer(_mask(from_clause)):
+        pieces.append(from_clause[start:join.start()])
+        start = join.end()
+    pieces.append(from_clause[start:])
+    for text in pieces:
+        text = text.strip()
+        match = _SOURCE_RE.match(text)
+        if not match:
+            sources.append((None, None))
+            continue
+        name = match.group('name')
+        relation = None if name.startswith('(') else parse_qname(name)
+        columns = None
+        if relation and relation[0] in (None, SCHEMA):
+            columns = _relation_columns(catalog, relation[1], resolving)
+        alias = normalize_ident(match.group('alias')) if match.group('alias') else relation and relation[1]
+        sources.append((alias, columns))
+    return sources
+
+
+def _relation_columns(catalog, name, resolving):
+    if name in catalog["tables"]:
+        return {c: d["type"] for c, d in catalog["tables"][name]["columns"].items()}
+    if name in catalog["views"] and name not in resolving:
+        columns = view_columns(catalog, name, resolving)
+        return None if columns is None else dict(columns)
+    return None
+
+
+def _expression_type(expr, sources):
+    expr = expr.strip()
+    while expr.startswith('(') and _mask(expr) == '(' + ' ' * (len(expr) - 2) + ')':
+        expr = expr[1:-1].strip()
+    masked = _mask(expr)
+    cast = _CAST_RE.match(masked)
+    if cast:
+        return expr[cast.start('type'):].strip()
+    cast = re.match(r'CAST\s*\((.*)\s+AS\s+(.+)\)$', expr, re.IGNORECASE | re.DOTALL)
+    if cast:
+        return cast.group(2).strip()
+    reference = _COLUMN_REF_RE.match(expr)
+    if reference:
+        qualifier = normalize_ident(reference.group(1)) if reference.group(1) else None
+        column = normalize_ident(reference.group(2))
+        for alias, columns in sources:
+            if columns and (qualifier is None or alias == qualifier) and column in columns:
+                return columns[column]
+        if qualifier is None and expr.lower() in ('true', 'false'):
+            return 'boolean'
+        return None
+    if re.match(r"'(?:[^']|'')*'$", expr):
+        return 'text'
+    if re.match(r'-?\d+$', expr):
+        return 'integer'
+    if re.match(r'-?\d*\.\d+$', expr):
+        return 'numeric'
+    call = _CALL_RE.match(expr)
+    if call and matching_paren(expr, call.start(2) - 1) == len(expr) - 1:
+        function = call.group(1).lower()
+        if function in _FIXED_RESULT:
+            return _FIXED_RESULT[function]
+        args = split_top_level(re.sub(r'^\s*DISTINCT\s+', '', call.group(2), flags=re.IGNORECASE))
+        if function in _FIRST_ARGUMENT_TYPE and args:
+            return _expression_type(args[0], sources)
+        if function == 'array_agg' and args:
+            element = _expression_type(re.split(r'\s+ORDER\s+BY\s+', args[0], flags=re.IGNORECASE)[0], sources)
+            return element and element + '[]'
+    return None
+
+
+def _select_items(select_list, sources):
+    # [(name, pg type or None, source column or None)]; None when a `*`
+    # can't be expanded.
+    items = []
+    for item in split_top_level(select_list):
+        star = re.match(r'(?:(' + IDENT + r')\s*\.\s*)?\*$', item)
+        if star:
+            qualifier = normalize_ident(star.group(1)) if star.group(1) else None
+            picked = [(a, c) for a, c in sources if qualifier is None or a == qualifier]
+            if not picked or any(c is None for _, c in picked):
+                return None
+            items.extend((column, pg_type, column) for _, columns in picked for column, pg_type in columns.items())
+            continue
+        reference = _COLUMN_REF_RE.match(item)
+        alias = None if reference else _ALIAS_RE.match(_mask(item))
+        if alias and alias.group('alias').lower() not in _NOT_ALIASES and not alias.group('expr').endswith(
+                ('::', '.')):
+            expr = item[:alias.end('expr')]
+            name = normalize_ident(item[alias.start('alias'):])
+        else:
+            expr = item
+            cast = _CAST_RE.match(_mask(item))
+            base = item[:cast.end('expr')].strip() if cast else item
+            call = _CALL_RE.match(base)
+            base_reference = _COLUMN_REF_RE.match(base)
+            name = (normalize_ident(base_reference.group(2)) if base_reference else
+                    call.group(1).lower() if call else '?column?')
+        source_reference = _COLUMN_REF_RE.match(expr.strip())
+        items.append((name, _expression_type(expr, sources),
+                      normalize_ident(source_reference.group(2)) if source_reference else None))
+    return items
+
+
+def view_columns(catalog, name, resolving=()):
+    """[(column, pg type or None)] for a view, or None when its SELECT list can't be read."""
+    parts = _select_parts(catalog["views"][name]["definition"])
+    if parts is None:
+        return None
+    select_list, from_clause, _ = parts
+    items = _select_items(select_list, _sources(catalog, from_clause, set(resolving) | {name}))
+    return None if items is None else [(column, pg_type) for column, pg_type, _ in items]
+
+
+def _updatable_base(catalog, name):
+    # (base table, {base column: view column}) for a view Postgres can write
+    # through: one table, no aggregation or set operation, and only the
+    # columns that are plain references to it. None otherwise.
+    view = catalog["views"][name]
+    parts = None if view["materialized"] else _select_parts(view["definition"])
+    if parts is None:
+        return None
+    select_list, from_clause, masked = parts
+    if re.match(r'\s*WITH\b', _mask(view["definition"]), re.IGNORECASE):
+        return None
+    from_masked = _mask(from_clause)
+    if _NOT_UPDATABLE_RE.search(from_masked) or re.search(r'\b(?:DISTINCT|GROUP|HAVING|LIMIT|OFFSET|UNION|'
+                                                          r'INTERSECT|EXCEPT)\b', masked, re.IGNORECASE):
+        return None
+    sources = _sources(catalog, from_clause, {name})
+    source = _SOURCE_RE.match(from_clause.strip())
+    relation = parse_qname(source.group('name')) if source and not source.group('name').startswith('(') else None
+    if len(sources) != 1 or relation is None or relation[1] not in catalog["tables"]:
+        return None
+    items = _select_items(select_list, sources)
+    if items is None or _AGGREGATE_RE.search(select_list):
+        return None
+    return relation[1], {base_column: column for column, _, base_column in items if base_column is not None}
+
+
+def view_type(catalog, name):
+    columns = view_columns(catalog, name) or []
+    row = [(column, False, _nullable(ts_type(catalog, pg_type or 'unknown')))
+           for column, pg_type in sorted(dict(columns).items())]
+    members = [('Row', False, _obj(row))]
+    base = _updatable_base(catalog, name)
+    if base is not None:
+        table, rename = base
+        writable = sorted((column, False, node) for column, _, node in row if column in rename.values())
+        members.append(('Insert', False, _obj([(c, True, node) for c, _, node in writable])))
+        members.append(('Update', False, _obj([(c, True, node) for c, _, node in writable])))
+        members.append(('Relationships', False, _relationships(catalog, table, rename)))
+    else:
+        members.append(('Relationships', False, ('tuple', [])))
+    return _obj(members)
+
+
+def schema_type(catalog, committed=None):
+    """The `Database` type for the migrations' public schema.
+
+    With the committed file's parsed `Database`, objects the extensions own,
+    tables and functions created outside the migrations and the columns of
+    tables the migrations only alter are kept from it.
+    """
+    outside = _outside(catalog)
+    sections = {
+        "Tables": {name: table_type(catalog, name) for name in catalog["tables"]},
+        "Views": {name: view_type(catalog, name) for name in catalog["views"]},
+        "Functions": {},
+        "Enums": {name: ('union', [_literal(v) for v in values]) for name, values in catalog["enums"].items()},
+        "CompositeTypes": {},
+    }
+    for name, overloads in catalog["functions"].items():
+        node = function_type(catalog, overloads)
+        if node is not None:
+            sections["Functions"][name] = node
+    version = _literal('12')
+    if committed is not None:
+        old = _members(committed)
+        version = _members(old.get('__InternalSupabase', _obj([]))).get('PostgrestVersion', version)
+        old = _members(old.get(SCHEMA, _obj([])))
+        for section, pattern in EXTENSION_OBJECTS.items():
+            for name, node in _members(old.get(section, _obj([]))).items():
+                if pattern and pattern.match(name) and name not in sections[section]:
+                    sections[section][name] = node
+        old_tables = _members(old.get('Tables', _obj([])))
+        for name, table in catalog["tables"].items():
+            if not table["partial"]:
+                continue
+            if name in old_tables:
+                sections["Tables"][name] = _merge_partial(sections["Tables"][name], old_tables[name])
+            else:
+                # Only the altered columns are known: not a table to emit.
+                del sections["Tables"][name]
+        for section in SECTIONS:
+            for name, node in _members(old.get(section, _obj([]))).items():
+                if name in outside[section]:
+                    sections[section][name] = node
+    public = []
+    for section in SECTIONS:
+        entries = [(name, False, sections[section][name]) for name in sorted(sections[section])]
+        public.append((section, False, _obj(entries or [(_EMPTY_SECTION, False, ('type', 'never'))])))
+    return _obj([('__InternalSupabase', False, _obj([('PostgrestVersion', False, version)])),
+                 (SCHEMA, False, _obj(public))])
+
+
+def _outside(catalog):
+    # {section: names} the migration SQL uses but never creates: they were
+    # created outside the migrations, and only the committed file has them.
+    tables = referenced_tables(catalog)
+    return {"Tables": tables, "Views": tables, "Functions": referenced_functions(catalog), "Enums": set(),
+            "CompositeTypes": set()}
+
+
+def _merge_partial(generated, committed):
+    # A table the migrations only alter: keep the committed columns and
+    # foreign keys they never mention.
+    old = _members(committed)
+    members = []
+    for part, _, node in generated[1]:
+        if part == 'Relationships':
+            keys = {_relationship_key(entry) for entry in node[1]}
+            extra = [entry for entry in old.get(part, ('tuple', []))[1] if _relationship_key(entry) not in keys]
+            node = ('tuple', sorted(node[1] + extra, key=_relationship_key))
+        elif part in old:
+            names = {key for key, _, _ in node[1]}
+            node = _obj(sorted(node[1] + [m for m in old[part][1] if m[0] not in names], key=lambda m: m[0]))
+        members.append((part, False, node))
+    return _obj(members)
+
+
+def _members(node):
+    return {key: value for key, _, value in node[1]} if node[0] == 'obj' else {}
+
+
+def _relationship_key(node):
+    fields = _members(node)
+    return tuple(fields.get(key, ('type', ''))[1] for key in ('foreignKeyName', 'referencedRelation'))
+
+
+# ---------------------------------------------------------------------------
+# Rendering, in the layout `supabase gen types typescript` prints
+# ---------------------------------------------------------------------------
+
+def _key(key):
+    return key if _KEY_RE.match(key) or key.startswith('[') else json.dumps(key, ensure_ascii=False)
+
+
+def _inline(node):
+    """`node` on one line, or None when it holds a multiline object."""
+    kind = node[0]
+    if kind == 'type':
+        return node[1]
+    if kind == 'array':
+        inner = _inline(node[1])
+        if inner is None:
+            return None
+        return (f'({inner})' if node[1][0] == 'union' else inner) + '[]'
+    parts = [_inline(n) for n in node[1]] if kind in ('union', 'tuple') else None
+    if kind == 'union':
+        return None if None in parts else ' | '.join(parts)
+    if kind == 'tuple':
+        return None if None in parts else '[' + ', '.join(parts) + ']'
+    if not node[1]:
+        return '{}'
+    if node[2]:
+        return None
+    members = []
+    for key, optional, value in node[1]:
+        text = _inline(value)
+        if text is None:
+            return None
+        members.append(f"{_key(key)}{'?' if optional else ''}: {text}")
+    return '{ ' + '; '.join(members) + ' }'
+
+
+def render(node, indent=0, used=0):
+    """`node` placed `used` columns into a line indented by `indent`."""
+    text = _inline(node)
+    if text is not None and used + len(text) <= WIDTH:
+        return text
+    kind = node[0]
+    pad = ' ' * (indent + 2)
+    if kind == 'obj':
+        return '{' + ''.join('\n' + pad + _render_member(key, optional, value, indent + 2)
+                             for key, optional, value in node[1]) + '\n' + ' ' * indent + '}'
+    if kind == 'tuple':
+        return '[' + ''.join('\n' + pad + render(value, indent + 2, indent + 2) + ','
+                             for value in node[1]) + '\n' + ' ' * indent + ']'
+    if kind == 'array' and node[1][0] != 'union':
+        return render(node[1], indent, used + 2) + '[]'
+    return text if text is not None else ' | '.join(render(n, indent, used) for n in node[1])
+
+
+def _render_member(key, optional, value, indent):
+    head = f"{_key(key)}{'?' if optional else ''}:"
+    if value[0] == 'union':
+        text = _inline(value)
+        if text is not None and indent + len(head) + 1 + len(text) <= WIDTH:
+            return f'{head} {text}'
+        return head + ''.join('\n' + ' ' * (indent + 2) + '| ' + render(alt, indent + 4, indent + 4)
+                              for alt in value[1])
+    return f'{head} {render(value, indent, indent + len(head) + 1)}'
+
+
+def render_constants(enums):
+    lines = ['export const Constants = {', f'  {SCHEMA}: {{']
+    if not enums:
+        lines.append('    Enums: {},')
+    else:
+        lines.append('    Enums: {')
+        for name, values in sorted(enums.items()):
+            literals = [json.dumps(v, ensure_ascii=False) for v in values]
+            line = f"      {_key(name)}: [{', '.join(literals)}],"
+            if len(line) <= WIDTH:
+                lines.append(line)
+            else:
+                lines.extend([f'      {_key(name)}: ['] + [f'        {v},' for v in literals] + ['      ],'])
+        lines.append('    },')
+    lines.extend(['  },', '} as const'])
+    return '\n'.join(lines)
+
+
+def render_file(catalog, committed_text):
+    """The whole types.ts: the committed file's header and helper types around
+    a regenerated `Database` and `Constants`."""
+    parsed = parse_types(committed_text)
+    database = schema_type(catalog, parsed.database)
+    body = render(database, 0, len('export type Database = '))
+    if parsed.comments:
+        body = body.replace('\n  __InternalSupabase:', '\n' + parsed.comments + '  __InternalSupabase:', 1)
+    enums = {name: [json.loads(v[1]) for v in node[1]]
+             for name, node in _members(_members(_members(database)[SCHEMA])["Enums"]).items()
+             if node[0] == 'union'}
+    return (committed_text[:parsed.database_start] + 'export type Database = ' + body +
+            committed_text[parsed.database_end:parsed.constants_start] + render_constants(enums) + '\n')
+
+
+# ---------------------------------------------------------------------------
+# Parsing the committed file
+# ---------------------------------------------------------------------------
+
+class _Parsed:
+    def __init__(self, database, database_start, database_end, constants_start, comments):
+        self.database = database
+        self.database_start = database_start
+        self.database_end = database_end
+        self.constants_start = constants_start
+        self.comments = comments
+
+
+class _TypeParser:
+    def __init__(self, content, tokens, pos):
+        self.content = content
+        self.tokens = tokens
+        self.pos = pos
+
+    def peek(self, offset=0):
+        pos = self.pos + offset
+        return self.tokens[pos] if pos < len(self.tokens) else None
+
+    def take(self, value=None):
+        token = self.peek()
+        if token is None or (value is not None and token.value != value):
+            found = 'end of file' if token is None else repr(token.value)
+            raise ValueError(f"expected {value!r} at offset {token.start if token else len(self.content)}, "
+                             f"found {found}")
+        self.pos += 1
+        return token
+
+    def at(self, value, offset=0):
+        token = self.peek(offset)
+        return token is not None and token.kind == 'punct' and token.value == value
+
+    def type(self):
+        if self.at('|'):
+            self.take()
+        alternatives = [self.postfix()]
+        while self.at('|'):
+            self.take()
+            alternatives.append(self.postfix())
+        return alternatives[0] if len(alternatives) == 1 else ('union', alternatives)
+
+    def postfix(self):
+        node = self.primary()
+        while self.at('[') and self.at(']', 1):
+            self.take()
+            self.take()
+            node = ('array', node)
+        return node
+
+    def primary(self):
+        token = self.take()
+        if token.value == '{' and token.kind == 'punct':
+            return self.object(token)
+        if token.value == '[' and token.kind == 'punct':
+            items = []
+            while not self.at(']'):
+                items.append(self.type())
+                if self.at(','):
+                    self.take()
+            self.take(']')
+            return ('tuple', items)
+        if token.value == '(' and token.kind == 'punct':
+            node = self.type()
+            self.take(')')
+            return node
+        if token.kind == 'string':
+            return ('type', f'"{token.value}"')
+        if token.kind in ('number', 'ident'):
+            text = token.value
+            while self.at('[') and self.peek(1) and self.peek(1).kind == 'string' and self.at(']', 2):
+                text += f'["{self.peek(1).value}"]'
+                self.pos += 3
+            if self.at('<'):
+                self.take()
+                args = [self.type()]
+                while self.at(','):
+                    self.take()
+                    args.append(self.type())
+                self.take('>')
+                text += '<' + ', '.join(_inline(a) or '' for a in args) + '>'
+            return ('type', text)
+        raise ValueError(f"unexpected {token.value!r} at offset {token.start}")
+
+    def object(self, brace):
+        following = self.peek()
+        multiline = following is not None and '\n' in self.content[brace.end:following.start]
+        members = []
+        while not self.at('}'):
+            if self.at('['):
+                # A mapped type: `[_ in never]: never` marks an empty section.
+                start = self.take().start
+                while not self.at(']'):
+                    self.take()
+                key = re.sub(r'\s+', ' ', self.content[start:self.take(']').end])
+            else:
+                key = self.take().value
+            optional = self.at('?')
+            if optional:
+                self.take()
+            self.take(':')
+            members.append((key, optional, self.type()))
+            if self.at(';') or self.at(','):
+                self.take()
+        self.take('}')
+        return _obj(members, multiline)
+
+
+def parse_types(content):
+    """The committed file's `Database` type and where it and `Constants` sit."""
+    tokens = list(tokenize(content))
+    for i, token in enumerate(tokens):
+        if (token.value == 'Database' and i >= 2 and tokens[i - 1].value == 'type'
+                and tokens[i - 2].value == 'export' and i + 1 < len(tokens) and tokens[i + 1].value == '='):
+            break
+    else:
+        raise ValueError("no `export type Database =` found")
+    parser = _TypeParser(content, tokens, i + 2)
+    opening = parser.peek()
+    database = parser.type()
+    end = tokens[parser.pos - 1].end
+    comments = re.match(r'\{\n((?:[ \t]*//[^\n]*\n)*)', content[opening.start:])
+    constants = re.search(r'^export const Constants\b', content, re.MULTILINE)
+    return _Parsed(database, tokens[i - 2].start, end, constants.start() if constants else len(content),
+                   comments.group(1) if comments else '')
+
+
+def committed_relations(content):
+    """Table and view names in a types.ts' public schema."""
+    public = _members(_members(parse_types(content).database).get(SCHEMA, _obj([])))
+    return {name for section in ('Tables', 'Views') for name in _members(public.get(section, _obj([])))
+            if name != _EMPTY_SECTION}
+
+
+# ---------------------------------------------------------------------------
+# Structural diff
+# ---------------------------------------------------------------------------
+
+def _canonical(node):
+    # Order-insensitive text for comparing two types.
+    kind = node[0]
+    if kind == 'type':
+        return node[1]
+    if kind == 'array':
+        inner = _canonical(node[1])
+        return (f'({inner})' if node[1][0] == 'union' else inner) + '[]'
+    if kind == 'union':
+        return ' | '.join(sorted(_canonical(n) for n in node[1]))
+    if kind == 'tuple':
+        return '[' + ', '.join(_canonical(n) for n in node[1]) + ']'
+    return '{ ' + '; '.join(f"{_key(k)}{'?' if o else ''}: {_canonical(v)}" for k, o, v in sorted(node[1])) + ' }'
+
+
+def _flatten(node):
+    if node[0] == 'obj':
+        return _obj([(key, optional, _flatten(value)) for key, optional, value in node[1]], False)
+    if node[0] in ('union', 'tuple'):
+        return (node[0], [_flatten(n) for n in node[1]])
+    if node[0] == 'array':
+        return ('array', _flatten(node[1]))
+    return node
+
+
+def _show(node):
+    return _inline(_flatten(node))
+
+
+def _overloads(node):
+    # A function's {Args, Returns} alternatives, or None for any other type.
+    alternatives = node[1] if node[0] == 'union' else [node]
+    if all(n[0] == 'obj' and 'Args' in _members(n) for n in alternatives):
+        return alternatives
+    return None
+
+
+def diff(generated, committed, path='', partial=False):
+    """[(change, path, generated, committed)] where the types differ.
+
+    change is '+' for what the migrations have and types.ts lacks, '-' for
+    the reverse and '~' for a different type. `partial` tables were created
+    outside the migrations, so their missing columns aren't drift.
+    """
+    changes = []
+    if generated[0] == 'obj' and committed[0] == 'obj':
+        new = {key: (optional, value) for key, optional, value in generated[1] if not key.startswith('[')}
+        old = {key: (optional, value) for key, optional, value in committed[1] if not key.startswith('[')}
+        for key in sorted(new.keys() | old.keys()):
+            child = f'{path}.{key}' if path else key
+            if key not in old:
+                changes.append(('+', child, _show(new[key][1]), None))
+            elif key not in new:
+                if not partial:
+                    changes.append(('-', child, None, _show(old[key][1])))
+            else:
+                if new[key][0] != old[key][0]:
+                    changes.append(('~', child, 'optional' if new[key][0] else 'required',
+                                    'optional' if old[key][0] else 'required'))
+                changes.extend(diff(new[key][1], old[key][1], child, partial))
+        return changes
+    if generated[0] == 'tuple' and committed[0] == 'tuple' and all(
+            n[0] == 'obj' and 'foreignKeyName' in _members(n) for n in generated[1] + committed[1]):
+        new = {_relationship_key(n): n for n in generated[1]}
+        old = {_relationship_key(n): n for n in committed[1]}
+        for key in sorted(new.keys() | old.keys()):
+            child = f"{path}[{json.loads(key[0])}]"
+            if key not in old:
+                changes.append(('+', child, _show(new[key]), None))
+            elif key not in new:
+                if not partial:
+                    changes.append(('-', child, None, _show(old[key])))
+            else:
+                changes.extend(diff(new[key], old[key], child))
+        return changes
+    new, old = _overloads(generated), _overloads(committed)
+    if new and old and (len(new) > 1 or len(old) > 1):
+        # Function overloads: match them up by their Args.
+        new = {_canonical(_members(n)['Args']): n for n in new}
+        old = {_canonical(_members(n)['Args']): n for n in old}
+        for key in sorted(new.keys() | old.keys()):
+            child = f'{path}({_show(_members((new.get(key) or old[key]))["Args"])})'
+            if key not in old:
+                changes.append(('+', child, _show(_members(new[key])['Returns']), None))
+            elif key not in new:
+                changes.append(('-', child, None, _show(_members(old[key])['Returns'])))
+            else:
+                changes.extend(diff(new[key], old[key], child))
+        return changes
+    if _canonical(generated) != _canonical(committed):
+        changes.append(('~', path, _show(generated), _show(committed)))
+    return changes
+
+
+def schema_drift(catalog, committed):
+    """diff() of the public schema, without the extensions' objects."""
+    generated = _members(_members(schema_type(catalog))[SCHEMA])
+    old = _members(_members(committed).get(SCHEMA, _obj([])))
+    # Tables the migrations only alter, or only use, can't be judged.
+    outside = _outside(catalog)
+    changes = []
+    for section in SECTIONS:
+        pattern = EXTENSION_OBJECTS[section]
+        new_entries = _members(generated[section])
+        old_entries = {name: node for name, node in _members(old.get(section, _obj([]))).items()
+                       if not (pattern and pattern.match(name) and name not in new_entries)}
+        partial = {name for name, table in catalog["tables"].items() if table["partial"]} \
+            if section == 'Tables' else set()
+        for name in sorted(new_entries.keys() | old_entries.keys()):
+            path = f'{SCHEMA}.{section}.{name}'
+            if name.startswith('['):
+                continue
+            if name not in old_entries:
+                if name not in partial:
+                    changes.append(('+', path, None, None))
+            elif name not in new_entries:
+                if name not in outside[section]:
+                    changes.append(('-', path, None, None))
+            else:
+                changes.extend(diff(new_entries[name], old_entries[name], path, name in partial))
+    return changes
+
+
+def format_changes(changes):
+    lines = []
+    for change, path, new, old in changes:
+        if change == '~':
+            lines.append(f'~ {path}: {old} -> {new}')
+        elif new is not None or old is not None:
+            lines.append(f'{change} {path}: {new if change == "+" else old}')
+        else:
+            lines.append(f'{change} {path}')
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate src/integrations/supabase/types.ts from supabase/migrations, offline, or report "
+                    "how the committed file has drifted from them.")
+    parser.add_argument('--diff', action='store_true',
+                        help="Report drift between the migrations and the committed types instead of generating; "
+                             "exits 1 when there is any")
+    parser.add_argument('--json', action='store_true', help="With --diff, print the changes as JSON")
+    parser.add_argument('--types', default=TYPES_PATH, metavar='PATH',
+                        help="Committed types file to diff against and take the helper types from "
+                             "(default: %(default)s)")
+    parser.add_argument('--out', metavar='PATH', help="Write the generated file here instead of stdout")
+    parser.add_argument('--write', action='store_true', help="Overwrite --types with the generated file")
+    parser.add_argument('--migrations-dir', default=MIGRATIONS_DIR)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--no-cache', action='store_true', help="Replay every migration instead of resuming "
+                                                                 "from the cached checkpoints")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    profiler = Profiler.from_args('gen_types', args)
+    start = time.perf_counter()
+    try:
+        with open(args.types, 'r') as f:
+            committed_text = f.read()
+    except OSError as e:
+        sys.exit(f"Can't read {args.types}: {e}")
+    catalog_stats = {}
+    with profiler.phase('schema'):
+        catalog = build_catalog(args.migrations_dir, args.cache_dir, use_cache=not args.no_cache,
+                                stats=catalog_stats)
+    profiler.catalog(catalog_stats)
+
+    if args.diff:
+        with profiler.phase('diff'):
+            changes = schema_drift(catalog, parse_types(committed_text).database)
+        seconds = round(time.perf_counter() - start, 3)
+        with profiler.phase('report'):
+            if args.json:
+                json.dump({"types": args.types, "seconds": seconds,
+                           "changes": [{"change": c, "path": p, "migrations": n, "types": o}
+                                       for c, p, n, o in changes]}, sys.stdout, indent=2)
+                print()
+            else:
+                for line in format_changes(changes):
+                    print(line)
+                print(f"{len(changes)} difference(s) between {args.migrations_dir} (+) and {args.types} (-) "
+                      f"in {seconds}s", file=sys.stderr)
+        profiler.finish()
+        if changes:
+            sys.exit(1)
+        return
+
+    with profiler.phase('render'):
+        output = render_file(catalog, committed_text)
+    path = args.types if args.write else args.out
+    with profiler.phase('report'):
+        if path:
+            with open(path, 'w') as f:
+                f.write(output)
+        else:
+            sys.stdout.write(output)
+    profiler.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import argparse
+import json
+import re
+import sys
+
+from audit_codebase import extract_query_chains, find_files
+from audit_profile import Profiler, add_arguments as add_profile_arguments
+from line_index import LineIndex
+from schema_catalog import MIGRATIONS_DIR, build_catalog
+
+# How each PostgREST filter can use an index.
+EQUALITY_METHODS = frozenset(('eq', 'in', 'is', 'match'))
+RANGE_METHODS = frozenset(('gt', 'gte', 'lt', 'lte'))
+# Served by GIN/GiST indexes (array/jsonb containment, full text, trigram).
+GIN_METHODS = frozenset((
+    'contains', 'containedBy', 'overlaps', 'textSearch', 'like', 'ilike', 'likeAllOf', 'likeAnyOf', 'ilikeAllOf',
+    'ilikeAnyOf', 'rangeGt', 'rangeGte', 'rangeLt', 'rangeLte', 'rangeAdjacent',
+))
+
+# Worst first; "order" means the filters are indexed but ORDER BY still sorts.
+COVERAGE_RANK = {"none": 0, "partial": 1, "order": 2}
+
+_PLAIN_COLUMN_RE = re.compile(r'^\w+$')
+_PREDICATE_RE = re.compile(
+    r'^(\w+)\s*(?:(IS\s+NOT\s+NULL|IS\s+NULL)|(=|<>|!=)\s*(.+?)|IN\s*\((.*)\))?$', re.IGNORECASE | re.DOTALL)
+
+
+def chain_access(chain, columns):
+    """The (equality, range, gin, order) columns a chain filters and sorts on.
+
+    Only plain columns of the chain's own table count: filters on embedded
+    resources, JSON paths and `or()` branches cannot be served by a
+    single-column prefix of an index on this table.
+    """
+    equality, ranges, gin = [], [], []
+    for ref in chain["filters"]:
+        col = ref["column"]
+        if ref["referenced"] or col not in columns:
+            continue
+        method = ref["method"]
+        if method in EQUALITY_METHODS:
+            target = equality
+        elif method in RANGE_METHODS:
+            target = ranges
+        elif method in GIN_METHODS:
+            target = gin
+        else:
+            continue
+        if col not in target:
+            target.append(col)
+    order = []
+    for ref in chain["order"]:
+        if not ref["referenced"] and ref["column"] in columns and ref["column"] not in order:
+            order.append(ref["column"])
+    return equality, ranges, gin, order
+
+
+def _strip_parens(text):
+    text = text.strip()
+    while text.startswith('(') and text.endswith(')'):
+        depth = 0
+        for i, char in enumerate(text):
+            depth += char == '('
+            depth -= char == ')'
+            if depth == 0 and i < len(text) - 1:
+                return text
+        text = text[1:-1].strip()
+    return text
+
+
+def _literal(text):
+    # 'pending'::public.status -> 'pending'
+    return re.sub(r'::[\w."]+(?:\[\])?$', '', text.strip()).strip()
+
+
+def predicate_holds(where, filters):
+    """True when the chain's filters imply a partial index's WHERE clause.
+
+    Understands conjunctions of `col IS [NOT] NULL`, `col = literal`,
+    `col IN (...)` and bare boolean columns; anything else is treated as not
+    implied, so such partial indexes are never credited.
+    """
+    by_column = {}
+    for ref in filters:
+        if not ref["referenced"]:
+            by_column.setdefault(ref["column"], []).append(ref)
+
+    for conjunct in re.split(r'\s+AND\s+', _strip_parens(where), flags=re.IGNORECASE):
+        conjunct = _strip_parens(conjunct)
+        negated = re.match(r'NOT\s+(\w+)$', conjunct, re.IGNORECASE)
+        if negated:
+            conjunct = f"{negated.group(1)} = false"
+        match = _PREDICATE_RE.match(conjunct)
+        if not match:
+            return False
+        col, null_test, op, value, in_list = match.groups()
+        refs = by_column.get(col, [])
+        if null_test:
+            if not any(_implies_null_test(ref, null_test.upper().split()[1] == 'NOT') for ref in refs):
+                return False
+        elif op:
+            if op != '=' or not any(_implies_equal(ref, _literal(value).lower()) for ref in refs):
+                return False
+        elif in_list is not None:
+            allowed = {_literal(v).lower() for v in in_list.split(',')}
+            if not any(_implies_equal(ref, a) for ref in refs for a in allowed):
+                return False
+        elif not any(_implies_equal(ref, 'true') for ref in refs):
+            return False
+    return True
+
+
+def _implies_null_test(ref, not_null):
+    method, value = ref["method"], (ref["value"] or '').lower()
+    if not_null:
+        if method == 'not' and ref["operator"] == 'is' and value == 'null':
+            return True
+        # Strict operators never match NULL, whatever the bound value is, so
+        # the planner proves `col IS NOT NULL` from them.
+        return method in {'eq', 'in', 'neq', 'like', 'ilike'} | RANGE_METHODS
+    return method == 'is' and value == 'null'
+
+
+def _implies_equal(ref, literal):
+    value = (ref["value"] or '').lower()
+    return ref["method"] in ('eq', 'is') and value == literal
+
+
+def index_coverage(index, equality, ranges, gin, order):
+    """How much of one access pattern `index` serves.
+
+    Returns (served columns, order served) following btree rules: a run of
+    equality columns, then one range column or the ORDER BY columns.
+    """
+    columns = index["columns"]
+    if index["method"] in ('gin', 'gist'):
+        return [c for c in columns if c in gin or c in equality], False
+    if index["method"] == 'hash':
+        return ([columns[0]] if columns and columns[0] in equality else []), False
+
+    served = []
+    i = 0
+    while i < len(columns) and columns[i] in equality and columns[i] not in served:
+        served.append(columns[i])
+        i += 1
+    rest = columns[i:]
+    order_served = bool(order) and rest[:len(order)] == order
+    if not order_served and rest and rest[0] in ranges:
+        served.append(rest[0])
+    if not order_served and order and all(c in equality for c in order):
+        order_served = True  # sorting on columns pinned by equality is free
+    return served, order_served
+
+
+def assess_chain(chain, table, indexes):
+    """Coverage verdict for one chain, or None when it filters on nothing."""
+    equality, ranges, gin, order = chain_access(chain, table["columns"])
+    wanted = equality + ranges + gin
+    if not wanted and not order:
+        return None
+
+    best = (None, [], False)
+    for name, index in indexes:
+        if any(not _PLAIN_COLUMN_RE.match(c) for c in index["columns"][:1]):
+            continue  # expression index
+        if index["where"] and not predicate_holds(index["where"], chain["filters"]):
+            continue
+        served, order_served = index_coverage(index, equality, ranges, gin, order)
+        if index["unique"] and index["method"] == 'btree' and all(c in equality for c in index["columns"]):
+            return None  # at most one row: nothing left to filter or sort
+        if (len(served), order_served) > (len(best[1]), best[2]):
+            best = (name, served, order_served)
+
+    name, served, order_served = best
+    missing = [c for c in wanted if c not in served]
+    if served:
+        # Once an index narrows the rows, rechecking a boolean is cheap, and
+        # a two-valued column makes a poor index key anyway.
+        missing = [c for c in missing if not _is_boolean(table, c)]
+    if wanted and not served and not order_served:
+        coverage = "none"
+    elif missing:
+        coverage = "partial"
+    elif order and not order_served:
+        coverage = "order"
+    else:
+        return None
+    return {
+        "equality": equality,
+        "range": ranges,
+        "gin": gin,
+        "order": order,
+        "coverage": coverage,
+        "best_index": name,
+        "unindexed": missing,
+    }
+
+
+def _is_boolean(table, column):
+    return table["columns"][column]["type"] in ('boolean', 'bool')
+
+
+def suggest_index(table_name, table, verdict):
+    if verdict["coverage"] != "order" and verdict["gin"] and not verdict["equality"] and not verdict["range"]:
+        column = verdict["gin"][0]
+        text = table["columns"][column]["type"] in ('text', 'citext') or table["columns"][column]["type"].startswith(
+            ('varchar', 'character varying'))
+        opclass = ' gin_trgm_ops' if text else ''
+        return f"CREATE INDEX ON public.{table_name} USING gin ({column}{opclass})"
+    # Booleans last: they only help once the selective columns have narrowed
+    # the scan.
+    columns = sorted(verdict["equality"], key=lambda c: _is_boolean(table, c))
+    if verdict["order"]:
+        columns += [c for c in verdict["order"] if c not in columns]
+    elif verdict["range"]:
+        columns.append(verdict["range"][0])
+    return f"CREATE INDEX ON public.{table_name} ({', '.join(columns)})"
+
+
+def advise(catalog, files, max_locations=10):
+    """Ranked missing-index report over the query chains in `files`.
+
+    Call sites with the same table, filter and order columns are grouped;
+    groups are ranked by call-site count, then by how little is indexed.
+    """
+    indexes_by_table = {}
+    for name, index in sorted(catalog["indexes"].items()):
+        indexes_by_table.setdefault(index["table"], []).append((name, index))
+
+    groups = {}
+    for filepath in files:
+        with open(filepath, 'r') as f:
+            content = f.read()
+        lines = None
+        for chain in extract_query_chains(filepath, content):
+            table = catalog["tables"].get(chain["table"])
+            if table is None or table["partial"]:
+                continue  # views, and tables whose indexes predate the migrations
+            verdict = assess_chain(chain, table, indexes_by_table.get(chain["table"], []))
+            if verdict is None:
+                continue
+            key = (chain["table"], tuple(sorted(verdict["equality"])), tuple(sorted(verdict["range"])),
+                   tuple(sorted(verdict["gin"])), tuple(verdict["order"]))
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = dict(verdict, table=chain["table"], call_sites=0, locations=[])
+            group["call_sites"] += 1
+            if COVERAGE_RANK[verdict["coverage"]] < COVERAGE_RANK[group["coverage"]]:
+                group.update(verdict)
+            if len(group["locations"]) < max_locations:
+                lines = lines or LineIndex(content)
+                line, column = lines.position(chain["table_offset"])
+                group["locations"].append({"file": filepath, "line": line, "column": column})
+
+    report = []
+    for group in groups.values():
+        group["suggestion"] = suggest_index(group["table"], catalog["tables"][group["table"]], group)
+        report.append(group)
+    report.sort(key=lambda g: (-g["call_sites"], COVERAGE_RANK[g["coverage"]], g["table"]))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rank the filters and sorts in src that no index from supabase/migrations serves.")
+    parser.add_argument('--migrations', default=MIGRATIONS_DIR)
+    parser.add_argument('--root', default='src', help="Source tree to scan (default: src)")
+    parser.add_argument('--coverage', choices=sorted(COVERAGE_RANK, key=COVERAGE_RANK.get), action='append',
+                        help="Only report this coverage level (repeatable)")
+    parser.add_argument('--min-call-sites', type=int, default=1, metavar='N')
+    parser.add_argument('--top', type=int, metavar='N', help="Only print the N highest-ranked entries")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    profiler = Profiler.from_args('index_advisor', args)
+    catalog_stats = {}
+    with profiler.phase('schema'):
+        catalog = build_catalog(args.migrations, stats=catalog_stats)
+    with profiler.phase('walk'):
+        files = find_files(args.root)
+    with profiler.phase('analyze'):
+        report = advise(catalog, profiler.each_file(files))
+    report = [g for g in report
+              if g["call_sites"] >= args.min_call_sites and (not args.coverage or g["coverage"] in args.coverage)]
+    if args.top is not None:
+        report = report[:args.top]
+    with profiler.phase('report'):
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    profiler.catalog(catalog_stats)
+    profiler.finish()
+
+
+if __name__ == "__main__":
+    main()
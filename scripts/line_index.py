@@ -0,0 +1,25 @@
+import bisect
+
+
+class LineIndex:
+    """Maps character offsets in one file to 1-based (line, column).
+
+    Built once per file in a single pass; each lookup is a bisect over the
+    line start offsets, so positioning many findings in a large module no
+    longer rescans the file prefix for every hit.
+    """
+
+    def __init__(self, content):
+        starts = [0]
+        pos = content.find('\n')
+        while pos != -1:
+            starts.append(pos + 1)
+            pos = content.find('\n', pos + 1)
+        self.starts = starts
+
+    def line(self, offset):
+        return bisect.bisect_right(self.starts, offset)
+
+    def position(self, offset):
+        line = bisect.bisect_right(self.starts, offset)
+        return line, offset - self.starts[line - 1] + 1
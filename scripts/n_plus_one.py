@@ -0,0 +1,567 @@
+import argparse
+import json
+import os
+import re
+import sys
+
+from audit_codebase import find_files
+from audit_profile import Profiler, add_arguments as add_profile_arguments
+from line_index import LineIndex
+from query_chains import iter_query_chains, iter_rpc_calls
+from ts_lexer import tokenize
+
+# Array methods whose callback runs once per element.
+ITERATION_METHODS = frozenset((
+    'map', 'forEach', 'flatMap', 'filter', 'reduce', 'reduceRight', 'some', 'every', 'find', 'findIndex',
+    'findLast', 'findLastIndex',
+))
+# Callbacks handed to these run later, if at all, rather than once per item.
+# So do JSX expression callbacks (onClick={() => ...}) and functions named
+# like event handlers, which run on user action.
+DEFERRING_CALLEES = frozenset((
+    'useCallback', 'useMemo', 'useEffect', 'useLayoutEffect', 'setTimeout', 'setInterval', 'requestAnimationFrame',
+    'requestIdleCallback', 'addEventListener', 'on', 'subscribe', 'debounce', 'throttle',
+))
+_HANDLER_RE = re.compile(r'^(?:handle|on)[A-Z]')
+_RETRY_RE = re.compile(r'attempt|retr(?:y|ies)|tries', re.IGNORECASE)
+# Loop headers that walk a collection; `while (true)` and `for (;;)` loops
+# probe or page until a query says stop.
+_PER_ITEM_HEADER = frozenset(('of', 'in', 'length', 'size'))
+# Callbacks that still run once per mount: effects, useQuery({ queryFn }).
+EFFECT_CALLEES = frozenset(('useEffect', 'useLayoutEffect'))
+EAGER_PROPERTIES = frozenset(('queryFn',))
+_NOT_METHODS = frozenset((
+    'if', 'for', 'while', 'switch', 'catch', 'function', 'return', 'typeof', 'await', 'new', 'with', 'constructor',
+))
+
+_IMPORT_RE = re.compile(r'\bimport\s+(?!type\b)([\w$*{}\s,]+?)\s+from\s+[\'"]([^\'"]+)[\'"]')
+_REEXPORT_RE = re.compile(r'\bexport\s+(?:type\s+)?(\*|\{[^}]*\})\s+from\s+[\'"]([^\'"]+)[\'"]')
+_DEFAULT_EXPORT_RE = re.compile(r'\bexport\s+default\s+(?:async\s+)?(?:function\s*\*?\s*)?([A-Za-z_$][\w$]*)')
+# tsconfig.json "paths".
+PATH_ALIASES = (('@/', 'src/'), ('~/', 'src/'))
+MODULE_SUFFIXES = ('', '.ts', '.tsx', '/index.ts', '/index.tsx')
+
+
+def _is_punct(token, *values):
+    return token.kind == 'punct' and token.value in values
+
+
+def match_brackets(tokens):
+    """({open index: close index} and {close: open}, [innermost open bracket per token])."""
+    pairs = {}
+    parents = []
+    stack = []
+    for i, token in enumerate(tokens):
+        parents.append(stack[-1] if stack else None)
+        if token.kind != 'punct':
+            continue
+        if token.value in ('(', '[', '{'):
+            stack.append(i)
+        elif token.value in (')', ']', '}') and stack:
+            opened = stack.pop()
+            pairs[opened] = i
+            pairs[i] = opened
+    return pairs, parents
+
+
+def _statement_end(tokens, i, pairs):
+    # Index of the last token of the statement or expression starting at i.
+    n = len(tokens)
+    while i < n:
+        token = tokens[i]
+        if _is_punct(token, '(', '[', '{') and i in pairs:
+            i = pairs[i] + 1
+            continue
+        if _is_punct(token, ';'):
+            return i
+        if _is_punct(token, ',', ')', ']', '}'):
+            return i - 1
+        i += 1
+    return n - 1
+
+
+def _body(tokens, i, pairs):
+    # (first, last) token of a block or single statement starting at i.
+    if i < len(tokens) and _is_punct(tokens[i], '{') and i in pairs:
+        return i, pairs[i]
+    return i, _statement_end(tokens, i, pairs)
+
+
+def _declared_name(tokens, k):
+    # `const name = ...`, `name: ...` (object property) or `name = ...`,
+    # looking back from the token before a function's parameters.
+    if k >= 1 and _is_punct(tokens[k], '=') and tokens[k - 1].kind == 'ident':
+        return tokens[k - 1].value
+    if k >= 1 and _is_punct(tokens[k], ':') and tokens[k - 1].kind in ('ident', 'string'):
+        return tokens[k - 1].value
+    if _is_punct(tokens[k], '='):
+        # const Card: React.FC<Props> = ...
+        j = k - 1
+        while j > 0 and k - j < 24 and not _is_punct(tokens[j], ';', '{', '}'):
+            if tokens[j - 1].kind == 'ident' and tokens[j - 1].value in ('const', 'let', 'var'):
+                return tokens[j].value if tokens[j].kind == 'ident' else None
+            j -= 1
+    return None
+
+
+def find_functions(tokens, pairs, parents):
+    """[{name, callee, start, end, first, last}] for every function in a file.
+
+    `start`/`end` are the token range from the parameters to the end of the
+    body; `callee` is the function a callback is passed to ('map',
+    'useEffect'), or '{' for a JSX expression such as onClick={() => ...}.
+    """
+    functions = []
+    n = len(tokens)
+    for i, token in enumerate(tokens):
+        params = body = None
+        name = None
+        if _is_punct(token, '=>'):
+            j = i - 1
+            if j >= 0 and _is_punct(tokens[j], ')') and j in pairs:
+                params = pairs[j]
+            elif j >= 0 and tokens[j].kind == 'ident' and not (j and _is_punct(tokens[j - 1], ':')):
+                params = j
+            else:
+                # (x): Promise<void> => -- step back over the return type.
+                while j > 0 and i - j < 32 and not (_is_punct(tokens[j], ')') and _is_punct(tokens[j + 1], ':')):
+                    j -= 1
+                params = pairs.get(j) if _is_punct(tokens[j], ')') else None
+            if params is None or i + 1 >= n:
+                continue
+            body = _body(tokens, i + 1, pairs)
+        elif token.kind == 'ident' and token.value == 'function':
+            j = i + 1
+            if j < n and _is_punct(tokens[j], '*'):
+                j += 1
+            if j < n and tokens[j].kind == 'ident':
+                name = tokens[j].value
+                j += 1
+            if j >= n or not _is_punct(tokens[j], '(') or j not in pairs:
+                continue
+            params = i
+            k = pairs[j] + 1
+            while k < n and not _is_punct(tokens[k], '{', ';'):
+                k += 1
+            if k >= n or not _is_punct(tokens[k], '{'):
+                continue  # overload signature
+            body = _body(tokens, k, pairs)
+        elif (token.kind == 'ident' and token.value not in _NOT_METHODS and i + 1 < n
+              and _is_punct(tokens[i + 1], '(') and i + 1 in pairs and i
+              and (_is_punct(tokens[i - 1], '{', ',', ';', '}')
+                   or tokens[i - 1].kind == 'ident' and tokens[i - 1].value in ('async', 'static', 'get', 'set'))):
+            # Method shorthand: name(args) { ... }
+            k = pairs[i + 1] + 1
+            if k < n and _is_punct(tokens[k], ':'):
+                while k < n and not _is_punct(tokens[k], '{', ';', ','):
+                    k += 1
+            if k >= n or not _is_punct(tokens[k], '{'):
+                continue
+            name = token.value
+            params = i
+            body = _body(tokens, k, pairs)
+        else:
+            continue
+
+        k = params - 1
+        if k >= 0 and tokens[k].kind == 'ident' and tokens[k].value == 'async':
+            k -= 1
+        callee = None
+        if name is None and k >= 0:
+            name = _declared_name(tokens, k)
+            if name is None and _is_punct(tokens[k], '(', ','):
+                opened = k if _is_punct(tokens[k], '(') else parents[k]
+                if opened is not None and opened > 0 and tokens[opened - 1].kind == 'ident':
+                    callee = tokens[opened - 1].value
+                    if callee in ('useCallback', 'useMemo') and opened >= 2:
+                        name = _declared_name(tokens, opened - 2)
+            elif name is None and _is_punct(tokens[k], '{'):
+                callee = '{'
+        functions.append({
+            "name": name,
+            "callee": callee,
+            "start": params,
+            "end": body[1],
+            "first": tokens[params].start,
+            "last": tokens[body[1]].end,
+            "params": {t.value for t in tokens[params:body[0]] if t.kind == 'ident'},
+            "key": _query_key(tokens, pairs, parents, k) if name in EAGER_PROPERTIES else None,
+        })
+    return functions
+
+
+def _query_key(tokens, pairs, parents, k):
+    # Identifiers in the queryKey next to the queryFn declared at tokens[k]
+    # (its `:`), or None when there is no literal key to read.
+    opened = parents[k]
+    if opened is None or opened not in pairs:
+        return None
+    for j in range(opened + 1, pairs[opened]):
+        if (parents[j] == opened and tokens[j].kind == 'ident' and tokens[j].value == 'queryKey'
+                and _is_punct(tokens[j + 1], ':')):
+            end = _statement_end(tokens, j + 2, pairs)
+            return {t.value for t in tokens[j + 2:end + 1] if t.kind == 'ident'}
+    return None
+
+
+def find_iterations(tokens, pairs, parents):
+    """[{kind, label, start, end, parallel, retry}] token ranges that run once per item."""
+    regions = []
+    n = len(tokens)
+    for i, token in enumerate(tokens):
+        if token.kind != 'ident':
+            continue
+        if token.value in ('for', 'while') and not (i and _is_punct(tokens[i - 1], '.', '?.')):
+            j = i + 1
+            if j < n and tokens[j].kind == 'ident' and tokens[j].value == 'await':
+                j += 1
+            if j >= n or not _is_punct(tokens[j], '(') or j not in pairs:
+                continue
+            if token.value == 'while' and i and _is_punct(tokens[i - 1], '}') and (i - 1) in pairs:
+                opened = pairs[i - 1]
+                if opened and tokens[opened - 1].kind == 'ident' and tokens[opened - 1].value == 'do':
+                    continue  # the tail of a do { } while (...) loop
+            header = tokens[j + 1:pairs[j]]
+            if not any(t.kind == 'ident' and t.value in _PER_ITEM_HEADER for t in header):
+                continue
+            start, end = _body(tokens, pairs[j] + 1, pairs)
+            regions.append({
+                "kind": "loop",
+                "label": token.value,
+                "start": start,
+                "end": end,
+                "parallel": False,
+                "retry": any(t.kind == 'ident' and _RETRY_RE.search(t.value) for t in header),
+            })
+        elif (token.value in ITERATION_METHODS and i and _is_punct(tokens[i - 1], '.', '?.') and i + 1 < n
+              and _is_punct(tokens[i + 1], '(') and i + 1 in pairs):
+            close = pairs[i + 1]
+            callback = tokens[i + 2:close]
+            if not (any(_is_punct(t, '=>') or (t.kind == 'ident' and t.value == 'function') for t in callback)
+                    or len(callback) == 1 and callback[0].kind == 'ident'):  # .map(fetchOne)
+                continue
+            opened = parents[i]
+            parallel = (opened is not None and opened >= 3 and tokens[opened - 1].kind == 'ident'
+                        and tokens[opened - 1].value in ('all', 'allSettled') and tokens[opened - 3].value == 'Promise')
+            regions.append({"kind": "callback", "label": f".{token.value}()", "start": i + 1, "end": close,
+                            "parallel": parallel, "retry": False})
+    return regions
+
+
+def _innermost(ranges, index):
+    best = None
+    for item in ranges:
+        if item["start"] <= index <= item["end"] and (best is None or item["start"] >= best["start"]):
+            best = item
+    return best
+
+
+def _token_index(tokens, offset, lo=0):
+    # First token starting at or after `offset` (tokens are sorted).
+    hi = len(tokens)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if tokens[mid].start < offset:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _defers(function):
+    return (function["callee"] == '{' or function["callee"] in DEFERRING_CALLEES
+            or bool(function["name"] and _HANDLER_RE.match(function["name"])))
+
+
+def _deferred(functions, region, index):
+    """True when a function between `region` and tokens[index] only runs later."""
+    return any(region["start"] < f["start"] and f["start"] <= index <= f["end"] and _defers(f) for f in functions)
+
+
+def suggest_batch(site):
+    """How to replace one call per item with a single request."""
+    if site["kind"] == 'rpc':
+        return f"Batch into one call: give {site['function']}() an array parameter and pass every item's value"
+    columns = [f["column"] for f in site["filters"] if f["method"] in ('eq', 'match') and not f["referenced"]]
+    if site["method"] == 'insert' or site["method"] == 'upsert':
+        return f"Pass every row to a single .{site['method']}([...]) call"
+    if columns:
+        column = columns[0]
+        if site["method"] == 'update':
+            return f"Collect the rows and use one .upsert([...]) (or an RPC) instead of .update().eq('{column}', ...)"
+        return f"Query once with .in('{column}', ids) and group the rows by {column}"
+    return "Hoist the query out of the loop and fetch every item's rows in one request"
+
+
+def _bindings(clause):
+    # [(imported, local)] for `Default, { a, b as c, type T }` or `* as ns`.
+    clause = clause.strip()
+    bindings = []
+    default, _, rest = clause.partition('{') if '{' in clause else (clause, '', '')
+    default = default.strip().rstrip(',').strip()
+    if default.startswith('*'):
+        bindings.append(('*', default.split()[-1]))
+    elif default:
+        bindings.append(('default', default))
+    for part in rest.rstrip('} \n').split(','):
+        words = part.split()
+        if not words or words[0] == 'type':
+            continue
+        bindings.append((words[0], words[-1]))
+    return bindings
+
+
+def parse_imports(content):
+    """({local name: (module, imported name)}, [(module, [(name, exported as)] or None for *)], default export)."""
+    imports = {}
+    for match in _IMPORT_RE.finditer(content):
+        for imported, local in _bindings(match.group(1)):
+            imports[local] = (match.group(2), imported)
+    reexports = []
+    for match in _REEXPORT_RE.finditer(content):
+        names = None if match.group(1) == '*' else _bindings(match.group(1))
+        reexports.append((match.group(2), names))
+    default = _DEFAULT_EXPORT_RE.search(content)
+    return imports, reexports, default.group(1) if default else None
+
+
+def module_path(filepath, module, known):
+    """The scanned file an import specifier points at, or None for a package."""
+    if module.startswith('.'):
+        base = os.path.join(os.path.dirname(filepath), module)
+    else:
+        for alias, target in PATH_ALIASES:
+            if module.startswith(alias):
+                base = target + module[len(alias):]
+                break
+        else:
+            return None
+    base = os.path.normpath(base)
+    for suffix in MODULE_SUFFIXES:
+        if base + suffix in known:
+            return base + suffix
+    return None
+
+
+def scan_file(filepath, content):
+    """Query sites, named functions and per-item constructs of one file."""
+    jsx = filepath.endswith('.tsx')
+    tokens = list(tokenize(content, jsx=jsx, elements=jsx))
+    pairs, parents = match_brackets(tokens)
+    functions = find_functions(tokens, pairs, parents)
+    regions = find_iterations(tokens, pairs, parents)
+
+    sites = []
+    if '.from(' in content:
+        for chain in iter_query_chains(content, tokens=tokens):
+            sites.append({"kind": 'query', "table": chain["table"], "method": chain["kind"],
+                          "filters": chain["filters"], "range": chain["range"], "offset": chain["start"]})
+    if '.rpc(' in content:
+        for call in iter_rpc_calls(content, tokens=tokens):
+            sites.append({"kind": 'rpc', "function": call["function"], "method": 'rpc', "filters": [],
+                          "range": None, "offset": call["start"]})
+    for site in sites:
+        site["index"] = _token_index(tokens, site["offset"])
+
+    # Calls and rendered components, by token index, for the indirect checks.
+    references = []
+    for i, token in enumerate(tokens):
+        if token.kind == 'element' and token.value[:1].isupper():
+            references.append((i, token.value, 'component'))
+        elif (token.kind == 'ident' and i + 1 < len(tokens) and _is_punct(tokens[i + 1], '(')
+              and not (i and _is_punct(tokens[i - 1], '.', '?.')) and token.value not in _NOT_METHODS):
+            references.append((i, token.value, 'call'))
+        elif (token.kind == 'ident' and i and _is_punct(tokens[i - 1], '(') and i + 1 < len(tokens)
+              and _is_punct(tokens[i + 1], ')') and i - 2 >= 0 and tokens[i - 2].value in ITERATION_METHODS):
+            references.append((i, token.value, 'call'))  # items.map(fetchOne)
+
+    imports, reexports, default = parse_imports(content)
+    return {"tokens": tokens, "functions": functions, "regions": regions, "sites": sites,
+            "references": references, "imports": imports, "reexports": reexports, "default": default}
+
+
+def _eager_owners(functions, index):
+    # Named functions that reach tokens[index] whenever they run or render,
+    # innermost first. Effects and other anonymous callbacks pass through to
+    # the enclosing function; a named one only runs when something calls it,
+    # which the call graph tracks. Event handlers and timers (which batch
+    # calls) never count, nor does a queryFn whose key ignores the hook's
+    # arguments: every instance shares one cached request.
+    owners = []
+    enclosing = sorted((f for f in functions if f["start"] <= index <= f["end"]), key=lambda f: -f["start"])
+    for position, function in enumerate(enclosing):
+        if function["name"] and _HANDLER_RE.match(function["name"]) or function["callee"] == '{':
+            break
+        if not function["name"] and function["callee"] in DEFERRING_CALLEES - EFFECT_CALLEES:
+            break
+        if function["key"] is not None:
+            arguments = set().union(*(f["params"] for f in enclosing[position + 1:]))
+            if not function["key"] & arguments:
+                break
+        if function["name"]:
+            owners.append(function["name"])
+            if function["name"] not in EAGER_PROPERTIES:
+                break
+    return owners
+
+
+def query_bearers(scans):
+    """{name: [(file, site)]} for functions and components that issue a query when called or rendered.
+
+    Names resolve to a function in the same file or, through its imports
+    (and barrel re-exports), to one in another scanned file.
+    """
+    defined = {filepath: {f["name"] for f in scan["functions"] if f["name"]} for filepath, scan in scans.items()}
+
+    def exported(filepath, name, depth=0):
+        scan = scans[filepath]
+        if name == 'default':
+            return (filepath, scan["default"]) if scan["default"] in defined[filepath] else None
+        if name in defined[filepath]:
+            return filepath, name
+        if depth > 8:
+            return None
+        for module, names in scan["reexports"]:
+            target = module_path(filepath, module, scans)
+            if target is None:
+                continue
+            if names is None:
+                found = exported(target, name, depth + 1)
+                if found:
+                    return found
+            for source, alias in names or ():
+                if alias == name:
+                    return exported(target, source, depth + 1)
+        return None
+
+    def resolve(filepath, name):
+        if name in defined[filepath]:
+            return filepath, name
+        imported = scans[filepath]["imports"].get(name)
+        if imported is None:
+            return None
+        target = module_path(filepath, imported[0], scans)
+        return exported(target, imported[1]) if target else None
+
+    bearers = {}
+    calls = {}  # (file, caller) -> {(callee, kind)}
+    for filepath, scan in scans.items():
+        for site in scan["sites"]:
+            for owner in _eager_owners(scan["functions"], site["index"]):
+                bearers.setdefault((filepath, owner), (filepath, site))
+        for index, name, kind in scan["references"]:
+            for owner in _eager_owners(scan["functions"], index):
+                calls.setdefault((filepath, owner), set()).add(name)
+
+    changed = True
+    while changed:
+        changed = False
+        for (filepath, caller), names in calls.items():
+            if (filepath, caller) in bearers:
+                continue
+            for name in names:
+                target = resolve(filepath, name)
+                if target and target in bearers and target != (filepath, caller):
+                    bearers[(filepath, caller)] = bearers[target]
+                    changed = True
+                    break
+    return bearers, resolve
+
+
+def detect(files):
+    """N+1 findings over `files`: direct query sites in per-item code, then indirect ones."""
+    scans = {}
+    contents = {}
+    for filepath in files:
+        with open(filepath, 'r') as f:
+            content = f.read()
+        contents[filepath] = content
+        scans[filepath] = scan_file(filepath, content)
+    bearers, resolve = query_bearers(scans)
+
+    findings = []
+    for filepath, scan in scans.items():
+        tokens = scan["tokens"]
+        lines = None
+
+        def position(index):
+            nonlocal lines
+            lines = lines or LineIndex(contents[filepath])
+            return lines.position(tokens[index].start)
+
+        def enclosing(index):
+            named = [f for f in scan["functions"] if f["name"] and f["start"] <= index <= f["end"]]
+            return max(named, key=lambda f: f["start"])["name"] if named else None
+
+        for site in scan["sites"]:
+            region = _innermost(scan["regions"], site["index"])
+            if region is None or region["retry"] or _deferred(scan["functions"], region, site["index"]):
+                continue
+            if region["kind"] == 'loop' and site["range"] is not None:
+                continue  # paging through one result set
+            line, column = position(site["index"])
+            loop_line, _ = position(region["start"])
+            findings.append(_finding(filepath, line, column, site, region, loop_line, enclosing(site["index"])))
+
+        for index, name, kind in scan["references"]:
+            region = _innermost(scan["regions"], index)
+            if region is None or region["retry"] or _deferred(scan["functions"], region, index):
+                continue
+            target = resolve(filepath, name)
+            if target is None or target not in bearers or name == enclosing(index):
+                continue
+            origin_file, site = bearers[target]
+            line, column = position(index)
+            loop_line, _ = position(region["start"])
+            finding = _finding(filepath, line, column, site, region, loop_line, enclosing(index))
+            origin_line, _ = LineIndex(contents[origin_file]).position(site["offset"])
+            finding["via"] = {"name": name, "kind": kind, "file": origin_file, "line": origin_line}
+            findings.append(finding)
+
+    findings.sort(key=lambda f: (f["file"], f["line"], f["column"]))
+    return findings
+
+
+def _finding(filepath, line, column, site, region, loop_line, function):
+    return {
+        "file": filepath,
+        "line": line,
+        "column": column,
+        "kind": site["kind"],
+        "target": site.get("table") or site.get("function"),
+        "method": site["method"],
+        "loop": region["label"],
+        "loop_line": loop_line,
+        "parallel": region["parallel"],
+        "function": function,
+        "via": None,
+        "suggestion": suggest_batch(site),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Find Supabase queries and RPCs issued once per item: inside loops, iteration callbacks, "
+                    "or components rendered from .map().")
+    parser.add_argument('--root', default='src', help="Source tree to scan (default: src)")
+    parser.add_argument('--direct-only', action='store_true',
+                        help="Only report queries written inside the loop, not ones reached through a call "
+                             "or a rendered component")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    profiler = Profiler.from_args('n_plus_one', args)
+    with profiler.phase('walk'):
+        files = find_files(args.root)
+    with profiler.phase('analyze'):
+        findings = detect(profiler.each_file(files))
+    if args.direct_only:
+        findings = [f for f in findings if f["via"] is None]
+    with profiler.phase('report'):
+        json.dump(findings, sys.stdout, indent=2)
+        print()
+    profiler.finish()
+
+
+if __name__ == "__main__":
+    main()
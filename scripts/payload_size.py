@@ -0,0 +1,270 @@
+import argparse
+import csv
+import json
+import re
+import sys
+
+from audit_codebase import extract_query_chains, find_files
+from audit_profile import Profiler, add_arguments as add_profile_arguments
+from line_index import LineIndex
+from query_chains import parse_select
+from relations import RelationGraph
+from schema_catalog import MIGRATIONS_DIR, build_catalog, canonical_type
+
+# Rough JSON-encoded size of one value, quotes and separators included.
+TYPE_WIDTHS = {
+    'uuid': 38, 'boolean': 5, 'smallint': 4, 'integer': 6, 'serial': 6, 'bigint': 10, 'bigserial': 10,
+    'real': 8, 'double precision': 12, 'numeric': 10, 'date': 12, 'time without time zone': 10,
+    'time with time zone': 14, 'timestamp with time zone': 34, 'timestamp without time zone': 28, 'interval': 12,
+    'inet': 16, 'text': 40, 'character varying': 40, 'character': 12, 'citext': 40,
+    'json': 400, 'jsonb': 400, 'tsvector': 600, 'bytea': 200, 'geography': 60, 'geometry': 60,
+}
+ENUM_WIDTH = 14
+DEFAULT_WIDTH = 32
+# Free-text columns run far longer than names and slugs.
+LONG_TEXT_WIDTH = 400
+_LONG_TEXT_RE = re.compile(r'(?:^|_)(?:description|body|content|bio|notes?|summary|html|markdown|text|message|'
+                           r'comment|caption|transcript)(?:_|$)')
+ARRAY_ELEMENTS = 5
+
+# Rows PostgREST returns when nothing bounds the query: Supabase's default
+# max_rows.
+MAX_ROWS = 1000
+# Assumed page size when .limit()/.range() are given a variable.
+DEFAULT_PAGE_ROWS = 50
+# Assumed rows per parent for a to-many embed without its own limit.
+EMBED_FANOUT = 10
+
+
+def value_width(column, type_text, enums):
+    type_name = canonical_type(type_text)
+    array = type_name.endswith('[]')
+    base = type_name.rstrip('[]')
+    if base in enums:
+        width = ENUM_WIDTH
+    elif base in ('text', 'character varying', 'citext') and _LONG_TEXT_RE.search(column):
+        width = LONG_TEXT_WIDTH
+    else:
+        width = TYPE_WIDTHS.get(base, DEFAULT_WIDTH)
+    return width * ARRAY_ELEMENTS + 2 if array else width
+
+
+def _field(name, width):
+    # "name":value,
+    return len(name) + 4 + width
+
+
+def estimate_items(items, table_name, catalog, relations, path=()):
+    """(bytes per row, [(column path, bytes)], partial) for a parsed select on `table_name`.
+
+    Column contributions are per row of the chain's own table: an embed's
+    columns are multiplied by its fan-out.
+    """
+    table = catalog["tables"].get(table_name)
+    columns = table["columns"] if table else {}
+    partial = table is None or table["partial"]
+    total = 2  # {}
+    contributions = []
+    for item in items:
+        name = item.get("alias") or item.get("name")
+        if item["kind"] == "star":
+            for column, definition in columns.items():
+                size = _field(column, value_width(column, definition["type"], catalog["enums"]))
+                total += size
+                contributions.append((path + (column,), size))
+        elif item["kind"] == "column":
+            definition = columns.get(item["name"])
+            if item["json_path"] or item["cast"]:
+                width = DEFAULT_WIDTH
+            elif definition is not None:
+                width = value_width(item["name"], definition["type"], catalog["enums"])
+            else:
+                width = DEFAULT_WIDTH
+                partial = True
+            size = _field(name, width)
+            total += size
+            contributions.append((path + (name,), size))
+        elif item["kind"] == "aggregate":
+            total += _field(name, TYPE_WIDTHS['bigint'])
+        elif item["kind"] == "embed":
+            resolved = relations.resolve(table_name, item["name"], item["hints"])
+            target = resolved["target"]
+            inner = [i for i in item["inner"] if not (i["kind"] == "column" and i["name"] == 'count')]
+            if target is None or (not inner and item["inner"]):
+                total += _field(name, TYPE_WIDTHS['bigint'])  # embed(count) or unresolvable
+                partial = partial or target is None
+                continue
+            size, inner_contributions, inner_partial = estimate_items(inner, target, catalog, relations,
+                                                                      path + (name,))
+            fanout = EMBED_FANOUT if resolved["to_many"] else 1
+            total += _field(name, size * fanout + (2 if fanout > 1 else 0))
+            contributions.extend((p, b * fanout) for p, b in inner_contributions)
+            partial = partial or inner_partial
+    return total, contributions, partial
+
+
+def _literal_int(text):
+    return int(text) if text is not None and re.fullmatch(r'\d+', text) else None
+
+
+def chain_rows(chain, unique_keys=()):
+    """(rows per request, bounded) from .single(), .limit(), .range() and key lookups.
+
+    `.eq()` on every column of a unique key returns at most one row;
+    `.in()` on one returns at most as many rows as the caller passes ids.
+    """
+    if chain["single"]:
+        return 1, True
+    pinned = {f["column"] for f in chain["filters"] if not f["referenced"] and f["method"] in ('eq', 'is')}
+    listed = pinned | {f["column"] for f in chain["filters"] if not f["referenced"] and f["method"] == 'in'}
+    if any(set(key) <= pinned for key in unique_keys):
+        return 1, True
+    keyed = any(set(key) <= listed for key in unique_keys)
+    if chain["range"] is not None:
+        bounds = [_literal_int(b) for b in chain["range"]]
+        if len(bounds) == 2 and None not in bounds:
+            return max(bounds[1] - bounds[0] + 1, 0), True
+        return DEFAULT_PAGE_ROWS, True
+    if chain["limit"] is not None:
+        limit = _literal_int(chain["limit"])
+        return (limit if limit is not None else DEFAULT_PAGE_ROWS), True
+    if keyed:
+        return DEFAULT_PAGE_ROWS, True
+    return MAX_ROWS, False
+
+
+def unique_keys(catalog):
+    keys = {}
+    for index in catalog["indexes"].values():
+        if index["unique"] and not index["where"]:
+            keys.setdefault(index["table"], []).append(index["columns"])
+    return keys
+
+
+def estimate_chain(chain, catalog, relations, row_counts=None, large_rows=None, keys=None):
+    """Payload estimate for one select chain, or None when it cannot be sized."""
+    if chain["kind"] != 'select' or chain["head"] or chain["table"] not in catalog["tables"]:
+        return None  # writes, count-only requests, views
+    select = chain["select"]
+    if select is None:
+        value, offset = '*', 0
+    elif select["dynamic"] or select["offset"] is None and select["value"] != '*':
+        return None
+    else:
+        value, offset = select["value"], select["offset"] or 0
+    items = parse_select(value, offset)
+
+    bytes_per_row, contributions, partial = estimate_items(items, chain["table"], catalog, relations)
+    if keys is None:
+        keys = unique_keys(catalog)
+    rows, bounded = chain_rows(chain, keys.get(chain["table"], ()))
+    row_count = (row_counts or {}).get(chain["table"])
+    if row_count is not None:
+        rows = min(rows, row_count)
+
+    flags = []
+    if any(item["kind"] == "star" for item in items):
+        flags.append("select-star")
+    if not bounded:
+        large = row_count is None or large_rows is None or row_count >= large_rows
+        if large:
+            flags.append("unbounded")
+    if _has_to_many(items, chain["table"], relations):
+        flags.append("to-many-embed")
+
+    contributions.sort(key=lambda c: -c[1])
+    return {
+        "table": chain["table"],
+        "select": re.sub(r'\s+', ' ', value).strip(),
+        "rows": rows,
+        "bounded": bounded,
+        "row_count": row_count,
+        "bytes_per_row": bytes_per_row,
+        "bytes": bytes_per_row * rows,
+        "partial": partial,
+        "flags": flags,
+        "heaviest": [{"column": '.'.join(p), "bytes": b} for p, b in contributions[:5]],
+    }
+
+
+def _has_to_many(items, table_name, relations):
+    for item in items:
+        if item["kind"] != "embed":
+            continue
+        resolved = relations.resolve(table_name, item["name"], item["hints"])
+        if resolved["to_many"]:
+            return True
+        if resolved["target"] and _has_to_many(item["inner"], resolved["target"], relations):
+            return True
+    return False
+
+
+def estimate(catalog, files, row_counts=None, large_rows=None):
+    """Estimates for every sizeable chain in `files`, heaviest first."""
+    relations = RelationGraph.from_catalog(catalog)
+    keys = unique_keys(catalog)
+    report = []
+    for filepath in files:
+        with open(filepath, 'r') as f:
+            content = f.read()
+        lines = None
+        for chain in extract_query_chains(filepath, content):
+            result = estimate_chain(chain, catalog, relations, row_counts, large_rows, keys)
+            if result is None:
+                continue
+            lines = lines or LineIndex(content)
+            line, column = lines.position(chain["table_offset"])
+            report.append(dict(result, file=filepath, line=line, column=column))
+    report.sort(key=lambda r: (-r["bytes"], r["file"], r["line"]))
+    return report
+
+
+def load_row_counts(path):
+    """{table: rows} from a JSON object or a CSV with relation and approx_rows columns.
+
+    The CSV is what `psql --csv` prints for
+    `select relname as relation, reltuples::bigint as approx_rows from pg_class`.
+    """
+    with open(path, 'r') as f:
+        if path.endswith('.json'):
+            return {name: int(rows) for name, rows in json.load(f).items()}
+        return {row["relation"]: int(float(row["approx_rows"])) for row in csv.DictReader(f)}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Estimate the response size of every query chain in src and rank the heaviest call sites.")
+    parser.add_argument('--migrations', default=MIGRATIONS_DIR)
+    parser.add_argument('--root', default='src', help="Source tree to scan (default: src)")
+    parser.add_argument('--row-counts', metavar='PATH',
+                        help="Table row counts (JSON, or CSV with relation,approx_rows) to cap row estimates")
+    parser.add_argument('--large-rows', type=int, default=10000, metavar='N',
+                        help="With --row-counts, only flag unbounded chains on tables with at least N rows")
+    parser.add_argument('--flag', choices=('select-star', 'unbounded', 'to-many-embed'), action='append',
+                        help="Only report chains with this flag (repeatable)")
+    parser.add_argument('--top', type=int, metavar='N', help="Only print the N heaviest call sites")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    profiler = Profiler.from_args('payload_size', args)
+    row_counts = load_row_counts(args.row_counts) if args.row_counts else None
+    catalog_stats = {}
+    with profiler.phase('schema'):
+        catalog = build_catalog(args.migrations, stats=catalog_stats)
+    with profiler.phase('walk'):
+        files = find_files(args.root)
+    with profiler.phase('analyze'):
+        report = estimate(catalog, profiler.each_file(files), row_counts, args.large_rows)
+    if args.flag:
+        report = [r for r in report if set(r["flags"]) & set(args.flag)]
+    if args.top is not None:
+        report = report[:args.top]
+    with profiler.phase('report'):
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    profiler.catalog(catalog_stats)
+    profiler.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,512 @@
+import re
+
+from ts_lexer import tokenize
+
+# Filter methods whose first argument is a column name.
+FILTER_METHODS = frozenset((
+    'eq', 'neq', 'gt', 'gte', 'lt', 'lte', 'like', 'ilike', 'likeAllOf', 'likeAnyOf', 'ilikeAllOf', 'ilikeAnyOf',
+    'is', 'in', 'contains', 'containedBy', 'rangeGt', 'rangeGte', 'rangeLt', 'rangeLte', 'rangeAdjacent',
+    'overlaps', 'textSearch', 'not', 'filter',
+))
+
+WRITE_METHODS = frozenset(('insert', 'update', 'upsert', 'delete'))
+
+# Everything a PostgREST query builder chain can be continued with. Calls on
+# a query variable are only folded into its chain when they are one of these.
+BUILDER_METHODS = FILTER_METHODS | WRITE_METHODS | frozenset((
+    'select', 'order', 'range', 'limit', 'single', 'maybeSingle', 'match', 'or', 'csv', 'geojson', 'explain',
+    'returns', 'overrideTypes', 'abortSignal', 'throwOnError', 'rollback',
+))
+
+_OR_CONDITION_RE = re.compile(
+    r'(?:^|[,(])\s*([A-Za-z_][\w]*(?:->>?[\w\']+)*)\.(?:not\.)?'
+    r'(?:eq|neq|gt|gte|lt|lte|like|ilike|is|in|cs|cd|ov|sl|sr|nxl|nxr|adj|fts|plfts|phfts|wfts|match|imatch|isdistinct)\.')
+
+_AGGREGATES = frozenset(('count', 'sum', 'avg', 'min', 'max'))
+
+
+def string_value(arg):
+    # (text, offset of the text) for an argument that is one string literal.
+    if len(arg) == 1 and arg[0].kind == 'string':
+        return arg[0].value, arg[0].start + 1
+    return None, None
+
+
+def split_arguments(tokens, open_index):
+    """Split the call starting at tokens[open_index] == '(' into arguments.
+
+    Returns (args, close_index) where each argument is a list of tokens.
+    """
+    args = []
+    current = []
+    depth = 0
+    i = open_index
+    while i < len(tokens):
+        token = tokens[i]
+        if token.kind == 'punct':
+            if token.value in ('(', '[', '{'):
+                depth += 1
+                if depth == 1:
+                    i += 1
+                    continue
+            elif token.value in (')', ']', '}'):
+                depth -= 1
+                if depth == 0:
+                    if current:
+                        args.append(current)
+                    return args, i
+            elif token.value == ',' and depth == 1:
+                args.append(current)
+                current = []
+                i += 1
+                continue
+        current.append(token)
+        i += 1
+    if current:
+        args.append(current)
+    return args, len(tokens) - 1
+
+
+def object_keys(arg):
+    """Top-level keys of an object literal, or of each object in an array.
+
+    Returns (keys, dynamic): keys is [(name, offset)], dynamic is True when a
+    spread, computed key or non-literal value hides some of them.
+    """
+    if not arg:
+        return [], True
+    if arg[0].kind == 'punct' and arg[0].value == '[':
+        elements, _ = split_arguments([_as_paren(arg[0])] + arg[1:], 0)
+        keys = []
+        dynamic = False
+        seen = set()
+        for element in elements:
+            element_keys, element_dynamic = object_keys(element)
+            dynamic = dynamic or element_dynamic
+            for name, offset in element_keys:
+                if name not in seen:
+                    seen.add(name)
+                    keys.append((name, offset))
+        return keys, dynamic
+    if not (arg[0].kind == 'punct' and arg[0].value == '{'):
+        return [], True
+
+    keys = []
+    dynamic = False
+    depth = 0
+    expect_key = True
+    for i, token in enumerate(arg):
+        if token.kind == 'punct' and token.value in ('(', '[', '{'):
+            depth += 1
+            if depth == 2 and token.value == '[' and expect_key:
+                dynamic = True  # computed key
+            continue
+        if token.kind == 'punct' and token.value in (')', ']', '}'):
+            depth -= 1
+            continue
+        if depth != 1:
+            continue
+        if token.kind == 'punct' and token.value == ',':
+            expect_key = True
+            continue
+        if not expect_key:
+            continue
+        expect_key = False
+        if token.kind == 'punct' and token.value == '...':
+            dynamic = True
+        elif token.kind in ('ident', 'string') and i + 1 < len(arg):
+            following = arg[i + 1]
+            if following.kind == 'punct' and following.value in (':', ',', '}', '?', '('):
+                offset = token.start + 1 if token.kind == 'string' else token.start
+                keys.append((token.value, offset))
+    return keys, dynamic
+
+
+def _as_paren(token):
+    return token._replace(value='(')
+
+
+def parse_select(text, offset=0):
+    """Parse a PostgREST select string into a tree of items.
+
+    Each item is a dict with kind 'column', 'embed', 'star' or 'aggregate',
+    the column/relation name, alias, `!hint`s, and the absolute offset of the
+    name. Embeds carry their parsed inner items.
+    """
+    items, _ = _parse_select_items(text, 0, offset)
+    return items
+
+
+_SELECT_NAME_RE = re.compile(r'\s*(?:"([^"]*)"|([\w]+))')
+
+
+def _parse_select_items(text, pos, base):
+    items = []
+    length = len(text)
+    while pos < length:
+        while pos < length and text[pos] in ' \t\r\n,':
+            pos += 1
+        if pos >= length:
+            break
+        if text[pos] == ')':
+            return items, pos + 1
+
+        spread = text.startswith('...', pos)
+        if spread:
+            pos += 3
+        while pos < length and text[pos].isspace():
+            pos += 1
+        if pos < length and text[pos] == '*':
+            items.append({"kind": "star", "offset": base + pos})
+            pos += 1
+            continue
+
+        name_match = _SELECT_NAME_RE.match(text, pos)
+        if not name_match:
+            pos += 1  # unparseable character; skip it rather than loop forever
+            continue
+        name = name_match.group(1) if name_match.group(1) is not None else name_match.group(2)
+        name_offset = base + name_match.start(1 if name_match.group(1) is not None else 2)
+        pos = name_match.end()
+        alias = None
+
+        rest = text[pos:].lstrip()
+        if rest.startswith(':') and not rest.startswith('::'):
+            pos = text.index(':', pos) + 1
+            second = _SELECT_NAME_RE.match(text, pos)
+            if second:
+                alias = name
+                name = second.group(1) if second.group(1) is not None else second.group(2)
+                name_offset = base + second.start(1 if second.group(1) is not None else 2)
+                pos = second.end()
+
+        item = {"kind": "column", "name": name, "alias": alias, "offset": name_offset, "hints": [],
+                "json_path": False, "cast": None}
+
+        # Modifiers: !hint, ->json, ::cast, .aggregate()
+        while pos < length:
+            while pos < length and text[pos] in ' \t\r\n':
+                pos += 1
+            if text.startswith('!', pos):
+                hint = re.match(r'!\s*(\w+)', text[pos:])
+                if not hint:
+                    pos += 1
+                    continue
+                item["hints"].append(hint.group(1))
+                pos += hint.end()
+            elif text.startswith('->', pos):
+                path = re.match(r'->>?\s*(?:\w+|\'[^\']*\')', text[pos:])
+                item["json_path"] = True
+                pos += path.end() if path else 2
+            elif text.startswith('::', pos):
+                cast = re.match(r'::\s*(\w+(?:\[\])?)', text[pos:])
+                item["cast"] = cast.group(1) if cast else None
+                pos += cast.end() if cast else 2
+            elif text.startswith('.', pos):
+                agg = re.match(r'\.\s*(\w+)\s*\(\s*\)', text[pos:])
+                if agg:
+                    item["aggregate"] = agg.group(1)
+                pos += agg.end() if agg else 1
+            else:
+                break
+
+        if pos < length and text[pos] == '(':
+            inner_start = pos + 1
+            inner, pos = _parse_select_items(text, inner_start, base)
+            if not inner and name in _AGGREGATES and not item["hints"]:
+                item["kind"] = "aggregate"
+            else:
+                item["kind"] = "embed"
+                item["inner"] = inner
+                item["spread"] = spread
+        items.append(item)
+
+        # Skip anything unexpected up to the next separator at this level.
+        while pos < length and text[pos] not in ',)':
+            pos += 1
+    return items, pos
+
+
+def _brace_depths(tokens):
+    depths = []
+    depth = 0
+    for token in tokens:
+        if token.kind == 'punct':
+            if token.value == '{':
+                depth += 1
+            elif token.value == '}':
+                depth -= 1
+        depths.append(depth)
+    return depths
+
+
+def _is_punct(token, *values):
+    return token.kind == 'punct' and token.value in values
+
+
+def _parse_calls(tokens, i, calls, methods=None):
+    # Consume `.method(args)` links starting at tokens[i]; returns the index
+    # after the last one. TypeScript `!` and `<Generic>` are stepped over.
+    n = len(tokens)
+    while i + 2 < n and _is_punct(tokens[i], '.', '?.') and tokens[i + 1].kind == 'ident':
+        method = tokens[i + 1]
+        j = i + 2
+        if _is_punct(tokens[j], '<'):
+            angle = 0
+            while j < n:
+                if _is_punct(tokens[j], '<'):
+                    angle += 1
+                elif _is_punct(tokens[j], '>'):
+                    angle -= 1
+                    if angle == 0:
+                        break
+                elif _is_punct(tokens[j], '>>'):
+                    angle -= 2
+                    if angle <= 0:
+                        break
+                j += 1
+            j += 1
+        if j >= n or not _is_punct(tokens[j], '('):
+            break
+        if methods is not None and method.value not in methods:
+            break
+        args, close = split_arguments(tokens, j)
+        calls.append({"method": method.value, "args": args, "start": tokens[i].start, "end": tokens[close].end})
+        i = close + 1
+        while i < n and _is_punct(tokens[i], '!'):
+            i += 1
+    return i
+
+
+def _assigned_variable(tokens, receiver_index):
+    # `const query = supabase.from(...)`, `query = await client.from(...)`
+    k = receiver_index
+    while k >= 2 and _is_punct(tokens[k - 1], '.', '?.') and tokens[k - 2].kind == 'ident':
+        k -= 2
+    if k >= 1 and tokens[k - 1].kind == 'ident' and tokens[k - 1].value == 'await':
+        k -= 1
+    if k >= 2 and _is_punct(tokens[k - 1], '=') and tokens[k - 2].kind == 'ident':
+        return tokens[k - 2].value
+    return None
+
+
+def _continuation_calls(tokens, depths, variable, i, calls):
+    # Fold `query = query.eq(...)` and `query.order(...)` into the chain while
+    # still inside the block that declared the query variable.
+    base_depth = depths[i - 1] if i else 0
+    n = len(tokens)
+    while i < n:
+        if depths[i] < base_depth:
+            break
+        token = tokens[i]
+        if token.kind == 'ident' and token.value == variable and not (i and _is_punct(tokens[i - 1], '.', '?.')):
+            if i + 1 < n and _is_punct(tokens[i + 1], '='):
+                if not (i + 2 < n and tokens[i + 2].kind == 'ident' and tokens[i + 2].value == variable):
+                    break  # reassigned to something else
+                i += 2
+                continue
+            before = len(calls)
+            after = _parse_calls(tokens, i + 1, calls, BUILDER_METHODS)
+            if len(calls) > before:
+                i = after
+                continue
+        i += 1
+
+
+def iter_query_chains(content, jsx=False, tokens=None):
+    """Yield one dict per `.from('<table>')` query chain in a TS/TSX source.
+
+    Keys: table, table_offset, start, end, variable, calls, select, kind,
+    filters, order, range, limit, single, write. Offsets are absolute
+    positions in `content`.
+    """
+    if tokens is None:
+        tokens = list(tokenize(content, jsx=jsx))
+    depths = None
+    n = len(tokens)
+
+    for i in range(1, n - 3):
+        token = tokens[i]
+        if token.kind != 'ident' or token.value != 'from' or not _is_punct(tokens[i - 1], '.', '?.'):
+            continue
+        if not (_is_punct(tokens[i + 1], '(') and tokens[i + 2].kind == 'string' and _is_punct(tokens[i + 3], ')')):
+            continue
+        if i >= 2 and tokens[i - 2].kind == 'ident' and tokens[i - 2].value == 'storage':
+            continue  # supabase.storage.from('bucket') names a bucket, not a table
+
+        calls = []
+        end_index = _parse_calls(tokens, i + 4, calls)
+        variable = _assigned_variable(tokens, i - 2) if i >= 2 and tokens[i - 2].kind == 'ident' else None
+        if variable:
+            if depths is None:
+                depths = _brace_depths(tokens)
+            _continuation_calls(tokens, depths, variable, end_index, calls)
+
+        yield build_chain(tokens[i + 2], tokens[i - 1].start, tokens[end_index - 1].end, calls, variable)
+
+
+def build_chain(table_token, start, end, calls, variable=None):
+    chain = {
+        "table": table_token.value,
+        "table_offset": table_token.start + 1,
+        "start": start,
+        "end": end,
+        "variable": variable,
+        "calls": calls,
+        "select": None,
+        "kind": "select",
+        "filters": [],
+        "order": [],
+        "range": None,
+        "limit": None,
+        "single": False,
+        "head": False,
+        "write": None,
+    }
+
+    for call in calls:
+        method = call["method"]
+        args = call["args"]
+        first, first_offset = string_value(args[0]) if args else (None, None)
+
+        if method == 'select':
+            if chain["select"] is None:
+                if not args:
+                    chain["select"] = {"value": '*', "offset": None, "dynamic": False}
+                elif first is not None:
+                    chain["select"] = {"value": first, "offset": first_offset, "dynamic": False}
+                else:
+                    chain["select"] = {"value": None, "offset": args[0][0].start, "dynamic": True}
+            if len(args) > 1:
+                chain["head"] = _option_is_true(args[1], 'head')
+        elif method in WRITE_METHODS:
+            chain["kind"] = method
+            if method != 'delete':
+                keys, dynamic = object_keys(args[0]) if args else ([], True)
+                chain["write"] = {
+                    "method": method,
+                    "keys": [{"name": name, "offset": offset} for name, offset in keys],
+                    "dynamic": dynamic,
+                    "many": bool(args) and _is_punct(args[0][0], '['),
+                }
+        elif method in FILTER_METHODS:
+            if first is not None:
+                # .not('col', 'is', null) and .filter('col', 'eq', 1) name
+                # their operator in the second argument.
+                operator = string_value(args[1])[0] if method in ('not', 'filter') and len(args) > 2 else None
+                chain["filters"].append({"method": method, "column": first, "offset": first_offset,
+                                         "referenced": False, "operator": operator,
+                                         "value": sql_literal(args[-1]) if len(args) > 1 else None})
+        elif method == 'match':
+            keys, _ = object_keys(args[0]) if args else ([], True)
+            for name, offset in keys:
+                chain["filters"].append({"method": 'eq', "column": name, "offset": offset, "referenced": False,
+                                         "operator": None, "value": None})
+        elif method == 'or':
+            referenced = len(args) > 1 and _has_referenced_option(args[1])
+            if first is not None:
+                for match in _OR_CONDITION_RE.finditer(first):
+                    chain["filters"].append({"method": 'or', "column": match.group(1), "referenced": referenced,
+                                             "offset": first_offset + match.start(1), "operator": None,
+                                             "value": None})
+        elif method == 'order':
+            if first is not None:
+                chain["order"].append({
+                    "column": first,
+                    "offset": first_offset,
+                    "ascending": not (len(args) > 1 and _option_is_false(args[1], 'ascending')),
+                    "referenced": len(args) > 1 and _has_referenced_option(args[1]),
+                })
+        elif method == 'range':
+            chain["range"] = [_source_text(a) for a in args[:2]]
+        elif method == 'limit':
+            chain["limit"] = _source_text(args[0]) if args else None
+        elif method in ('single', 'maybeSingle'):
+            chain["single"] = True
+
+    return chain
+
+
+def iter_rpc_calls(content, jsx=False, tokens=None):
+    """Yield one dict per `.rpc('<function>', {args})` call in a TS/TSX source.
+
+    Keys: function, offset, start, end, args ([{name, offset}]), dynamic,
+    has_args, calls. `dynamic` is True when the argument object is not a
+    literal or hides keys behind spreads. Calls whose function name is not a
+    string literal (`rpc(name as any, ...)`) are skipped.
+    """
+    if tokens is None:
+        tokens = list(tokenize(content, jsx=jsx))
+    n = len(tokens)
+
+    for i in range(1, n - 2):
+        token = tokens[i]
+        if token.kind != 'ident' or token.value != 'rpc' or not _is_punct(tokens[i - 1], '.', '?.'):
+            continue
+        if not _is_punct(tokens[i + 1], '('):
+            continue
+        args, close = split_arguments(tokens, i + 1)
+        if not args:
+            continue
+        name = args[0]
+        # "name" as any / "name" as "name" | "other": the literal still names it.
+        if len(name) > 1 and name[1].kind == 'ident' and name[1].value == 'as':
+            name = name[:1]
+        function, offset = string_value(name)
+        if function is None:
+            continue
+
+        keys, dynamic = object_keys(args[1]) if len(args) > 1 else ([], False)
+        calls = []
+        end_index = _parse_calls(tokens, close + 1, calls)
+        yield {
+            "function": function,
+            "offset": offset,
+            "start": tokens[i - 1].start,
+            "end": tokens[end_index - 1].end,
+            "args": [{"name": key, "offset": key_offset} for key, key_offset in keys],
+            "dynamic": dynamic,
+            "has_args": len(args) > 1,
+            "calls": calls,
+        }
+
+
+def sql_literal(arg):
+    # The SQL spelling of a literal argument ('text', 42, true, null), or
+    # None when the argument is an expression.
+    if len(arg) == 1:
+        token = arg[0]
+        if token.kind == 'string':
+            return "'" + token.value.replace("'", "''") + "'"
+        if token.kind == 'number':
+            return token.value
+        if token.kind == 'ident' and token.value in ('true', 'false', 'null'):
+            return token.value
+    return None
+
+
+def _source_text(arg):
+    if len(arg) == 1 and arg[0].kind in ('number', 'string', 'ident'):
+        return arg[0].value
+    return None
+
+
+def _option(arg, name):
+    for i, token in enumerate(arg[:-2]):
+        if token.kind in ('ident', 'string') and token.value == name and _is_punct(arg[i + 1], ':'):
+            return arg[i + 2]
+    return None
+
+
+def _option_is_true(arg, name):
+    value = _option(arg, name)
+    return value is not None and value.kind == 'ident' and value.value == 'true'
+
+
+def _option_is_false(arg, name):
+    value = _option(arg, name)
+    return value is not None and value.kind == 'ident' and value.value == 'false'
+
+
+def _has_referenced_option(arg):
+    return _option(arg, 'referencedTable') is not None or _option(arg, 'foreignTable') is not None
@@ -0,0 +1,182 @@
+from schema_catalog import referenced_tables
+from suggestions import SuggestionIndex
+
+# Join modifiers share the `!` syntax with disambiguation hints.
+JOIN_HINTS = frozenset(('inner', 'left'))
+
+
+class RelationGraph:
+    """Foreign-key relationships between public tables, as PostgREST embeds them.
+
+    `resolve(origin, name, hints)` answers what `name!hint(...)` in a select
+    on `origin` embeds. Answers are memoised per (origin, name, hints), so a
+    select string costs one lookup per embed however often the same relation
+    appears across chains.
+
+    Tables flagged partial predate the migrations: their columns and foreign
+    keys are incomplete, so a missing or ambiguous relationship involving one
+    is never reported. Nor is one involving a view, whose relationships
+    PostgREST infers from the view definition, or a table in `outside`,
+    which exists but is created outside the migrations.
+    """
+
+    def __init__(self, tables, views=(), outside=()):
+        self.tables = tables
+        self.views = frozenset(views)
+        self.outside = frozenset(outside)
+        self.outgoing = {}
+        self.incoming = {}
+        for name, table in tables.items():
+            for fk in table["foreign_keys"]:
+                if fk["ref_schema"] != 'public':
+                    continue
+                self.outgoing.setdefault(name, []).append(fk)
+                self.incoming.setdefault(fk["ref_table"], []).append((name, fk))
+        self._memo = {}
+        self._suggestions = {}
+        self.lookups = 0
+
+    @classmethod
+    def from_catalog(cls, catalog, outside=None):
+        # By default, the tables the migration SQL reads but never creates.
+        if outside is None:
+            outside = referenced_tables(catalog)
+        tables = {}
+        unique = {}
+        for index in catalog["indexes"].values():
+            if index["unique"] and not index["where"]:
+                unique.setdefault(index["table"], []).append(index["columns"])
+        for name, table in catalog["tables"].items():
+            tables[name] = {
+                "foreign_keys": [
+                    {key: fk[key] for key in ("name", "columns", "ref_schema", "ref_table", "ref_columns")}
+                    for fk in table["foreign_keys"]
+                ],
+                "unique": unique.get(name, []),
+                "partial": table["partial"],
+            }
+        return cls(tables, catalog["views"], outside)
+
+    def memo_stats(self):
+        """(memo hits, lookups) for `resolve`."""
+        return self.lookups - len(self._memo), self.lookups
+
+    def relationships(self, origin, target):
+        """Every way `target` can be embedded in `origin`.
+
+        Each is {kind, fk, table, junction}, `table` owning `fk`: many-to-one
+        through an FK on origin, one-to-many through an FK on target, or
+        many-to-many through a junction table whose FKs to both are part of
+        one of its unique keys.
+        """
+        found = []
+        for fk in self.outgoing.get(origin, ()):
+            if fk["ref_table"] == target:
+                found.append({"kind": "many-to-one", "fk": fk, "table": origin, "junction": None})
+        for table, fk in self.incoming.get(origin, ()):
+            if table == target:
+                found.append({"kind": "one-to-many", "fk": fk, "table": table, "junction": None})
+        for junction, to_origin in self.incoming.get(origin, ()):
+            if junction in (origin, target):
+                continue
+            keys = self.tables[junction]["unique"]
+            for to_target in self.outgoing.get(junction, ()):
+                if to_target is to_origin or to_target["ref_table"] != target:
+                    continue
+                columns = set(to_origin["columns"]) | set(to_target["columns"])
+                if any(columns <= set(key) for key in keys):
+                    found.append({"kind": "many-to-many", "fk": to_target, "table": junction, "junction": junction})
+        return found
+
+    def resolve(self, origin, name, hints=()):
+        """What `name!hints(...)` embeds in a select on `origin`.
+
+        Returns {status, target, candidates, hint, to_many}; status is one of 'ok',
+        'unknown' (no such relationship), 'ambiguous' (several, no hint
+        picks one), 'hint' (no relationship matches `hint`) or 'opaque'
+        (the migrations cannot tell). `candidates` are the hints that would
+        pick each remaining relationship; `to_many` is True when one of them
+        embeds an array of rows rather than a single object.
+        """
+        self.lookups += 1
+        hints = tuple(h for h in hints if h not in JOIN_HINTS)
+        key = (origin, name, hints)
+        result = self._memo.get(key)
+        if result is None:
+            result = self._memo[key] = self._resolve(origin, name, hints)
+        return result
+
+    def _resolve(self, origin, name, hints):
+        if origin not in self.tables or name in self.views or (name in self.outside and name not in self.tables):
+            return _result('opaque')
+        if name in self.tables:
+            target = name
+            candidates = self.relationships(origin, target)
+        else:
+            # `owner_id(...)` embeds through the FK on that column, and
+            # `reviews_owner_id_fkey(...)` through the FK of that name.
+            candidates = [{"kind": "many-to-one", "fk": fk, "table": origin, "junction": None}
+                          for fk in self.outgoing.get(origin, ()) if name == fk["name"] or fk["columns"] == [name]]
+            candidates += [{"kind": "one-to-many", "fk": fk, "table": table, "junction": None}
+                           for table, fk in self.incoming.get(origin, ()) if fk["name"] == name]
+            target = None
+            if candidates:
+                first = candidates[0]
+                target = first["fk"]["ref_table"] if first["kind"] == 'many-to-one' else first["table"]
+        incomplete = self.tables[origin]["partial"] or (
+            target is not None and (target not in self.tables or self.tables[target]["partial"]))
+
+        for hint in hints:
+            matching = [c for c in candidates if _matches_hint(c, hint)]
+            if not matching:
+                return _result('opaque' if incomplete else 'hint', target, candidates, hint)
+            candidates = matching
+
+        if not candidates:
+            return _result('opaque' if incomplete else 'unknown', target)
+        # A self-referencing FK is both many-to-one and one-to-many; count it once.
+        if len(candidates) > 1 and not incomplete and len({_hint_for(c) for c in candidates}) > 1:
+            return _result('ambiguous', target, candidates)
+        result = _result('ok', target, candidates)
+        result["to_many"] = any(self._to_many(c) for c in candidates)
+        return result
+
+    def _to_many(self, candidate):
+        # One-to-many through a unique FK column is one-to-one: PostgREST
+        # embeds an object, not an array.
+        if candidate["kind"] == 'many-to-one':
+            return False
+        if candidate["kind"] == 'one-to-many':
+            keys = self.tables[candidate["table"]]["unique"]
+            return not any(set(key) <= set(candidate["fk"]["columns"]) for key in keys)
+        return True
+
+    def embeddable(self, origin):
+        """Names that can follow `origin` in a select: related tables and FK columns."""
+        names = {fk["ref_table"] for fk in self.outgoing.get(origin, ())}
+        names |= {fk["columns"][0] for fk in self.outgoing.get(origin, ()) if len(fk["columns"]) == 1}
+        names |= {table for table, _ in self.incoming.get(origin, ())}
+        for junction, _ in self.incoming.get(origin, ()):
+            names |= {fk["ref_table"] for fk in self.outgoing.get(junction, ())}
+        return names
+
+    def suggest(self, origin, name):
+        index = self._suggestions.get(origin)
+        if index is None:
+            index = self._suggestions[origin] = SuggestionIndex(self.embeddable(origin))
+        return index.best(name)
+
+
+def _matches_hint(candidate, hint):
+    # PostgREST accepts the FK name, the FK column or the junction table.
+    fk = candidate["fk"]
+    return hint in (fk["name"], candidate["junction"]) or fk["columns"] == [hint]
+
+
+def _hint_for(candidate):
+    return candidate["junction"] or candidate["fk"]["name"]
+
+
+def _result(status, target=None, candidates=(), hint=None):
+    return {"status": status, "target": target, "candidates": sorted({_hint_for(c) for c in candidates}),
+            "hint": hint, "to_many": None}
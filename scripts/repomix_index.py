@@ -0,0 +1,396 @@
+import argparse
+import fnmatch
+import hashlib
+import html
+import json
+import mmap
+import os
+import re
+import sys
+
+from schema_catalog import CACHE_DIR, IDENT, QNAME, parse_qname, split_statements
+
+BUNDLES = ('migrations-repomix.xml', 'repomix-code.xml', 'repomix-output.xml')
+INDEX_DIR = os.path.join(CACHE_DIR, 'repomix')
+
+# Bump whenever what gets indexed changes so stale indexes are rebuilt.
+INDEX_VERSION = 1
+
+_FILE_RE = re.compile(rb'^<file path="([^"]*)">\n', re.MULTILINE)
+_FILES_END = b'\n</files>'
+_FILE_END = b'\n</file>'
+# SQL outside .sql files: fenced blocks in docs and rules.
+_SQL_FENCE_RE = re.compile(rb'^```(?:sql|pgsql|postgres|postgresql|plpgsql)[ \t]*\n(.*?)^```', re.MULTILINE | re.DOTALL)
+
+# (kind, pattern); the first group names the object, a second the table it
+# belongs to.
+_OBJECT_RES = (
+    ('function', re.compile(r'CREATE\s+(?:OR\s+REPLACE\s+)?(?:FUNCTION|PROCEDURE)\s+(' + QNAME + r')\s*\(',
+                            re.IGNORECASE)),
+    ('table', re.compile(r'CREATE\s+(?:UNLOGGED\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(' + QNAME + r')',
+                         re.IGNORECASE)),
+    ('view', re.compile(r'CREATE\s+(?:OR\s+REPLACE\s+)?(?:MATERIALIZED\s+)?VIEW\s+(?:IF\s+NOT\s+EXISTS\s+)?('
+                        + QNAME + r')', re.IGNORECASE)),
+    ('policy', re.compile(r'CREATE\s+POLICY\s+(' + IDENT + r')\s+ON\s+(' + QNAME + r')', re.IGNORECASE)),
+)
+KINDS = tuple(kind for kind, _ in _OBJECT_RES)
+
+RULE = '=' * 66
+SUBRULE = '-' * 66
+
+_MIGRATIONS = 'supabase/migrations/*.sql'
+_SEARCH_RPCS = ('search_buildings', 'find_nearby_buildings', 'get_discovery_filters', 'get_discovery_feed',
+                'get_map_clusters', 'get_map_clusters_v2', 'get_buildings_list', 'building_matches_credit_filters',
+                'resolve_locality_for_explore')
+
+# The review extracts --extract regenerates. An extract is either `raw` (the
+# files concatenated as they are) or a list of (title, items) sections; an
+# item is a file, the latest definition of an SQL object, or a grep over the
+# files matching a glob.
+EXTRACTS = {
+    'cards-context.txt': {
+        "raw": True,
+        "items": [{"file": 'src/features/posts/components/ReviewCardFeed.tsx'},
+                  {"file": 'src/features/posts/hooks/useReviewCardData.ts'},
+                  {"file": 'src/types/feed.ts'},
+                  {"file": 'docs/DESIGN_TOKENS.md'},
+                  {"file": 'tailwind.config.ts'}],
+    },
+    'search-backend-extract.txt': {
+        "sections": [
+            ("SECTION A — All migrations touching search/discovery/map (filenames)",
+             [{"grep": r'\b(?:' + '|'.join(_SEARCH_RPCS) + r')\b', "files": _MIGRATIONS, "list": True}]),
+            ("SECTION B — Latest definition of each search RPC (full SQL body)",
+             [{"object": 'function', "name": name} for name in _SEARCH_RPCS]),
+            ("SECTION C — Indexes, extensions, tsvector, trigram",
+             [{"grep": r'(?i)CREATE\s+(?:UNIQUE\s+)?INDEX|CREATE\s+EXTENSION|tsvector|gin_trgm_ops',
+               "files": _MIGRATIONS}]),
+            ("SECTION D — Triggers that maintain search columns",
+             [{"grep": r'(?i)CREATE\s+(?:OR\s+REPLACE\s+)?TRIGGER', "files": _MIGRATIONS, "before": 1, "after": 6}]),
+            ("SECTION E — RLS SELECT policies on relevant tables",
+             [{"grep": r'(?i)CREATE\s+POLICY', "files": _MIGRATIONS, "before": 1, "after": 10}]),
+            ("SECTION F — Status / soft-delete / visibility filters in RPCs",
+             [{"grep": r'b\.is_deleted|b\.status(?:::text)?\s+IS\s+DISTINCT\s+FROM', "files": _MIGRATIONS}]),
+            ("SECTION H — Frontend search API layer",
+             [{"file": 'src/features/credits/api/companies.ts'},
+              {"file": 'src/features/credits/api/people.ts'}]),
+            ("SECTION I — SearchPage and core search components",
+             [{"file": path} for path in (
+                 'src/features/maps/components/FilterDrawer.tsx',
+                 'src/features/maps/components/BuildingSidebar.tsx',
+                 'src/features/maps/hooks/useURLMapState.ts',
+                 'src/features/maps/hooks/useMapData.ts',
+                 'src/features/search/utils/searchFilters.ts',
+                 'src/features/search/components/OmniSearchBar.tsx',
+                 'src/features/search/components/DiscoverySearchInput.tsx',
+                 'src/features/search/hooks/useBuildingSearch.ts',
+                 'src/features/search/hooks/useGlobalEntitySearch.ts',
+                 'src/features/search/SearchPage.tsx')]),
+        ],
+    },
+}
+
+
+class BundleIndex:
+    """Byte offsets of every `<file path=...>` section of a repomix bundle and
+    of the SQL objects inside them.
+
+    The index is built in one scan of the memory-mapped bundle and kept in
+    .audit-cache/repomix keyed on the bundle's size and mtime; after that,
+    reading one file or one object is a slice of the mapping.
+    """
+
+    def __init__(self, path, index_dir=INDEX_DIR):
+        self.path = path
+        self.index_dir = index_dir
+        self.files = {}    # path -> (start, end) of the section body
+        self.objects = []  # (kind, schema, name, table, path, start, end, line), in bundle order
+        self.rebuilt = False
+        self._file = None
+        self._map = None
+
+    @property
+    def index_path(self):
+        digest = hashlib.sha1(os.path.abspath(self.path).encode()).hexdigest()[:10]
+        return os.path.join(self.index_dir, f"{os.path.basename(self.path)}-{digest}.json")
+
+    def open(self, use_cache=True, rebuild=False):
+        """Map the bundle and load its stored index, building it if stale or `rebuild`."""
+        self._file = open(self.path, 'rb')
+        stat = os.fstat(self._file.fileno())
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b''
+        key = [INDEX_VERSION, stat.st_size, stat.st_mtime_ns]
+        if use_cache and not rebuild and self._load(key):
+            return self
+        self._build()
+        self.rebuilt = True
+        if use_cache:
+            self._save(key)
+        return self
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _load(self, key):
+        try:
+            with open(self.index_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("key") != key:
+            return False
+        self.files = {path: (start, end) for path, start, end in data["files"]}
+        self.objects = [tuple(entry) for entry in data["objects"]]
+        return True
+
+    def _save(self, key):
+        os.makedirs(self.index_dir, exist_ok=True)
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({"key": key, "bundle": self.path,
+                       "files": [[path, start, end] for path, (start, end) in self.files.items()],
+                       "objects": self.objects}, f)
+        os.replace(tmp, self.index_path)
+
+    def _build(self):
+        data = self._map
+        limit = data.rfind(_FILES_END)
+        limit = len(data) if limit == -1 else limit
+        matches = list(_FILE_RE.finditer(data, 0, limit))
+        self.files = {}
+        self.objects = []
+        for i, match in enumerate(matches):
+            start = match.end()
+            bound = matches[i + 1].start() if i + 1 < len(matches) else limit
+            # The closing tag is the last one before the next section, so a
+            # file that itself mentions </file> is not cut short.
+            end = data.rfind(_FILE_END, start - 1, bound)
+            end = bound if end == -1 else end
+            path = html.unescape(match.group(1).decode('utf-8'))
+            self.files[path] = (start, max(start, end))
+            self._index_objects(path, start, max(start, end))
+
+    def _index_objects(self, path, start, end):
+        data = self._map
+        if path.endswith('.sql'):
+            regions = [(start, end)]
+        else:
+            regions = [fence.span(1) for fence in _SQL_FENCE_RE.finditer(data, start, end)]
+        for region_start, region_end in regions:
+            sql = data[region_start:region_end].decode('utf-8', errors='replace')
+            for offset, text in split_statements(sql):
+                for kind, pattern in _OBJECT_RES:
+                    match = pattern.match(text)
+                    if not match:
+                        continue
+                    schema, name = parse_qname(match.group(1))
+                    table = parse_qname(match.group(2))[1] if pattern.groups > 1 else None
+                    stmt_start = region_start + len(sql[:offset].encode('utf-8'))
+                    stmt_end = stmt_start + len(text.encode('utf-8'))
+                    line = data[start:stmt_start].count(b'\n') + 1
+                    self.objects.append((kind, schema, name, table, path, stmt_start, stmt_end, line))
+                    break
+
+    def read(self, start, end):
+        return self._map[start:end].decode('utf-8', errors='replace')
+
+    def file(self, path):
+        """Contents of `path` as bundled, or None."""
+        span = self.files.get(path)
+        return None if span is None else self.read(*span)
+
+    def glob(self, pattern):
+        return [path for path in self.files if fnmatch.fnmatchcase(path, pattern)]
+
+    def find_objects(self, kind=None, name=None, table=None):
+        """Objects matching every given filter; `name` may be schema-qualified."""
+        schema = None
+        if name is not None:
+            schema, name = parse_qname(name)
+        table = parse_qname(table)[1] if table is not None else None
+        return [obj for obj in self.objects
+                if (kind is None or obj[0] == kind) and (name is None or obj[2] == name)
+                and (schema is None or (obj[1] or 'public') == schema) and (table is None or obj[3] == table)]
+
+
+def open_bundles(paths, index_dir=INDEX_DIR, rebuild=False):
+    return [BundleIndex(path, index_dir).open(rebuild=rebuild) for path in paths]
+
+
+def find_file(bundles, path):
+    """(bundle, contents) from the first bundle that has `path`, or (None, None)."""
+    for bundle in bundles:
+        content = bundle.file(path)
+        if content is not None:
+            return bundle, content
+    return None, None
+
+
+def latest_object(bundles, kind, name):
+    """(bundle, object) for the last definition of `name` across `bundles`, or (None, None).
+
+    Later bundles win, and within one bundle the later section does; repomix
+    keeps supabase/migrations in lexical order, so that is the newest migration.
+    """
+    for bundle in reversed(bundles):
+        found = bundle.find_objects(kind, name)
+        if found:
+            return bundle, found[-1]
+    return None, None
+
+
+def grep(bundles, pattern, files, before=0, after=0, list_only=False):
+    """Lines of `grep -n` output (or of `grep -l` with `list_only`) over the bundled `files`."""
+    regex = re.compile(pattern)
+    out = []
+    seen = set()
+    for bundle in bundles:
+        for path in bundle.glob(files):
+            if path in seen:
+                continue
+            seen.add(path)
+            lines = bundle.file(path).split('\n')
+            hits = [i for i, line in enumerate(lines) if regex.search(line)]
+            if not hits:
+                continue
+            if list_only:
+                out.append(path)
+                continue
+            shown = -1
+            for i in hits:
+                first = max(i - before, shown + 1)
+                if (before or after) and out and first > shown + 1:
+                    out.append('--')
+                for j in range(first, min(i + after, len(lines) - 1) + 1):
+                    out.append(f"{path}{':' if j in hits else '-'}{j + 1}{':' if j in hits else '-'}{lines[j]}")
+                shown = max(shown, min(i + after, len(lines) - 1))
+    return out
+
+
+def render_extract(bundles, spec):
+    """(text, missing) for one EXTRACTS entry; `missing` lists items no bundle has."""
+    out = []
+    missing = []
+    if spec.get("raw"):
+        for item in spec["items"]:
+            _, content = find_file(bundles, item["file"])
+            if content is None:
+                missing.append(f"file {item['file']}")
+                continue
+            out.append(content)
+        return '\n'.join(out) + '\n', missing
+
+    for title, items in spec["sections"]:
+        out += [RULE, title, RULE]
+        for item in items:
+            if "file" in item:
+                _, content = find_file(bundles, item["file"])
+                if content is None:
+                    missing.append(f"file {item['file']}")
+                    continue
+                out += ['', SUBRULE, f"FILE: {item['file']}", SUBRULE, content]
+            elif "object" in item:
+                bundle, obj = latest_object(bundles, item["object"], item["name"])
+                if obj is None:
+                    missing.append(f"{item['object']} {item['name']}")
+                    continue
+                kind, _, name, _, path, start, end, _ = obj
+                out += ['', SUBRULE, f"{kind.upper()}: {name}", SUBRULE, f"FILE: {path}", bundle.read(start, end)]
+            else:
+                lines = grep(bundles, item["grep"], item["files"], item.get("before", 0), item.get("after", 0),
+                             item.get("list", False))
+                if not lines:
+                    missing.append(f"grep {item['grep']!r} in {item['files']}")
+                out += lines
+        out.append('')
+    return '\n'.join(out) + '\n', missing
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Index repomix bundles once, then pull single files, SQL objects or the review extracts "
+                    "out of them without rescanning.")
+    parser.add_argument('--bundle', action='append', metavar='PATH',
+                        help="Bundle to read, repeatable; later bundles win for objects "
+                             f"(default: {', '.join(BUNDLES)} if present)")
+    parser.add_argument('--index-dir', default=INDEX_DIR)
+    parser.add_argument('--rebuild', action='store_true', help="Ignore and rewrite the stored indexes")
+    parser.add_argument('--list', nargs='?', const='*', metavar='GLOB', help="List bundled file paths")
+    parser.add_argument('--file', action='append', metavar='PATH', help="Print a bundled file, repeatable")
+    parser.add_argument('--objects', action='store_true', help="List indexed SQL objects as JSON")
+    parser.add_argument('--object', action='append', metavar='NAME',
+                        help="Print the latest definition of an SQL object, repeatable")
+    parser.add_argument('--kind', choices=KINDS, help="Only this kind of object for --objects and --object")
+    parser.add_argument('--all', action='store_true', help="With --object, print every definition, oldest first")
+    parser.add_argument('--extract', nargs='*', metavar='NAME', choices=sorted(EXTRACTS),
+                        help="Regenerate these review extracts (default: all of them)")
+    parser.add_argument('--out-dir', default='.', help="Where --extract writes (default: .)")
+    parser.add_argument('--force', action='store_true',
+                        help="Write an extract even when some of its items are in no bundle; without it such an "
+                             "extract is left as it is and the exit status is 1")
+    args = parser.parse_args()
+
+    paths = args.bundle or [path for path in BUNDLES if os.path.exists(path)]
+    if not paths:
+        sys.exit("No repomix bundles found; pass --bundle")
+    bundles = open_bundles(paths, args.index_dir, args.rebuild)
+    status = 0
+    try:
+        if args.list is not None:
+            for path in sorted({path for bundle in bundles for path in bundle.glob(args.list)}):
+                print(path)
+        for path in args.file or ():
+            _, content = find_file(bundles, path)
+            if content is None:
+                print(f"{path}: not in any bundle", file=sys.stderr)
+                status = 1
+                continue
+            sys.stdout.write(content + '\n')
+        if args.objects:
+            json.dump([{"bundle": bundle.path, "kind": kind, "schema": schema, "name": name, "table": table,
+                        "file": path, "line": line}
+                       for bundle in bundles
+                       for kind, schema, name, table, path, _, _, line in bundle.find_objects(args.kind)],
+                      sys.stdout, indent=2)
+            print()
+        for name in args.object or ():
+            if args.all:
+                found = [(bundle, obj) for bundle in bundles for obj in bundle.find_objects(args.kind, name)]
+            else:
+                found = [latest for latest in [latest_object(bundles, args.kind, name)] if latest[1] is not None]
+            if not found:
+                print(f"{name}: no such object in any bundle", file=sys.stderr)
+                status = 1
+            for bundle, (kind, _, _, _, path, start, end, line) in found:
+                print(f"-- {kind} from {path}:{line} ({bundle.path})")
+                print(bundle.read(start, end))
+        if args.extract is not None:
+            os.makedirs(args.out_dir, exist_ok=True)
+            for name in args.extract or sorted(EXTRACTS):
+                text, missing = render_extract(bundles, EXTRACTS[name])
+                for item in missing:
+                    print(f"{name}: {item} not in any bundle", file=sys.stderr)
+                if missing and not args.force:
+                    # The checked-in extract would lose those items.
+                    print(f"{name}: not written ({len(missing)} missing; --force writes it anyway)", file=sys.stderr)
+                    status = 1
+                    continue
+                with open(os.path.join(args.out_dir, name), 'w') as f:
+                    f.write(text)
+    finally:
+        for bundle in bundles:
+            bundle.close()
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import json
+import re
+
+SARIF_SCHEMA = 'https://json.schemastore.org/sarif-2.1.0.json'
+
+# Rule ids for code scanning, keyed by how `describe_discrepancy` and the
+# table check word each finding.
+RULES = (
+    ('invalid-table', re.compile(r"Invalid table reference: '([^']*)'"), "Query on a table the schema does not have"),
+    ('invalid-column', re.compile(r"Invalid column '[^']*' on table '([^']*)'"), "Column missing from the table"),
+    ('invalid-embed', re.compile(r"Invalid embedded resource '[^']*' on table '([^']*)'"),
+     "Embedded resource with no relationship to the table"),
+    ('ambiguous-embed', re.compile(r"Ambiguous embedded resource '[^']*' on table '([^']*)'"),
+     "Embedded resource reachable through several foreign keys"),
+    ('invalid-hint', re.compile(r"Invalid hint '[^']*' for embedded resource '[^']*' on table '([^']*)'"),
+     "Embed hint that matches no relationship"),
+    ('invalid-function', re.compile(r"Invalid function reference: '([^']*)'"), "RPC to a function the schema does not have"),
+    ('invalid-argument', re.compile(r"Invalid argument '[^']*' for function '([^']*)'"), "RPC argument the function does not take"),
+    ('missing-argument', re.compile(r"Missing argument '[^']*' for function '([^']*)'"), "RPC without a required argument"),
+)
+
+
+def classify(finding):
+    """(rule id, table or function name) for one finding."""
+    for rule, pattern, _ in RULES:
+        match = pattern.match(finding["error"])
+        if match:
+            return rule, match.group(1)
+    return 'schema-reference', None
+
+
+class JsonWriter:
+    """The audit's original report: one indented JSON array, written element by element."""
+
+    def __init__(self, out):
+        self.out = out
+        self.count = 0
+
+    def write(self, finding):
+        body = json.dumps(finding, indent=2).replace('\n', '\n  ')
+        self.out.write(('[\n  ' if self.count == 0 else ',\n  ') + body)
+        self.count += 1
+
+    def close(self):
+        self.out.write('\n]\n' if self.count else '[]\n')
+        self.out.flush()
+
+
+class NdjsonWriter:
+    """One finding per line, flushed as it is found."""
+
+    def __init__(self, out):
+        self.out = out
+
+    def write(self, finding):
+        self.out.write(json.dumps(finding) + '\n')
+        self.out.flush()
+
+    def close(self):
+        self.out.flush()
+
+
+class SarifWriter:
+    """A SARIF 2.1.0 log for code-scanning upload.
+
+    Results are streamed; the rule list, which only names rules that fired,
+    follows them in the same run object once the last finding is in.
+    """
+
+    def __init__(self, out, tool='audit_codebase'):
+        self.out = out
+        self.tool = tool
+        self.count = 0
+        self.rules = []
+        self.out.write('{"$schema":' + json.dumps(SARIF_SCHEMA) + ',"version":"2.1.0","runs":[{"results":[')
+
+    def write(self, finding):
+        rule, _ = classify(finding)
+        if rule not in self.rules:
+            self.rules.append(rule)
+        result = {
+            "ruleId": rule,
+            "ruleIndex": self.rules.index(rule),
+            "level": "error",
+            "message": {"text": f"{finding['error']}. {finding['fix']}."},
+            "locations": [{"physicalLocation": {
+                "artifactLocation": {"uri": finding["file"], "uriBaseId": "%SRCROOT%"},
+                "region": {"startLine": finding["line"], "startColumn": finding["column"]},
+            }}],
+        }
+        self.out.write((',' if self.count else '') + '\n' + json.dumps(result))
+        self.count += 1
+
+    def close(self):
+        descriptions = {rule: text for rule, _, text in RULES}
+        rules = [{"id": rule, "shortDescription": {"text": descriptions.get(rule, "Invalid schema reference")}}
+                 for rule in self.rules]
+        driver = {"name": self.tool, "rules": rules}
+        self.out.write('\n],"tool":' + json.dumps({"driver": driver}) + '}]}\n')
+        self.out.flush()
+
+
+class SummaryWriter:
+    """Counts by rule, table (or function) and file; no finding is kept."""
+
+    def __init__(self, out):
+        self.out = out
+        self.total = 0
+        self.rules = {}
+        self.tables = {}
+        self.files = {}
+
+    def write(self, finding):
+        rule, name = classify(finding)
+        self.total += 1
+        self.rules[rule] = self.rules.get(rule, 0) + 1
+        if name is not None:
+            self.tables[name] = self.tables.get(name, 0) + 1
+        self.files[finding["file"]] = self.files.get(finding["file"], 0) + 1
+
+    def close(self):
+        def ranked(counts):
+            return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+        json.dump({"findings": self.total, "rules": ranked(self.rules), "tables": ranked(self.tables),
+                   "files": ranked(self.files)}, self.out, indent=2)
+        self.out.write('\n')
+        self.out.flush()
+
+
+WRITERS = {'json': JsonWriter, 'ndjson': NdjsonWriter, 'sarif': SarifWriter, 'summary': SummaryWriter}
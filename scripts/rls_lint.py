@@ -0,0 +1,247 @@
+import argparse
+import json
+import re
+import sys
+
+from audit_profile import Profiler, add_arguments as add_profile_arguments
+from schema_catalog import IDENT, MIGRATIONS_DIR, build_catalog, matching_paren, normalize_ident, parse_qname
+
+# See .agents/skills/supabase-postgres-best-practices/references/security-rls-performance.md
+SEVERITIES = ('info', 'warning', 'error')
+
+RULES = {
+    "auth-function-per-row": (
+        'error', "Wrap {call} as (select {call}) so Postgres evaluates it once per statement instead of per row"),
+    "security-definer-per-row": (
+        'warning', "SECURITY DEFINER function {call} is called per row{hint}"),
+    "unindexed-subquery": (
+        'warning', "Subquery on {table} filters on {columns}, which no index leads with"),
+    "unindexed-policy-column": (
+        'info', "Policy compares {table}.{column} with the current user, but no index leads with it"),
+}
+
+# Per-statement values that Postgres re-evaluates for every row unless the
+# call sits in an initPlan, i.e. is wrapped in a scalar (select ...).
+_AUTH_CALL_RE = re.compile(r'\b(auth\s*\.\s*(?:uid|jwt|role|email)|current_setting)\s*\(', re.IGNORECASE)
+_CALL_RE = re.compile(r'(?:(' + IDENT + r')\s*\.\s*)?(' + IDENT + r')\s*\(')
+_SUBQUERY_RE = re.compile(r'\(\s*SELECT\b', re.IGNORECASE)
+_FROM_RE = re.compile(r'\b(?:FROM|JOIN)\s+(' + IDENT + r'(?:\s*\.\s*' + IDENT + r')?)(?:\s+(?:AS\s+)?(?!(?:WHERE|JOIN|'
+                      r'INNER|LEFT|RIGHT|FULL|CROSS|ON|USING|LIMIT|GROUP|ORDER)\b)(' + IDENT + r'))?', re.IGNORECASE)
+_CONDITION_RE = re.compile(r'(?<![\w.])(?:(' + IDENT + r')\s*\.\s*)?(' + IDENT + r')\s*(?:=|\bIN\b)', re.IGNORECASE)
+_USER_COMPARISON_RE = re.compile(
+    r'(?<![\w.])(\w+)\s*=\s*\(?\s*(?:SELECT\s+)?auth\s*\.\s*uid\s*\(\s*\)|'
+    r'auth\s*\.\s*uid\s*\(\s*\)\s*\)?\s*=\s*(\w+)\b', re.IGNORECASE)
+_SCALAR_UID_RE = re.compile(r'\s*SELECT\s+auth\s*\.\s*uid\s*\(\s*\)\s*(?:AS\s+\w+\s*)?$', re.IGNORECASE)
+_KEYWORDS = frozenset((
+    'select', 'exists', 'in', 'any', 'all', 'not', 'and', 'or', 'coalesce', 'nullif', 'greatest', 'least', 'array',
+    'cast', 'case', 'when', 'then', 'else', 'values', 'row', 'filter', 'over',
+))
+
+
+def _blank_strings(expr):
+    # Keep offsets but hide string literal contents from the patterns.
+    return re.sub(r"'(?:[^']|'')*'", lambda m: "'" + ' ' * (len(m.group(0)) - 2) + "'", expr)
+
+
+def _is_wrapped(expr, start, end):
+    # True for (select <call>) and (select <call> as alias).
+    before = expr[:start].rstrip()
+    if not before.lower().endswith('select'):
+        return False
+    if not before[:-6].rstrip().endswith('('):
+        return False
+    return re.match(r'\s*(?:AS\s+\w+\s*)?\)', expr[end:], re.IGNORECASE) is not None
+
+
+def _leading_index_columns(catalog):
+    leading = {}
+    for index in catalog["indexes"].values():
+        if index["columns"]:
+            leading.setdefault(index["table"], set()).add(index["columns"][0])
+    return leading
+
+
+def _security_definer_functions(catalog):
+    return {name for name, overloads in catalog["functions"].items()
+            if any(o["security_definer"] for o in overloads.values())}
+
+
+def _subqueries(expr):
+    """[(start, end, text)] for every (SELECT ...) group, nested ones included."""
+    groups = []
+    for match in _SUBQUERY_RE.finditer(expr):
+        close = matching_paren(expr, match.start())
+        end = close if close != -1 else len(expr)
+        groups.append((match.start(), end, expr[match.start() + 1:end]))
+    return groups
+
+
+def lint_expression(catalog, table_name, expr, context, definer_functions, leading):
+    """Findings for one USING or WITH CHECK expression."""
+    findings = []
+    table = catalog["tables"][table_name]
+    scan = _blank_strings(expr)
+
+    for match in _AUTH_CALL_RE.finditer(scan):
+        close = matching_paren(scan, match.end() - 1)
+        end = close + 1 if close != -1 else len(scan)
+        if not _is_wrapped(scan, match.start(), end):
+            findings.append(_finding("auth-function-per-row", context, call=re.sub(r'\s+', '', expr[match.start():end])))
+
+    for match in _CALL_RE.finditer(scan):
+        schema = normalize_ident(match.group(1)) if match.group(1) else None
+        name = normalize_ident(match.group(2))
+        if schema not in (None, 'public') or name not in definer_functions:
+            continue
+        close = matching_paren(scan, match.end() - 1)
+        end = close + 1 if close != -1 else len(scan)
+        if _is_wrapped(scan, match.start(), end):
+            continue
+        arguments = scan[match.end():end - 1]
+        row_columns = sorted({w for w in re.findall(r'(?<![\w.])([a-z_]\w*)\b(?!\s*[.(])', arguments)
+                              if w in table["columns"]})
+        hint = (f"; it takes row values ({', '.join(row_columns)}), so prefer a set-based check such as "
+                f"col IN (select ...) over an indexed table" if row_columns
+                else "; wrap it as (select ...) so it runs once per statement")
+        findings.append(_finding("security-definer-per-row", context, call=expr[match.start():end], hint=hint))
+
+    for start, end, subquery in _subqueries(scan):
+        aliases = {}
+        for source in _FROM_RE.finditer(subquery):
+            schema, source_table = parse_qname(source.group(1))
+            if schema not in (None, 'public') or source_table not in catalog["tables"]:
+                continue
+            aliases[source_table] = source_table
+            if source.group(2):
+                aliases[normalize_ident(source.group(2))] = source_table
+        if not aliases:
+            continue
+        where = re.search(r'\b(?:WHERE|ON)\b(.*)$', subquery, re.IGNORECASE | re.DOTALL)
+        if not where:
+            continue
+        filtered = {}
+        for condition in _CONDITION_RE.finditer(where.group(1)):
+            qualifier = normalize_ident(condition.group(1)) if condition.group(1) else None
+            column = normalize_ident(condition.group(2))
+            if column in _KEYWORDS:
+                continue
+            if qualifier:
+                source_table = aliases.get(qualifier)
+            else:
+                candidates = [t for t in set(aliases.values()) if column in catalog["tables"][t]["columns"]]
+                source_table = candidates[0] if len(candidates) == 1 else None
+            if source_table and column in catalog["tables"][source_table]["columns"]:
+                filtered.setdefault(source_table, []).append(column)
+        for source_table, columns in sorted(filtered.items()):
+            # Indexes of tables that predate the migrations are unknown.
+            if catalog["tables"][source_table]["partial"]:
+                continue
+            if not leading.get(source_table, set()) & set(columns):
+                findings.append(_finding("unindexed-subquery", context, table=source_table,
+                                         columns=', '.join(sorted(set(columns)))))
+
+    # Comparisons on the policy table itself, outside any subquery other than
+    # the (select auth.uid()) wrapper.
+    outer = scan
+    for start, end, subquery in reversed(_subqueries(scan)):
+        if not _SCALAR_UID_RE.match(subquery):
+            outer = outer[:start] + ' ' * (end - start) + outer[end:]
+    for match in _USER_COMPARISON_RE.finditer(outer):
+        column = normalize_ident(match.group(1) or match.group(2))
+        if table["partial"]:
+            break
+        if column in table["columns"] and column not in leading.get(table_name, set()):
+            findings.append(_finding("unindexed-policy-column", context, table=table_name, column=column))
+    return findings
+
+
+def _finding(rule, context, **details):
+    severity, message = RULES[rule]
+    finding = dict(context)
+    finding.update({
+        "rule": rule,
+        "severity": severity,
+        "message": message.format(**details),
+        "detail": details.get("call") or details.get("columns") or details.get("column"),
+    })
+    return finding
+
+
+def lint_catalog(catalog):
+    """Lint the policies in force after the last migration."""
+    definer_functions = _security_definer_functions(catalog)
+    leading = _leading_index_columns(catalog)
+    findings = []
+    for table_name, table in sorted(catalog["tables"].items()):
+        for policy_name, policy in sorted(table["policies"].items()):
+            for clause in ("using", "with_check"):
+                if not policy[clause]:
+                    continue
+                context = {
+                    "table": table_name,
+                    "policy": policy_name,
+                    "command": policy["command"],
+                    "clause": clause,
+                    "file": policy["file"],
+                    "line": policy["line"],
+                }
+                findings.extend(lint_expression(catalog, table_name, policy[clause], context, definer_functions,
+                                                leading))
+    return _dedupe(findings)
+
+
+def _dedupe(findings):
+    # The same call in USING and WITH CHECK is one problem, reported once.
+    seen = set()
+    unique = []
+    for finding in findings:
+        key = baseline_key(finding)
+        if key not in seen:
+            seen.add(key)
+            unique.append(finding)
+    return unique
+
+
+def baseline_key(finding):
+    return finding["rule"], finding["table"], finding["policy"], finding["detail"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lint the effective RLS policies in supabase/migrations for "
+                                                 "per-row evaluation and unindexed lookups.")
+    parser.add_argument('--migrations', default=MIGRATIONS_DIR)
+    parser.add_argument('--baseline', metavar='PATH',
+                        help="JSON output of an earlier run; findings already in it are not reported")
+    parser.add_argument('--fail-on', choices=SEVERITIES + ('never',), default='error',
+                        help="Exit 1 when a finding of at least this severity remains (default: error)")
+    parser.add_argument('--rule', choices=sorted(RULES), action='append', help="Only run this rule (repeatable)")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    profiler = Profiler.from_args('rls_lint', args)
+    catalog_stats = {}
+    with profiler.phase('schema'):
+        catalog = build_catalog(args.migrations, stats=catalog_stats)
+    with profiler.phase('analyze'):
+        findings = lint_catalog(catalog)
+    if args.rule:
+        findings = [f for f in findings if f["rule"] in args.rule]
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            known = {baseline_key(finding) for finding in json.load(f)}
+        findings = [f for f in findings if baseline_key(f) not in known]
+
+    with profiler.phase('report'):
+        json.dump(findings, sys.stdout, indent=2)
+        print()
+    profiler.catalog(catalog_stats)
+    profiler.finish()
+
+    if args.fail_on != 'never':
+        threshold = SEVERITIES.index(args.fail_on)
+        if any(SEVERITIES.index(f["severity"]) >= threshold for f in findings):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
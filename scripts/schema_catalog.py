@@ -0,0 +1,1346 @@
+import hashlib
+import json
+import os
+import re
+import sys
+
+from line_index import LineIndex
+
+MIGRATIONS_DIR = 'supabase/migrations'
+CACHE_DIR = '.audit-cache'
+
+# Bump whenever the replay logic changes so stale checkpoints are ignored.
+CATALOG_VERSION = 8
+
+# A snapshot is written every N migrations (and after the last one). Keeping
+# one per migration would cost ~50 MB of JSON for the whole history; a new
+# migration still only replays the files after the newest checkpoint.
+CHECKPOINT_INTERVAL = 16
+
+IDENT = r'(?:"[^"]+"|[A-Za-z_][\w$]*)'
+QNAME = IDENT + r'(?:\s*\.\s*' + IDENT + r')?'
+
+# Everything the splitter has to step over: comments, quoted strings and
+# identifiers, dollar-quoted bodies, and the statement terminator itself.
+_SPLIT_RE = re.compile(r"--|/\*|[Ee]'|'|\"|\$(?:[A-Za-z_]\w*)?\$|;")
+
+_TRACKED_SCHEMAS = (None, 'public')
+
+# What the Supabase CLI applies: `<version>_<name>.sql`, in lexical order.
+# Anything else in supabase/migrations (README.md, seed files) is ignored.
+MIGRATION_NAME_RE = re.compile(r'^(\d+)_(.+)\.sql$')
+
+
+def list_migrations(migrations_dir=MIGRATIONS_DIR):
+    # The files the Supabase CLI applies, in its order.
+    return sorted(f for f in os.listdir(migrations_dir) if MIGRATION_NAME_RE.match(f))
+
+
+def split_statements(sql):
+    """Split SQL into statements, returning [(offset, text), ...].
+
+    Comments are blanked out with spaces (newlines are kept) so offsets into
+    `text` still line up with the original file.
+    """
+    statements = []
+    out = []
+    pos = 0
+    stmt_start = 0
+    length = len(sql)
+
+    while pos < length:
+        match = _SPLIT_RE.search(sql, pos)
+        if not match:
+            out.append(sql[pos:])
+            break
+        token = match.group(0)
+        start = match.start()
+        out.append(sql[pos:start])
+
+        if token == ';':
+            out.append(';')
+            _push_statement(statements, stmt_start, ''.join(out))
+            out = []
+            pos = stmt_start = match.end()
+            continue
+
+        if token == '--':
+            end = sql.find('\n', start)
+            end = length if end == -1 else end
+            out.append(' ' * (end - start))
+        elif token == '/*':
+            end = _block_comment_end(sql, start)
+            out.append(re.sub(r'[^\n]', ' ', sql[start:end]))
+        elif token in ("'", "E'", "e'"):
+            # E'' strings honour backslash escapes; only treat the E as a
+            # prefix when it is not the tail of an identifier.
+            escapes = token != "'" and (start == 0 or not (sql[start - 1].isalnum() or sql[start - 1] == '_'))
+            if token != "'" and not escapes:
+                out.append(token[0])
+                start += 1
+            end = _string_end(sql, start + 1, "'", escapes)
+            out.append(sql[start:end])
+        elif token == '"':
+            end = _string_end(sql, start + 1, '"', False)
+            out.append(sql[start:end])
+        else:
+            # Dollar-quoted body: $$ ... $$ or $tag$ ... $tag$
+            close = sql.find(token, match.end())
+            end = length if close == -1 else close + len(token)
+            out.append(sql[start:end])
+        pos = end
+
+    _push_statement(statements, stmt_start, ''.join(out))
+    return statements
+
+
+def _push_statement(statements, offset, text):
+    stripped = text.lstrip()
+    if stripped.rstrip(' \t\r\n;'):
+        statements.append((offset + len(text) - len(stripped), stripped.rstrip()))
+
+
+def _block_comment_end(sql, start):
+    # Postgres block comments nest.
+    depth = 0
+    pos = start
+    while pos < len(sql):
+        if sql.startswith('/*', pos):
+            depth += 1
+            pos += 2
+        elif sql.startswith('*/', pos):
+            depth -= 1
+            pos += 2
+            if depth == 0:
+                return pos
+        else:
+            pos += 1
+    return len(sql)
+
+
+def _string_end(sql, pos, quote, escapes):
+    while pos < len(sql):
+        char = sql[pos]
+        if escapes and char == '\\':
+            pos += 2
+            continue
+        if char == quote:
+            if sql.startswith(quote, pos + 1):
+                pos += 2
+                continue
+            return pos + 1
+        pos += 1
+    return len(sql)
+
+
+def split_top_level(text, sep=','):
+    """Split on `sep` outside parentheses, brackets and quotes."""
+    parts = []
+    depth = 0
+    current = []
+    pos = 0
+    while pos < len(text):
+        char = text[pos]
+        if char in "'\"":
+            end = _string_end(text, pos + 1, char, False)
+            current.append(text[pos:end])
+            pos = end
+            continue
+        if char == '$':
+            tag = re.match(r'\$(?:[A-Za-z_]\w*)?\$', text[pos:])
+            if tag:
+                close = text.find(tag.group(0), pos + len(tag.group(0)))
+                end = len(text) if close == -1 else close + len(tag.group(0))
+                current.append(text[pos:end])
+                pos = end
+                continue
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == sep and depth == 0:
+            parts.append(''.join(current).strip())
+            current = []
+            pos += 1
+            continue
+        current.append(char)
+        pos += 1
+    tail = ''.join(current).strip()
+    if tail:
+        parts.append(tail)
+    return parts
+
+
+def matching_paren(text, open_index):
+    # Index of the ')' closing the '(' at open_index, or -1.
+    depth = 0
+    pos = open_index
+    while pos < len(text):
+        char = text[pos]
+        if char in "'\"":
+            pos = _string_end(text, pos + 1, char, False)
+            continue
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0:
+                return pos
+        pos += 1
+    return -1
+
+
+def normalize_ident(ident):
+    ident = ident.strip()
+    if ident.startswith('"') and ident.endswith('"'):
+        return ident[1:-1]
+    return ident.lower()
+
+
+def parse_qname(text):
+    # "public"."Foo" -> ('public', 'Foo'); bar -> (None, 'bar')
+    parts = re.findall(IDENT, text)
+    if len(parts) >= 2:
+        return normalize_ident(parts[0]), normalize_ident(parts[1])
+    return None, normalize_ident(parts[0])
+
+
+def normalize_type(type_text):
+    type_text = re.sub(r'\s+', ' ', type_text.strip()).lower()
+    type_text = re.sub(r'^"?public"?\.', '', type_text)
+    return type_text.replace('"', '')
+
+
+def new_catalog():
+    return {
+        "version": CATALOG_VERSION,
+        "key": None,
+        "migrations": 0,
+        "tables": {},
+        "indexes": {},
+        "enums": {},
+        "views": {},
+        # {name: {argument types ("uuid, integer"): overload}}
+        "functions": {},
+        # {relation: first migration} for every public table or view any
+        # statement reads or writes, created by the migrations or not.
+        "referenced": {},
+        # {function: first migration} for every public function a GRANT,
+        # REVOKE, COMMENT or ALTER names.
+        "referenced_functions": {},
+        # {table: first migration} for every CREATE TEMP[ORARY] TABLE, at
+        # the top level or inside a function body: session-local, never
+        # part of the schema however often the SQL reads it.
+        "temporary": {},
+    }
+
+
+# ---------------------------------------------------------------------------
+# Statement handlers
+# ---------------------------------------------------------------------------
+
+_CREATE_TABLE_RE = re.compile(
+    r'CREATE\s+(?:(?:GLOBAL|LOCAL)\s+)?(?:(TEMP|TEMPORARY)\s+|UNLOGGED\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(' + QNAME + r')\s*',
+    re.IGNORECASE)
+_ALTER_TABLE_RE = re.compile(
+    r'ALTER\s+TABLE\s+(?:IF\s+EXISTS\s+)?(?:ONLY\s+)?(' + QNAME + r')\s*\*?\s+(.*)$', re.IGNORECASE | re.DOTALL)
+_DROP_TABLE_RE = re.compile(r'DROP\s+TABLE\s+(?:IF\s+EXISTS\s+)?(.*?)(?:\s+(?:CASCADE|RESTRICT))?\s*;?$',
+                            re.IGNORECASE | re.DOTALL)
+_CREATE_INDEX_RE = re.compile(
+    r'CREATE\s+(UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+NOT\s+EXISTS\s+)?(' + IDENT + r'\s+)?ON\s+(?:ONLY\s+)?('
+    + QNAME + r')\s*(?:USING\s+(\w+)\s*)?\(', re.IGNORECASE)
+_DROP_INDEX_RE = re.compile(r'DROP\s+INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+EXISTS\s+)?(.*?)(?:\s+(?:CASCADE|RESTRICT))?\s*;?$',
+                            re.IGNORECASE | re.DOTALL)
+_ALTER_INDEX_RE = re.compile(r'ALTER\s+INDEX\s+(?:IF\s+EXISTS\s+)?(' + QNAME + r')\s+RENAME\s+TO\s+(' + IDENT + r')',
+                             re.IGNORECASE)
+_CREATE_ENUM_RE = re.compile(r'CREATE\s+TYPE\s+(' + QNAME + r')\s+AS\s+ENUM\s*\((.*)\)', re.IGNORECASE | re.DOTALL)
+_ALTER_TYPE_RE = re.compile(r'ALTER\s+TYPE\s+(' + QNAME + r')\s+(.*?)\s*;?$', re.IGNORECASE | re.DOTALL)
+_DROP_TYPE_RE = re.compile(r'DROP\s+TYPE\s+(?:IF\s+EXISTS\s+)?(.*?)(?:\s+(?:CASCADE|RESTRICT))?\s*;?$',
+                           re.IGNORECASE | re.DOTALL)
+_CREATE_VIEW_RE = re.compile(
+    r'CREATE\s+(?:OR\s+REPLACE\s+)?(?:(?:TEMP|TEMPORARY)\s+)?(?:RECURSIVE\s+)?(MATERIALIZED\s+)?VIEW\s+'
+    r'(?:IF\s+NOT\s+EXISTS\s+)?(' + QNAME + r')(.*?)\bAS\b\s*(.*?)\s*;?$', re.IGNORECASE | re.DOTALL)
+_ALTER_VIEW_RE = re.compile(
+    r'ALTER\s+(?:MATERIALIZED\s+)?VIEW\s+(?:IF\s+EXISTS\s+)?(' + QNAME + r')\s+RENAME\s+TO\s+(' + IDENT + r')',
+    re.IGNORECASE)
+_DROP_VIEW_RE = re.compile(
+    r'DROP\s+(?:MATERIALIZED\s+)?VIEW\s+(?:IF\s+EXISTS\s+)?(.*?)(?:\s+(?:CASCADE|RESTRICT))?\s*;?$',
+    re.IGNORECASE | re.DOTALL)
+_CREATE_POLICY_RE = re.compile(r'CREATE\s+POLICY\s+(' + IDENT + r')\s+ON\s+(' + QNAME + r')\s*(.*?)\s*;?$',
+                               re.IGNORECASE | re.DOTALL)
+_ALTER_POLICY_RE = re.compile(r'ALTER\s+POLICY\s+(' + IDENT + r')\s+ON\s+(' + QNAME + r')\s*(.*?)\s*;?$',
+                              re.IGNORECASE | re.DOTALL)
+_DROP_POLICY_RE = re.compile(r'DROP\s+POLICY\s+(?:IF\s+EXISTS\s+)?(' + IDENT + r')\s+ON\s+(' + QNAME + r')',
+                             re.IGNORECASE)
+_GRANT_RE = re.compile(r'GRANT\s+(.*?)\s+ON\s+(.*?)\s+TO\s+(.*?)(?:\s+WITH\s+GRANT\s+OPTION)?(?:\s+GRANTED\s+BY\s+\S+)?\s*;?$',
+                       re.IGNORECASE | re.DOTALL)
+_REVOKE_RE = re.compile(r'REVOKE\s+(GRANT\s+OPTION\s+FOR\s+)?(.*?)\s+ON\s+(.*?)\s+FROM\s+(.*?)'
+                        r'(?:\s+GRANTED\s+BY\s+\S+)?(?:\s+(?:CASCADE|RESTRICT))?\s*;?$', re.IGNORECASE | re.DOTALL)
+_CREATE_FUNCTION_RE = re.compile(r'CREATE\s+(?:OR\s+REPLACE\s+)?(?:FUNCTION|PROCEDURE)\s+(' + QNAME + r')\s*\(',
+                                 re.IGNORECASE)
+_ALTER_FUNCTION_RE = re.compile(r'ALTER\s+(?:FUNCTION|PROCEDURE|ROUTINE)\s+(' + QNAME + r')\s*(\(.*)$',
+                                re.IGNORECASE | re.DOTALL)
+_DROP_FUNCTION_RE = re.compile(
+    r'DROP\s+(?:FUNCTION|PROCEDURE|ROUTINE)\s+(?:IF\s+EXISTS\s+)?(.*?)(?:\s+(?:CASCADE|RESTRICT))?\s*;?$',
+    re.IGNORECASE | re.DOTALL)
+_DO_BLOCK_RE = re.compile(r'DO\s+(?:LANGUAGE\s+\w+\s+)?(\$(?:[A-Za-z_]\w*)?\$)(.*)\1', re.IGNORECASE | re.DOTALL)
+_DDL_IN_BLOCK_RE = re.compile(r'\b(?:(?:CREATE|ALTER|DROP)\s+(?:UNIQUE\s+)?(?:TABLE|INDEX|TYPE|VIEW|MATERIALIZED|POLICY)'
+                              r'|GRANT|REVOKE)\b', re.IGNORECASE)
+# FOR pol IN SELECT policyname FROM pg_policies WHERE tablename = '...' LOOP
+#   EXECUTE format('DROP POLICY IF EXISTS %I ON ...', pol) ...
+_DYNAMIC_POLICY_DROP_RE = re.compile(
+    r'\bFROM\s+pg_policies\s+WHERE\s+(.*?)\bLOOP\b.*?DROP\s+POLICY\s+(?:IF\s+EXISTS\s+)?%I\s+ON\s+(' + QNAME + r')',
+    re.IGNORECASE | re.DOTALL)
+
+_COLUMN_CONSTRAINT_RE = re.compile(
+    r'\s(?:CONSTRAINT|NOT\s+NULL|NULL|DEFAULT|PRIMARY\s+KEY|REFERENCES|UNIQUE|CHECK|GENERATED|COLLATE)\b', re.IGNORECASE)
+_REFERENCES_RE = re.compile(r'REFERENCES\s+(' + QNAME + r')\s*(?:\(([^)]*)\))?(.*)$', re.IGNORECASE | re.DOTALL)
+_ON_DELETE_RE = re.compile(r'ON\s+DELETE\s+(CASCADE|RESTRICT|NO\s+ACTION|SET\s+NULL|SET\s+DEFAULT)', re.IGNORECASE)
+_TABLE_CONSTRAINT_RE = re.compile(r'(?:CONSTRAINT\s+(' + IDENT + r')\s+)?(PRIMARY\s+KEY|UNIQUE|FOREIGN\s+KEY|CHECK|EXCLUDE)\b(.*)$',
+                                  re.IGNORECASE | re.DOTALL)
+
+
+def _ident_list(text):
+    return [normalize_ident(c) for c in split_top_level(text) if c]
+
+
+def _tracked(schema):
+    return schema in _TRACKED_SCHEMAS
+
+
+def _parse_column(table, definition):
+    name_match = re.match(IDENT, definition)
+    if not name_match:
+        return None, None
+    col_name = normalize_ident(name_match.group(0))
+    rest = definition[name_match.end():]
+
+    constraint_match = _COLUMN_CONSTRAINT_RE.search(' ' + rest)
+    if constraint_match:
+        type_text = rest[:constraint_match.start()]
+        constraints = rest[constraint_match.start():]
+    else:
+        type_text, constraints = rest, ''
+
+    upper = re.sub(r'\s+', ' ', constraints.upper())
+    column = {
+        "type": normalize_type(type_text),
+        "nullable": 'NOT NULL' not in upper and 'PRIMARY KEY' not in upper,
+        "default": None,
+        "generated": 'GENERATED' in upper,
+    }
+    default_match = re.search(r'\bDEFAULT\s+(.*?)(?=\s+(?:NOT\s+NULL|NULL|PRIMARY|REFERENCES|UNIQUE|CHECK|CONSTRAINT)\b|$)',
+                              constraints, re.IGNORECASE | re.DOTALL)
+    if default_match:
+        column["default"] = default_match.group(1).strip()
+    return col_name, (column, constraints)
+
+
+def _add_column(catalog, table_name, definition, filename):
+    table = catalog["tables"].get(table_name)
+    if table is None:
+        return
+    col_name, parsed = _parse_column(table_name, definition)
+    if not col_name:
+        return
+    column, constraints = parsed
+    if col_name in table["columns"]:
+        # ADD COLUMN IF NOT EXISTS on an existing column is a no-op.
+        return
+    table["columns"][col_name] = column
+
+    if re.search(r'\bPRIMARY\s+KEY\b', constraints, re.IGNORECASE):
+        _set_primary_key(catalog, table_name, [col_name], None, filename)
+    if re.search(r'\bUNIQUE\b', constraints, re.IGNORECASE):
+        _add_implicit_index(catalog, table_name, f"{table_name}_{col_name}_key", [col_name], filename)
+    ref = _REFERENCES_RE.search(constraints)
+    if ref:
+        fk_name = re.search(r'CONSTRAINT\s+(' + IDENT + r')\s+REFERENCES', constraints, re.IGNORECASE)
+        _add_foreign_key(catalog, table_name, fk_name.group(1) if fk_name else None, [col_name], ref)
+
+
+def _add_foreign_key(catalog, table_name, name, columns, ref_match):
+    ref_schema, ref_table = parse_qname(ref_match.group(1))
+    on_delete = _ON_DELETE_RE.search(ref_match.group(3) or '')
+    fk = {
+        "name": normalize_ident(name) if name else f"{table_name}_{'_'.join(columns)}_fkey",
+        "columns": columns,
+        "ref_schema": ref_schema or 'public',
+        "ref_table": ref_table,
+        "ref_columns": _ident_list(ref_match.group(2)) if ref_match.group(2) else ['id'],
+        "on_delete": re.sub(r'\s+', ' ', on_delete.group(1).upper()) if on_delete else None,
+    }
+    fks = catalog["tables"][table_name]["foreign_keys"]
+    fks[:] = [f for f in fks if f["name"] != fk["name"]]
+    fks.append(fk)
+
+
+def _set_primary_key(catalog, table_name, columns, name, filename):
+    catalog["tables"][table_name]["primary_key"] = columns
+    _add_implicit_index(catalog, table_name, normalize_ident(name) if name else f"{table_name}_pkey", columns, filename)
+
+
+def _add_implicit_index(catalog, table_name, name, columns, filename):
+    catalog["indexes"][name] = {
+        "table": table_name,
+        "columns": columns,
+        "include": [],
+        "unique": True,
+        "method": 'btree',
+        "where": None,
+        "implicit": True,
+        "file": filename,
+    }
+
+
+def _add_table_constraint(catalog, table_name, text, filename):
+    match = _TABLE_CONSTRAINT_RE.match(text.strip())
+    if not match:
+        return
+    name, kind, rest = match.group(1), re.sub(r'\s+', ' ', match.group(2).upper()), match.group(3)
+    cols_match = re.match(r'\s*\(([^)]*)\)', rest)
+    if kind == 'PRIMARY KEY' and cols_match:
+        _set_primary_key(catalog, table_name, _ident_list(cols_match.group(1)), name, filename)
+    elif kind == 'UNIQUE' and cols_match:
+        columns = _ident_list(cols_match.group(1))
+        index_name = normalize_ident(name) if name else f"{table_name}_{'_'.join(columns)}_key"
+        _add_implicit_index(catalog, table_name, index_name, columns, filename)
+    elif kind == 'FOREIGN KEY' and cols_match:
+        ref = _REFERENCES_RE.search(rest[cols_match.end():])
+        if ref:
+            _add_foreign_key(catalog, table_name, name, _ident_list(cols_match.group(1)), ref)
+
+
+def _drop_constraint(catalog, table_name, name):
+    table = catalog["tables"][table_name]
+    table["foreign_keys"] = [f for f in table["foreign_keys"] if f["name"] != name]
+    index = catalog["indexes"].get(name)
+    if index and index.get("implicit") and index["table"] == table_name:
+        del catalog["indexes"][name]
+        if name == f"{table_name}_pkey" or index["columns"] == table.get("primary_key"):
+            table["primary_key"] = []
+
+
+def _create_table(catalog, stmt, filename, match, line):
+    if match.group(1):
+        return  # temporary tables are not part of the schema
+    schema, table_name = parse_qname(match.group(2))
+    if not _tracked(schema):
+        return
+    rest = stmt[match.end():]
+    existing = catalog["tables"].get(table_name)
+    if existing and re.search(r'IF\s+NOT\s+EXISTS', stmt[:match.end()], re.IGNORECASE):
+        if not existing["partial"]:
+            return
+        # The table predates the migration history; the column list spelled
+        # out here is the best record of it we have, so fold it in and treat
+        # the table as fully known from now on.
+        existing["partial"] = False
+        existing["created_in"] = filename
+    else:
+        catalog["tables"][table_name] = _new_table(filename)
+    if not rest.startswith('('):
+        return  # CREATE TABLE ... AS / PARTITION OF: columns are not spelled out
+    close = matching_paren(rest, 0)
+    body = rest[1:close] if close != -1 else rest[1:]
+    for item in split_top_level(body):
+        if _TABLE_CONSTRAINT_RE.match(item):
+            _add_table_constraint(catalog, table_name, item, filename)
+        elif re.match(r'LIKE\s', item, re.IGNORECASE):
+            _, source = parse_qname(item.split(None, 1)[1])
+            if source in catalog["tables"]:
+                for col, definition in catalog["tables"][source]["columns"].items():
+                    catalog["tables"][table_name]["columns"][col] = dict(definition)
+        else:
+            _add_column(catalog, table_name, item, filename)
+
+
+def _new_table(created_in, partial=False):
+    return {
+        "columns": {},
+        "primary_key": [],
+        "foreign_keys": [],
+        "created_in": created_in,
+        "rls_enabled": False,
+        "rls_forced": False,
+        # Every ENABLE/DISABLE/FORCE/NO FORCE in replay order.
+        "rls_toggles": [],
+        # {name: {command, permissive, roles, using, with_check, file, line}}
+        "policies": {},
+        # {role: [privilege, ...]} as granted in the migrations. `revoked`
+        # keeps privileges taken away from a role that the migrations never
+        # granted, i.e. revocations of Supabase's default grants.
+        "grants": {},
+        "revoked": {},
+        # Partial tables were created before the first migration and are only
+        # known through later ALTERs, so their column list is incomplete.
+        "partial": partial,
+    }
+
+
+def _rename_table(catalog, old, new):
+    catalog["tables"][new] = catalog["tables"].pop(old)
+    for index in catalog["indexes"].values():
+        if index["table"] == old:
+            index["table"] = new
+    for table in catalog["tables"].values():
+        for fk in table["foreign_keys"]:
+            if fk["ref_table"] == old:
+                fk["ref_table"] = new
+
+
+def _rename_column(catalog, table_name, old, new):
+    table = catalog["tables"][table_name]
+    if old not in table["columns"]:
+        return
+    table["columns"] = {(new if c == old else c): d for c, d in table["columns"].items()}
+    table["primary_key"] = [new if c == old else c for c in table["primary_key"]]
+    for fk in table["foreign_keys"]:
+        fk["columns"] = [new if c == old else c for c in fk["columns"]]
+    for other_name, other in catalog["tables"].items():
+        for fk in other["foreign_keys"]:
+            if fk["ref_table"] == table_name:
+                fk["ref_columns"] = [new if c == old else c for c in fk["ref_columns"]]
+    for index in catalog["indexes"].values():
+        if index["table"] == table_name:
+            index["columns"] = [new if c == old else c for c in index["columns"]]
+            index["include"] = [new if c == old else c for c in index["include"]]
+
+
+def _drop_column(catalog, table_name, col):
+    table = catalog["tables"][table_name]
+    if table["columns"].pop(col, None) is None:
+        return
+    # Postgres drops every index and constraint that depends on the column.
+    table["foreign_keys"] = [f for f in table["foreign_keys"] if col not in f["columns"]]
+    if col in table["primary_key"]:
+        table["primary_key"] = []
+    for name in [n for n, i in catalog["indexes"].items() if i["table"] == table_name and col in i["columns"]]:
+        del catalog["indexes"][name]
+
+
+def _alter_table(catalog, stmt, filename, match, line):
+    schema, table_name = parse_qname(match.group(1))
+    if not _tracked(schema):
+        return
+    if table_name not in catalog["tables"]:
+        catalog["tables"][table_name] = _new_table(None, partial=True)
+    actions = match.group(2).rstrip(' ;')
+
+    rename = re.match(r'RENAME\s+TO\s+(' + IDENT + r')', actions, re.IGNORECASE)
+    if rename:
+        _rename_table(catalog, table_name, normalize_ident(rename.group(1)))
+        return
+    rename = re.match(r'RENAME\s+CONSTRAINT\s+(' + IDENT + r')\s+TO\s+(' + IDENT + r')', actions, re.IGNORECASE)
+    if rename:
+        old, new = normalize_ident(rename.group(1)), normalize_ident(rename.group(2))
+        for fk in catalog["tables"][table_name]["foreign_keys"]:
+            if fk["name"] == old:
+                fk["name"] = new
+        if old in catalog["indexes"] and catalog["indexes"][old].get("implicit"):
+            catalog["indexes"][new] = catalog["indexes"].pop(old)
+        return
+    rename = re.match(r'RENAME\s+(?:COLUMN\s+)?(' + IDENT + r')\s+TO\s+(' + IDENT + r')', actions, re.IGNORECASE)
+    if rename:
+        _rename_column(catalog, table_name, normalize_ident(rename.group(1)), normalize_ident(rename.group(2)))
+        return
+    set_schema = re.match(r'SET\s+SCHEMA\s+(' + IDENT + r')', actions, re.IGNORECASE)
+    if set_schema:
+        if normalize_ident(set_schema.group(1)) != 'public':
+            _drop_table(catalog, table_name)
+        return
+
+    for action in split_top_level(actions):
+        _alter_table_action(catalog, table_name, action, filename, line)
+
+
+def _alter_table_action(catalog, table_name, action, filename, line):
+    table = catalog["tables"][table_name]
+    add = re.match(r'ADD\s+(COLUMN\s+)?(?:IF\s+NOT\s+EXISTS\s+)?(.*)$', action, re.IGNORECASE | re.DOTALL)
+    if add:
+        rest = add.group(2)
+        if not add.group(1) and _TABLE_CONSTRAINT_RE.match(rest):
+            _add_table_constraint(catalog, table_name, rest, filename)
+        else:
+            _add_column(catalog, table_name, rest, filename)
+        return
+
+    drop = re.match(r'DROP\s+CONSTRAINT\s+(?:IF\s+EXISTS\s+)?(' + IDENT + r')', action, re.IGNORECASE)
+    if drop:
+        _drop_constraint(catalog, table_name, normalize_ident(drop.group(1)))
+        return
+    drop = re.match(r'DROP\s+(?:COLUMN\s+)?(?:IF\s+EXISTS\s+)?(' + IDENT + r')', action, re.IGNORECASE)
+    if drop:
+        _drop_column(catalog, table_name, normalize_ident(drop.group(1)))
+        return
+
+    alter = re.match(r'ALTER\s+(?:COLUMN\s+)?(' + IDENT + r')\s+(.*)$', action, re.IGNORECASE | re.DOTALL)
+    if alter:
+        column = table["columns"].get(normalize_ident(alter.group(1)))
+        if column is None:
+            return
+        change = alter.group(2)
+        retype = re.match(r'(?:SET\s+DATA\s+)?TYPE\s+(.*?)(?:\s+(?:USING|COLLATE)\b.*)?$', change, re.IGNORECASE | re.DOTALL)
+        if retype:
+            column["type"] = normalize_type(retype.group(1))
+        elif re.match(r'SET\s+NOT\s+NULL', change, re.IGNORECASE):
+            column["nullable"] = False
+        elif re.match(r'DROP\s+NOT\s+NULL', change, re.IGNORECASE):
+            column["nullable"] = True
+        elif re.match(r'SET\s+DEFAULT\s', change, re.IGNORECASE):
+            column["default"] = change.split(None, 2)[2].strip()
+        elif re.match(r'DROP\s+DEFAULT', change, re.IGNORECASE):
+            column["default"] = None
+        return
+
+    rls = re.match(r'(ENABLE|DISABLE|FORCE|NO\s+FORCE)\s+ROW\s+LEVEL\s+SECURITY', action, re.IGNORECASE)
+    if rls:
+        toggle = re.sub(r'\s+', ' ', rls.group(1).upper())
+        if toggle in ('ENABLE', 'DISABLE'):
+            table["rls_enabled"] = toggle == 'ENABLE'
+        else:
+            table["rls_forced"] = toggle == 'FORCE'
+        table["rls_toggles"].append({"action": toggle, "file": filename, "line": line})
+
+
+def _drop_table(catalog, table_name):
+    catalog["referenced"].pop(table_name, None)
+    if catalog["tables"].pop(table_name, None) is None:
+        return
+    for name in [n for n, i in catalog["indexes"].items() if i["table"] == table_name]:
+        del catalog["indexes"][name]
+    for table in catalog["tables"].values():
+        table["foreign_keys"] = [f for f in table["foreign_keys"] if f["ref_table"] != table_name]
+
+
+def _name_list(text):
+    names = []
+    for item in split_top_level(text):
+        schema, name = parse_qname(item)
+        if _tracked(schema):
+            names.append(name)
+    return names
+
+
+def _create_index(catalog, stmt, filename, match, line):
+    schema, table_name = parse_qname(match.group(3))
+    if not _tracked(schema):
+        return
+    name = normalize_ident(match.group(2)) if match.group(2) else None
+    if name and name in catalog["indexes"] and re.search(r'IF\s+NOT\s+EXISTS', stmt[:match.end()], re.IGNORECASE):
+        return
+    close = matching_paren(stmt, match.end() - 1)
+    elements = split_top_level(stmt[match.end():close])
+    tail = stmt[close + 1:].rstrip(' ;') if close != -1 else ''
+
+    columns = []
+    for element in elements:
+        element = re.sub(r'\s+(?:ASC|DESC|NULLS\s+(?:FIRST|LAST))\b', '', element, flags=re.IGNORECASE).strip()
+        col_match = re.match(r'(' + IDENT + r')(?:\s+\w+_ops)?\s*$', element)
+        # Expression indexes keep their raw text so they never match a plain column.
+        columns.append(normalize_ident(col_match.group(1)) if col_match else re.sub(r'\s+', ' ', element))
+
+    include = re.search(r'INCLUDE\s*\(([^)]*)\)', tail, re.IGNORECASE)
+    where = re.search(r'\bWHERE\s+(.*)$', tail, re.IGNORECASE | re.DOTALL)
+    if not name:
+        plain = [c for c in columns if re.match(r'^\w+$', c)]
+        name = f"{table_name}_{'_'.join(plain)}_idx"
+    catalog["indexes"][name] = {
+        "table": table_name,
+        "columns": columns,
+        "include": _ident_list(include.group(1)) if include else [],
+        "unique": bool(match.group(1)),
+        "method": (match.group(4) or 'btree').lower(),
+        "where": re.sub(r'\s+', ' ', where.group(1)).strip() if where else None,
+        "implicit": False,
+        "file": filename,
+    }
+
+
+def _drop_index(catalog, stmt, filename, match, line):
+    for name in _name_list(match.group(1)):
+        catalog["indexes"].pop(name, None)
+
+
+def _alter_index(catalog, stmt, filename, match, line):
+    _, old = parse_qname(match.group(1))
+    if old in catalog["indexes"]:
+        catalog["indexes"][normalize_ident(match.group(2))] = catalog["indexes"].pop(old)
+
+
+def _enum_labels(text):
+    return [label.replace("''", "'") for label in re.findall(r"'((?:[^']|'')*)'", text)]
+
+
+def _create_enum(catalog, stmt, filename, match, line):
+    schema, name = parse_qname(match.group(1))
+    if _tracked(schema):
+        catalog["enums"][name] = _enum_labels(match.group(2))
+
+
+def _alter_type(catalog, stmt, filename, match, line):
+    schema, name = parse_qname(match.group(1))
+    if not _tracked(schema) or name not in catalog["enums"]:
+        return
+    labels = catalog["enums"][name]
+    change = match.group(2)
+    add = re.match(r"ADD\s+VALUE\s+(?:IF\s+NOT\s+EXISTS\s+)?'((?:[^']|'')*)'(?:\s+(BEFORE|AFTER)\s+'((?:[^']|'')*)')?",
+                   change, re.IGNORECASE)
+    if add:
+        label = add.group(1).replace("''", "'")
+        if label in labels:
+            return
+        anchor = add.group(3).replace("''", "'") if add.group(3) else None
+        if anchor in labels:
+            labels.insert(labels.index(anchor) + (1 if add.group(2).upper() == 'AFTER' else 0), label)
+        else:
+            labels.append(label)
+        return
+    rename = re.match(r"RENAME\s+VALUE\s+'((?:[^']|'')*)'\s+TO\s+'((?:[^']|'')*)'", change, re.IGNORECASE)
+    if rename and rename.group(1) in labels:
+        labels[labels.index(rename.group(1))] = rename.group(2)
+        return
+    rename = re.match(r'RENAME\s+TO\s+(' + IDENT + r')', change, re.IGNORECASE)
+    if rename:
+        catalog["enums"][normalize_ident(rename.group(1))] = catalog["enums"].pop(name)
+
+
+def _drop_type(catalog, stmt, filename, match, line):
+    for name in _name_list(match.group(1)):
+        catalog["enums"].pop(name, None)
+
+
+def _create_view(catalog, stmt, filename, match, line):
+    schema, name = parse_qname(match.group(2))
+    if not _tracked(schema):
+        return
+    catalog["views"][name] = {
+        "materialized": bool(match.group(1)),
+        "definition": match.group(4).strip(),
+        "file": filename,
+    }
+
+
+def _alter_view(catalog, stmt, filename, match, line):
+    _, old = parse_qname(match.group(1))
+    if old in catalog["views"]:
+        catalog["views"][normalize_ident(match.group(2))] = catalog["views"].pop(old)
+        for index in catalog["indexes"].values():
+            if index["table"] == old:
+                index["table"] = normalize_ident(match.group(2))
+
+
+def _drop_view(catalog, stmt, filename, match, line):
+    for name in _name_list(match.group(1)):
+        if catalog["views"].pop(name, None) is not None:
+            for index_name in [n for n, i in catalog["indexes"].items() if i["table"] == name]:
+                del catalog["indexes"][index_name]
+
+
+# ---------------------------------------------------------------------------
+# Functions
+# ---------------------------------------------------------------------------
+
+# Spellings Postgres treats as the same type, so `get_feed(INT, INT)` and
+# `get_feed(integer, integer)` name one overload.
+_TYPE_ALIASES = {
+    'int': 'integer', 'int4': 'integer', 'int8': 'bigint', 'int2': 'smallint', 'bool': 'boolean',
+    'float8': 'double precision', 'float4': 'real', 'float': 'double precision', 'decimal': 'numeric',
+    'varchar': 'character varying', 'char': 'character', 'timestamptz': 'timestamp with time zone',
+    'timestamp': 'timestamp without time zone', 'timetz': 'time with time zone',
+}
+_MULTIWORD_TYPE_RE = re.compile(
+    r'(?:double\s+precision|character\s+varying|bit\s+varying|timestamp|time)\b(?:\s*\(\d+\))?'
+    r'(?:\s+with(?:out)?\s+time\s+zone)?\s*(?:\[\s*\])*$', re.IGNORECASE)
+_ARG_MODE_RE = re.compile(r'(IN|OUT|INOUT|VARIADIC)\s+', re.IGNORECASE)
+_FUNCTION_BODY_RE = re.compile(r"\bAS\s+(?:(\$(?:[A-Za-z_]\w*)?\$).*?\1|'(?:[^']|'')*')", re.IGNORECASE | re.DOTALL)
+_RETURNS_RE = re.compile(
+    r'\bRETURNS\s+(?:(TABLE)\s*\(|(SETOF\s+)?(.+?)(?=\s+(?:LANGUAGE|IMMUTABLE|STABLE|VOLATILE|SECURITY|SET|STRICT|'
+    r'CALLED|RETURNS|PARALLEL|COST|ROWS|LEAKPROOF|NOT|WINDOW|TRANSFORM|SUPPORT|EXTERNAL|BEGIN)\b|\s*;?\s*$))',
+    re.IGNORECASE | re.DOTALL)
+
+
+def canonical_type(type_text):
+    type_text = normalize_type(type_text)
+    array = ''
+    while type_text.endswith('[]'):
+        type_text, array = type_text[:-2].rstrip(), array + '[]'
+    base = re.sub(r'\s*\(.*\)$', '', type_text)
+    return _TYPE_ALIASES.get(base, base) + array
+
+
+def function_args(text):
+    """Parse a parameter list into [{name, type, mode, default}, ...]."""
+    args = []
+    for item in split_top_level(text):
+        default = re.search(r'\s+DEFAULT\s+|\s*=\s*', item, re.IGNORECASE)
+        value = item[default.end():].strip() if default else None
+        item = item[:default.start()] if default else item
+        mode = _ARG_MODE_RE.match(item)
+        item = item[mode.end():] if mode else item
+        parts = item.strip().split(None, 1)
+        if len(parts) == 2 and not _MULTIWORD_TYPE_RE.match(item.strip()):
+            name, type_text = normalize_ident(parts[0]), parts[1]
+        else:
+            name, type_text = None, item
+        args.append({
+            "name": name,
+            "type": canonical_type(type_text),
+            "mode": mode.group(1).upper() if mode else 'IN',
+            "default": value,
+        })
+    return args
+
+
+def signature_key(args):
+    # Postgres identifies an overload by its input argument types only.
+    return ', '.join(a["type"] for a in args if a["mode"] != 'OUT')
+
+
+def _function_options(text):
+    # Options may come before or after the body; scan them with it removed.
+    options = _FUNCTION_BODY_RE.sub(' ', text)
+    language = re.search(r'\bLANGUAGE\s+\'?(\w+)', options, re.IGNORECASE)
+    volatility = re.search(r'\b(IMMUTABLE|STABLE|VOLATILE)\b', options, re.IGNORECASE)
+    security = re.search(r'\bSECURITY\s+(DEFINER|INVOKER)\b', options, re.IGNORECASE)
+    return {
+        "language": language.group(1).lower() if language else None,
+        "volatility": volatility.group(1).upper() if volatility else None,
+        "security_definer": security.group(1).upper() == 'DEFINER' if security else None,
+    }
+
+
+def function_returns(text):
+    """(type, set, table columns) from the text after a parameter list.
+
+    `RETURNS SETOF public.buildings` -> ('buildings', True, None);
+    `RETURNS TABLE (id uuid, n int)` -> ('record', True, [{name, type, ...}]).
+    """
+    options = _FUNCTION_BODY_RE.sub(' ', text)
+    match = _RETURNS_RE.search(options)
+    if not match:
+        return None, False, None
+    if match.group(1):
+        close = matching_paren(options, match.end() - 1)
+        columns = function_args(options[match.end():close if close != -1 else len(options)])
+        return 'record', True, columns
+    return canonical_type(match.group(3)), bool(match.group(2)), None
+
+
+def _create_function(catalog, stmt, filename, match, line):
+    schema, name = parse_qname(match.group(1))
+    if not _tracked(schema):
+        return
+    close = matching_paren(stmt, match.end() - 1)
+    if close == -1:
+        return
+    args = function_args(stmt[match.end():close])
+    options = _function_options(stmt[close + 1:])
+    returns, returns_set, returns_table = function_returns(stmt[close + 1:])
+    catalog["functions"].setdefault(name, {})[signature_key(args)] = {
+        "args": args,
+        "returns": returns,
+        "returns_set": returns_set,
+        "returns_table": returns_table,
+        "language": options["language"],
+        "volatility": options["volatility"] or 'VOLATILE',
+        "security_definer": bool(options["security_definer"]),
+        "file": filename,
+        "line": line,
+        "end_line": line + stmt.count('\n') if line is not None else None,
+    }
+
+
+def _function_signatures(text):
+    # "f(int), public.g" -> [('f', 'integer'), ('g', None)]; None means
+    # every overload.
+    signatures = []
+    for item in split_top_level(text):
+        paren = item.find('(')
+        schema, name = parse_qname(item[:paren] if paren != -1 else item)
+        if not _tracked(schema):
+            continue
+        if paren == -1:
+            signatures.append((name, None))
+        else:
+            close = matching_paren(item, paren)
+            signatures.append((name, signature_key(function_args(item[paren + 1:close if close != -1 else None]))))
+    return signatures
+
+
+def _alter_function(catalog, stmt, filename, match, line):
+    schema, name = parse_qname(match.group(1))
+    rest = match.group(2)
+    close = matching_paren(rest, 0)
+    overloads = catalog["functions"].get(name)
+    if not _tracked(schema) or close == -1 or overloads is None:
+        return
+    key = signature_key(function_args(rest[1:close]))
+    if key not in overloads:
+        return
+    action = rest[close + 1:]
+    rename = re.match(r'\s*RENAME\s+TO\s+(' + IDENT + r')', action, re.IGNORECASE)
+    if rename:
+        catalog["functions"].setdefault(normalize_ident(rename.group(1)), {})[key] = overloads.pop(key)
+        if not overloads:
+            del catalog["functions"][name]
+        return
+    options = _function_options(action)
+    if options["volatility"]:
+        overloads[key]["volatility"] = options["volatility"]
+    if options["security_definer"] is not None:
+        overloads[key]["security_definer"] = options["security_definer"]
+
+
+def _drop_function(catalog, stmt, filename, match, line):
+    for name, key in _function_signatures(match.group(1)):
+        catalog["referenced_functions"].pop(name, None)
+        overloads = catalog["functions"].get(name)
+        if overloads is None:
+            continue
+        if key is None:
+            overloads.clear()
+        else:
+            overloads.pop(key, None)
+        if not overloads:
+            del catalog["functions"][name]
+
+
+# ---------------------------------------------------------------------------
+# Row level security and privileges
+# ---------------------------------------------------------------------------
+
+TABLE_PRIVILEGES = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'TRUNCATE', 'REFERENCES', 'TRIGGER')
+
+_POLICY_CLAUSE_RE = re.compile(
+    r'\s*(?:AS\s+(PERMISSIVE|RESTRICTIVE)\b|FOR\s+(ALL|SELECT|INSERT|UPDATE|DELETE)\b|(TO)\s+|(USING)\s*\(|'
+    r'(WITH\s+CHECK)\s*\(|RENAME\s+TO\s+(' + IDENT + r'))', re.IGNORECASE)
+_POLICY_ROLES_RE = re.compile(r'(.*?)(?=\s*(?:\bUSING\b|\bWITH\s+CHECK\b|$))', re.IGNORECASE | re.DOTALL)
+# Privileges on anything but tables (functions, sequences, schemas, ...) are
+# not part of the table catalog.
+_NON_TABLE_OBJECT_RE = re.compile(
+    r'(?:FUNCTION|PROCEDURE|ROUTINE|SEQUENCE|SCHEMA|DATABASE|TYPE|DOMAIN|LANGUAGE|LARGE\s+OBJECT|FOREIGN|TABLESPACE|'
+    r'PARAMETER|ALL\s+(?:FUNCTIONS|PROCEDURES|ROUTINES|SEQUENCES)\b)\b', re.IGNORECASE)
+
+
+def _collapse(expr):
+    return re.sub(r'\s+', ' ', expr).strip()
+
+
+def _role_list(text):
+    roles = []
+    for role in split_top_level(text):
+        role = re.sub(r'^GROUP\s+', '', role, flags=re.IGNORECASE)
+        if role:
+            roles.append(normalize_ident(role))
+    return roles
+
+
+def _policy_clauses(text):
+    # Clauses of CREATE/ALTER POLICY after `ON table`, in any order.
+    clauses = {}
+    pos = 0
+    while pos < len(text):
+        match = _POLICY_CLAUSE_RE.match(text, pos)
+        if not match:
+            break
+        permissive, command, to, using, check, rename = match.groups()
+        pos = match.end()
+        if permissive:
+            clauses["permissive"] = permissive.upper() == 'PERMISSIVE'
+        elif command:
+            clauses["command"] = command.upper()
+        elif to:
+            roles = _POLICY_ROLES_RE.match(text, pos)
+            clauses["roles"] = _role_list(roles.group(1))
+            pos = roles.end()
+        elif using or check:
+            close = matching_paren(text, pos - 1)
+            end = close if close != -1 else len(text)
+            clauses["using" if using else "with_check"] = _collapse(text[pos:end])
+            pos = end + 1
+        else:
+            clauses["rename"] = normalize_ident(rename)
+    return clauses
+
+
+def _policy_table(catalog, qname):
+    schema, table_name = parse_qname(qname)
+    if not _tracked(schema):
+        return None
+    if table_name not in catalog["tables"]:
+        # Like ALTER TABLE: the table predates the migration history.
+        catalog["tables"][table_name] = _new_table(None, partial=True)
+    return catalog["tables"][table_name]
+
+
+def _create_policy(catalog, stmt, filename, match, line):
+    table = _policy_table(catalog, match.group(2))
+    if table is None:
+        return
+    clauses = _policy_clauses(match.group(3))
+    table["policies"][normalize_ident(match.group(1))] = {
+        "command": clauses.get("command", 'ALL'),
+        "permissive": clauses.get("permissive", True),
+        "roles": clauses.get("roles", ['public']),
+        "using": clauses.get("using"),
+        "with_check": clauses.get("with_check"),
+        "file": filename,
+        "line": line,
+    }
+
+
+def _alter_policy(catalog, stmt, filename, match, line):
+    table = _policy_table(catalog, match.group(2))
+    name = normalize_ident(match.group(1))
+    if table is None or name not in table["policies"]:
+        return
+    clauses = _policy_clauses(match.group(3))
+    if "rename" in clauses:
+        table["policies"][clauses["rename"]] = table["policies"].pop(name)
+        return
+    policy = table["policies"][name]
+    for key in ("roles", "using", "with_check"):
+        if key in clauses:
+            policy[key] = clauses[key]
+            # The location of the expressions now in force.
+            policy["file"], policy["line"] = filename, line
+
+
+def _drop_policy(catalog, stmt, filename, match, line):
+    schema, table_name = parse_qname(match.group(2))
+    if _tracked(schema) and table_name in catalog["tables"]:
+        catalog["tables"][table_name]["policies"].pop(normalize_ident(match.group(1)), None)
+
+
+def _drop_policies_matching(catalog, conditions, qname):
+    # The pg_policies loop drops every policy on the table, or only those for
+    # one command when the query filters on cmd.
+    schema, table_name = parse_qname(qname)
+    if not _tracked(schema) or table_name not in catalog["tables"]:
+        return
+    command = re.search(r"\bcmd\s*=\s*'(\w+)'", conditions, re.IGNORECASE)
+    policies = catalog["tables"][table_name]["policies"]
+    for name in [n for n, p in policies.items() if not command or p["command"] == command.group(1).upper()]:
+        del policies[name]
+
+
+def _privilege_list(text):
+    privileges = []
+    for privilege in split_top_level(text):
+        privilege = _collapse(privilege).upper()
+        if privilege in ('ALL', 'ALL PRIVILEGES'):
+            privileges.extend(TABLE_PRIVILEGES)
+        elif privilege:
+            # Column grants keep their column list: "SELECT (a, b)".
+            privileges.append(re.sub(r'\s*\(', ' (', privilege, count=1))
+    return privileges
+
+
+def _privilege_tables(catalog, target):
+    target = target.strip()
+    everything = re.match(r'ALL\s+TABLES\s+IN\s+SCHEMA\s+(.*)$', target, re.IGNORECASE | re.DOTALL)
+    if everything:
+        schemas = [normalize_ident(s) for s in split_top_level(everything.group(1))]
+        return list(catalog["tables"]) if 'public' in schemas else []
+    if _NON_TABLE_OBJECT_RE.match(target):
+        return []
+    target = re.sub(r'^TABLE\s+', '', target, flags=re.IGNORECASE)
+    return [name for name in _name_list(target) if name in catalog["tables"]]
+
+
+def _grant(catalog, stmt, filename, match, line):
+    privileges = _privilege_list(match.group(1))
+    roles = _role_list(match.group(3))
+    for table_name in _privilege_tables(catalog, match.group(2)):
+        table = catalog["tables"][table_name]
+        for role in roles:
+            table["grants"][role] = sorted(set(table["grants"].get(role, [])) | set(privileges))
+            revoked = [p for p in table["revoked"].get(role, []) if p not in privileges]
+            if revoked:
+                table["revoked"][role] = revoked
+            else:
+                table["revoked"].pop(role, None)
+
+
+def _revoke(catalog, stmt, filename, match, line):
+    if match.group(1):
+        return  # REVOKE GRANT OPTION FOR leaves the privilege itself in place
+    privileges = _privilege_list(match.group(2))
+    roles = _role_list(match.group(4))
+    for table_name in _privilege_tables(catalog, match.group(3)):
+        table = catalog["tables"][table_name]
+        for role in roles:
+            granted = table["grants"].get(role, [])
+            remaining = [p for p in granted if p not in privileges]
+            if remaining:
+                table["grants"][role] = remaining
+            else:
+                table["grants"].pop(role, None)
+            never_granted = [p for p in privileges if p not in granted]
+            if never_granted:
+                table["revoked"][role] = sorted(set(table["revoked"].get(role, [])) | set(never_granted))
+
+
+def _do_block(catalog, stmt, filename, match, line):
+    # DO blocks guard DDL with IF EXISTS checks. The handlers are tolerant of
+    # missing objects, so applying the DDL inside them unconditionally matches
+    # what the guards intend.
+    body_start = match.start(2)
+    for offset, inner in split_statements(match.group(2)):
+        inner_line = line + stmt.count('\n', 0, body_start + offset) if line else None
+        dynamic = _DYNAMIC_POLICY_DROP_RE.search(inner)
+        if dynamic:
+            _drop_policies_matching(catalog, dynamic.group(1), dynamic.group(2))
+            continue
+        ddl = _DDL_IN_BLOCK_RE.search(inner)
+        if ddl:
+            apply_statement(catalog, inner[ddl.start():], filename,
+                            inner_line + inner.count('\n', 0, ddl.start()) if inner_line else None)
+
+
+# Ordered: the first pattern that matches the start of a statement wins.
+_HANDLERS = [
+    (_CREATE_TABLE_RE, _create_table),
+    (_ALTER_TABLE_RE, _alter_table),
+    (_DROP_TABLE_RE, lambda catalog, stmt, filename, m, line: [_drop_table(catalog, t) for t in _name_list(m.group(1))]),
+    (_CREATE_INDEX_RE, _create_index),
+    (_DROP_INDEX_RE, _drop_index),
+    (_ALTER_INDEX_RE, _alter_index),
+    (_CREATE_ENUM_RE, _create_enum),
+    (_ALTER_TYPE_RE, _alter_type),
+    (_DROP_TYPE_RE, _drop_type),
+    (_CREATE_VIEW_RE, _create_view),
+    (_ALTER_VIEW_RE, _alter_view),
+    (_DROP_VIEW_RE, _drop_view),
+    (_CREATE_FUNCTION_RE, _create_function),
+    (_ALTER_FUNCTION_RE, _alter_function),
+    (_DROP_FUNCTION_RE, _drop_function),
+    (_CREATE_POLICY_RE, _create_policy),
+    (_ALTER_POLICY_RE, _alter_policy),
+    (_DROP_POLICY_RE, _drop_policy),
+    (_GRANT_RE, _grant),
+    (_REVOKE_RE, _revoke),
+    (_DO_BLOCK_RE, _do_block),
+]
+
+
+def apply_statement(catalog, stmt, filename, line=None):
+    for pattern, handler in _HANDLERS:
+        match = pattern.match(stmt)
+        if match:
+            handler(catalog, stmt, filename, match, line)
+            return True
+    return False
+
+
+# Relations a statement (or a function body or policy inside it) reads or
+# writes. `INTO` alone is left out: in PL/pgSQL it names variables.
+_RELATION_REF_RE = re.compile(
+    r'(?<!DISTINCT )\b(?:FROM|JOIN|INSERT\s+INTO|UPDATE|REFERENCES|TABLE)\s+(?:ONLY\s+)?(?:IF\s+(?:NOT\s+)?EXISTS\s+)?(' + QNAME +
+    r')\b(?!\s*[(.])', re.IGNORECASE)
+# Comments inside function bodies, quoted text and quoted names with spaces
+# (policy names): prose, not SQL. One pass, so an apostrophe in a comment
+# never opens a string.
+_PROSE_RE = re.compile(r"--[^\n]*|/\*.*?\*/|'(?:[^']|'')*'|\"[^\"]*\"", re.DOTALL)
+# `trim(both '-' from slug)`, `extract(year from d)`: FROM here takes a value.
+_FROM_VALUE_RE = re.compile(r'\b(?:trim|extract|substring|overlay|position)\s*\([^()]*\)', re.IGNORECASE)
+_CTE_NAME_RE = re.compile(r'(' + IDENT + r')\s*(?:\([^()]*\))?\s+AS\s+(?:NOT\s+)?(?:MATERIALIZED\s+)?\(',
+                          re.IGNORECASE)
+_TEMP_TABLE_RE = re.compile(r'\bCREATE\s+(?:(?:GLOBAL|LOCAL)\s+)?(?:TEMP|TEMPORARY)\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(' +
+                            QNAME + r')', re.IGNORECASE)
+_FUNCTION_REF_RE = re.compile(r'\b(?:ON|ALTER)\s+FUNCTION\s+(' + QNAME + r')\s*\(', re.IGNORECASE)
+_NOT_RELATIONS = frozenset(('public', 'anon', 'authenticated', 'service_role', 'postgres', 'current_date', 'only',
+                            'lateral', 'select', 'unnest', 'if', 'of', 'on', 'or', 'set', 'to'))
+
+
+def _record_references(catalog, stmt, filename):
+    stmt = _PROSE_RE.sub(lambda m: m.group(0) if m.group(0).startswith('"') and not re.search(r'\s', m.group(0)) else ' ',
+                         stmt)
+    stmt = _FROM_VALUE_RE.sub(' ', stmt)
+    ctes = {normalize_ident(m.group(1)) for m in _CTE_NAME_RE.finditer(stmt)}
+    for match in _TEMP_TABLE_RE.finditer(stmt):
+        catalog["temporary"].setdefault(parse_qname(match.group(1))[1], filename)
+    for match in _RELATION_REF_RE.finditer(stmt):
+        schema, name = parse_qname(match.group(1))
+        if _tracked(schema) and name not in ctes and name not in _NOT_RELATIONS and not name.startswith('pg_'):
+            catalog["referenced"].setdefault(name, filename)
+    for match in _FUNCTION_REF_RE.finditer(stmt):
+        schema, name = parse_qname(match.group(1))
+        if _tracked(schema):
+            catalog["referenced_functions"].setdefault(name, filename)
+
+
+def referenced_tables(catalog):
+    """Relations the migration SQL uses but never creates or drops: they
+    exist in the database, created outside the migrations."""
+    return {name for name in catalog["referenced"]
+            if name not in catalog["tables"] and name not in catalog["views"] and name not in catalog["temporary"]}
+
+
+def referenced_functions(catalog):
+    """Functions the migration SQL grants, revokes or alters but never
+    creates or drops."""
+    return {name for name in catalog["referenced_functions"] if name not in catalog["functions"]}
+
+
+def replay_migration(catalog, sql, filename):
+    lines = LineIndex(sql)
+    for offset, stmt in split_statements(sql):
+        # Before applying, so a DROP forgets the relation it names.
+        _record_references(catalog, stmt, filename)
+        apply_statement(catalog, stmt, filename, lines.line(offset))
+    catalog["migrations"] += 1
+    return catalog
+
+
+# ---------------------------------------------------------------------------
+# Incremental build
+# ---------------------------------------------------------------------------
+
+def _checkpoint_dir(cache_dir):
+    return os.path.join(cache_dir, 'catalog')
+
+
+def migration_keys(migrations_dir=MIGRATIONS_DIR):
+    """Chain key after each migration: sha256(previous key, name, file hash).
+
+    Editing, inserting or renaming a migration changes the key of that file
+    and every later one, so only checkpoints before it stay valid.
+    """
+    keys = []
+    key = f"catalog-v{CATALOG_VERSION}"
+    for filename in list_migrations(migrations_dir):
+        with open(os.path.join(migrations_dir, filename), 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        key = hashlib.sha256(f"{key}:{filename}:{digest}".encode()).hexdigest()
+        keys.append((filename, key))
+    return keys
+
+
+def build_catalog(migrations_dir=MIGRATIONS_DIR, cache_dir=CACHE_DIR, use_cache=True, stats=None):
+    """Replay every migration in order, resuming from the newest checkpoint.
+
+    `stats`, when given, receives how many migrations there are and how
+    many had to be replayed past the checkpoint.
+    """
+    keys = migration_keys(migrations_dir)
+    checkpoints = _checkpoint_dir(cache_dir)
+
+    catalog = None
+    start = 0
+    if use_cache and os.path.isdir(checkpoints):
+        for i in range(len(keys) - 1, -1, -1):
+            path = os.path.join(checkpoints, keys[i][1] + '.json')
+            if os.path.exists(path):
+                try:
+                    with open(path, 'r') as f:
+                        catalog = json.load(f)
+                    start = i + 1
+                    break
+                except (OSError, ValueError):
+                    continue
+    if catalog is None:
+        catalog = new_catalog()
+
+    for i in range(start, len(keys)):
+        filename, key = keys[i]
+        with open(os.path.join(migrations_dir, filename), 'r', encoding='utf-8', errors='replace') as f:
+            replay_migration(catalog, f.read(), filename)
+        catalog["key"] = key
+        if use_cache and ((i + 1) % CHECKPOINT_INTERVAL == 0 or i == len(keys) - 1):
+            _write_checkpoint(checkpoints, key, catalog)
+
+    if stats is not None:
+        stats.update(migrations=len(keys), replayed=len(keys) - start)
+    if not keys:
+        catalog["key"] = f"catalog-v{CATALOG_VERSION}"
+    if use_cache and start < len(keys):
+        _prune_checkpoints(checkpoints, {k for _, k in keys})
+    return catalog
+
+
+def _write_checkpoint(checkpoints, key, catalog):
+    os.makedirs(checkpoints, exist_ok=True)
+    tmp = os.path.join(checkpoints, key + '.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(catalog, f, separators=(',', ':'))
+    os.replace(tmp, os.path.join(checkpoints, key + '.json'))
+
+
+def _prune_checkpoints(checkpoints, live_keys):
+    # Checkpoints from an abandoned migration history can never be resumed.
+    if not os.path.isdir(checkpoints):
+        return
+    for entry in os.listdir(checkpoints):
+        if entry.endswith('.json') and entry[:-5] not in live_keys:
+            os.remove(os.path.join(checkpoints, entry))
+
+
+def catalog_to_schema(catalog, include_partial=False):
+    # The {table: {column: type}} shape `parse_schema` returns.
+    return {
+        name: {col: definition["type"] for col, definition in table["columns"].items()}
+        for name, table in catalog["tables"].items()
+        if include_partial or not table["partial"]
+    }
+
+
+def catalog_to_functions(catalog):
+    # {function: [[{name, required}, ...] per overload]}: the input arguments
+    # a PostgREST /rpc call can name. Unnamed arguments have name None.
+    return {
+        name: [
+            [{"name": arg["name"], "required": arg["default"] is None}
+             for arg in overload["args"] if arg["mode"] != 'OUT']
+            for overload in overloads.values()
+        ]
+        for name, overloads in catalog["functions"].items()
+    }
+
+
+def partial_tables(catalog):
+    return {name for name, table in catalog["tables"].items() if table["partial"]}
+
+
+def table_security(catalog, tables=None):
+    """RLS, policy and grant summary per table, for the audit reports.
+
+    `tables` restricts (and orders) the result; names the migrations never
+    mention get an empty row with created_in None.
+    """
+    rows = {}
+    for name in (tables if tables is not None else sorted(catalog["tables"])):
+        table = catalog["tables"].get(name) or _new_table(None)
+        rows[name] = {
+            "name": name,
+            "created_in": table["created_in"],
+            "rls_enabled": table["rls_enabled"],
+            "rls_forced": table["rls_forced"],
+            "policies": sorted(table["policies"]),
+            "grants": sorted(table["grants"]),
+            "revoked": sorted(table["revoked"]),
+        }
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay supabase/migrations into a schema catalog.")
+    parser.add_argument('--migrations', default=MIGRATIONS_DIR)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--no-cache', action='store_true', help="Replay every migration from scratch")
+    parser.add_argument('--schema-only', action='store_true', help="Print the parse_schema-compatible shape")
+    parser.add_argument('--security', action='store_true', help="Print the per-table RLS/policy/grant summary")
+    args = parser.parse_args()
+
+    catalog = build_catalog(args.migrations, args.cache_dir, use_cache=not args.no_cache)
+    if args.schema_only:
+        output = catalog_to_schema(catalog)
+    elif args.security:
+        output = table_security(catalog)
+    else:
+        output = catalog
+    json.dump(output, sys.stdout, indent=2)
+    print()
@@ -0,0 +1,267 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+BASELINES_DIR = 'tests/visual/baselines'
+# What the verification scripts write (src/verify_building_form.py, tests/repro/verify_fix.py).
+DEFAULT_SCREENSHOTS = ('/home/jules/verification/building_form.png', 'tests/repro/screenshot.png')
+MASKS_FILE = 'masks.json'
+
+# Tiles are TILE x TILE pixels; the perceptual hash averages each into an
+# 8x8 luminance grid, so TILE must be a multiple of 8.
+TILE = 32
+HASH_GRID = 8
+LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+# Fixed odd multipliers: the exact tile checksum is a position-weighted sum
+# that wraps in uint64, so any single changed byte changes it.
+_WEIGHTS = {}
+OUTLINE = (255, 200, 0)
+
+
+def load(path):
+    with Image.open(path) as image:
+        return np.asarray(image.convert('RGB'))
+
+
+def apply_masks(image, masks):
+    """A copy of `image` with every (x, y, w, h) rectangle blacked out; `image` itself if there are none."""
+    if not masks:
+        return image
+    image = image.copy()
+    for x, y, w, h in masks:
+        image[max(y, 0):y + h, max(x, 0):x + w] = 0
+    return image
+
+
+def tiles(image, size=TILE):
+    """(rows, cols, size, size, channels) view of `image`, zero-padded to whole tiles."""
+    height, width = image.shape[:2]
+    pad_y, pad_x = -height % size, -width % size
+    if pad_y or pad_x:
+        image = np.pad(image, ((0, pad_y), (0, pad_x), (0, 0)))
+    rows, cols = image.shape[0] // size, image.shape[1] // size
+    return image.reshape(rows, size, cols, size, -1).swapaxes(1, 2)
+
+
+def _weights(length):
+    weights = _WEIGHTS.get(length)
+    if weights is None:
+        weights = np.random.default_rng(length).integers(1, 2 ** 63, size=length, dtype=np.uint64) | np.uint64(1)
+        _WEIGHTS[length] = weights
+    return weights
+
+
+def signatures(image, size=TILE):
+    """Per-tile {"checksum", "phash", "luma"} arrays, each shaped (rows, cols)."""
+    grid = tiles(image, size)
+    rows, cols = grid.shape[:2]
+    flat = grid.reshape(rows, cols, -1)
+    checksum = (flat.astype(np.uint64) * _weights(flat.shape[-1])).sum(axis=-1, dtype=np.uint64)
+
+    luma = grid.astype(np.float32) @ LUMA  # (rows, cols, size, size)
+    cell = size // HASH_GRID
+    blocks = luma.reshape(rows, cols, HASH_GRID, cell, HASH_GRID, cell).mean(axis=(3, 5))
+    means = blocks.mean(axis=(2, 3))
+    # Average hash: one bit per cell, set when the cell is brighter than the tile.
+    bits = (blocks > means[..., None, None]).reshape(rows, cols, HASH_GRID * HASH_GRID)
+    phash = np.packbits(bits, axis=-1).view('>u8')[..., 0]
+    return {"checksum": checksum, "phash": phash, "luma": means}
+
+
+def hamming(a, b):
+    return np.unpackbits((a ^ b).astype('>u8').view(np.uint8).reshape(a.shape + (8,)), axis=-1).sum(axis=-1)
+
+
+def _sidecar(baseline):
+    return os.path.splitext(baseline)[0] + '.tiles.npz'
+
+
+def baseline_signatures(baseline, masks, size=TILE):
+    """(signatures, shape) for `baseline`, from its sidecar when that matches the masks and tile size."""
+    try:
+        with np.load(_sidecar(baseline)) as data:
+            if (int(data["tile"]) == size and data["masks"].tolist() == [list(m) for m in masks]
+                    and os.path.getmtime(_sidecar(baseline)) >= os.path.getmtime(baseline)):
+                return ({"checksum": data["checksum"], "phash": data["phash"], "luma": data["luma"]},
+                        tuple(int(v) for v in data["shape"]))
+    except (OSError, KeyError, ValueError):
+        pass
+    image = apply_masks(load(baseline), masks)
+    return signatures(image, size), image.shape
+
+
+def write_baseline(screenshot, baseline, masks, size=TILE):
+    os.makedirs(os.path.dirname(baseline) or '.', exist_ok=True)
+    shutil.copyfile(screenshot, baseline)
+    image = apply_masks(load(baseline), masks)
+    np.savez(_sidecar(baseline), tile=size, shape=image.shape, masks=np.array(masks, dtype=np.int64).reshape(-1, 4),
+             **signatures(image, size))
+
+
+def heatmap(reference, diff, changed_tiles, size=TILE):
+    """The reference dimmed to grey, with changed pixels in red by how much they changed and changed tiles outlined."""
+    grey = (reference.astype(np.float32) @ LUMA * 0.35 + 90).astype(np.uint8)
+    out = np.repeat(grey[..., None], 3, axis=2)
+    strength = diff[:out.shape[0], :out.shape[1]].astype(np.float32) / 255
+    hot = strength > 0
+    out[hot, 0] = (160 + 95 * strength[hot]).astype(np.uint8)
+    out[hot, 1] = (out[hot, 1] * (1 - strength[hot])).astype(np.uint8)
+    out[hot, 2] = (out[hot, 2] * (1 - strength[hot])).astype(np.uint8)
+    height, width = grey.shape
+    for row, col in zip(*np.nonzero(changed_tiles)):
+        top, left = row * size, col * size
+        if top >= height or left >= width:
+            continue
+        bottom, right = min(top + size, height) - 1, min(left + size, width) - 1
+        out[top, left:right + 1] = out[bottom, left:right + 1] = OUTLINE
+        out[top:bottom + 1, left] = out[top:bottom + 1, right] = OUTLINE
+    return out
+
+
+def compare(screenshot, baseline, masks=(), tolerance=0, tile_threshold=0.0, hash_distance=None, out=None,
+            size=TILE):
+    """Tile-by-tile comparison of `screenshot` with `baseline`.
+
+    Tiles whose exact checksums match the baseline's stored ones are skipped
+    without decoding the baseline. With `hash_distance`, so are tiles whose
+    perceptual hash is within that many bits and whose mean luminance is
+    within `tolerance`: rendering noise, not a change. The rest are
+    compared pixel by pixel; a pixel differs when a channel moves by more
+    than `tolerance`, and a tile fails when more than `tile_threshold` of
+    its pixels differ.
+    """
+    start = time.perf_counter()
+    masks = [tuple(m) for m in masks]
+    image = apply_masks(load(screenshot), masks)
+    current = signatures(image, size)
+    expected, expected_shape = baseline_signatures(baseline, masks, size)
+
+    rows = min(current["checksum"].shape[0], expected["checksum"].shape[0])
+    cols = min(current["checksum"].shape[1], expected["checksum"].shape[1])
+    overlap = np.s_[:rows, :cols]
+    candidates = current["checksum"][overlap] != expected["checksum"][overlap]
+    if hash_distance is not None:
+        near = hamming(current["phash"][overlap], expected["phash"][overlap]) <= hash_distance
+        near &= np.abs(current["luma"][overlap] - expected["luma"][overlap]) <= tolerance
+        candidates &= ~near
+    # Tiles only one of the two images has are changed by definition.
+    outside = np.ones(current["checksum"].shape, dtype=bool)
+    outside[overlap] = False
+
+    total = current["checksum"].size
+    result = {"screenshot": screenshot, "baseline": baseline, "size": list(image.shape[:2]),
+              "baseline_size": list(expected_shape[:2]), "tiles": total,
+              "skipped": int(rows * cols - candidates.sum()), "compared": int(candidates.sum())}
+
+    changed = outside.copy()
+    diff = None
+    changed_pixels = int(outside.sum()) * size * size
+    if candidates.any():
+        reference = apply_masks(load(baseline), masks)
+        picked = np.nonzero(candidates)
+        a = tiles(image, size)[overlap][picked].astype(np.int16)
+        b = tiles(reference, size)[overlap][picked].astype(np.int16)
+        delta = np.abs(a - b).max(axis=-1)  # (k, size, size)
+        differing = delta > tolerance
+        counts = differing.sum(axis=(1, 2))
+        failing = counts > tile_threshold * size * size
+        changed[overlap][picked] = failing
+        changed_pixels += int(counts[failing].sum())
+        if out is not None:
+            grid = np.zeros(current["checksum"].shape + (size, size), dtype=np.uint8)
+            grid[:rows, :cols][picked] = np.where(differing, delta, 0).astype(np.uint8)
+            diff = grid.swapaxes(1, 2).reshape(grid.shape[0] * size, grid.shape[1] * size)
+
+    failed = bool(changed.any())
+    result.update(
+        status='failed' if failed else 'passed',
+        changed_tiles=int(changed.sum()),
+        changed_pixels=changed_pixels,
+        changed_ratio=round(changed_pixels / (image.shape[0] * image.shape[1]), 6),
+        regions=[[int(c) * size, int(r) * size, size, size] for r, c in zip(*np.nonzero(changed))][:50],
+    )
+    if failed and out is not None:
+        if diff is None:
+            diff = np.zeros((current["checksum"].shape[0] * size, current["checksum"].shape[1] * size), np.uint8)
+        os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+        Image.fromarray(heatmap(image, diff, changed, size)).save(out)
+        result["heatmap"] = out
+    result["ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return result
+
+
+def load_masks(baselines_dir):
+    try:
+        with open(os.path.join(baselines_dir, MASKS_FILE), 'r') as f:
+            return json.load(f)
+    except OSError:
+        return {}
+
+
+def _rectangle(text):
+    try:
+        x, y, w, h = (int(v) for v in text.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected x,y,w,h")
+    return x, y, w, h
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the verification scripts' screenshots with stored baselines, tile by tile, and write a "
+                    "heatmap of what changed.")
+    parser.add_argument('screenshots', nargs='*', help="PNG files to check (default: the verification screenshots "
+                                                       "that exist)")
+    parser.add_argument('--baselines', default=BASELINES_DIR, metavar='DIR',
+                        help=f"Baselines, one PNG per screenshot file name, plus an optional {MASKS_FILE} of "
+                             f"{{file name: [[x, y, w, h], ...]}} regions to ignore (default: {BASELINES_DIR})")
+    parser.add_argument('--out', default='test-results/visual', metavar='DIR', help="Where heatmaps go")
+    parser.add_argument('--mask', type=_rectangle, action='append', default=[], metavar='X,Y,W,H',
+                        help="Ignore this region in every screenshot (repeatable)")
+    parser.add_argument('--tolerance', type=int, default=0, metavar='N',
+                        help="Per-channel difference (0-255) a pixel may have and still match (default: 0)")
+    parser.add_argument('--tile-threshold', type=float, default=0.0, metavar='FRACTION',
+                        help="Fraction of a tile's pixels that may differ before it fails (default: 0)")
+    parser.add_argument('--hash-distance', type=int, metavar='BITS',
+                        help="Also skip tiles whose perceptual hash is within BITS of the baseline's and whose mean "
+                             "luminance is within --tolerance")
+    parser.add_argument('--tile', type=int, default=TILE, help=f"Tile size in pixels, a multiple of 8 (default: {TILE})")
+    parser.add_argument('--update', action='store_true', help="Store the screenshots as the new baselines")
+    args = parser.parse_args()
+    if args.tile <= 0 or args.tile % HASH_GRID:
+        parser.error("--tile must be a positive multiple of 8")
+
+    screenshots = args.screenshots or [p for p in DEFAULT_SCREENSHOTS if os.path.exists(p)]
+    if not screenshots:
+        sys.exit("No screenshots to check")
+    masks_by_name = load_masks(args.baselines)
+
+    report = []
+    for screenshot in screenshots:
+        name = os.path.basename(screenshot)
+        baseline = os.path.join(args.baselines, name)
+        masks = args.mask + [tuple(m) for m in masks_by_name.get(name, [])]
+        if args.update:
+            write_baseline(screenshot, baseline, masks, args.tile)
+            report.append({"screenshot": screenshot, "baseline": baseline, "status": 'updated'})
+        elif not os.path.exists(baseline):
+            report.append({"screenshot": screenshot, "baseline": baseline, "status": 'new'})
+        else:
+            out = os.path.join(args.out, os.path.splitext(name)[0] + '.diff.png')
+            report.append(compare(screenshot, baseline, masks, args.tolerance, args.tile_threshold,
+                                  args.hash_distance, out, args.tile))
+
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    if any(r["status"] == 'failed' for r in report):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
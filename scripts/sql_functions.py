@@ -0,0 +1,83 @@
+import argparse
+import functools
+import json
+import os
+import sys
+
+from schema_catalog import MIGRATIONS_DIR, build_catalog
+
+RULE = '-' * 66
+
+
+def live_overloads(catalog, name):
+    """The overloads of `name` in force after the last migration, oldest first."""
+    overloads = catalog["functions"].get(name, {})
+    return sorted(overloads.items(), key=lambda item: (item[1]["file"], item[1]["line"] or 0))
+
+
+@functools.lru_cache(maxsize=None)
+def _migration_lines(path):
+    with open(path, 'r') as f:
+        return f.read().splitlines()
+
+
+def definition_text(migrations_dir, overload):
+    # The statement's own lines, read back from the migration that last
+    # created it.
+    lines = _migration_lines(os.path.join(migrations_dir, overload["file"]))
+    return '\n'.join(lines[overload["line"] - 1:overload["end_line"]])
+
+
+def describe(name, key, overload):
+    return {
+        "name": name,
+        "signature": key,
+        "args": overload["args"],
+        "returns": overload["returns"],
+        "returns_set": overload["returns_set"],
+        "returns_table": overload["returns_table"],
+        "language": overload["language"],
+        "volatility": overload["volatility"],
+        "security_definer": overload["security_definer"],
+        "file": overload["file"],
+        "line": overload["line"],
+        "end_line": overload["end_line"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Print the latest definition of SQL functions, as left by supabase/migrations.")
+    parser.add_argument('names', nargs='*', help="Functions to show (default: all)")
+    parser.add_argument('--migrations', default=MIGRATIONS_DIR)
+    parser.add_argument('--json', action='store_true', help="Print signatures and attributes instead of SQL")
+    args = parser.parse_args()
+
+    catalog = build_catalog(args.migrations)
+    names = args.names or sorted(catalog["functions"])
+
+    if args.json:
+        json.dump([describe(name, key, overload) for name in names for key, overload in live_overloads(catalog, name)],
+                  sys.stdout, indent=2)
+        print()
+        return
+
+    for name in names:
+        print()
+        print(RULE)
+        print(f"FUNCTION: {name}")
+        print(RULE)
+        overloads = live_overloads(catalog, name)
+        if not overloads:
+            print(f"(no migration found defining {name})")
+            continue
+        for key, overload in overloads:
+            print(f"FILE: {os.path.join(args.migrations, overload['file'])}:{overload['line']}")
+            print(f"SIGNATURE: {name}({key})")
+            print()
+            print(definition_text(args.migrations, overload))
+            print("---END---")
+
+
+if __name__ == "__main__":
+    main()
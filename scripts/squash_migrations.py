@@ -0,0 +1,503 @@
+import argparse
+import datetime
+import json
+import os
+import re
+import shutil
+import sys
+
+from audit_profile import Profiler, add_arguments as add_profile_arguments
+from line_index import LineIndex
+from schema_catalog import (IDENT, MIGRATION_NAME_RE, MIGRATIONS_DIR, QNAME, apply_statement, function_args,
+                            list_migrations, matching_paren, new_catalog, parse_qname, signature_key,
+                            split_statements, split_top_level)
+VERSION_FORMAT = '%Y%m%d%H%M%S'
+
+# Catalog fields that record where something was defined rather than what.
+_PROVENANCE = frozenset(('created_in', 'file', 'line', 'end_line', 'migrations', 'key'))
+
+_WORD_RE = re.compile(r'[a-z_][a-z0-9_$]*')
+_CASCADE_RE = re.compile(r'\bCASCADE\s*;?\s*$', re.IGNORECASE)
+
+# (pattern, kind, action); the first group names the object, a second the
+# table it belongs to. `touch` statements change an object without
+# creating it; they live and die with it.
+_CREATE_FUNCTION_RE = re.compile(r'CREATE\s+(OR\s+REPLACE\s+)?(?:FUNCTION|PROCEDURE)\s+(' + QNAME + r')\s*\(',
+                                 re.IGNORECASE)
+_FUNCTION_TARGET_RE = re.compile(
+    r'(?:ALTER|COMMENT\s+ON)\s+(?:FUNCTION|PROCEDURE|ROUTINE)\s+(' + QNAME + r')\s*\(', re.IGNORECASE)
+_DROP_FUNCTION_RE = re.compile(r'DROP\s+(?:FUNCTION|PROCEDURE|ROUTINE)\s+(IF\s+EXISTS\s+)?(.*?)'
+                               r'(?:\s+(?:CASCADE|RESTRICT))?\s*;?$', re.IGNORECASE | re.DOTALL)
+_CREATE_TABLE_RE = re.compile(r'CREATE\s+(?:UNLOGGED\s+)?TABLE\s+(IF\s+NOT\s+EXISTS\s+)?(' + QNAME + r')',
+                              re.IGNORECASE)
+_CREATE_VIEW_RE = re.compile(r'CREATE\s+(OR\s+REPLACE\s+)?(?:MATERIALIZED\s+)?VIEW\s+(IF\s+NOT\s+EXISTS\s+)?('
+                             + QNAME + r')', re.IGNORECASE)
+_CREATE_INDEX_RE = re.compile(r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?(IF\s+NOT\s+EXISTS\s+)?(?:('
+                              + IDENT + r')\s+)?ON\s+(?:ONLY\s+)?(' + QNAME + r')', re.IGNORECASE)
+_CREATE_POLICY_RE = re.compile(r'CREATE\s+POLICY\s+(' + IDENT + r')\s+ON\s+(' + QNAME + r')', re.IGNORECASE)
+_CREATE_TRIGGER_RE = re.compile(r'CREATE\s+(OR\s+REPLACE\s+)?(?:CONSTRAINT\s+)?TRIGGER\s+(' + IDENT + r')\s.*?\bON\s+('
+                                + QNAME + r')', re.IGNORECASE | re.DOTALL)
+_CREATE_TYPE_RE = re.compile(r'CREATE\s+TYPE\s+(' + QNAME + r')\s+AS\b', re.IGNORECASE)
+_DROP_RE = re.compile(r'DROP\s+(TABLE|(?:MATERIALIZED\s+)?VIEW|INDEX|TYPE)\s+(?:CONCURRENTLY\s+)?(IF\s+EXISTS\s+)?(.*?)'
+                      r'(?:\s+(?:CASCADE|RESTRICT))?\s*;?$', re.IGNORECASE | re.DOTALL)
+_DROP_ON_TABLE_RE = re.compile(r'DROP\s+(POLICY|TRIGGER)\s+(IF\s+EXISTS\s+)?(' + IDENT + r')\s+ON\s+(' + QNAME + r')',
+                               re.IGNORECASE)
+_ALTER_RE = re.compile(r'ALTER\s+(TABLE|(?:MATERIALIZED\s+)?VIEW|INDEX|TYPE)\s+(?:IF\s+EXISTS\s+)?(?:ONLY\s+)?('
+                       + QNAME + r')\s*(.*)$', re.IGNORECASE | re.DOTALL)
+_ALTER_ON_TABLE_RE = re.compile(r'ALTER\s+(POLICY|TRIGGER)\s+(' + IDENT + r')\s+ON\s+(' + QNAME + r')\s*(.*)$',
+                                re.IGNORECASE | re.DOTALL)
+_COMMENT_RE = re.compile(r'COMMENT\s+ON\s+(TABLE|VIEW|MATERIALIZED\s+VIEW|INDEX|TYPE)\s+(' + QNAME + r')',
+                         re.IGNORECASE)
+_COMMENT_COLUMN_RE = re.compile(r'COMMENT\s+ON\s+COLUMN\s+((?:' + IDENT + r'\s*\.\s*){1,2})' + IDENT, re.IGNORECASE)
+_COMMENT_ON_TABLE_RE = re.compile(r'COMMENT\s+ON\s+(POLICY|TRIGGER)\s+(' + IDENT + r')\s+ON\s+(' + QNAME + r')',
+                                  re.IGNORECASE)
+_PRIVILEGE_RE = re.compile(r'(?:GRANT|REVOKE)\s+.*?\s+ON\s+(?:(TABLE|FUNCTION|PROCEDURE|ROUTINE)\s+)?(.*?)\s+'
+                           r'(?:TO|FROM)\s', re.IGNORECASE | re.DOTALL)
+_RENAME_RE = re.compile(r'^RENAME\s+TO\s+(' + IDENT + r')', re.IGNORECASE)
+_NOT_PRIVILEGE_TARGETS = re.compile(r'^(?:ALL\s|SCHEMA\s|SEQUENCE\s|TYPE\s|DOMAIN\s|DATABASE\s|LANGUAGE\s|'
+                                    r'FOREIGN\s|LARGE\s|TABLESPACE\s)', re.IGNORECASE)
+
+
+# ---------------------------------------------------------------------------
+# Ordering hazards
+# ---------------------------------------------------------------------------
+
+def parse_version(version):
+    """The datetime a migration version stands for, or None when it is not a valid timestamp."""
+    if len(version) not in (8, 12, 14):
+        return None
+    try:
+        return datetime.datetime.strptime(version.ljust(14, '0'), VERSION_FORMAT)
+    except ValueError:
+        return None
+
+
+def migration_hazards(migrations_dir=MIGRATIONS_DIR, now=None):
+    """[{kind, files, detail}] for file names the Supabase CLI orders or applies unexpectedly.
+
+    - untimestamped: not `<version>_<name>.sql`; the CLI (and
+      schema_catalog.list_migrations) skips it.
+    - duplicate-version: versions are the primary key of the remote
+      supabase_migrations.schema_migrations table, so only one is recorded.
+    - invalid-timestamp / short-version: the version is not a valid
+      YYYYMMDDHHMMSS, so its position does not follow its date.
+    - out-of-order: lexical order (what the CLI applies) disagrees with
+      the order of the timestamps.
+    - future-timestamp: every migration created today sorts before it.
+    """
+    now = now or datetime.datetime.now()
+    hazards = []
+    versions = {}
+    dated = []
+    for filename in sorted(os.listdir(migrations_dir)):
+        match = MIGRATION_NAME_RE.match(filename)
+        if match is None:
+            hazards.append({"kind": "untimestamped", "files": [filename],
+                            "detail": "skipped by the Supabase CLI (name must be <timestamp>_name.sql)"})
+            continue
+        version = match.group(1)
+        versions.setdefault(version, []).append(filename)
+        when = parse_version(version)
+        if when is None:
+            hazards.append({"kind": "invalid-timestamp", "files": [filename],
+                            "detail": f"{version} is not a valid YYYYMMDDHHMMSS timestamp"})
+            continue
+        if len(version) != 14:
+            hazards.append({"kind": "short-version", "files": [filename],
+                            "detail": f"{len(version)}-digit version sorts after every 14-digit version "
+                                      f"starting {version}"})
+        if when > now:
+            hazards.append({"kind": "future-timestamp", "files": [filename],
+                            "detail": f"dated {when:%Y-%m-%d %H:%M}; newly created migrations will sort before it"})
+        dated.append((when, filename))
+
+    for version, files in versions.items():
+        if len(files) > 1:
+            hazards.append({"kind": "duplicate-version", "files": files,
+                            "detail": f"{len(files)} files share version {version}; schema_migrations records one"})
+
+    latest = None
+    for when, filename in dated:  # lexical order
+        if latest is not None and when < latest[0]:
+            hazards.append({"kind": "out-of-order", "files": [latest[1], filename],
+                            "detail": f"{filename} is dated before {latest[1]} but applied after it"})
+        if latest is None or when >= latest[0]:
+            latest = (when, filename)
+
+    hazards.sort(key=lambda h: (h["kind"], h["files"]))
+    return hazards
+
+
+# ---------------------------------------------------------------------------
+# Statement effects
+# ---------------------------------------------------------------------------
+
+def _name(qname):
+    return parse_qname(qname)[1].lower()
+
+
+def _function_keys(text):
+    # "f(int), public.g" -> [('function', 'f', 'integer'), ('function', 'g', None)]
+    keys = []
+    for item in split_top_level(text):
+        paren = item.find('(')
+        name = _name(item[:paren] if paren != -1 else item)
+        if paren == -1:
+            keys.append(('function', name, None))
+        else:
+            close = matching_paren(item, paren)
+            keys.append(('function', name, signature_key(function_args(item[paren + 1:close if close != -1 else None]))))
+    return keys
+
+
+def _function_key(stmt, match, name_group):
+    paren = match.end() - 1
+    close = matching_paren(stmt, paren)
+    return ('function', _name(match.group(name_group)),
+            signature_key(function_args(stmt[paren + 1:close if close != -1 else None])))
+
+
+def _effect(action, keys, **extra):
+    effect = {"action": action, "keys": keys, "replace": False, "if_not_exists": False, "if_exists": False,
+              "cascade": False, "parents": []}
+    effect.update(extra)
+    return effect
+
+
+def statement_effect(stmt):
+    """What one statement does to the objects the squash tracks.
+
+    Returns {action, keys, replace, if_not_exists, if_exists, cascade,
+    parents}; action is 'define', 'drop', 'touch', 'rename' or None (an
+    opaque statement: DML, DO blocks, extensions...). Keys are ('table',
+    name), ('function', name, signature), ('policy', table, name) and so
+    on; `parents` are the tables an index, policy or trigger belongs to.
+    """
+    match = _CREATE_FUNCTION_RE.match(stmt)
+    if match:
+        return _effect('define', [_function_key(stmt, match, 2)], replace=bool(match.group(1)))
+    match = _FUNCTION_TARGET_RE.match(stmt)
+    if match:
+        key = _function_key(stmt, match, 1)
+        close = matching_paren(stmt, match.end() - 1)
+        if close != -1 and _RENAME_RE.match(stmt[close + 1:].strip()):
+            return _effect('rename', [key, ('function', _RENAME_RE.match(stmt[close + 1:].strip()).group(1).lower(),
+                                            key[2])])
+        return _effect('touch', [key])
+    match = _DROP_FUNCTION_RE.match(stmt)
+    if match:
+        return _effect('drop', _function_keys(match.group(2)), if_exists=bool(match.group(1)),
+                       cascade=bool(_CASCADE_RE.search(stmt)))
+    match = _CREATE_TABLE_RE.match(stmt)
+    if match:
+        return _effect('define', [('table', _name(match.group(2)))], if_not_exists=bool(match.group(1)))
+    match = _CREATE_VIEW_RE.match(stmt)
+    if match:
+        return _effect('define', [('view', _name(match.group(3)))], replace=bool(match.group(1)),
+                       if_not_exists=bool(match.group(2)))
+    match = _CREATE_INDEX_RE.match(stmt)
+    if match:
+        table = ('table', _name(match.group(3)))
+        if match.group(2) is None:
+            return _effect('touch', [table])
+        return _effect('define', [('index', _name(match.group(2)))], if_not_exists=bool(match.group(1)),
+                       parents=[table])
+    match = _CREATE_POLICY_RE.match(stmt)
+    if match:
+        table = _name(match.group(2))
+        return _effect('define', [('policy', table, _name(match.group(1)))], parents=[('table', table)])
+    match = _CREATE_TRIGGER_RE.match(stmt)
+    if match:
+        table = _name(match.group(3))
+        return _effect('define', [('trigger', table, _name(match.group(2)))], replace=bool(match.group(1)),
+                       parents=[('table', table)])
+    match = _CREATE_TYPE_RE.match(stmt)
+    if match:
+        return _effect('define', [('type', _name(match.group(1)))])
+    match = _DROP_RE.match(stmt)
+    if match:
+        kind = 'view' if match.group(1).upper().endswith('VIEW') else match.group(1).lower()
+        return _effect('drop', [(kind, _name(n)) for n in split_top_level(match.group(3)) if n],
+                       if_exists=bool(match.group(2)), cascade=bool(_CASCADE_RE.search(stmt)))
+    match = _DROP_ON_TABLE_RE.match(stmt)
+    if match:
+        return _effect('drop', [(match.group(1).lower(), _name(match.group(4)), _name(match.group(3)))],
+                       if_exists=bool(match.group(2)), cascade=bool(_CASCADE_RE.search(stmt)))
+    match = _ALTER_RE.match(stmt)
+    if match:
+        kind = 'view' if match.group(1).upper().endswith('VIEW') else match.group(1).lower()
+        key = (kind, _name(match.group(2)))
+        rename = _RENAME_RE.match(match.group(3))
+        if rename:
+            return _effect('rename', [key, (kind, rename.group(1).lower())])
+        return _effect('touch', [key])
+    match = _ALTER_ON_TABLE_RE.match(stmt)
+    if match:
+        key = (match.group(1).lower(), _name(match.group(3)), _name(match.group(2)))
+        rename = _RENAME_RE.match(match.group(4))
+        if rename:
+            return _effect('rename', [key, (key[0], key[1], rename.group(1).lower())])
+        return _effect('touch', [key])
+    match = _COMMENT_COLUMN_RE.match(stmt)
+    if match:
+        return _effect('touch', [('table', _name(match.group(1).strip().rstrip('.')))])
+    match = _COMMENT_RE.match(stmt)
+    if match:
+        kind = match.group(1).lower()
+        return _effect('touch', [('view' if kind.endswith('view') else kind, _name(match.group(2)))])
+    match = _COMMENT_ON_TABLE_RE.match(stmt)
+    if match:
+        return _effect('touch', [(match.group(1).lower(), _name(match.group(3)), _name(match.group(2)))])
+    match = _PRIVILEGE_RE.match(stmt)
+    if match and not _NOT_PRIVILEGE_TARGETS.match(match.group(2)):
+        if match.group(1) and match.group(1).upper() != 'TABLE':
+            return _effect('touch', _function_keys(match.group(2)))
+        return _effect('touch', [('table', _name(n)) for n in split_top_level(match.group(2)) if n])
+    return _effect(None, [])
+
+
+def _mention(key):
+    # The words a statement that depends on the object would contain
+    # ("Users can read" policies are quoted).
+    return frozenset(_WORD_RE.findall(key[2] if key[0] in ('policy', 'trigger') else key[1]))
+
+
+# ---------------------------------------------------------------------------
+# Squash
+# ---------------------------------------------------------------------------
+
+def load_statements(migrations_dir, files):
+    """[{file, line, sql, text, effect, words}] for every statement in `files`, in order.
+
+    `sql` has comments blanked out, as schema_catalog replays it; `text` is
+    the original, comments included, for the baseline.
+    """
+    statements = []
+    for filename in files:
+        with open(os.path.join(migrations_dir, filename), 'r', encoding='utf-8', errors='replace') as f:
+            sql = f.read()
+        lines = LineIndex(sql)
+        for offset, stmt in split_statements(sql):
+            statements.append({
+                "file": filename,
+                "line": lines.line(offset),
+                # The original text, comments included: split_statements
+                # blanks them out without moving anything.
+                "sql": stmt,
+                "text": sql[offset:offset + len(stmt)],
+                "effect": statement_effect(stmt),
+                "words": frozenset(_WORD_RE.findall(stmt.lower())),
+            })
+    return statements
+
+
+def eliminate(statements):
+    """Mark statements whose effect a later statement undoes; returns {reason: count}.
+
+    A statement is only removed when nothing kept in between can have
+    depended on it: no statement outside the object's own history between
+    its definition and the one that supersedes or drops it mentions the
+    object by name. Objects that are renamed, dropped with CASCADE, or
+    dropped several to a statement are left alone.
+    """
+    for statement in statements:
+        statement["keep"] = True
+    live = {}
+    pinned = set()
+    seen = set()
+    removed = {}
+
+    def count(reason, n=1):
+        removed[reason] = removed.get(reason, 0) + n
+
+    def untouched(start, end, own, words):
+        return not any(statements[k]["keep"] and k not in own and words <= statements[k]["words"]
+                       for k in range(start + 1, end))
+
+    def history(entry):
+        own = {entry["define"], *entry["touches"], *entry["earlier"]}
+        for child in entry["children"]:
+            own |= history(child)
+        return own
+
+    for i, statement in enumerate(statements):
+        effect = statement["effect"]
+        action = effect["action"]
+        if action == 'rename':
+            pinned.update(effect["keys"])
+            for key in effect["keys"]:
+                live.pop(key, None)
+        elif action == 'define':
+            for key in effect["keys"]:
+                previous = live.get(key)
+                if previous is not None and key not in pinned:
+                    if effect["if_not_exists"]:
+                        statement["keep"] = False
+                        count("create-if-not-exists of a live object")
+                        break
+                    if (effect["replace"] and not previous["touches"] and not previous["children"]
+                            and untouched(previous["define"], i, {previous["define"]}, _mention(key))):
+                        statements[previous["define"]]["keep"] = False
+                        count(f"{key[0]} replaced later")
+                # A kept earlier definition is part of this one's history: dropping
+                # the object later has to take both out, or the earlier one survives.
+                entry = {"define": i, "touches": [], "children": [], "parent": None,
+                         "start": i, "earlier": set()}
+                if previous is not None and key not in pinned:
+                    entry["start"] = previous["start"]
+                    entry["earlier"] = history(previous)
+                for parent in effect["parents"]:
+                    if parent in live:
+                        live[parent]["children"].append(entry)
+                        entry["parent"] = live[parent]
+                live[key] = entry
+        elif action == 'drop':
+            keys = []
+            for key in effect["keys"]:
+                if key[0] == 'function' and key[2] is None:
+                    keys.extend(k for k in live if k[0] == 'function' and k[1] == key[1])
+                    if not any(k[0] == 'function' and k[1] == key[1] for k in live):
+                        keys.append(key)
+                else:
+                    keys.append(key)
+            for key in keys:
+                entry = live.pop(key, None)
+                if entry is not None and entry["parent"] is not None:
+                    entry["parent"]["children"].remove(entry)
+                if entry is None:
+                    # Never created and never mentioned: a no-op on a fresh database.
+                    if (effect["if_exists"] and len(keys) == 1 and key not in pinned
+                            and not _mention(key) <= seen):
+                        statement["keep"] = False
+                        count("drop-if-exists of a missing object")
+                    continue
+                for stale in [k for k, e in live.items() if e["parent"] is entry]:
+                    live.pop(stale)
+                if len(keys) > 1 or effect["cascade"] or key in pinned:
+                    continue
+                own = history(entry)
+                if untouched(entry["start"], i, own, _mention(key)):
+                    for k in own:
+                        statements[k]["keep"] = False
+                    statement["keep"] = False
+                    count(f"{key[0]} created then dropped", len(own) + 1)
+        elif action == 'touch':
+            for key in effect["keys"]:
+                if key in live:
+                    live[key]["touches"].append(i)
+        seen |= statement["words"]
+    return removed
+
+
+def _normalized(value):
+    if isinstance(value, dict):
+        return {k: _normalized(v) for k, v in value.items() if k not in _PROVENANCE}
+    if isinstance(value, list):
+        return [_normalized(v) for v in value]
+    return value
+
+
+def catalog_difference(statements):
+    """Top-level catalog sections that differ between replaying every statement and only the kept ones."""
+    full, squashed = new_catalog(), new_catalog()
+    for statement in statements:
+        apply_statement(full, statement["sql"], statement["file"], statement["line"])
+        if statement["keep"]:
+            apply_statement(squashed, statement["sql"], statement["file"], statement["line"])
+    differences = []
+    for section in ('tables', 'indexes', 'enums', 'views', 'functions'):
+        before, after = _normalized(full[section]), _normalized(squashed[section])
+        for name in sorted(set(before) | set(after)):
+            if before.get(name) != after.get(name):
+                differences.append(f"{section}.{name}")
+    return differences
+
+
+def render_baseline(statements, first, last):
+    parts = [f"-- Baseline squashed from {first} .. {last} by scripts/squash_migrations.py.\n"
+             f"-- Statements a later migration undoes have been left out; the rest are verbatim.\n"]
+    current = None
+    for statement in statements:
+        if not statement["keep"]:
+            continue
+        if statement["file"] != current:
+            current = statement["file"]
+            parts.append(f"\n-- {current}\n")
+        text = statement["text"]
+        parts.append(text if text.endswith(';') else text + ';')
+        parts.append('\n')
+    return ''.join(parts)
+
+
+def squash(migrations_dir=MIGRATIONS_DIR, through=None):
+    """(statements, files squashed, files after) for a baseline through version `through` (default: all)."""
+    files = list_migrations(migrations_dir)
+    if through is not None:
+        squashed = [f for f in files if MIGRATION_NAME_RE.match(f).group(1) <= through]
+    else:
+        squashed = files
+    after = files[len(squashed):]
+    statements = load_statements(migrations_dir, squashed)
+    return statements, squashed, after
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Squash supabase/migrations into one baseline file plus the migrations after it, and report "
+                    "file names the Supabase CLI orders or applies unexpectedly.")
+    parser.add_argument('--migrations', default=MIGRATIONS_DIR)
+    parser.add_argument('--through', metavar='VERSION',
+                        help="Squash migrations up to and including this version (default: all)")
+    parser.add_argument('--out', default='supabase/squashed', metavar='DIR',
+                        help="Directory for the baseline and the later migrations (default: supabase/squashed)")
+    parser.add_argument('--check', action='store_true',
+                        help="Only report hazards and what the squash would remove; write nothing")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    profiler = Profiler.from_args('squash_migrations', args)
+    with profiler.phase('hazards'):
+        hazards = migration_hazards(args.migrations)
+    with profiler.phase('read'):
+        statements, squashed, after = squash(args.migrations, args.through)
+    if not squashed:
+        sys.exit(f"No migrations at or before {args.through}")
+    with profiler.phase('eliminate'):
+        removed = eliminate(statements)
+    with profiler.phase('verify'):
+        differences = catalog_difference(statements)
+
+    version = MIGRATION_NAME_RE.match(squashed[-1]).group(1)
+    baseline = f"{version}_baseline.sql"
+    report = {
+        "baseline": baseline,
+        "squashed_files": len(squashed),
+        "statements": len(statements),
+        "kept": sum(1 for s in statements if s["keep"]),
+        "removed": removed,
+        "after": after,
+        "catalog_differences": differences,
+        "hazards": hazards,
+    }
+    if not args.check:
+        if differences:
+            sys.exit("The squashed history replays to a different catalog: " + ', '.join(differences[:10]))
+        if os.path.abspath(args.out) == os.path.abspath(args.migrations):
+            sys.exit("--out must not be the migrations directory")
+        if os.path.isdir(args.out) and os.listdir(args.out):
+            sys.exit(f"{args.out} is not empty; remove it or pick another --out")
+        with profiler.phase('write'):
+            os.makedirs(args.out, exist_ok=True)
+            with open(os.path.join(args.out, baseline), 'w') as f:
+                f.write(render_baseline(statements, squashed[0], squashed[-1]))
+            for filename in after:
+                shutil.copy2(os.path.join(args.migrations, filename), os.path.join(args.out, filename))
+        report["out"] = args.out
+    with profiler.phase('report'):
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    profiler.finish()
+
+
+if __name__ == "__main__":
+    main()
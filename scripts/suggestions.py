@@ -0,0 +1,184 @@
+import bisect
+import difflib
+import heapq
+import math
+from collections import Counter
+
+# difflib.get_close_matches' default: below this ratio nothing is suggested.
+DEFAULT_CUTOFF = 0.6
+
+
+def trigrams(word):
+    # Padded so one- and two-letter names still get grams, and so prefixes
+    # and suffixes weigh a little more than interior matches.
+    padded = f"^{word}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SuggestionIndex:
+    """"Did you mean" lookups over a fixed vocabulary (table or column names).
+
+    Scores are exactly difflib's SequenceMatcher ratio, and ties are broken
+    the way get_close_matches breaks them, so `best(word)` returns what
+    `get_close_matches(word, words, n=1)` would. Trigram postings order the
+    candidates so the likeliest are scored first; the running k-th best score
+    then prunes everyone else by length and character counts before the
+    quadratic ratio is computed. Lookups are memoised, since a bad rename
+    repeats the same invalid name across many call sites.
+    """
+
+    def __init__(self, words):
+        self.words = sorted(set(words))
+        self.postings = {}
+        for i, word in enumerate(self.words):
+            for gram in trigrams(word):
+                self.postings.setdefault(gram, []).append(i)
+        # (length, index) pairs, so the lengths that can reach the cutoff are
+        # one bisect away.
+        self.by_length = sorted((len(word), i) for i, word in enumerate(self.words))
+        self._memo = {}
+        self.lookups = 0
+
+    def __len__(self):
+        return len(self.words)
+
+    def top(self, word, k=3, cutoff=DEFAULT_CUTOFF):
+        """The k best [(candidate, score), ...] with score >= cutoff, best first."""
+        self.lookups += 1
+        key = (word, k, cutoff)
+        matches = self._memo.get(key)
+        if matches is None:
+            matches = self._memo[key] = self._search(word, k, cutoff)
+        return matches
+
+    def best(self, word, cutoff=DEFAULT_CUTOFF):
+        matches = self.top(word, 1, cutoff)
+        return matches[0][0] if matches else None
+
+    def _search(self, word, k, cutoff):
+        if not word or not self.words or k <= 0:
+            return []
+
+        # ratio = 2*M / (len(a) + len(b)) and M <= the shorter length, so only
+        # this window of lengths can score at least `cutoff`.
+        size = len(word)
+        low = math.ceil(size * cutoff / (2.0 - cutoff) - 1e-9)
+        high = math.floor(size * (2.0 - cutoff) / cutoff + 1e-9) if cutoff > 0 else math.inf
+        window = self.by_length[bisect.bisect_left(self.by_length, (low, -1)):
+                                bisect.bisect_right(self.by_length, (high, len(self.words)))]
+        if not window:
+            return []
+
+        shared = Counter()
+        for gram in trigrams(word):
+            for i in self.postings.get(gram, ()):
+                shared[i] += 1
+        eligible = {i for _, i in window}
+        order = [i for i, _ in shared.most_common() if i in eligible]
+        # The rest by their length bound, best first, so the scan can stop at
+        # the first one that cannot beat the current k-th score.
+        rest = [i for _, i in window if i not in shared]
+        rest.sort(key=lambda i: abs(len(self.words[i]) - size))
+        shortlisted = len(order)
+        order += rest
+
+        # Same orientation as get_close_matches: the word is seq2, whose
+        # character index is built once and reused for every candidate.
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(word)
+        found = []  # min-heap of (score, candidate), at most k entries
+        for position, i in enumerate(order):
+            candidate = self.words[i]
+            floor = found[0][0] if len(found) == k else cutoff
+            # real_quick_ratio and quick_ratio are upper bounds on ratio.
+            if 2.0 * min(size, len(candidate)) / (size + len(candidate)) < floor:
+                if position >= shortlisted:
+                    break
+                continue
+            matcher.set_seq1(candidate)
+            if matcher.quick_ratio() < floor:
+                continue
+            score = matcher.ratio()
+            if score < cutoff:
+                continue
+            if len(found) < k:
+                heapq.heappush(found, (score, candidate))
+            elif (score, candidate) > found[0]:
+                heapq.heapreplace(found, (score, candidate))
+
+        return [(candidate, score) for score, candidate in sorted(found, reverse=True)]
+
+
+class SchemaSuggestions:
+    """Suggestion indexes for one schema, built once per run.
+
+    The table and function indexes are built up front; a table's column
+    index, or a function's argument index, is built the first time one of its
+    names needs a suggestion. `functions` is the shape
+    `catalog_to_functions` returns.
+    """
+
+    def __init__(self, schema, functions=None):
+        self.schema = schema
+        self.tables = SuggestionIndex(schema)
+        self._columns = {}
+        self.signatures = functions or {}
+        self.functions = SuggestionIndex(self.signatures)
+        self._arguments = {}
+
+    def columns(self, table):
+        index = self._columns.get(table)
+        if index is None:
+            index = self._columns[table] = SuggestionIndex(self.schema.get(table, {}))
+        return index
+
+    def table(self, name):
+        return self.tables.best(name)
+
+    def column(self, table, name):
+        return self.columns(table).best(name)
+
+    def arguments(self, function):
+        index = self._arguments.get(function)
+        if index is None:
+            names = {arg["name"] for overload in self.signatures.get(function, ()) for arg in overload
+                     if arg["name"]}
+            index = self._arguments[function] = SuggestionIndex(names)
+        return index
+
+    def function(self, name):
+        return self.functions.best(name)
+
+    def argument(self, function, name):
+        return self.arguments(function).best(name)
+
+    def memo_stats(self):
+        """(memo hits, lookups) across every index built so far."""
+        indexes = [self.tables, self.functions, *self._columns.values(), *self._arguments.values()]
+        lookups = sum(index.lookups for index in indexes)
+        return lookups - sum(len(index._memo) for index in indexes), lookups
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    from schema_catalog import build_catalog, catalog_to_functions, catalog_to_schema
+
+    parser = argparse.ArgumentParser(
+        description="Show the closest table, column, function or argument names for a misspelt name.")
+    parser.add_argument('name')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--table', help="Suggest a column of this table instead of a table")
+    target.add_argument('--function', nargs='?', const='', metavar='NAME',
+                        help="Suggest a function, or with NAME an argument of that function")
+    parser.add_argument('-k', type=int, default=3, help="Number of candidates (default: 3)")
+    args = parser.parse_args()
+
+    catalog = build_catalog()
+    suggestions = SchemaSuggestions(catalog_to_schema(catalog, include_partial=True), catalog_to_functions(catalog))
+    if args.function is not None:
+        index = suggestions.arguments(args.function) if args.function else suggestions.functions
+    else:
+        index = suggestions.columns(args.table) if args.table else suggestions.tables
+    print(json.dumps([{"name": name, "score": round(score, 4)} for name, score in index.top(args.name, args.k)],
+                     indent=2))
@@ -0,0 +1,102 @@
+import os
+import re
+import sys
+
+from line_index import LineIndex
+
+# Directories the Data API audits search for `.from('<table>')` calls.
+DEFAULT_ROOTS = ('src', 'app', 'apps', 'packages')
+
+# Only source files can contain query-builder calls; skipping assets keeps the
+# single walk cheap on the ~1,100 file tree.
+SOURCE_EXTENSIONS = ('.ts', '.tsx', '.js', '.jsx', '.mjs', '.cjs')
+
+EXCLUDED_DIRS = ('node_modules', '.git')
+
+
+def iter_source_files(roots=DEFAULT_ROOTS, extensions=SOURCE_EXTENSIONS):
+    # extensions=None walks every file, as `grep -r` does.
+    for root_dir in roots:
+        if os.path.isfile(root_dir):
+            if extensions is None or root_dir.endswith(extensions):
+                yield root_dir
+            continue
+        for root, dirs, files in os.walk(root_dir):
+            dirs[:] = [d for d in dirs if d not in EXCLUDED_DIRS]
+            for file in files:
+                if extensions is None or file.endswith(extensions):
+                    yield os.path.join(root, file)
+
+
+def compile_table_matcher(tables=None):
+    # One alternation for every table instead of one grep per table. Longest
+    # names first so `user_buildings` is never shadowed by a shorter prefix.
+    if tables is None:
+        names = r"\w+"
+    else:
+        names = "|".join(re.escape(t) for t in sorted(set(tables), key=len, reverse=True))
+        if not names:
+            return None
+    return re.compile(r"\.from\(['\"](" + names + r")['\"]\)")
+
+
+def scan_table_references(tables=None, roots=DEFAULT_ROOTS, extensions=SOURCE_EXTENSIONS):
+    """Walk `roots` once and collect every `.from('<table>')` call.
+
+    Returns {table: {"count": int, "locations": [(path, line, column), ...]}}.
+    Every requested table is present in the result, with a zero count when it
+    is never referenced. When `tables` is None, every referenced table is
+    reported.
+    """
+    refs = {t: {"count": 0, "locations": []} for t in (tables or ())}
+    matcher = compile_table_matcher(tables)
+    if matcher is None:
+        return refs
+
+    for filepath in iter_source_files(roots, extensions):
+        try:
+            with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
+                content = f.read()
+        except OSError as e:
+            print(f"Error reading {filepath}: {e}", file=sys.stderr)
+            continue
+
+        lines = None
+        for match in matcher.finditer(content):
+            if lines is None:
+                lines = LineIndex(content)
+            line, column = lines.position(match.start())
+
+            entry = refs.setdefault(match.group(1), {"count": 0, "locations": []})
+            entry["count"] += 1
+            entry["locations"].append((filepath, line, column))
+
+    return refs
+
+
+def count_occurrences(needle, roots=DEFAULT_ROOTS, extensions=None):
+    # `grep -r needle roots --exclude-dir=node_modules | wc -l`: lines
+    # containing `needle` in every file, and one line ("Binary file ...
+    # matches") for a binary file that contains it anywhere.
+    needle = needle.encode('utf-8')
+    total = 0
+    for filepath in iter_source_files(roots, extensions):
+        try:
+            with open(filepath, 'rb') as f:
+                content = f.read()
+        except OSError as e:
+            print(f"Error reading {filepath}: {e}", file=sys.stderr)
+            continue
+        if needle not in content:
+            continue
+        if b'\0' in content:
+            total += 1
+        else:
+            total += sum(1 for line in content.split(b'\n') if needle in line)
+    return total
+
+
+if __name__ == "__main__":
+    import json
+    refs = scan_table_references(sys.argv[1:] or None)
+    print(json.dumps({t: r["count"] for t, r in sorted(refs.items())}, indent=2))
@@ -0,0 +1,210 @@
+import re
+from collections import namedtuple
+
+# kind is one of: ident, string, template, number, regex, punct, element.
+#   string   - '...', "..." and `...` without substitutions; value is the text
+#              between the quotes (escapes left as written)
+#   template - one literal piece of a `...${expr}...` template; the tokens of
+#              each substitution are emitted between the pieces
+#   element  - the tag name of a JSX opening element ('BuildingCard',
+#              'div'); only emitted when tokenize() is asked for them
+# Comments and other JSX markup produce no tokens; expressions inside JSX
+# braces do.
+Token = namedtuple('Token', ['kind', 'value', 'start', 'end'])
+
+_SPACE_RE = re.compile(r'(?:\s+|//[^\n]*|/\*.*?(?:\*/|\Z))+', re.DOTALL)
+_TEMPLATE_CHUNK_RE = re.compile(r'(?:[^`\\$]|\\.|\$(?!\{))*', re.DOTALL)
+_REGEX_RE = re.compile(r'/(?:[^/\\\n\[]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[A-Za-z]*')
+_PUNCT_RE = re.compile(
+    r'>>>=|\.\.\.|===|!==|\*\*=|<<=|>>=|>>>|\?\?=|&&=|\|\|=|=>|\?\.(?!\d)|==|!=|<=|>=|&&|\|\||\?\?|\+\+|--|'
+    r'\+=|-=|\*=|/=|%=|&=|\|=|\^=|\*\*|<<|>>|[{}()\[\];,.<>+\-*/%&|^!~?:=@#]')
+
+# Leading whitespace and comments, then one alternation per token.
+# Characters whose meaning depends on context ('/', '<', braces and
+# backticks) fall through to `special`.
+_TOKEN_RE = re.compile(
+    r'(?:\s+|//[^\n]*|/\*.*?(?:\*/|\Z))*'
+    r'(?:(?P<ident>[A-Za-z_$][\w$]*)'
+    r'|(?P<string>\'(?:[^\'\\\n]|\\.)*(?:\'|$)|"(?:[^"\\\n]|\\.)*(?:"|$))'
+    r'|(?P<number>(?:0[xXoObB][\da-fA-F_]+|(?:\d[\d_]*\.?[\d_]*|\.\d[\d_]*)(?:[eE][+-]?\d+)?)n?)'
+    r'|(?P<special>[{}`/<])'
+    r'|(?P<punct>>>>=|\.\.\.|===|!==|\*\*=|>>=|>>>|\?\?=|&&=|\|\|=|=>|\?\.(?!\d)|==|!=|>=|&&|\|\||\?\?|'
+    r'\+\+|--|\+=|-=|\*=|%=|&=|\|=|\^=|\*\*|>>|[()\[\];,.>+\-*%&|^!~?:=@#\\]|.))?',
+    re.DOTALL | re.MULTILINE)
+
+# After these a '/' starts a regex literal and a '<' (in .tsx) starts JSX.
+_EXPRESSION_KEYWORDS = frozenset((
+    'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw', 'case', 'do', 'else',
+    'yield', 'await', 'default',
+))
+
+_JSX_NAME_RE = re.compile(r'[A-Za-z_$][\w$.:-]*')
+_JSX_TEXT_RE = re.compile(r'[^<{]*')
+_JSX_ATTR_RE = re.compile(r'(?:\s+|[^\s{}<>/"\'=]+|=)+')
+_JSX_CLOSE_RE = re.compile(r'<\s*/')
+_JSX_START_RE = re.compile(r'<\s*[A-Za-z_$>]')
+_JSX_GENERIC_RE = re.compile(r'<\s*[A-Za-z_$][\w$]*\s*(?:,|extends\b)')
+
+
+def _expression_expected(prev):
+    if prev is None:
+        return True
+    if prev.kind == 'punct':
+        return prev.value not in (')', ']', '}', '++', '--')
+    if prev.kind == 'ident':
+        return prev.value in _EXPRESSION_KEYWORDS
+    return False
+
+
+def tokenize(content, jsx=False, elements=False):
+    """Yield Tokens for one TypeScript/TSX source in a single pass.
+
+    `jsx` enables JSX element scanning (for .tsx files), so apostrophes in
+    element text never open a string. `elements` adds an element token for
+    each JSX opening tag.
+    """
+    pos = 0
+    length = len(content)
+    prev = None
+    depth = 0
+    # Resume points for '}' closing a template substitution or a JSX
+    # expression: (kind, brace depth when it was opened, JSX element depth).
+    stack = []
+
+    while pos < length:
+        match = _TOKEN_RE.match(content, pos)
+        kind = match.lastgroup
+        if kind is None:
+            return  # only whitespace and comments left
+        pos = match.start(kind)
+        end = match.end()
+
+        if kind == 'ident':
+            token = Token('ident', match.group(kind), pos, end)
+        elif kind == 'string':
+            text = match.group(kind)
+            closed = len(text) > 1 and text[-1] == text[0]
+            token = Token('string', text[1:-1] if closed else text[1:], pos, end)
+        elif kind == 'number':
+            token = Token('number', match.group(kind), pos, end)
+        elif kind == 'punct':
+            token = Token('punct', match.group(kind), pos, end)
+        else:
+            char = content[pos]
+            if char == '{':
+                depth += 1
+                token = Token('punct', '{', pos, pos + 1)
+                end = pos + 1
+            elif char == '}':
+                if stack and stack[-1][1] == depth:
+                    kind, _, element_depth = stack.pop()
+                    if kind == 'template':
+                        token, pos = _template_piece(content, pos + 1, pos, stack, depth)
+                        yield token
+                        prev = token
+                        continue
+                    yield Token('punct', '}', pos, pos + 1)
+                    mode = 'attrs' if kind == 'jsx_attr' else 'children'
+                    pos, suspended = yield from _jsx(content, pos + 1, mode, element_depth, stack, depth, elements)
+                    # A finished JSX element is a complete operand, like a ')'.
+                    prev = Token('punct', '{' if suspended else ')', pos, pos)
+                    continue
+                depth -= 1
+                token = Token('punct', '}', pos, pos + 1)
+                end = pos + 1
+            elif char == '`':
+                token, end = _template_piece(content, pos + 1, pos, stack, depth)
+            elif char == '/' and _expression_expected(prev) and _REGEX_RE.match(content, pos):
+                end = _REGEX_RE.match(content, pos).end()
+                token = Token('regex', content[pos:end], pos, end)
+            elif (char == '<' and jsx and _expression_expected(prev) and _JSX_START_RE.match(content, pos)
+                  and not _JSX_GENERIC_RE.match(content, pos)):
+                pos, suspended = yield from _jsx(content, pos, 'open', 0, stack, depth, elements)
+                prev = Token('punct', '{' if suspended else ')', pos, pos)
+                continue
+            else:
+                # '/' as division and '<' as comparison or generic bracket
+                punct = _PUNCT_RE.match(content, pos)
+                end = punct.end() if punct else pos + 1
+                token = Token('punct', content[pos:end], pos, end)
+
+        yield token
+        prev = token
+        pos = end
+
+
+def _template_piece(content, pos, start, stack, depth):
+    # Scan from just after '`' or a substitution's '}' to the closing '`' or
+    # the next '${'. A template without substitutions is a plain string.
+    chunk = _TEMPLATE_CHUNK_RE.match(content, pos)
+    end = chunk.end()
+    text = content[pos:end]
+    whole = content[start] == '`'
+    if content.startswith('${', end):
+        stack.append(('template', depth, 0))
+        return Token('template', text, start, end + 2), end + 2
+    end = min(end + 1, len(content))
+    return Token('string' if whole else 'template', text, start, end), end
+
+
+def _jsx(content, pos, mode, element_depth, stack, depth, elements=False):
+    """Skip JSX markup iteratively, returning (offset, suspended).
+
+    mode is 'open' (pos at '<'), 'attrs' (inside an opening tag) or
+    'children'. The scan suspends at an attribute or child expression: it
+    yields the '{', records where to resume on `stack`, and hands control back
+    to the code tokenizer until the matching '}'.
+    """
+    length = len(content)
+    while pos < length:
+        if mode == 'open':
+            pos += 1
+            space = _SPACE_RE.match(content, pos)
+            name = _JSX_NAME_RE.match(content, space.end() if space else pos)
+            if name:
+                if elements:
+                    yield Token('element', name.group(0), name.start(), name.end())
+                pos = name.end()
+            mode = 'attrs'
+        elif mode == 'attrs':
+            attrs = _JSX_ATTR_RE.match(content, pos)
+            if attrs:
+                pos = attrs.end()
+                if pos >= length:
+                    break
+            char = content[pos]
+            if char in '\'"':
+                end = content.find(char, pos + 1)
+                pos = length if end == -1 else end + 1
+            elif char == '{':
+                stack.append(('jsx_attr', depth, element_depth))
+                yield Token('punct', '{', pos, pos + 1)
+                return pos + 1, True
+            elif content.startswith('/>', pos):
+                pos += 2
+                if element_depth == 0:
+                    return pos, False
+                mode = 'children'
+            elif char == '>':
+                pos += 1
+                element_depth += 1
+                mode = 'children'
+            else:
+                pos += 1
+        else:
+            if element_depth == 0:
+                return pos, False
+            pos = _JSX_TEXT_RE.match(content, pos).end()
+            if pos >= length:
+                break
+            if content[pos] == '{':
+                stack.append(('jsx_child', depth, element_depth))
+                yield Token('punct', '{', pos, pos + 1)
+                return pos + 1, True
+            if _JSX_CLOSE_RE.match(content, pos):
+                end = content.find('>', pos)
+                pos = length if end == -1 else end + 1
+                element_depth -= 1
+            else:
+                mode = 'open'
+    return length, False
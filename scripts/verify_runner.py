@@ -0,0 +1,151 @@
+import argparse
+import asyncio
+import contextvars
+import glob
+import importlib.util
+import inspect
+import io
+import json
+import os
+import sys
+import time
+
+from playwright.async_api import async_playwright
+
+# Python verification scripts: each module-level `async def test_*(page)` or
+# `check_*(page)` is one check.
+DEFAULT_PATTERNS = ('src/verify_*.py', 'tests/repro/verify_*.py')
+CHECK_PREFIXES = ('test_', 'check_')
+BASE_URL = 'http://localhost:8080'
+DEFAULT_ARTIFACTS = '/home/jules/verification'
+
+# Checks print progress; each check's output is captured separately even
+# though they share sys.stdout.
+_log = contextvars.ContextVar('verify_log', default=None)
+
+
+class _CheckOutput(io.TextIOBase):
+    def __init__(self, fallback):
+        self.fallback = fallback
+
+    def write(self, text):
+        buffer = _log.get()
+        return (buffer or self.fallback).write(text)
+
+    def flush(self):
+        self.fallback.flush()
+
+
+def discover(patterns=DEFAULT_PATTERNS):
+    """[(id, function, None) or (id, None, reason)] for every check in the matching files."""
+    checks = []
+    for path in sorted({p for pattern in patterns for p in glob.glob(pattern)}):
+        name = 'verify_' + os.path.splitext(path)[0].replace(os.sep, '_')
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        for attr, function in vars(module).items():
+            if not attr.startswith(CHECK_PREFIXES) or not inspect.isfunction(function) or function.__module__ != name:
+                continue
+            parameters = list(inspect.signature(function).parameters)
+            check_id = f"{path}::{attr}"
+            if not parameters or parameters[0] != 'page':
+                continue
+            if not inspect.iscoroutinefunction(function):
+                checks.append((check_id, None, "not an async function; the runner shares one async browser"))
+            else:
+                checks.append((check_id, function, None))
+    return checks
+
+
+async def run_check(browser, check_id, function, semaphore, args):
+    result = {"check": check_id, "status": None, "seconds": None, "error": None}
+    async with semaphore:
+        log = io.StringIO()
+        _log.set(log)
+        kwargs = {}
+        if 'artifacts' in inspect.signature(function).parameters:
+            kwargs["artifacts"] = args.artifacts
+        context = page = None
+        start = time.perf_counter()
+        try:
+            context = await browser.new_context(base_url=args.base_url)
+            context.set_default_timeout(args.timeout * 1000)
+            page = await context.new_page()
+            await asyncio.wait_for(function(page, **kwargs), args.check_timeout)
+            result["status"] = 'passed'
+        except Exception as e:
+            result["status"] = 'failed'
+            result["error"] = f"{type(e).__name__}: {e}"
+            try:
+                safe_id = check_id.replace(os.sep, '_').replace('::', '-')
+                await page.screenshot(path=os.path.join(args.artifacts, f"{safe_id}-failure.png"))
+            except Exception:
+                pass
+        finally:
+            result["seconds"] = round(time.perf_counter() - start, 3)
+            if context is not None:
+                await context.close()
+        result["log"] = log.getvalue().splitlines()
+    return result
+
+
+async def run_all(checks, args):
+    """Run every check in its own browser context on one shared browser, `args.jobs` at a time."""
+    semaphore = asyncio.Semaphore(args.jobs)
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=not args.headed, executable_path=args.executable)
+        try:
+            runnable = [(check_id, function) for check_id, function, _ in checks if function is not None]
+            results = await asyncio.gather(*(run_check(browser, check_id, function, semaphore, args)
+                                             for check_id, function in runnable))
+        finally:
+            await browser.close()
+    skipped = [{"check": check_id, "status": 'skipped', "seconds": None, "error": reason, "log": []}
+               for check_id, function, reason in checks if function is None]
+    return list(results) + skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the Python verification scripts' async check functions concurrently on one browser.")
+    parser.add_argument('patterns', nargs='*', default=list(DEFAULT_PATTERNS),
+                        help="Globs of check files (default: %(default)s)")
+    parser.add_argument('-k', metavar='SUBSTRING', help="Only run checks whose id contains SUBSTRING")
+    parser.add_argument('--jobs', type=int, default=4, metavar='N', help="Checks to run at once (default: 4)")
+    parser.add_argument('--base-url', default=BASE_URL, help="Base URL for relative page.goto() (default: %(default)s)")
+    parser.add_argument('--artifacts', default=DEFAULT_ARTIFACTS, metavar='DIR',
+                        help="Where checks and failures save screenshots (default: %(default)s)")
+    parser.add_argument('--timeout', type=float, default=10, metavar='SECONDS',
+                        help="Default timeout for each Playwright action and wait (default: 10)")
+    parser.add_argument('--check-timeout', type=float, default=120, metavar='SECONDS',
+                        help="Fail a check that runs longer than this (default: 120)")
+    parser.add_argument('--headed', action='store_true')
+    parser.add_argument('--executable', metavar='PATH',
+                        help="Chromium or Chrome binary to use instead of Playwright's bundled one")
+    args = parser.parse_args()
+
+    checks = discover(args.patterns)
+    if args.k:
+        checks = [c for c in checks if args.k in c[0]]
+    if not checks:
+        sys.exit("No checks found")
+    os.makedirs(args.artifacts, exist_ok=True)
+
+    stdout = sys.stdout
+    sys.stdout = _CheckOutput(sys.stderr)
+    start = time.perf_counter()
+    try:
+        results = asyncio.run(run_all(checks, args))
+    finally:
+        sys.stdout = stdout
+    json.dump({"wall_seconds": round(time.perf_counter() - start, 3),
+               "check_seconds": round(sum(r["seconds"] or 0 for r in results), 3),
+               "checks": results}, sys.stdout, indent=2)
+    print()
+    if any(r["status"] == 'failed' for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,114 @@
+import asyncio
 
-from playwright.sync_api import Page, expect, sync_playwright
+from playwright.async_api import Page, async_playwright, expect
 
-def test_building_form(page: Page):
+BASE_URL = "http://localhost:8080"
+# How long to wait for the outcome of a submit before concluding there was
+# none: the fixed sleep this replaced. A dialog or error toast ends the wait
+# sooner. (A networkidle wait can't bound it: that load state was already
+# reached when the form loaded, and a click doesn't reset it.)
+OUTCOME_TIMEOUT_MS = 2000
+# Sonner renders each toast as an <li data-sonner-toast>, typed by data-type;
+# the Radix toaster as an <li role="status">, `destructive` for errors.
+TOAST_SELECTOR = "li[data-sonner-toast], li[role='status']"
+ERROR_TOAST_SELECTOR = "li[data-sonner-toast][data-type='error'], li[role='status'].destructive"
+
+
+async def wait_for_outcome(page: Page, dialogs: asyncio.Queue, timeout_ms=OUTCOME_TIMEOUT_MS):
+    """('dialog', message) or ('toast', text) for whichever appears first; (None, None) on timeout.
+
+    Only an error toast ends the wait early: a success toast may come before
+    the dialog. A toast of any kind still showing at the timeout, with no
+    dialog, counts.
+    """
+    dialog = asyncio.ensure_future(dialogs.get())
+    error = asyncio.ensure_future(
+        page.locator(ERROR_TOAST_SELECTOR).first.wait_for(state="visible", timeout=timeout_ms))
+    try:
+        done, _ = await asyncio.wait({dialog, error}, timeout=timeout_ms / 1000,
+                                     return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        dialog.cancel()
+        error.cancel()
+    if dialog in done:
+        return 'dialog', dialog.result()
+    if error in done and error.exception() is None:
+        return 'toast', await page.locator(ERROR_TOAST_SELECTOR).first.text_content()
+    toasts = page.locator(TOAST_SELECTOR)
+    if await toasts.count():
+        return 'toast', await toasts.first.text_content()
+    return None, None
+
+
+async def test_building_form(page: Page, artifacts="/home/jules/verification"):
     print("Navigating to test page...")
-    page.goto("http://localhost:8080/test-building-form")
+    await page.goto("/test-building-form")
 
     # Wait for the form to be visible
-    page.wait_for_selector("form")
+    await page.wait_for_selector("form")
+    await page.wait_for_load_state("networkidle")
     print("Form loaded.")
 
     # Check Name Input
     name_input = page.locator("#name")
-    required_attr = name_input.get_attribute("required")
+    required_attr = await name_input.get_attribute("required")
     if required_attr is not None:
         raise AssertionError(f"Name input has required attribute: {required_attr}")
     print("Name input is not required.")
 
     # Check Name Label
-    name_label = page.locator("label[for='name']")
-    expect(name_label).to_have_text("Name")
+    await expect(page.locator("label[for='name']")).to_have_text("Name")
     print("Name label is correct.")
 
     # Check Category Label
-    category_label = page.locator("label[for='category-select']")
-    expect(category_label).to_have_text("Category")
+    await expect(page.locator("label[for='category-select']")).to_have_text("Category")
     print("Category label is correct.")
 
     # Submit the form empty
     print("Submitting form...")
 
-    dialog_triggered = False
-    def handle_dialog(dialog):
-        nonlocal dialog_triggered
-        dialog_triggered = True
+    dialogs = asyncio.Queue()
+
+    async def handle_dialog(dialog):
         print(f"Dialog message: {dialog.message}")
-        dialog.accept()
+        await dialog.accept()
+        dialogs.put_nowait(dialog.message)
 
     page.on("dialog", handle_dialog)
 
-    submit_button = page.get_by_role("button", name="Save Building")
-    submit_button.click()
-
-    # Wait for potential submission
-    page.wait_for_timeout(2000)
+    await page.get_by_role("button", name="Save Building").click()
 
-    if not dialog_triggered:
-        # Check for validation errors (toasts)
-        toasts = page.locator("li[role='status']") # Sonner toast selector might vary
-        if toasts.count() > 0:
-             print(f"Toast appeared: {toasts.first.text_content()}")
-             raise AssertionError("Validation error toast appeared instead of success dialog")
-        else:
-             print("Warning: No dialog triggered, but no error toast found either.")
-    else:
+    # Whichever comes first: the success dialog or a validation error toast.
+    outcome, text = await wait_for_outcome(page, dialogs)
+    if outcome == 'toast':
+        print(f"Toast appeared: {text}")
+        raise AssertionError("Validation error toast appeared instead of success dialog")
+    if outcome == 'dialog':
         print("Success dialog triggered!")
+    else:
+        print("Warning: No dialog triggered, but no error toast found either.")
 
     # Screenshot
-    page.screenshot(path="/home/jules/verification/building_form.png")
+    await page.screenshot(path=f"{artifacts}/building_form.png")
     print("Screenshot saved.")
 
-if __name__ == "__main__":
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
+
+async def main():
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page(base_url=BASE_URL)
         try:
-            test_building_form(page)
+            await test_building_form(page)
         except Exception as e:
             print(f"Verification failed: {e}")
             try:
-                page.screenshot(path="/home/jules/verification/failure.png")
-            except:
+                await page.screenshot(path="/home/jules/verification/failure.png")
+            except Exception:
                 pass
-            exit(1)
+            raise SystemExit(1)
         finally:
-            browser.close()
+            await browser.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
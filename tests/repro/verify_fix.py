@@ -1,20 +1,25 @@
-from playwright.sync_api import sync_playwright
+from playwright.async_api import Page, async_playwright
+import asyncio
 import os
 
-def run():
-    with sync_playwright() as p:
-        browser = p.chromium.launch()
-        page = browser.new_page()
 
-        # Load local HTML file
-        file_path = os.path.abspath("tests/repro/repro.html")
-        page.goto(f"file://{file_path}")
+async def check_repro_screenshot(page: Page):
+    # Load local HTML file
+    file_path = os.path.abspath("tests/repro/repro.html")
+    await page.goto(f"file://{file_path}")
 
-        # Take screenshot
-        output_path = "tests/repro/screenshot.png"
-        page.screenshot(path=output_path, full_page=True)
-        print(f"Screenshot saved to {output_path}")
-        browser.close()
+    # Take screenshot
+    output_path = "tests/repro/screenshot.png"
+    await page.screenshot(path=output_path, full_page=True)
+    print(f"Screenshot saved to {output_path}")
+
+
+async def run():
+    async with async_playwright() as p:
+        browser = await p.chromium.launch()
+        page = await browser.new_page()
+        await check_repro_screenshot(page)
+        await browser.close()
 
 if __name__ == "__main__":
-    run()
+    asyncio.run(run())
@@ -0,0 +1,193 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+SCRIPTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts')
+sys.path.insert(0, SCRIPTS)
+
+from audit_cache import FindingsCache, content_hash  # noqa: E402
+from audit_codebase import analyze_file, analyze_files, changed_files  # noqa: E402
+from relations import RelationGraph  # noqa: E402
+from schema_catalog import build_catalog, catalog_to_functions, catalog_to_schema  # noqa: E402
+from sql_functions import live_overloads  # noqa: E402
+from suggestions import SchemaSuggestions  # noqa: E402
+
+MIGRATION = "CREATE TABLE reviews (id uuid PRIMARY KEY, body text, rating int);\n"
+
+SOURCES = {
+    'src/a.ts': "const { data } = await supabase.from('reviews').select('id, bodyy').eq('ratting', 5);\n",
+    'src/b.ts': "await supabase.from('reviewz').select('*');\n",
+}
+
+
+def write(root, files):
+    for name, content in files.items():
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+
+
+class FindingsCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        write(self.root, dict(SOURCES, **{'m/20240101000000_a.sql': MIGRATION}))
+
+    def audit(self, *args):
+        result = subprocess.run([sys.executable, os.path.join(SCRIPTS, 'audit_codebase.py'), '--migrations', 'm']
+                                + list(args), cwd=self.root, capture_output=True, text=True, check=True)
+        return json.loads(result.stdout)
+
+    def cache(self):
+        with open(os.path.join(self.root, '.audit-cache', 'findings.json')) as f:
+            return json.load(f)
+
+    def test_cached_run_matches_cold_run(self):
+        cold = self.audit('--no-cache')
+        self.assertEqual([f["error"] for f in cold], [
+            "Invalid table reference: 'reviewz'",
+            "Invalid column 'bodyy' on table 'reviews'",
+            "Invalid column 'ratting' on table 'reviews'",
+        ])
+        self.assertEqual(self.audit(), cold)
+        self.assertEqual(sorted(self.cache()["files"]), ['src/a.ts', 'src/b.ts'])
+        self.assertEqual(self.audit(), cold)
+
+    def test_cached_findings_are_served(self):
+        self.audit()
+        data = self.cache()
+        data["files"]["src/b.ts"]["findings"] = []
+        with open(os.path.join(self.root, '.audit-cache', 'findings.json'), 'w') as f:
+            json.dump(data, f)
+        self.assertEqual([f["file"] for f in self.audit()], ['src/a.ts', 'src/a.ts'])
+
+    def test_schema_change_invalidates_every_entry(self):
+        self.audit()
+        write(self.root, {'m/20240102000000_b.sql': "ALTER TABLE reviews ADD COLUMN bodyy text;\n"})
+        self.assertEqual([f["error"] for f in self.audit()], [
+            "Invalid table reference: 'reviewz'",
+            "Invalid column 'ratting' on table 'reviews'",
+        ])
+
+    def test_schema_key_and_file_hash(self):
+        path = os.path.join(self.root, 'findings.json')
+        cache = FindingsCache(path, schema_key='v1')
+        cache.put('src/a.ts', content_hash('a'), [{"error": "x"}])
+        cache.save()
+
+        self.assertEqual(FindingsCache(path, schema_key='v1').load().get('src/a.ts', content_hash('a')),
+                         [{"error": "x"}])
+        self.assertIsNone(FindingsCache(path, schema_key='v2').load().get('src/a.ts', content_hash('a')))
+        changed = FindingsCache(path, schema_key='v1').load()
+        self.assertIsNone(changed.get('src/a.ts', content_hash('a changed')))
+        self.assertEqual((changed.hits, changed.misses), (0, 1))
+
+
+def catalog(sql):
+    with tempfile.TemporaryDirectory() as root:
+        write(root, {'m/20240101000000_a.sql': sql})
+        return build_catalog(os.path.join(root, 'm'), root, use_cache=False)
+
+
+class JobsTest(unittest.TestCase):
+    def test_pool_matches_serial_order(self):
+        c = catalog(MIGRATION)
+        schema, partial, functions = catalog_to_schema(c), set(), catalog_to_functions(c)
+        relations = RelationGraph.from_catalog(c)
+        pending = [(f'src/{i}.ts', content) for i in range(3) for content in SOURCES.values()]
+        suggestions = SchemaSuggestions(schema, functions)
+        serial = [analyze_file(path, content, schema, partial, suggestions, functions, relations)
+                  for path, content in pending]
+        self.assertEqual(sum(map(len, serial)), 9)
+        self.assertEqual(list(analyze_files(pending, schema, partial, 2, functions, relations)), serial)
+
+
+FUNCTIONS = MIGRATION + """
+CREATE FUNCTION review_count(building uuid, since date DEFAULT NULL) RETURNS bigint
+    AS $$ SELECT count(*) FROM reviews $$ LANGUAGE sql;
+CREATE FUNCTION search_reviews(query text) RETURNS SETOF reviews
+    AS $$ SELECT * FROM reviews $$ LANGUAGE sql;
+CREATE FUNCTION search_reviews(query text, building uuid, lim int DEFAULT 10) RETURNS SETOF reviews
+    AS $$ SELECT * FROM reviews $$ LANGUAGE sql;
+"""
+
+
+class RpcTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.catalog = catalog(FUNCTIONS)
+        cls.schema, cls.functions = catalog_to_schema(cls.catalog), catalog_to_functions(cls.catalog)
+
+    def findings(self, source):
+        return [(f["error"], f["fix"]) for f in analyze_file('src/r.ts', source, self.schema, set(),
+                                                             functions=self.functions)]
+
+    def test_unknown_function(self):
+        self.assertEqual(self.findings("supabase.rpc('reviews_count', { building: id });"),
+                         [("Invalid function reference: 'reviews_count'", "Change to 'review_count'")])
+
+    def test_unknown_argument(self):
+        self.assertEqual(self.findings("supabase.rpc('review_count', { buildng: id });"),
+                         [("Invalid argument 'buildng' for function 'review_count'", "Change to 'building'")])
+
+    def test_missing_argument(self):
+        self.assertEqual(self.findings("supabase.rpc('review_count', {});"),
+                         [("Missing argument 'building' for function 'review_count'", "Pass 'building'")])
+        self.assertEqual(self.findings("supabase.rpc('review_count', { ...args });"), [])
+
+    def test_defaults_and_overloads(self):
+        self.assertEqual(self.findings("supabase.rpc('review_count', { building: id });\n"
+                                       "supabase.rpc('review_count', { building: id, since: d });\n"
+                                       "supabase.rpc('search_reviews', { query: q });\n"
+                                       "supabase.rpc('search_reviews', { query: q, building: b });"), [])
+        # Only the three-argument overload takes `lim`; it also needs `building`.
+        self.assertEqual(self.findings("supabase.rpc('search_reviews', { query: q, lim: 5 });"),
+                         [("Missing argument 'building' for function 'search_reviews'", "Pass 'building'")])
+
+    def test_overloads_in_definition_order(self):
+        self.assertEqual([key for key, _ in live_overloads(self.catalog, 'search_reviews')],
+                         ['text', 'text, uuid, integer'])
+
+
+@unittest.skipUnless(shutil.which('git'), 'git not installed')
+class ChangedFilesTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        write(self.root, dict(SOURCES, **{'supabase/migrations/20240101000000_a.sql': MIGRATION}))
+        self.git('init', '-q')
+        self.git('add', '.')
+        self.git('commit', '-q', '-m', 'base')
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        self.addCleanup(os.chdir, cwd)
+
+    def git(self, *args):
+        subprocess.run(['git', '-c', 'user.name=t', '-c', 'user.email=t@example.com'] + list(args),
+                       cwd=self.root, check=True, capture_output=True)
+
+    def test_changed_and_untracked_sources(self):
+        write(self.root, {'src/a.ts': "await supabase.from('reviews').select('id');\n",
+                          'src/c.tsx': "export {};\n", 'notes.md': "x\n"})
+        self.assertEqual(changed_files('HEAD'), ['src/a.ts', 'src/c.tsx'])
+
+    def test_changed_migration_forces_a_full_run(self):
+        write(self.root, {'supabase/migrations/20240102000000_b.sql': "ALTER TABLE reviews ADD COLUMN x int;\n"})
+        self.assertIsNone(changed_files('HEAD'))
+        self.git('add', '.')
+        self.git('commit', '-q', '-m', 'migration')
+        self.assertIsNone(changed_files('HEAD~1'))
+
+    def test_unknown_ref(self):
+        with self.assertRaises(SystemExit) as raised:
+            changed_files('no-such-ref')
+        self.assertEqual(str(raised.exception), '--since: unknown ref no-such-ref')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+
+from audit_watch import AuditDaemon  # noqa: E402
+
+SCHEMA = """
+CREATE TABLE profiles (id uuid PRIMARY KEY, username text);
+CREATE TABLE buildings (id uuid PRIMARY KEY, name text);
+CREATE TABLE reviews (id uuid PRIMARY KEY, author_id uuid REFERENCES profiles (id), body text);
+"""
+
+SOURCES = {
+    'src/buildings.ts': "supabase.from('buildings').select('name');\n",
+    'src/profiles.ts': "supabase.from('profiles').select('id, username');\n",
+    'src/reviews.ts': "supabase.from('reviews').select('body, author_id(id)');\n",
+    'src/feed/broken.ts': "supabase.from('reviews').select('bodyy');\n",
+    'src/feed/ok.ts': "supabase.from('reviews').select('body');\n",
+}
+
+
+class DaemonTest(unittest.TestCase):
+    def setUp(self):
+        # Relative paths, as the daemon runs from the repository root; the
+        # catalog checkpoints land in the temporary directory too.
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        self.addCleanup(os.chdir, cwd)
+        self.write('m/20240101000000_schema.sql', SCHEMA)
+        for path, content in SOURCES.items():
+            self.write(path, content)
+        self.out = io.StringIO()
+        self.daemon = AuditDaemon('src', 'm', use_cache=False, out=self.out)
+        self.daemon.start()
+        self.analysed = []
+        analyze = self.daemon._analyze
+        self.daemon._analyze = lambda pending: (self.analysed.extend(p for p, _ in pending), analyze(pending))
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def events(self):
+        lines = self.out.getvalue().splitlines()
+        self.out.seek(0)
+        self.out.truncate()
+        return [json.loads(line) for line in lines]
+
+    def test_start(self):
+        events = self.events()
+        self.assertEqual([e["event"] for e in events], ['findings', 'ready'])
+        self.assertEqual(events[0]["file"], os.path.join('src', 'feed', 'broken.ts'))
+        self.assertEqual((events[1]["files"], events[1]["findings"]), (5, 1))
+
+    def test_column_change_requeues_files_naming_the_table_or_fk_column(self):
+        self.events()
+        self.write('m/20240102000000_bio.sql', "ALTER TABLE profiles ADD COLUMN bio text;\n")
+        self.daemon.update({'m/20240102000000_bio.sql'})
+        # broken.ts is re-checked because it has findings whose suggestions may change.
+        self.assertEqual(sorted(self.analysed), [os.path.join('src', 'feed', 'broken.ts'),
+                                                 os.path.join('src', 'profiles.ts'),
+                                                 os.path.join('src', 'reviews.ts')])
+        schema = [e for e in self.events() if e["event"] == 'schema']
+        self.assertEqual(schema[0]["changed"], ['author_id', 'profiles'])
+
+    def test_edited_file_alone_is_reanalysed(self):
+        self.events()
+        self.write('src/buildings.ts', "supabase.from('buildings').select('nam');\n")
+        self.daemon.update({'src/buildings.ts'})
+        self.assertEqual(self.analysed, ['src/buildings.ts'])
+        self.assertEqual([(e["event"], e.get("file")) for e in self.events()],
+                         [('findings', 'src/buildings.ts'), ('idle', None)])
+
+    def test_deleted_file_clears_its_findings(self):
+        self.events()
+        os.remove('src/feed/broken.ts')
+        self.daemon.update({'src/feed/broken.ts'})
+        self.assertEqual([(e["event"], e.get("file"), e.get("findings")) for e in self.events()],
+                         [('findings', 'src/feed/broken.ts', []), ('idle', None, 0)])
+        self.assertNotIn('src/feed/broken.ts', self.daemon.files)
+
+    def test_deleted_directory_drops_every_file_under_it(self):
+        self.events()
+        shutil.rmtree('src/feed')
+        self.daemon.update({'src/feed'})
+        events = self.events()
+        self.assertEqual([(e["event"], e.get("file"), e.get("findings")) for e in events],
+                         [('findings', os.path.join('src', 'feed', 'broken.ts'), []), ('idle', None, 0)])
+        self.assertEqual(sorted(self.daemon.files), [os.path.join('src', 'buildings.ts'),
+                                                     os.path.join('src', 'profiles.ts'),
+                                                     os.path.join('src', 'reviews.ts')])
+
+
+if __name__ == '__main__':
+    unittest.main()
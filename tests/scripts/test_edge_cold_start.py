@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+
+from edge_cold_start import (DenoLock, ImportGraph, RemoteSources, analyse_function, budget,  # noqa: E402
+                             list_functions, parse_module, shared_report)
+
+SUPABASE = 'https://esm.sh/supabase-js@2'
+SUPABASE_PINNED = 'https://esm.sh/supabase-js@2.39.0'
+PDF = 'https://esm.sh/pdf-lib@1.17.1'
+
+SHARED = ("import { createClient } from '" + SUPABASE + "';\n"
+          "export const client = createClient(Deno.env.get('URL'), Deno.env.get('KEY'));\n"
+          "console.log('db ready');\n")
+# PDFDocument is only used inside the handler, so pdf-lib could load lazily.
+EXPORT = ("import { client } from '../_shared/db.ts';\n"
+          "import { PDFDocument } from '" + PDF + "';\n"
+          "Deno.serve(async (req) => {\n"
+          "  const doc = await PDFDocument.create();\n"
+          "  return new Response(await client.from('reviews').select('*'));\n"
+          "});\n")
+# The same import read at load time cannot wait.
+RENDER = ("import { PDFDocument } from '" + PDF + "';\n"
+          "const template = PDFDocument.create();\n"
+          "Deno.serve(() => new Response(template));\n")
+REMOTE = {
+    SUPABASE_PINNED: b"export function createClient(url, key) { return { url, key }; }\n",
+    PDF: b"export class PDFDocument { static create() { return new PDFDocument(); } }\n" + b"// pad\n" * 10_000,
+}
+
+
+class EdgeColdStartTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        self.addCleanup(os.chdir, cwd)
+        self.write('functions/_shared/db.ts', SHARED)
+        self.write('functions/export-pdf/index.ts', EXPORT)
+        self.write('functions/render/index.ts', RENDER)
+        self.write('functions/notes/README.md', "Not deployed.\n")
+        self.write('deno.lock', json.dumps({
+            "version": "3",
+            "redirects": {SUPABASE: SUPABASE_PINNED},
+            "remote": {SUPABASE_PINNED: hashlib.sha256(REMOTE[SUPABASE_PINNED]).hexdigest()},
+        }))
+        for url, data in REMOTE.items():
+            rest = url[len('https://esm.sh'):]
+            path = os.path.join('deno', 'remote', 'https', 'esm.sh', hashlib.sha256(rest.encode()).hexdigest())
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+        lock = DenoLock('deno.lock')
+        self.graph = ImportGraph(lock, RemoteSources(lock, 'deno'), functions_dir='functions')
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def analyse(self, name):
+        return analyse_function(self.graph, name, os.path.join('functions', name, 'index.ts'))
+
+    def test_list_functions_skips_shared_and_entryless_directories(self):
+        self.assertEqual(list_functions('functions'), [
+            ('export-pdf', os.path.join('functions', 'export-pdf', 'index.ts')),
+            ('render', os.path.join('functions', 'render', 'index.ts')),
+        ])
+
+    def test_parse_module_counts_load_time_side_effects(self):
+        self.assertEqual(parse_module(SHARED)[1], 2)
+        self.assertEqual(parse_module(EXPORT)[1], 1)
+        self.assertEqual(parse_module(RENDER)[1], 2)
+
+    def test_byte_totals_follow_the_lock_redirect(self):
+        report = self.analyse('export-pdf')
+        self.assertEqual((report["local_bytes"], report["shared_bytes"], report["remote_bytes"]),
+                         (len(EXPORT), len(SHARED), len(REMOTE[SUPABASE_PINNED]) + len(REMOTE[PDF])))
+        self.assertEqual(report["bytes"], len(EXPORT) + len(SHARED) + sum(map(len, REMOTE.values())))
+        self.assertEqual((report["modules"], report["remote_modules"], report["remote_unsized"]), (4, 2, 0))
+        self.assertEqual(report["shared"], [os.path.join('functions', '_shared', 'db.ts')])
+        # The redirect target is locked; pdf-lib has no entry in deno.lock.
+        self.assertEqual(report["unlocked"], [PDF])
+        self.assertEqual(report["side_effects"], 3)
+        # supabase-js through _shared and pdf-lib directly.
+        self.assertEqual(budget(report), {"bytes": len(EXPORT) + len(SHARED), "side_effects": 3,
+                                          "remote_imports": 2, "remote_bytes": report["remote_bytes"]})
+
+    def test_lazy_load_candidate_only_when_unused_at_load(self):
+        rows = {row["specifier"]: row for row in self.analyse('export-pdf')["imports"]}
+        self.assertEqual(list(rows)[0], PDF)
+        self.assertEqual(rows[PDF]["exclusive_bytes"], len(REMOTE[PDF]))
+        self.assertTrue(rows[PDF]["lazy_candidate"])
+        self.assertFalse(rows[os.path.join('functions', '_shared', 'db.ts')]["lazy_candidate"])
+
+        rows = {row["specifier"]: row for row in self.analyse('render')["imports"]}
+        self.assertTrue(rows[PDF]["used_at_load"])
+        self.assertFalse(rows[PDF]["lazy_candidate"])
+
+    def test_shared_report(self):
+        reports = [self.analyse('export-pdf'), self.analyse('render')]
+        self.assertEqual(shared_report(self.graph, reports), [{
+            "module": os.path.join('functions', '_shared', 'db.ts'), "bytes": len(SHARED), "side_effects": 2,
+            "transitive_bytes": len(SHARED) + len(REMOTE[SUPABASE_PINNED]), "transitive_modules": 2,
+            "remote_unsized": 0, "functions": ['export-pdf'],
+        }])
+
+    def test_hash_mismatch_leaves_remote_unsized(self):
+        with open('deno.lock', 'w') as f:
+            json.dump({"redirects": {SUPABASE: SUPABASE_PINNED}, "remote": {SUPABASE_PINNED: '0' * 64}}, f)
+        lock = DenoLock('deno.lock')
+        graph = ImportGraph(lock, RemoteSources(lock, 'deno'), functions_dir='functions')
+        report = analyse_function(graph, 'export-pdf', os.path.join('functions', 'export-pdf', 'index.ts'))
+        self.assertEqual((report["remote_unsized"], report["remote_bytes"]), (1, len(REMOTE[PDF])))
+        self.assertNotIn("remote_bytes", budget(report))
+
+
+if __name__ == '__main__':
+    unittest.main()
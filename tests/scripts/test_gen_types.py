@@ -0,0 +1,149 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+
+from gen_types import (TYPES_PATH, format_changes, parse_types, render, render_file, schema_drift,  # noqa: E402
+                       ts_type)
+from schema_catalog import build_catalog  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..')
+
+COMMITTED = '''export type Json = string | number
+
+export type Database = {
+  public: {
+    Tables: {
+      comment_likes: {
+        Row: {
+          comment_id: string
+          user_id: string
+        }
+        Insert: {
+          comment_id: string
+          user_id: string
+        }
+        Update: {
+          comment_id?: string
+          user_id?: string
+        }
+        Relationships: []
+      }
+      reviews: {
+        Row: {
+          id: string
+        }
+        Insert: {
+          id: string
+        }
+        Update: {
+          id?: string
+        }
+        Relationships: []
+      }
+    }
+    Views: {
+      [_ in never]: never
+    }
+    Functions: {
+      [_ in never]: never
+    }
+    Enums: {
+      [_ in never]: never
+    }
+    CompositeTypes: {
+      [_ in never]: never
+    }
+  }
+}
+
+export const Constants = {
+  public: {
+    Enums: {},
+  },
+} as const
+'''
+
+
+def catalog(files):
+    with tempfile.TemporaryDirectory() as migrations, tempfile.TemporaryDirectory() as cache:
+        for name, sql in files.items():
+            with open(os.path.join(migrations, name), 'w') as f:
+                f.write(sql)
+        return build_catalog(migrations, cache, use_cache=False)
+
+
+class TsTypeTest(unittest.TestCase):
+    def test_postgres_types(self):
+        c = catalog({'20240101000000_a.sql': "CREATE TYPE mood AS ENUM ('ok');"})
+        self.assertEqual(ts_type(c, 'int4'), ('type', 'number'))
+        self.assertEqual(ts_type(c, 'timestamp with time zone'), ('type', 'string'))
+        self.assertEqual(ts_type(c, 'jsonb'), ('type', 'Json'))
+        self.assertEqual(ts_type(c, 'text[][]'), ('array', ('array', ('type', 'string'))))
+        self.assertEqual(ts_type(c, 'mood'), ('type', 'Database["public"]["Enums"]["mood"]'))
+        self.assertEqual(ts_type(c, 'geometry'), ('type', 'unknown'))
+
+
+class RenderTest(unittest.TestCase):
+    def test_union_breaks_past_the_print_width(self):
+        node = ('obj', [('status', False, ('union', [('type', f'"value_{i}"') for i in range(8)]))], True)
+        self.assertEqual(render(node), '{\n  status:\n' + ''.join(f'    | "value_{i}"\n' for i in range(8)) + '}')
+
+    def test_short_object_stays_inline(self):
+        node = ('obj', [('id', False, ('type', 'string')), ('n', True, ('type', 'number'))], False)
+        self.assertEqual(render(node), '{ id: string; n?: number }')
+
+    @unittest.skipUnless(os.path.exists(os.path.join(ROOT, TYPES_PATH)), 'no committed types.ts')
+    def test_committed_file_round_trips(self):
+        with open(os.path.join(ROOT, TYPES_PATH), 'r') as f:
+            text = f.read()
+        parsed = parse_types(text)
+        original = text[parsed.database_start:parsed.database_end].replace(parsed.comments, '', 1)
+        self.assertEqual('export type Database = ' + render(parsed.database, 0, len('export type Database = ')),
+                         original)
+
+
+class DriftTest(unittest.TestCase):
+    def test_no_drift_after_generating(self):
+        c = catalog({'20240101000000_a.sql': 'CREATE TABLE reviews (id uuid PRIMARY KEY, body text);'})
+        generated = render_file(c, COMMITTED)
+        self.assertEqual(schema_drift(c, parse_types(generated).database), [])
+
+    def test_new_column(self):
+        c = catalog({'20240101000000_a.sql': 'CREATE TABLE reviews (id uuid PRIMARY KEY, body text);'})
+        self.assertEqual(format_changes(schema_drift(c, parse_types(COMMITTED).database)), [
+            '- public.Tables.comment_likes',
+            '+ public.Tables.reviews.Insert.body: string | null',
+            '+ public.Tables.reviews.Row.body: string | null',
+            '+ public.Tables.reviews.Update.body: string | null',
+        ])
+
+    def test_table_the_migrations_only_read_is_kept(self):
+        c = catalog({'20240101000000_a.sql': 'CREATE TABLE reviews (id uuid PRIMARY KEY);\n'
+                                             'GRANT SELECT ON TABLE comment_likes TO authenticated;'})
+        self.assertEqual(schema_drift(c, parse_types(COMMITTED).database), [])
+        self.assertIn('comment_likes: {', render_file(c, COMMITTED))
+
+    def test_table_the_migrations_never_mention_is_dropped(self):
+        c = catalog({'20240101000000_a.sql': 'CREATE TABLE reviews (id uuid PRIMARY KEY);'})
+        self.assertEqual(format_changes(schema_drift(c, parse_types(COMMITTED).database)),
+                         ['- public.Tables.comment_likes'])
+
+    def test_partial_table_without_committed_counterpart_is_skipped(self):
+        c = catalog({'20240101000000_a.sql': 'CREATE TABLE reviews (id uuid PRIMARY KEY);\n'
+                                             'ALTER TABLE comment_likes ADD COLUMN x int;\n'
+                                             'ALTER TABLE groups ADD COLUMN slug text;'})
+        self.assertEqual(format_changes(schema_drift(c, parse_types(COMMITTED).database)), [
+            '+ public.Tables.comment_likes.Insert.x: number | null',
+            '+ public.Tables.comment_likes.Row.x: number | null',
+            '+ public.Tables.comment_likes.Update.x: number | null',
+        ])
+        generated = render_file(c, COMMITTED)
+        self.assertNotIn('groups', generated)
+        self.assertIn('x: number | null', generated)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+
+from index_advisor import advise  # noqa: E402
+from schema_catalog import build_catalog  # noqa: E402
+
+TABLE = """
+CREATE TABLE reviews (
+    id uuid PRIMARY KEY,
+    building_id uuid NOT NULL,
+    user_id uuid NOT NULL,
+    status text,
+    is_hidden boolean NOT NULL DEFAULT false,
+    body text,
+    created_at timestamptz NOT NULL
+);
+"""
+
+SOURCE = """
+await supabase.from('reviews').select('*').eq('building_id', id).order('created_at', { ascending: false });
+await supabase.from('reviews').select('*').eq('building_id', other).order('created_at');
+await supabase.from('reviews').select('*').eq('user_id', me).eq('is_hidden', false);
+await supabase.from('reviews').select('*').eq('status', 'pending');
+await supabase.from('reviews').select('*').ilike('body', `%${q}%`);
+await supabase.from('reviews').select('*').eq('id', id).single();
+"""
+
+
+def report(sql):
+    with tempfile.TemporaryDirectory() as root:
+        migrations = os.path.join(root, 'migrations')
+        os.mkdir(migrations)
+        with open(os.path.join(migrations, '20240101000000_schema.sql'), 'w') as f:
+            f.write(TABLE + sql)
+        source = os.path.join(root, 'reviews.ts')
+        with open(source, 'w') as f:
+            f.write(SOURCE)
+        return {(tuple(g["equality"] + g["range"] + g["gin"]), tuple(g["order"])): g
+                for g in advise(build_catalog(migrations, root, use_cache=False), [source])}
+
+
+class AdviseTest(unittest.TestCase):
+    def test_without_indexes(self):
+        groups = report('')
+        self.assertEqual(sorted(groups), [
+            (('body',), ()),
+            (('building_id',), ('created_at',)),
+            (('status',), ()),
+            (('user_id', 'is_hidden'), ()),
+        ])
+        sorted_by_building = groups[(('building_id',), ('created_at',))]
+        self.assertEqual((sorted_by_building["coverage"], sorted_by_building["call_sites"]), ('none', 2))
+        self.assertEqual(sorted_by_building["suggestion"],
+                         'CREATE INDEX ON public.reviews (building_id, created_at)')
+        self.assertEqual(groups[(('user_id', 'is_hidden'), ())]["suggestion"],
+                         'CREATE INDEX ON public.reviews (user_id, is_hidden)')
+        self.assertEqual(groups[(('body',), ())]["suggestion"],
+                         'CREATE INDEX ON public.reviews USING gin (body gin_trgm_ops)')
+
+    def test_leading_indexes(self):
+        groups = report("CREATE INDEX reviews_building_created ON reviews (building_id, created_at DESC);\n"
+                        "CREATE INDEX reviews_user ON reviews (user_id);\n"
+                        "CREATE INDEX reviews_pending ON reviews (status) WHERE status = 'pending';\n"
+                        "CREATE INDEX reviews_body ON reviews USING gin (body gin_trgm_ops);\n")
+        # The boolean left over once user_id narrows the scan is not worth a key.
+        self.assertEqual(groups, {})
+
+    def test_index_led_by_another_column(self):
+        groups = report("CREATE INDEX reviews_created ON reviews (created_at, building_id);\n"
+                        "CREATE INDEX reviews_live ON reviews (status) WHERE status = 'live';\n")
+        # It walks the rows in created_at order, but not only this building's.
+        verdict = groups[(('building_id',), ('created_at',))]
+        self.assertEqual((verdict["coverage"], verdict["unindexed"]), ('partial', ['building_id']))
+        self.assertEqual(groups[(('status',), ())]["best_index"], None)
+
+    def test_order_left_to_sort(self):
+        groups = report("CREATE INDEX reviews_building ON reviews (building_id);\n")
+        verdict = groups[(('building_id',), ('created_at',))]
+        self.assertEqual((verdict["coverage"], verdict["best_index"]), ('order', 'reviews_building'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+
+from line_index import LineIndex  # noqa: E402
+
+CONTENT = "import x;\r\nconst a = 1;\n\n  supabase.from('reviews')\r\n"
+
+
+def brute_force(content, offset):
+    # What the audit computed before the index: rescan the prefix.
+    line = content[:offset].count('\n') + 1
+    return line, offset - (content.rfind('\n', 0, offset) + 1) + 1
+
+
+class PositionTest(unittest.TestCase):
+    def check(self, offset):
+        self.assertEqual(LineIndex(CONTENT).position(offset), brute_force(CONTENT, offset), offset)
+        self.assertEqual(LineIndex(CONTENT).line(offset), brute_force(CONTENT, offset)[0], offset)
+
+    def test_line_start(self):
+        self.check(CONTENT.index('const'))
+        self.check(0)
+
+    def test_mid_line(self):
+        self.check(CONTENT.index('supabase'))
+
+    def test_crlf(self):
+        self.check(CONTENT.index('\r'))
+        self.check(CONTENT.index('\n'))
+
+    def test_blank_line_and_eof(self):
+        self.check(CONTENT.index('\n\n') + 1)
+        self.check(len(CONTENT))
+
+    def test_every_offset(self):
+        for offset in range(len(CONTENT) + 1):
+            self.check(offset)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+
+from n_plus_one import detect  # noqa: E402
+
+
+def findings(files):
+    with tempfile.TemporaryDirectory() as root:
+        paths = []
+        for name, content in files.items():
+            path = os.path.join(root, name)
+            with open(path, 'w') as f:
+                f.write(content)
+            paths.append(path)
+        return [dict(f, file=os.path.basename(f["file"])) for f in detect(paths)]
+
+
+def summary(files):
+    return [(f["line"], f["target"], f["loop"], f["parallel"]) for f in findings(files)]
+
+
+class DirectTest(unittest.TestCase):
+    def test_await_in_for_loop(self):
+        result = findings({'a.ts': (
+            "export async function loadAuthors(reviews) {\n"
+            "  for (const review of reviews) {\n"
+            "    const { data } = await supabase.from('profiles').select('*').eq('id', review.user_id);\n"
+            "  }\n"
+            "}\n")})
+        self.assertEqual(len(result), 1)
+        self.assertEqual((result[0]["line"], result[0]["loop"], result[0]["loop_line"], result[0]["function"]),
+                         (3, 'for', 2, 'loadAuthors'))
+        self.assertEqual(result[0]["suggestion"], "Query once with .in('id', ids) and group the rows by id")
+
+    def test_map_async_callback(self):
+        self.assertEqual(summary({'a.ts': (
+            "const rows = ids.map(async (id) => {\n"
+            "  return supabase.rpc('review_count', { building: id });\n"
+            "});\n")}), [(2, 'review_count', '.map()', False)])
+
+    def test_promise_all_is_marked_parallel(self):
+        self.assertEqual(summary({'a.ts': (
+            "await Promise.all(ids.map((id) => supabase.from('reviews').select('*').eq('building_id', id)));\n")}),
+            [(1, 'reviews', '.map()', True)])
+
+    def test_retry_loop_is_not_per_item(self):
+        self.assertEqual(findings({'a.ts': (
+            "for (let attempt = 0; attempt < delays.length; attempt++) {\n"
+            "  const { error } = await supabase.from('reviews').insert(row);\n"
+            "  if (!error) break;\n"
+            "}\n")}), [])
+
+    def test_paging_and_deferred_callbacks(self):
+        self.assertEqual(findings({'a.tsx': (
+            "for (const page of pages) {\n"
+            "  await supabase.from('reviews').select('*').range(page.from, page.to);\n"
+            "}\n"
+            "items.map((item) => <button onClick={() => supabase.from('likes').insert({ id: item.id })} />);\n")}),
+            [])
+
+    def test_callback_near_the_start_of_a_file(self):
+        # Two tokens before the bracket: there is no room for `Promise.`, and
+        # looking further back must not wrap around to the end of the file.
+        self.assertEqual(summary({'a.ts': "await all(ids.map((id) => supabase.rpc('touch', { id })));\n"
+                                          "export default Promise\n"}),
+                         [(1, 'touch', '.map()', False)])
+
+
+class IndirectTest(unittest.TestCase):
+    def test_component_rendered_from_map(self):
+        result = findings({
+            'Card.tsx': ("export function Card({ id }) {\n"
+                         "  useEffect(() => { supabase.from('reviews').select('*').eq('id', id); }, [id]);\n"
+                         "  return null;\n"
+                         "}\n"),
+            'List.tsx': ("import { Card } from './Card';\n"
+                         "export function List({ ids }) {\n"
+                         "  return ids.map((id) => <Card id={id} />);\n"
+                         "}\n"),
+        })
+        self.assertEqual([(f["file"], f["line"], f["via"]["name"], f["via"]["kind"], f["via"]["line"])
+                          for f in result], [('List.tsx', 3, 'Card', 'component', 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
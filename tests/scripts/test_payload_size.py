@@ -0,0 +1,98 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+
+from payload_size import (DEFAULT_PAGE_ROWS, EMBED_FANOUT, MAX_ROWS, chain_rows, estimate_items,  # noqa: E402
+                          unique_keys, value_width)
+from query_chains import iter_query_chains, parse_select  # noqa: E402
+from relations import RelationGraph  # noqa: E402
+from schema_catalog import build_catalog  # noqa: E402
+
+SCHEMA = """
+CREATE TYPE review_status AS ENUM ('draft', 'live');
+CREATE TABLE profiles (id uuid PRIMARY KEY, username text UNIQUE, bio text);
+CREATE TABLE reviews (
+    id uuid PRIMARY KEY,
+    user_id uuid REFERENCES profiles (id),
+    rating int,
+    status review_status,
+    tags text[]
+);
+"""
+
+
+def chain(source):
+    return next(iter_query_chains(source))
+
+
+class PayloadTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with tempfile.TemporaryDirectory() as migrations, tempfile.TemporaryDirectory() as cache:
+            with open(os.path.join(migrations, '20240101000000_schema.sql'), 'w') as f:
+                f.write(SCHEMA)
+            cls.catalog = build_catalog(migrations, cache, use_cache=False)
+        cls.relations = RelationGraph.from_catalog(cls.catalog)
+        cls.keys = unique_keys(cls.catalog)
+
+    def rows(self, source):
+        c = chain(source)
+        return chain_rows(c, self.keys[c["table"]])
+
+    def items(self, table, select):
+        return estimate_items(parse_select(select, 0), table, self.catalog, self.relations)
+
+    def test_value_width(self):
+        enums = self.catalog["enums"]
+        self.assertEqual(value_width('id', 'uuid', enums), 38)
+        self.assertEqual(value_width('rating', 'int4', enums), 6)
+        self.assertEqual(value_width('username', 'varchar(20)', enums), 40)
+        self.assertEqual(value_width('bio', 'text', enums), 400)
+        self.assertEqual(value_width('status', 'review_status', enums), 14)
+        self.assertEqual(value_width('tags', 'text[]', enums), 40 * 5 + 2)
+        self.assertEqual(value_width('path', 'ltree', enums), 32)
+
+    def test_single(self):
+        self.assertEqual(self.rows("supabase.from('reviews').select('id').eq('rating', 5).single()"), (1, True))
+
+    def test_eq_on_a_unique_key(self):
+        self.assertEqual(self.rows("supabase.from('profiles').select('id').eq('username', name)"), (1, True))
+        self.assertEqual(self.rows("supabase.from('profiles').select('id').in('id', ids)"),
+                         (DEFAULT_PAGE_ROWS, True))
+        self.assertEqual(self.rows("supabase.from('reviews').select('id').eq('user_id', me)"), (MAX_ROWS, False))
+
+    def test_range_and_limit(self):
+        self.assertEqual(self.rows("supabase.from('reviews').select('id').range(20, 39)"), (20, True))
+        self.assertEqual(self.rows("supabase.from('reviews').select('id').range(from, to)"),
+                         (DEFAULT_PAGE_ROWS, True))
+        self.assertEqual(self.rows("supabase.from('reviews').select('id').limit(5)"), (5, True))
+
+    def test_columns(self):
+        total, contributions, partial = self.items('profiles', 'id, username')
+        self.assertEqual(total, 2 + (2 + 4 + 38) + (8 + 4 + 40))
+        self.assertEqual(contributions, [(('id',), 44), (('username',), 52)])
+        self.assertFalse(partial)
+        self.assertTrue(self.items('profiles', 'id, nickname')[2])
+
+    def test_to_many_embed_is_multiplied_by_the_fanout(self):
+        total, contributions, partial = self.items('profiles', 'id, reviews(rating)')
+        per_review = 2 + (6 + 4 + 6)
+        self.assertEqual(total, 2 + 44 + (7 + 4 + per_review * EMBED_FANOUT + 2))
+        self.assertEqual(contributions[-1], (('reviews', 'rating'), 16 * EMBED_FANOUT))
+        self.assertFalse(partial)
+
+    def test_to_one_embed_is_not(self):
+        total, _, _ = self.items('reviews', 'id, profiles(username)')
+        self.assertEqual(total, 2 + 44 + (8 + 4 + 2 + 52))
+
+    def test_embed_count(self):
+        total, contributions, _ = self.items('profiles', 'id, reviews(count)')
+        self.assertEqual(total, 2 + 44 + (7 + 4 + 10))
+        self.assertEqual(contributions, [(('id',), 44)])
+
+
+if __name__ == '__main__':
+    unittest.main()
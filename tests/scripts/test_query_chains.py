@@ -0,0 +1,65 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+
+from query_chains import iter_query_chains, iter_rpc_calls, parse_select  # noqa: E402
+
+SOURCE = """
+const { data } = await supabase
+  .from('reviews')
+  .select('id, body, author:profiles!reviews_author_id_fkey(name)')
+  .eq('status', 'live')
+  .order('created_at', { ascending: false });
+let q = supabase.from("buildings").select("*");
+if (city) q = q.eq("city", city);
+const r = await supabase.rpc('get_feed', { p_limit: 10, p_offset: 0 });
+// supabase.from('commented_out')
+"""
+
+
+class QueryChainsTest(unittest.TestCase):
+    def setUp(self):
+        self.chains = list(iter_query_chains(SOURCE))
+
+    def test_tables_and_offsets(self):
+        self.assertEqual([c["table"] for c in self.chains], ['reviews', 'buildings'])
+        for chain in self.chains:
+            self.assertEqual(SOURCE[chain["table_offset"]:].split("'")[0].split('"')[0], chain["table"])
+
+    def test_select_filters_and_order(self):
+        reviews = self.chains[0]
+        self.assertEqual(reviews["select"]["value"], 'id, body, author:profiles!reviews_author_id_fkey(name)')
+        self.assertEqual([(f["method"], f["column"], f["value"]) for f in reviews["filters"]],
+                         [('eq', 'status', "'live'")])
+        self.assertEqual([(o["column"], o["ascending"]) for o in reviews["order"]], [('created_at', False)])
+
+    def test_calls_on_the_assigned_variable_continue_the_chain(self):
+        buildings = self.chains[1]
+        self.assertEqual(buildings["variable"], 'q')
+        self.assertEqual([(f["column"], f["value"]) for f in buildings["filters"]], [('city', None)])
+
+    def test_rpc_arguments(self):
+        calls = list(iter_rpc_calls(SOURCE))
+        self.assertEqual([(c["function"], [a["name"] for a in c["args"]]) for c in calls],
+                         [('get_feed', ['p_limit', 'p_offset'])])
+
+
+class ParseSelectTest(unittest.TestCase):
+    def test_embed_with_alias_and_hint(self):
+        items = parse_select('id, author:profiles!fk(name, avatar), count')
+        self.assertEqual([(i["kind"], i["name"]) for i in items],
+                         [('column', 'id'), ('embed', 'profiles'), ('column', 'count')])
+        embed = items[1]
+        self.assertEqual((embed["alias"], embed["hints"], embed["offset"]), ('author', ['fk'], 11))
+        self.assertEqual([(i["name"], i["offset"]) for i in embed["inner"]], [('name', 23), ('avatar', 29)])
+
+    def test_casts_and_json_paths(self):
+        items = parse_select('total:amount::text, meta->>kind')
+        self.assertEqual((items[0]["name"], items[0]["alias"], items[0]["cast"]), ('amount', 'total', 'text'))
+        self.assertTrue(items[1]["json_path"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+
+from relations import RelationGraph  # noqa: E402
+from schema_catalog import build_catalog  # noqa: E402
+
+SCHEMA = """
+CREATE TABLE profiles (id uuid PRIMARY KEY);
+CREATE TABLE buildings (id uuid PRIMARY KEY);
+CREATE TABLE reviews (
+    id uuid PRIMARY KEY,
+    author_id uuid CONSTRAINT reviews_author_id_fkey REFERENCES profiles (id),
+    editor_id uuid CONSTRAINT reviews_editor_id_fkey REFERENCES profiles (id),
+    building_id uuid REFERENCES buildings (id)
+);
+CREATE TABLE building_architects (
+    building_id uuid REFERENCES buildings (id),
+    architect_id uuid REFERENCES profiles (id),
+    PRIMARY KEY (building_id, architect_id)
+);
+CREATE FUNCTION like_count(r uuid) RETURNS bigint AS $$
+  SELECT count(*) FROM comment_likes WHERE review_id = r
+$$ LANGUAGE sql;
+"""
+
+
+def graph(sql, outside=None):
+    with tempfile.TemporaryDirectory() as migrations, tempfile.TemporaryDirectory() as cache:
+        with open(os.path.join(migrations, '20240101000000_schema.sql'), 'w') as f:
+            f.write(sql)
+        return RelationGraph.from_catalog(build_catalog(migrations, cache, use_cache=False), outside)
+
+
+class ResolveTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = graph(SCHEMA)
+
+    def test_two_fks_to_one_table_are_ambiguous(self):
+        result = self.graph.resolve('reviews', 'profiles')
+        self.assertEqual(result["status"], 'ambiguous')
+        self.assertEqual(result["candidates"], ['reviews_author_id_fkey', 'reviews_editor_id_fkey'])
+
+    def test_hint_by_fk_name_or_column(self):
+        for hint in ('reviews_author_id_fkey', 'author_id'):
+            result = self.graph.resolve('reviews', 'profiles', (hint,))
+            self.assertEqual((result["status"], result["to_many"]), ('ok', False))
+        self.assertEqual(self.graph.resolve('reviews', 'profiles', ('owner_id',))["status"], 'hint')
+
+    def test_embed_by_fk_column(self):
+        result = self.graph.resolve('reviews', 'editor_id')
+        self.assertEqual((result["status"], result["target"]), ('ok', 'profiles'))
+
+    def test_embed_by_fk_name(self):
+        result = self.graph.resolve('reviews', 'reviews_editor_id_fkey')
+        self.assertEqual((result["status"], result["target"], result["to_many"]), ('ok', 'profiles', False))
+        result = self.graph.resolve('profiles', 'reviews_author_id_fkey')
+        self.assertEqual((result["status"], result["target"], result["to_many"]), ('ok', 'reviews', True))
+
+    def test_many_to_many_through_junction(self):
+        result = self.graph.resolve('buildings', 'profiles')
+        self.assertEqual((result["status"], result["to_many"]), ('ok', True))
+        self.assertEqual(result["candidates"], ['building_architects'])
+
+    def test_unknown(self):
+        self.assertEqual(self.graph.resolve('buildings', 'reviewers')["status"], 'unknown')
+        self.assertEqual(self.graph.resolve('reviews', 'nonexistent_fkey')["status"], 'unknown')
+
+    def test_table_created_outside_the_migrations_is_opaque(self):
+        self.assertEqual(self.graph.resolve('reviews', 'comment_likes')["status"], 'opaque')
+        self.assertEqual(graph(SCHEMA, outside=()).resolve('reviews', 'comment_likes')["status"], 'unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+SCRIPTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts')
+sys.path.insert(0, SCRIPTS)
+
+from repomix_index import BundleIndex  # noqa: E402
+
+OLD_FEED = "CREATE FUNCTION get_feed(n int) RETURNS int AS $$ SELECT n $$ LANGUAGE sql;"
+NEW_FEED = "CREATE OR REPLACE FUNCTION public.get_feed(n int) RETURNS int AS $$ SELECT n + 1 $$ LANGUAGE sql;"
+POLICY = 'CREATE POLICY "Café owners" ON public.cafés FOR SELECT USING (true);'
+CARD = "// Renders </file> literally.\nexport const Card = () => <p>é</p>;"
+DOC = "# Notes\n\n```sql\nCREATE TABLE notes (id int);\n```"
+
+FILES = (
+    ('supabase/migrations/20240101000000_feed.sql', "-- naïve first cut\n" + OLD_FEED),
+    ('src/Card.tsx', CARD),
+    ('docs/notes.md', DOC),
+    ('supabase/migrations/20240201000000_feed.sql', POLICY + "\n\n" + NEW_FEED),
+)
+
+
+def bundle_text(files):
+    sections = ''.join(f'<file path="{path}">\n{content}\n</file>\n\n' for path, content in files)
+    return f"This file is a merged representation.\n<files>\n{sections}</files>\n"
+
+
+class BundleTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.bundle = os.path.join(self.dir.name, 'repomix-output.xml')
+        self.index_dir = os.path.join(self.dir.name, 'index')
+        with open(self.bundle, 'w', encoding='utf-8') as f:
+            f.write(bundle_text(FILES))
+
+    def run_cli(self, *args):
+        return subprocess.run([sys.executable, os.path.join(SCRIPTS, 'repomix_index.py'), '--bundle', self.bundle,
+                               '--index-dir', self.index_dir] + list(args),
+                              capture_output=True, text=True, encoding='utf-8')
+
+    def test_file_slices_exactly_its_section(self):
+        for path, content in FILES:
+            self.assertEqual(self.run_cli('--file', path).stdout, content + '\n')
+        result = self.run_cli('--file', 'src/Missing.tsx')
+        self.assertEqual((result.returncode, result.stderr), (1, "src/Missing.tsx: not in any bundle\n"))
+
+    def test_object_slices_exactly_its_statement(self):
+        self.assertEqual(self.run_cli('--object', 'get_feed').stdout,
+                         f"-- function from supabase/migrations/20240201000000_feed.sql:3 ({self.bundle})\n"
+                         f"{NEW_FEED}\n")
+        self.assertEqual(self.run_cli('--object', 'get_feed', '--all').stdout.splitlines()[1], OLD_FEED)
+        self.assertEqual(self.run_cli('--object', '"Café owners"', '--kind', 'policy').stdout.splitlines()[1],
+                         POLICY)
+        self.assertEqual(self.run_cli('--object', 'notes').stdout.splitlines()[1], "CREATE TABLE notes (id int);")
+
+    def test_index_is_reused_while_size_and_mtime_hold(self):
+        with BundleIndex(self.bundle, self.index_dir).open() as first:
+            self.assertTrue(first.rebuilt)
+        with BundleIndex(self.bundle, self.index_dir).open() as second:
+            self.assertFalse(second.rebuilt)
+            self.assertEqual(second.files, first.files)
+            self.assertEqual(second.objects, first.objects)
+            self.assertEqual(second.file('src/Card.tsx'), CARD)
+
+        with open(self.bundle, 'w', encoding='utf-8') as f:
+            f.write(bundle_text(FILES[:2]))
+        with BundleIndex(self.bundle, self.index_dir).open() as changed:
+            self.assertTrue(changed.rebuilt)
+            self.assertEqual(sorted(changed.files), ['src/Card.tsx', 'supabase/migrations/20240101000000_feed.sql'])
+
+        stat = os.stat(self.bundle)
+        os.utime(self.bundle, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        with BundleIndex(self.bundle, self.index_dir).open() as touched:
+            self.assertTrue(touched.rebuilt)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import io
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+
+from report_writers import WRITERS, JsonWriter, NdjsonWriter, SarifWriter, SummaryWriter  # noqa: E402
+
+
+def finding(file, error, fix, line=1, column=1):
+    return {"file": file, "error": error, "fix": fix, "line": line, "column": column}
+
+
+FINDINGS = [
+    finding('src/a.ts', "Invalid column 'bodyy' on table 'reviews'", "Change to 'body'", 3, 14),
+    finding('src/a.ts', "Invalid table reference: 'reviewz'", "Change to 'reviews'", 9, 22),
+    finding('src/b.ts', "Invalid column 'ratting' on table 'reviews'", "Change to 'rating'", 1, 73),
+    finding('src/b.ts', "Missing argument 'building' for function 'review_count'", "Pass 'building'", 4, 21),
+    finding('src/c.ts', "Invalid embedded resource 'authors' on table 'profiles'", "Change to 'reviews'", 2, 5),
+]
+
+
+def render(writer_class, findings):
+    out = io.StringIO()
+    writer = writer_class(out)
+    for f in findings:
+        writer.write(f)
+    writer.close()
+    return out.getvalue()
+
+
+class WritersTest(unittest.TestCase):
+    def test_json_matches_json_dumps(self):
+        for findings in (FINDINGS, FINDINGS[:1], []):
+            self.assertEqual(render(JsonWriter, findings), json.dumps(findings, indent=2) + '\n')
+
+    def test_ndjson(self):
+        self.assertEqual([json.loads(line) for line in render(NdjsonWriter, FINDINGS).splitlines()], FINDINGS)
+
+    def test_sarif(self):
+        log = json.loads(render(SarifWriter, FINDINGS))
+        self.assertEqual(log["version"], '2.1.0')
+        run = log["runs"][0]
+        rules = run["tool"]["driver"]["rules"]
+        self.assertEqual([r["id"] for r in rules],
+                         ['invalid-column', 'invalid-table', 'missing-argument', 'invalid-embed'])
+        self.assertEqual(len(run["results"]), len(FINDINGS))
+        for result, f in zip(run["results"], FINDINGS):
+            self.assertEqual(rules[result["ruleIndex"]]["id"], result["ruleId"])
+            region = result["locations"][0]["physicalLocation"]["region"]
+            self.assertEqual((region["startLine"], region["startColumn"]), (f["line"], f["column"]))
+        self.assertEqual(json.loads(render(SarifWriter, []))["runs"][0]["results"], [])
+
+    def test_summary_counts(self):
+        summary = json.loads(render(SummaryWriter, FINDINGS))
+        self.assertEqual(summary, {
+            "findings": 5,
+            "rules": {"invalid-column": 2, "invalid-embed": 1, "invalid-table": 1, "missing-argument": 1},
+            "tables": {"reviews": 2, "profiles": 1, "review_count": 1, "reviewz": 1},
+            "files": {"src/a.ts": 2, "src/b.ts": 2, "src/c.ts": 1},
+        })
+        self.assertEqual(list(summary["rules"]), ['invalid-column', 'invalid-embed', 'invalid-table',
+                                                  'missing-argument'])
+
+    def test_every_format_is_registered(self):
+        self.assertEqual(sorted(WRITERS), ['json', 'ndjson', 'sarif', 'summary'])
+
+
+if __name__ == '__main__':
+    unittest.main()
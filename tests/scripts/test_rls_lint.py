@@ -0,0 +1,59 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+
+from rls_lint import lint_catalog  # noqa: E402
+from schema_catalog import build_catalog  # noqa: E402
+
+SCHEMA = """
+CREATE TABLE groups (id uuid PRIMARY KEY);
+CREATE TABLE members (group_id uuid, user_id uuid, role text);
+CREATE TABLE posts (id uuid PRIMARY KEY, group_id uuid, author_id uuid);
+CREATE INDEX members_user_idx ON members (user_id, group_id);
+CREATE FUNCTION is_admin(g uuid) RETURNS boolean LANGUAGE sql SECURITY DEFINER AS $$ SELECT true $$;
+"""
+
+
+def lint(policies):
+    with tempfile.TemporaryDirectory() as migrations, tempfile.TemporaryDirectory() as cache:
+        with open(os.path.join(migrations, '20240101000000_a.sql'), 'w') as f:
+            f.write(SCHEMA + policies)
+        return [(f["rule"], f["policy"], f["detail"]) for f in lint_catalog(build_catalog(migrations, cache,
+                                                                                        use_cache=False))]
+
+
+class LintTest(unittest.TestCase):
+    def test_bare_auth_call_is_per_row(self):
+        self.assertEqual(lint("CREATE POLICY own ON posts USING (auth.uid() = author_id);"), [
+            ('auth-function-per-row', 'own', 'auth.uid()'),
+            ('unindexed-policy-column', 'own', 'author_id'),
+        ])
+
+    def test_wrapped_auth_call_is_not(self):
+        self.assertEqual(lint("CREATE INDEX posts_author_idx ON posts (author_id);\n"
+                              "CREATE POLICY own ON posts USING ((select auth.uid()) = author_id);"), [])
+
+    def test_auth_call_in_a_string_is_ignored(self):
+        self.assertEqual(lint("CREATE POLICY s ON groups USING (current_user <> 'auth.uid()');"), [])
+
+    def test_security_definer_call_with_row_values(self):
+        [finding] = lint("CREATE POLICY adm ON posts USING (is_admin(group_id));")
+        self.assertEqual(finding, ('security-definer-per-row', 'adm', 'is_admin(group_id)'))
+
+    def test_subquery_filtering_on_an_unindexed_column(self):
+        self.assertEqual(lint("CREATE POLICY m ON posts USING (group_id IN (SELECT m.group_id FROM members m "
+                              "WHERE m.role = 'admin'));"), [('unindexed-subquery', 'm', 'role')])
+        self.assertEqual(lint("CREATE POLICY m ON posts USING (group_id IN (SELECT group_id FROM members "
+                              "WHERE user_id = (select auth.uid())));"), [])
+
+    def test_same_problem_in_using_and_with_check_reported_once(self):
+        findings = lint("CREATE POLICY u ON posts FOR UPDATE USING (auth.uid() = author_id) "
+                        "WITH CHECK (auth.uid() = author_id);")
+        self.assertEqual([rule for rule, _, _ in findings], ['auth-function-per-row', 'unindexed-policy-column'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+
+from schema_catalog import (build_catalog, list_migrations, referenced_functions, referenced_tables,  # noqa: E402
+                            split_statements)
+
+
+def write_migrations(directory, files):
+    for name, sql in files.items():
+        with open(os.path.join(directory, name), 'w') as f:
+            f.write(sql)
+
+
+class ListMigrationsTest(unittest.TestCase):
+    def test_only_timestamped_sql_files_in_lexical_order(self):
+        with tempfile.TemporaryDirectory() as migrations:
+            write_migrations(migrations, {
+                '20240102000000_b.sql': '', '20240101000000_a.sql': '', 'add_slug_to_groups.sql': '',
+                '_TEMPLATE_rpc.sql.txt': '', '20240103000000_notes.md': '',
+            })
+            self.assertEqual(list_migrations(migrations), ['20240101000000_a.sql', '20240102000000_b.sql'])
+
+    def test_untimestamped_alter_does_not_revive_a_dropped_table(self):
+        with tempfile.TemporaryDirectory() as migrations, tempfile.TemporaryDirectory() as cache:
+            write_migrations(migrations, {
+                '20240101000000_create_groups.sql': 'CREATE TABLE public.groups (id uuid PRIMARY KEY);',
+                '20240102000000_remove_groups.sql': 'DROP TABLE IF EXISTS public.groups CASCADE;',
+                'add_slug_to_groups.sql': 'ALTER TABLE groups ADD COLUMN slug text;',
+            })
+            catalog = build_catalog(migrations, cache, use_cache=False)
+            self.assertNotIn('groups', catalog["tables"])
+
+    def test_alter_without_create_is_partial(self):
+        with tempfile.TemporaryDirectory() as migrations, tempfile.TemporaryDirectory() as cache:
+            write_migrations(migrations, {'20240101000000_slug.sql': 'ALTER TABLE groups ADD COLUMN slug text;'})
+            table = build_catalog(migrations, cache, use_cache=False)["tables"]["groups"]
+            self.assertTrue(table["partial"])
+            self.assertEqual(list(table["columns"]), ['slug'])
+
+
+class ReferencedTablesTest(unittest.TestCase):
+    def catalog(self, sql):
+        with tempfile.TemporaryDirectory() as migrations, tempfile.TemporaryDirectory() as cache:
+            write_migrations(migrations, {'20240101000000_a.sql': sql})
+            return build_catalog(migrations, cache, use_cache=False)
+
+    def test_tables_read_but_never_created(self):
+        catalog = self.catalog(
+            "CREATE TABLE reviews (id uuid PRIMARY KEY);\n"
+            "CREATE FUNCTION like_count(r uuid) RETURNS bigint AS $$\n"
+            "  -- don't count from deleted users\n"
+            "  WITH recent AS (SELECT * FROM comment_likes l JOIN reviews v ON v.id = l.review_id)\n"
+            "  SELECT count(*) FROM recent WHERE trim(both '-' from slug) IS DISTINCT FROM 'x'\n"
+            "$$ LANGUAGE sql;\n"
+            "CREATE POLICY \"Read from anywhere\" ON reviews FOR SELECT USING (true);")
+        self.assertEqual(referenced_tables(catalog), {'comment_likes'})
+
+    def test_temporary_tables_are_not_references(self):
+        catalog = self.catalog(
+            "CREATE TEMPORARY TABLE IF NOT EXISTS temp_group_logs (id uuid);\n"
+            "CREATE FUNCTION stats() RETURNS void AS $$\n"
+            "BEGIN\n"
+            "  CREATE TEMP TABLE temp_group_entries (id uuid) ON COMMIT DROP;\n"
+            "  INSERT INTO temp_group_entries SELECT id FROM temp_group_logs;\n"
+            "  UPDATE group_stats SET n = (SELECT count(*) FROM temp_group_entries);\n"
+            "END $$ LANGUAGE plpgsql;")
+        self.assertEqual(referenced_tables(catalog), {'group_stats'})
+
+    def test_drop_forgets_the_reference(self):
+        catalog = self.catalog("INSERT INTO legacy_likes VALUES (1);\nDROP TABLE legacy_likes;")
+        self.assertEqual(referenced_tables(catalog), set())
+
+    def test_functions_granted_but_never_created(self):
+        catalog = self.catalog("REVOKE ALL ON FUNCTION public.is_mutual(a uuid, b uuid) FROM anon;\n"
+                               "GRANT EXECUTE ON FUNCTION old_feed(int) TO authenticated;\n"
+                               "DROP FUNCTION old_feed(int);")
+        self.assertEqual(referenced_functions(catalog), {'is_mutual'})
+
+
+class RowLevelSecurityTest(unittest.TestCase):
+    TABLE = ("CREATE TABLE reviews (id uuid PRIMARY KEY, user_id uuid);\n"
+             "ALTER TABLE reviews ENABLE ROW LEVEL SECURITY;\n")
+
+    def table(self, sql):
+        with tempfile.TemporaryDirectory() as migrations, tempfile.TemporaryDirectory() as cache:
+            write_migrations(migrations, {'20240101000000_a.sql': self.TABLE + sql})
+            return build_catalog(migrations, cache, use_cache=False)["tables"]["reviews"]
+
+    def test_policies_and_their_alterations(self):
+        table = self.table(
+            'CREATE POLICY "Owners update" ON reviews AS PERMISSIVE FOR UPDATE TO authenticated\n'
+            '  USING (auth.uid() = user_id) WITH CHECK (auth.uid() = user_id);\n'
+            'CREATE POLICY "Anyone reads" ON public.reviews FOR SELECT USING (true);\n'
+            'ALTER POLICY "Anyone reads" ON reviews TO anon, authenticated;\n'
+            'ALTER POLICY "Owners update" ON reviews RENAME TO owners_update;\n')
+        self.assertTrue(table["rls_enabled"])
+        self.assertEqual(table["rls_toggles"], [{'action': 'ENABLE', 'file': '20240101000000_a.sql', 'line': 2}])
+        self.assertEqual(sorted(table["policies"]), ['Anyone reads', 'owners_update'])
+        update = table["policies"]["owners_update"]
+        self.assertEqual((update["command"], update["roles"], update["using"], update["with_check"]),
+                         ('UPDATE', ['authenticated'], 'auth.uid() = user_id', 'auth.uid() = user_id'))
+        read = table["policies"]["Anyone reads"]
+        self.assertEqual((read["command"], read["roles"], read["using"], read["line"]),
+                         ('SELECT', ['anon', 'authenticated'], 'true', 6))
+
+    def test_pg_policies_loop_drops_only_the_filtered_command(self):
+        table = self.table(
+            'CREATE POLICY upd ON reviews FOR UPDATE USING (true);\n'
+            'CREATE POLICY sel ON reviews FOR SELECT USING (true);\n'
+            "DO $$ BEGIN\n"
+            "  FOR pol IN SELECT policyname FROM pg_policies WHERE tablename = 'reviews' AND cmd = 'UPDATE' LOOP\n"
+            "    EXECUTE format('DROP POLICY %I ON reviews', pol.policyname);\n"
+            "  END LOOP;\n"
+            "END $$;\n")
+        self.assertEqual(list(table["policies"]), ['sel'])
+
+    def test_grants_and_revokes(self):
+        table = self.table(
+            'GRANT ALL ON TABLE reviews TO service_role;\n'
+            'GRANT SELECT, INSERT ON reviews TO anon;\n'
+            'REVOKE INSERT ON reviews FROM anon;\n'
+            'REVOKE DELETE ON reviews FROM authenticated;\n'
+            'GRANT EXECUTE ON FUNCTION reviews() TO authenticated;\n')
+        self.assertEqual(table["grants"], {
+            'service_role': ['DELETE', 'INSERT', 'REFERENCES', 'SELECT', 'TRIGGER', 'TRUNCATE', 'UPDATE'],
+            'anon': ['SELECT'],
+        })
+        self.assertEqual(table["revoked"], {'authenticated': ['DELETE']})
+
+
+class SplitStatementsTest(unittest.TestCase):
+    def test_semicolons_in_strings_comments_and_bodies(self):
+        sql = ("SELECT ';' AS a; -- not ; here\n"
+               "CREATE FUNCTION f() RETURNS int AS $$ BEGIN RETURN 1; END $$ LANGUAGE plpgsql;\n"
+               "/* ; */ SELECT 2;")
+        texts = [text.strip() for _, text in split_statements(sql)]
+        self.assertEqual(len(texts), 3)
+        self.assertEqual(texts[0], "SELECT ';' AS a;")
+        self.assertIn('RETURN 1; END', texts[1])
+        self.assertEqual(texts[2], 'SELECT 2;')
+
+    def test_offsets_point_into_the_original(self):
+        sql = "SELECT 1;\n  SELECT 2;"
+        offsets = [offset for offset, _ in split_statements(sql)]
+        self.assertEqual(sql[offsets[1]:].lstrip()[:8], 'SELECT 2')
+
+
+if __name__ == '__main__':
+    unittest.main()
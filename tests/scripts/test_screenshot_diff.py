@@ -0,0 +1,66 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:
+    np = None
+else:
+    import screenshot_diff  # noqa: E402
+
+
+@unittest.skipIf(np is None, 'numpy and Pillow are not installed')
+class CompareTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        # Two rows by three columns of 32px tiles, with something in every tile.
+        image = np.zeros((64, 96, 3), dtype=np.uint8)
+        image[..., 0] = np.arange(96, dtype=np.uint8)
+        image[..., 1] = np.arange(64, dtype=np.uint8)[:, None]
+        self.before = self.save('before.png', image)
+        changed = image.copy()
+        changed[40:50, 70:80] = 255  # inside the tile at row 1, column 2
+        self.after = self.save('after.png', changed)
+        self.baseline = os.path.join(self.dir.name, 'baselines', 'shot.png')
+        screenshot_diff.write_baseline(self.before, self.baseline, [])
+
+    def save(self, name, array):
+        path = os.path.join(self.dir.name, name)
+        Image.fromarray(array).save(path)
+        return path
+
+    def test_only_the_changed_tile_fails(self):
+        out = os.path.join(self.dir.name, 'out', 'shot.diff.png')
+        result = screenshot_diff.compare(self.after, self.baseline, out=out)
+        self.assertEqual(result["status"], 'failed')
+        self.assertEqual((result["tiles"], result["compared"], result["skipped"]), (6, 1, 5))
+        self.assertEqual((result["changed_tiles"], result["changed_pixels"]), (1, 100))
+        self.assertEqual(result["regions"], [[64, 32, 32, 32]])
+        self.assertTrue(os.path.exists(out))
+
+    def test_mask_suppresses_the_change(self):
+        result = screenshot_diff.compare(self.after, self.baseline, masks=[(64, 32, 32, 32)])
+        self.assertEqual((result["status"], result["changed_tiles"]), ('passed', 0))
+
+    def test_tolerance_and_tile_threshold(self):
+        self.assertEqual(screenshot_diff.compare(self.after, self.baseline, tile_threshold=0.1)["status"], 'passed')
+        self.assertEqual(screenshot_diff.compare(self.after, self.baseline, tolerance=255)["status"], 'passed')
+
+    def test_unchanged_tiles_are_skipped_from_the_sidecar(self):
+        self.assertTrue(os.path.exists(os.path.splitext(self.baseline)[0] + '.tiles.npz'))
+        with mock.patch.object(screenshot_diff, 'load', wraps=screenshot_diff.load) as load:
+            result = screenshot_diff.compare(self.before, self.baseline)
+        self.assertEqual((result["status"], result["compared"], result["skipped"]), ('passed', 0, 6))
+        # Only the screenshot is decoded: the baseline's checksums come from the sidecar.
+        self.assertEqual([c.args[0] for c in load.call_args_list], [self.before])
+
+
+if __name__ == '__main__':
+    unittest.main()
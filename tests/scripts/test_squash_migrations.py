@@ -0,0 +1,81 @@
+import datetime
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+
+from squash_migrations import catalog_difference, eliminate, migration_hazards, squash  # noqa: E402
+
+NOW = datetime.datetime(2025, 1, 1)
+
+
+def write_migrations(directory, files):
+    for name, sql in files.items():
+        with open(os.path.join(directory, name), 'w') as f:
+            f.write(sql)
+
+
+class HazardsTest(unittest.TestCase):
+    def hazards(self, names):
+        with tempfile.TemporaryDirectory() as migrations:
+            write_migrations(migrations, {name: '' for name in names})
+            return [(h["kind"], h["files"]) for h in migration_hazards(migrations, now=NOW)]
+
+    def test_each_kind(self):
+        self.assertEqual(self.hazards([
+            '20240101000000_a.sql', '20240101000000_b.sql', 'add_slug_to_groups.sql', '20241399000000_bad.sql',
+            '20240301_short.sql', '20240301120000_noon.sql', '20990101000000_future.sql',
+        ]), [
+            ('duplicate-version', ['20240101000000_a.sql', '20240101000000_b.sql']),
+            ('future-timestamp', ['20990101000000_future.sql']),
+            ('invalid-timestamp', ['20241399000000_bad.sql']),
+            ('out-of-order', ['20240301120000_noon.sql', '20240301_short.sql']),
+            ('short-version', ['20240301_short.sql']),
+            ('untimestamped', ['add_slug_to_groups.sql']),
+        ])
+
+    def test_clean_history(self):
+        self.assertEqual(self.hazards(['20240101000000_a.sql', '20240102000000_b.sql', 'README.md']),
+                         [('untimestamped', ['README.md'])])
+
+
+class EliminateTest(unittest.TestCase):
+    def squash(self, files):
+        with tempfile.TemporaryDirectory() as migrations:
+            write_migrations(migrations, files)
+            statements, _, _ = squash(migrations)
+        eliminate(statements)
+        return statements
+
+    def test_dropped_table_and_replaced_function(self):
+        statements = self.squash({
+            '20240101000000_a.sql': "CREATE TABLE t (id int);\nCREATE TABLE tmp (id int);\n"
+                                    "CREATE FUNCTION f() RETURNS int LANGUAGE sql AS $$ SELECT 1 $$;",
+            '20240102000000_b.sql': "DROP TABLE tmp;\n"
+                                    "CREATE OR REPLACE FUNCTION f() RETURNS int LANGUAGE sql AS $$ SELECT 2 $$;\n"
+                                    "ALTER TABLE t ADD COLUMN x int;",
+        })
+        self.assertEqual([s["text"].split('(')[0].strip() for s in statements if s["keep"]],
+                         ['CREATE TABLE t', 'CREATE OR REPLACE FUNCTION f', 'ALTER TABLE t ADD COLUMN x int;'])
+        self.assertEqual(catalog_difference(statements), [])
+
+    def test_table_used_before_it_is_dropped_is_kept(self):
+        statements = self.squash({
+            '20240101000000_a.sql': "CREATE TABLE t (id int);\nCREATE TABLE tmp (id int);",
+            '20240102000000_b.sql': "INSERT INTO t SELECT id FROM tmp;\nDROP TABLE tmp;",
+        })
+        self.assertEqual([s["keep"] for s in statements], [True, True, True, True])
+        self.assertEqual(catalog_difference(statements), [])
+
+    def test_untimestamped_files_are_not_squashed(self):
+        statements = self.squash({
+            '20240101000000_a.sql': "CREATE TABLE t (id int);",
+            'add_slug.sql': "ALTER TABLE t ADD COLUMN slug text;",
+        })
+        self.assertEqual({s["file"] for s in statements}, {'20240101000000_a.sql'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import difflib
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+
+from suggestions import SchemaSuggestions, SuggestionIndex  # noqa: E402
+
+TABLES = ['buildings', 'building_architects', 'building_credits', 'collections', 'collection_items', 'comments',
+          'image_likes', 'likes', 'notifications', 'profiles', 'recommendations', 'reviews', 'user_buildings',
+          'follows', 'tags', 'a', 'ab']
+
+
+def mutations(word, rng):
+    letters = 'abcdeilmnorstu_'
+    out = {word, word[:-1], word + 's', word[1:], word.upper()}
+    for _ in range(6):
+        i = rng.randrange(len(word) + 1)
+        out.add(word[:i] + rng.choice(letters) + word[i + 1:])
+        out.add(word[:i] + rng.choice(letters) + word[i:])
+    return sorted(w for w in out if w)
+
+
+class SuggestionIndexTest(unittest.TestCase):
+    def test_matches_get_close_matches(self):
+        rng = random.Random(7)
+        # Names are unique within a schema.
+        vocabulary = sorted(set(TABLES) | {''.join(rng.choice('abcdefgh_') for _ in range(rng.randint(1, 14)))
+                                           for _ in range(200)})
+        index = SuggestionIndex(vocabulary)
+        queries = [q for word in TABLES for q in mutations(word, rng)] + ['comment_likes', 'x', 'zzzz']
+        for cutoff in (0.6, 0.8):
+            for word in queries:
+                expected = difflib.get_close_matches(word, vocabulary, n=3, cutoff=cutoff)
+                self.assertEqual([name for name, _ in index.top(word, 3, cutoff)], expected, (word, cutoff))
+                self.assertEqual(index.best(word, cutoff), (expected or [None])[0], (word, cutoff))
+
+    def test_scores_are_sequence_matcher_ratios(self):
+        index = SuggestionIndex(TABLES)
+        for name, score in index.top('comment_likes', 3):
+            self.assertEqual(score, difflib.SequenceMatcher(None, name, 'comment_likes').ratio())
+
+    def test_lookups_are_memoised(self):
+        index = SuggestionIndex(TABLES)
+        for _ in range(3):
+            index.best('reviewz')
+        self.assertEqual((index.lookups, len(index._memo)), (3, 1))
+
+    def test_empty_vocabulary(self):
+        self.assertIsNone(SuggestionIndex([]).best('anything'))
+
+
+class SchemaSuggestionsTest(unittest.TestCase):
+    def test_tables_columns_functions_and_arguments(self):
+        suggestions = SchemaSuggestions(
+            {'reviews': {'body': 'text', 'created_at': 'timestamptz'}},
+            {'get_feed': [[{'name': 'p_limit', 'required': False}, {'name': None, 'required': True}]]})
+        self.assertEqual(suggestions.table('review'), 'reviews')
+        self.assertEqual(suggestions.column('reviews', 'created'), 'created_at')
+        self.assertIsNone(suggestions.column('missing_table', 'body'))
+        self.assertEqual(suggestions.function('get_feeds'), 'get_feed')
+        self.assertEqual(suggestions.argument('get_feed', 'limit'), 'p_limit')
+
+
+if __name__ == '__main__':
+    unittest.main()
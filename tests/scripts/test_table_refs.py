@@ -0,0 +1,47 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+
+from table_refs import count_occurrences, scan_table_references  # noqa: E402
+
+FILES = {
+    'src/client.ts': "import { createClient } from '@supabase/supabase-js';\n"
+                     "export const a = createClient(url, key); export const b = createClient(url, key);\n",
+    'src/feed.tsx': "supabase.from('reviews').select('*'); supabase.from('reviews').select('id');\n"
+                    "supabase.from(\"profiles\").select('*');\n",
+    'src/README.md': "Call createClient once.\n",
+    'src/node_modules/x/index.js': "createClient();\nsupabase.from('reviews');\n",
+}
+
+
+class TableRefsTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        for name, content in FILES.items():
+            path = os.path.join(self.root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(content)
+        with open(os.path.join(self.root, 'src', 'logo.png'), 'wb') as f:
+            f.write(b'\x89PNG\0createClient\0createClient\n')
+        self.src = os.path.join(self.root, 'src')
+
+    def test_count_occurrences_counts_lines_like_grep(self):
+        # Two lines in client.ts, the README, and the binary file once.
+        self.assertEqual(count_occurrences('createClient', roots=(self.src,)), 4)
+        self.assertEqual(count_occurrences('createClient', roots=(self.src,), extensions=('.ts',)), 2)
+        self.assertEqual(count_occurrences('createClient', roots=(os.path.join(self.root, 'missing'),)), 0)
+
+    def test_scan_counts_every_call(self):
+        refs = scan_table_references(['reviews', 'profiles', 'comments'], roots=(self.src,))
+        self.assertEqual({t: r["count"] for t, r in refs.items()}, {'reviews': 2, 'profiles': 1, 'comments': 0})
+        self.assertEqual([(line, column) for _, line, column in refs['reviews']["locations"]], [(1, 9), (1, 47)])
+
+
+if __name__ == '__main__':
+    unittest.main()
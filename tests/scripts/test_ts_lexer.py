@@ -0,0 +1,53 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+
+from ts_lexer import tokenize  # noqa: E402
+
+
+def kinds(src, **kwargs):
+    return [(t.kind, t.value) for t in tokenize(src, **kwargs)]
+
+
+class TokenizeTest(unittest.TestCase):
+    def test_nested_template_substitutions(self):
+        self.assertEqual(kinds("`x ${b + `in${c}`} y`"), [
+            ('template', 'x '), ('ident', 'b'), ('punct', '+'), ('template', 'in'), ('ident', 'c'),
+            ('template', ''), ('template', ' y'),
+        ])
+
+    def test_template_without_substitutions_is_a_string(self):
+        self.assertEqual(kinds('`a ${"{"}`')[0], ('template', 'a '))
+        self.assertEqual(kinds('`plain`'), [('string', 'plain')])
+
+    def test_regex_literal_with_slash_in_class(self):
+        self.assertEqual(kinds('r = /a\\/[/]b/g.test(s)')[2], ('regex', '/a\\/[/]b/g'))
+
+    def test_division_is_not_a_regex(self):
+        self.assertEqual(kinds('x / y / z'), [('ident', 'x'), ('punct', '/'), ('ident', 'y'), ('punct', '/'),
+                                               ('ident', 'z')])
+        self.assertEqual(kinds('return /y/')[1], ('regex', '/y/'))
+
+    def test_comments_produce_no_tokens(self):
+        self.assertEqual(kinds("a // from('x')\n/* .from('y') */ b"), [('ident', 'a'), ('ident', 'b')])
+
+    def test_strings_keep_escapes_and_offsets(self):
+        src = "f('it\\'s', \"q\")"
+        tokens = [t for t in tokenize(src) if t.kind == 'string']
+        self.assertEqual([t.value for t in tokens], ["it\\'s", 'q'])
+        self.assertEqual(src[tokens[1].start:tokens[1].end], '"q"')
+
+    def test_jsx_markup_is_skipped_but_expressions_are_not(self):
+        self.assertEqual(kinds('x = <Card id={v}>hi {n}</Card>', jsx=True, elements=True), [
+            ('ident', 'x'), ('punct', '='), ('element', 'Card'), ('punct', '{'), ('ident', 'v'), ('punct', '}'),
+            ('punct', '{'), ('ident', 'n'), ('punct', '}'),
+        ])
+
+    def test_generic_arrow_is_not_jsx(self):
+        self.assertNotIn('element', [k for k, _ in kinds('const f = <T,>(x: T) => x', jsx=True, elements=True)])
+
+
+if __name__ == '__main__':
+    unittest.main()